@@ -0,0 +1,420 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = """
+---
+name: zhmc
+short_description: Inventory of CPCs, partitions and LPARs managed by an HMC
+description:
+  - Creates an inventory with the CPCs (Z systems) managed by an HMC, the
+    partitions on CPCs in DPM mode and the LPARs on CPCs in classic mode.
+  - Uses a YAML configuration file whose name ends with C(zhmc.yml) or
+    C(zhmc.yaml).
+  - The inventory host name of a CPC is its name. The inventory host name of a
+    partition or LPAR is C(<cpc_name>.<name>).
+  - The hosts are added to the groups C(zhmc_cpcs), C(zhmc_partitions) and
+    C(zhmc_lpars), and the partitions and LPARs of a CPC are added to the group
+    C(zhmc_cpc_<cpc_name>). Additional groups can be created from the host
+    variables with the C(keyed_groups) and C(groups) options.
+  - The host variables are the properties of the CPC, partition or LPAR, with
+    their names prefixed with C(zhmc_) and hyphens replaced with underscores
+    (e.g. C(zhmc_status)). In addition, C(zhmc_class) is the resource class
+    ('cpc', 'partition', 'logical-partition') and C(zhmc_cpc_name) is the
+    name of the CPC.
+  - On HMCs with version 2.14.0 or higher, the "List Permitted Partitions"
+    and "List Permitted Logical Partitions" operations are used. On older
+    HMCs, the managed CPCs are listed and the partitions or LPARs on each CPC.
+  - Partitions and LPARs for which the user has no object access permission
+    are not in the inventory.
+  - The inventory can be cached with an inventory cache plugin, so that
+    subsequent runs within the cache timeout do not access the HMC.
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - "The HMC userid must have object-access permissions to these objects:
+    Target partitions and LPARs, CPCs of target partitions and LPARs (only
+    for z13 and older, and for the CPC hosts)."
+extends_documentation_fragment:
+  - constructed
+  - inventory_cache
+options:
+  plugin:
+    description:
+      - Token that ensures this is a configuration file for this plugin.
+    required: true
+    choices: ['ibm.ibm_zhmc.zhmc']
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - "The authentication credentials for the HMC, as a dictionary with the
+         following items:"
+      - "* C(userid) (str, required): The userid (username) for authenticating
+         with the HMC."
+      - "* C(password) (str, required): The password for authenticating with
+         the HMC. It is recommended to encrypt it with Ansible Vault."
+      - "* C(ca_certs) (str): Path name of certificate file or certificate
+         directory to be used for verifying the HMC certificate. If null
+         (default), the certificates provided by the 'certifi' Python
+         package (or the ones specified in the 'REQUESTS_CA_BUNDLE' or
+         'CURL_CA_BUNDLE' environment variables) are used."
+      - "* C(verify) (bool): If True (default), verify the HMC certificate as
+         specified in C(ca_certs). If False, do not verify the HMC
+         certificate."
+    type: dict
+    required: true
+  cpc_names:
+    description:
+      - Names of the CPCs whose partitions and LPARs (and the CPCs themselves)
+        are added to the inventory. If empty (default), all managed CPCs are
+        used.
+    type: list
+    elements: str
+    default: []
+  include_cpcs:
+    description:
+      - Add the CPCs as hosts to the inventory.
+    type: bool
+    default: true
+  include_partitions:
+    description:
+      - Add the partitions of CPCs in DPM mode as hosts to the inventory.
+    type: bool
+    default: true
+  include_lpars:
+    description:
+      - Add the LPARs of CPCs in classic mode as hosts to the inventory.
+    type: bool
+    default: true
+  properties:
+    description:
+      - Names of additional properties of the CPCs, partitions and LPARs that
+        are retrieved from the HMC and added as host variables, with
+        underscores or hyphens (e.g. C(os_type)). Properties that do not exist
+        for a resource class are ignored for that class.
+      - Retrieving additional properties requires one HMC operation per host.
+        If empty (default), only the properties returned when listing the
+        resources are added, which requires no additional HMC operations.
+    type: list
+    elements: str
+    default: []
+"""
+
+EXAMPLES = """
+---
+# File zhmc.yml: All CPCs, partitions and LPARs, with groups by status
+# and OS type, cached for 10 minutes
+plugin: ibm.ibm_zhmc.zhmc
+hmc_host: 10.11.12.13
+hmc_auth:
+  userid: myuser
+  password: !vault |
+    $ANSIBLE_VAULT;1.1;AES256
+    ...
+  verify: false
+properties:
+  - os_type
+keyed_groups:
+  - key: zhmc_status
+    prefix: status
+  - key: zhmc_os_type
+    prefix: os
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: ~/.cache/zhmc_inventory
+cache_timeout: 600
+
+---
+# File zhmc.yml: Only the partitions of CPC1 that are active
+plugin: ibm.ibm_zhmc.zhmc
+hmc_host: 10.11.12.13
+hmc_auth:
+  userid: myuser
+  password: mypassword
+cpc_names:
+  - CPC1
+include_cpcs: false
+include_lpars: false
+groups:
+  active_partitions: zhmc_status == 'active'
+"""
+
+import traceback  # noqa: E402
+
+from ansible.errors import AnsibleError, AnsibleParserError  # noqa: E402
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, \
+    Cacheable  # noqa: E402
+
+from ..module_utils.common import get_hmc_auth, get_session, \
+    Error, HmcCapabilities  # noqa: E402
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Prefix for the names of the host variables
+HOSTVAR_PREFIX = 'zhmc_'
+
+# Prefix for the names of the groups of the hosts of a CPC
+CPC_GROUP_PREFIX = 'zhmc_cpc_'
+
+# Groups for the hosts of each resource class
+CLASS_GROUPS = {
+    'cpc': 'zhmc_cpcs',
+    'partition': 'zhmc_partitions',
+    'logical-partition': 'zhmc_lpars',
+}
+
+
+def hostvar_name(prop_name):
+    """
+    Return the host variable name for an HMC property name.
+    """
+    return HOSTVAR_PREFIX + prop_name.replace('-', '_')
+
+
+def pull_properties(resource, prop_names):
+    """
+    Retrieve the specified properties of a resource from the HMC, if not yet
+    present, and return the subset of them that exists for the resource.
+    """
+    # The properties are retrieved with a single "Get Properties" operation.
+    # The full properties are retrieved, because not all of the specified
+    # properties may exist for the resource class, and because not all HMC
+    # versions support the selection of properties.
+    if any(p not in resource.properties for p in prop_names):
+        resource.pull_full_properties()
+    return dict((p, resource.properties[p])
+                for p in prop_names if p in resource.properties)
+
+
+def host_entry(resource, cpc, prop_names):
+    """
+    Return a dictionary with the inventory data of a CPC, partition or LPAR,
+    that is suitable for caching.
+    """
+    # The properties returned when listing the resource, and the specified
+    # additional properties
+    props = dict(resource.properties)
+    props.update(pull_properties(resource, prop_names))
+    props['class'] = resource.manager.class_name
+    props['cpc-name'] = cpc.name
+    if 'se-version' not in props and 'se-version' in cpc.properties:
+        props['se-version'] = cpc.properties['se-version']
+    if resource is cpc:
+        host_name = cpc.name
+    else:
+        host_name = '{0}.{1}'.format(cpc.name, resource.name)
+    host_vars = dict((hostvar_name(n), v) for n, v in props.items())
+    return dict(name=host_name, cpc_name=cpc.name, vars=host_vars)
+
+
+def list_resources(client, capabilities, kind, list_cpcs):
+    """
+    Return the partitions (kind 'partitions') or LPARs (kind 'lpars') of all
+    managed CPCs, using the "List Permitted ..." operation if the HMC supports
+    it, and otherwise listing them in the CPCs returned by list_cpcs().
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # The "List Permitted Partitions" and "List Permitted Logical
+    # Partitions" operations were added in HMC version 2.14.0.
+    console = client.consoles.console
+    if kind == 'partitions':
+        if capabilities.has_list_permitted(kind):
+            return console.list_permitted_partitions()
+        resources = []
+        for cpc in list_cpcs():
+            if capabilities.cpc_dpm_enabled(cpc):
+                resources.extend(cpc.partitions.list())
+        return resources
+    if capabilities.has_list_permitted(kind):
+        return console.list_permitted_lpars()
+    resources = []
+    for cpc in list_cpcs():
+        if not capabilities.cpc_dpm_enabled(cpc):
+            resources.extend(cpc.lpars.list())
+    return resources
+
+
+def list_host_entries(client, cpc_names, include_cpcs, include_partitions,
+                      include_lpars, prop_names):
+    """
+    Return the inventory data of the CPCs, partitions and LPARs managed by the
+    HMC, as a list of dictionaries (see host_entry()).
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    prop_names = [p.replace('_', '-') for p in prop_names]
+
+    def cpc_selected(cpc_name):
+        return not cpc_names or cpc_name in cpc_names
+
+    entries = []
+    cpcs = []  # Selected CPCs, listed once when first needed
+
+    def list_cpcs():
+        if not cpcs:
+            cpcs.append([cpc for cpc in client.cpcs.list()
+                         if cpc_selected(cpc.name)])
+        return cpcs[0]
+
+    if include_cpcs:
+        for cpc in list_cpcs():
+            entries.append(host_entry(cpc, cpc, prop_names))
+
+    kinds = []
+    if include_partitions:
+        kinds.append('partitions')
+    if include_lpars:
+        kinds.append('lpars')
+    if kinds:
+
+        # The HMC capabilities are cached across inventory refreshes. If the
+        # HMC has been downgraded in the meantime, the listing is repeated
+        # with the capabilities retrieved again.
+        capabilities = HmcCapabilities.for_client(client)
+        for kind in kinds:
+            try:
+                resources = list_resources(
+                    client, capabilities, kind, list_cpcs)
+            except zhmcclient.HTTPError as exc:
+                if not capabilities.refresh_on_error(exc):
+                    raise
+                resources = list_resources(
+                    client, capabilities, kind, list_cpcs)
+            for resource in resources:
+                cpc = resource.manager.cpc
+                if cpc_selected(cpc.name):
+                    entries.append(host_entry(resource, cpc, prop_names))
+
+    return entries
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+    """
+    Inventory plugin for the CPCs, partitions and LPARs managed by an HMC.
+    """
+
+    NAME = 'ibm.ibm_zhmc.zhmc'
+
+    def verify_file(self, path):
+        """
+        Return whether the file is a configuration file for this plugin.
+        """
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(('zhmc.yml', 'zhmc.yaml'))
+        return False
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+
+        if IMP_ZHMCCLIENT_ERR is not None:
+            raise AnsibleError(
+                "The zhmcclient Python package is required for the zhmc "
+                "inventory plugin:\n{0}".format(IMP_ZHMCCLIENT_ERR))
+
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        entries = None
+        if attempt_to_read_cache:
+            try:
+                entries = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+
+        if entries is None:
+            entries = self._list_host_entries()
+
+        if cache_needs_update:
+            self._cache[cache_key] = entries
+
+        self._populate(entries)
+
+    def _get_session(self):
+        """
+        Return a session with the HMC.
+        """
+        try:
+            userid, password, ca_certs, verify = get_hmc_auth(
+                self.get_option('hmc_auth'))
+        except Error as exc:
+            raise AnsibleParserError(str(exc))
+        return get_session(
+            None, self.get_option('hmc_host'), userid, password, ca_certs,
+            verify)
+
+    def _list_host_entries(self):
+        """
+        Return the inventory data from the HMC.
+        """
+        session = self._get_session()
+        try:
+            client = zhmcclient.Client(session)
+            return list_host_entries(
+                client,
+                cpc_names=self.get_option('cpc_names'),
+                include_cpcs=self.get_option('include_cpcs'),
+                include_partitions=self.get_option('include_partitions'),
+                include_lpars=self.get_option('include_lpars'),
+                prop_names=self.get_option('properties'))
+        except zhmcclient.Error as exc:
+            raise AnsibleError(
+                "Cannot retrieve the inventory from HMC {0}: {1}: {2}".
+                format(self.get_option('hmc_host'), exc.__class__.__name__,
+                       exc))
+        finally:
+            session.logoff()
+
+    def _populate(self, entries):
+        """
+        Add the hosts and groups for the inventory data to the inventory.
+        """
+        strict = self.get_option('strict')
+        for entry in entries:
+            host_name = entry['name']
+            host_vars = entry['vars']
+            self.inventory.add_host(host_name)
+            for name, value in host_vars.items():
+                self.inventory.set_variable(host_name, name, value)
+
+            class_group = CLASS_GROUPS[host_vars[hostvar_name('class')]]
+            self.inventory.add_group(class_group)
+            self.inventory.add_child(class_group, host_name)
+            if host_vars[hostvar_name('class')] != 'cpc':
+                cpc_group = self.inventory.add_group(self._sanitize_group_name(
+                    CPC_GROUP_PREFIX + entry['cpc_name']))
+                self.inventory.add_child(cpc_group, host_name)
+
+            self._set_composite_vars(
+                self.get_option('compose'), host_vars, host_name, strict)
+            self._add_host_to_composed_groups(
+                self.get_option('groups'), host_vars, host_name, strict)
+            self._add_host_to_keyed_groups(
+                self.get_option('keyed_groups'), host_vars, host_name, strict)
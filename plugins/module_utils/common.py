@@ -19,24 +19,49 @@ Utility functions for use by more than one Ansible module.
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import atexit
 import logging
 import traceback
 import platform
 import sys
+import os
+import re
+import csv
+import json
+import time
+import random
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
 
 from ansible.module_utils import six
+from ansible.module_utils.six.moves import queue
 
 try:
-    from zhmcclient import Session
-    IMP_ZHMCCLIENT_ERR = None
+    from logging.handlers import QueueHandler, QueueListener
 except ImportError:
-    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+    # Python 2: Log records are written synchronously
+    QueueHandler = None
+
+try:
+    import fcntl
+except ImportError:
+    # Not on POSIX systems: HMC rate limits are not applied
+    fcntl = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the 'futures' package: Functions are run serially
+    ThreadPoolExecutor = None
 
 try:
-    from zhmcclient_mock import FakedSession
-    IMP_ZHMCCLIENT_MOCK_ERR = None
+    from zhmcclient import Session, HTTPError, ConnectTimeout, \
+        ConnectionError as ZhmcConnectionError
+    IMP_ZHMCCLIENT_ERR = None
 except ImportError:
-    IMP_ZHMCCLIENT_MOCK_ERR = traceback.format_exc()
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
 
 
 class Error(Exception):
@@ -100,9 +125,6 @@ def common_fail_on_import_errors(module):
     if IMP_ZHMCCLIENT_ERR is not None:
         module.fail_json(msg=missing_required_lib("zhmcclient"),
                          exception=IMP_ZHMCCLIENT_ERR)
-    if IMP_ZHMCCLIENT_MOCK_ERR is not None:
-        module.fail_json(msg=missing_required_lib("zhmcclient_mock"),
-                         exception=IMP_ZHMCCLIENT_MOCK_ERR)
 
 
 def missing_required_lib(library, reason=None, url=None):
@@ -235,7 +257,10 @@ def stop_partition(partition, check_mode):
     status of the partition, regardless of what its current operational status
     is.
 
-    The resulting operational status will be one of STOP_END_STATUSES.
+    The resulting operational status will be one of STOP_END_STATUSES. If the
+    partition is already stopped, it is not stopped again. Partitions in the
+    other statuses of STOP_END_STATUSES (e.g. paused or terminated) are
+    stopped.
 
     Parameters:
       partition (zhmcclient.Partition): The partition (must exist, and its
@@ -277,6 +302,9 @@ def stop_partition(partition, check_mode):
             status = 'stopped'
         partition.update_properties_local({'status': status})
         changed = True
+    elif status == 'stopped':
+        # Stopping a stopped partition would be rejected by the HMC
+        pass
     elif status == 'stopping':
         if not check_mode:
             # Let it finish the stopping
@@ -393,7 +421,7 @@ def start_partition(partition, check_mode):
     return changed
 
 
-def wait_for_transition_completion(partition):
+def wait_for_transition_completion(partition, pull_properties=True):
     """
     If the partition is in a transitional state, wait for completion of that
     transition. This is required for updating properties.
@@ -402,14 +430,16 @@ def wait_for_transition_completion(partition):
     STOP_END_STATUSES.
 
     Parameters:
-      partition (zhmcclient.Partition): The partition (must exist, and its
-        status property is assumed to be current).
+      partition (zhmcclient.Partition): The partition (must exist).
+      pull_properties (bool): Retrieve the properties of the partition first.
+        If False, its status property is assumed to be current.
 
     Raises:
       StatusError: Partition is in one of BAD_STATUSES.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
-    partition.pull_full_properties()
+    if pull_properties:
+        partition.pull_full_properties()
     status = partition.get_property('status')
     if status in BAD_STATUSES:
         raise StatusError(
@@ -657,7 +687,8 @@ def ensure_lpar_loaded(
     return changed
 
 
-def get_session(faked_session, host, userid, password, ca_certs, verify):
+def get_session(faked_session, host, userid, password, ca_certs, verify,
+                session_id=None):
     """
     Return a session object for the HMC.
 
@@ -666,12 +697,1258 @@ def get_session(faked_session, host, userid, password, ca_certs, verify):
         If this object is a `zhmcclient_mock.FakedSession` object, return that
         object.
         Else, return a new `zhmcclient.Session` object from the other arguments.
+      session_id (string or None): ID of an existing HMC session to be
+        reused by the new `zhmcclient.Session` object. If the HMC session has
+        ended, a new HMC session is created using userid and password.
+
+    If the environment variable named by CASSETTE_ENV_VAR is set to a file
+    path, the HTTP methods issued through a new `zhmcclient.Session` object are
+    recorded to that file (see CassetteRecorder).
+
+    If the environment variable named by RATE_LIMITS_ENV_VAR defines limits
+    for the HMC, the HTTP methods issued through a new `zhmcclient.Session`
+    object are subject to these limits (see HmcRateLimiter).
+
+    HMC operations issued through a new `zhmcclient.Session` object that fail
+    with a transient error are retried according to the retry policy defined
+    in the environment variable named by RETRY_ENV_VAR (see RetryPolicy).
+
+    Raises:
+      ParameterError: Invalid limits or retry policy in the environment
+        variables.
     """
-    if isinstance(faked_session, FakedSession):
-        return faked_session
-    else:
-        verify_cert = ca_certs if verify else False
-        return Session(host, userid, password, verify_cert=verify_cert)
+    if faked_session is not None:
+        # The zhmcclient mock support is used only in tests and for check mode
+        # with a snapshot. Importing it is expensive (e.g. jsonschema), so it
+        # is imported only when needed.
+        from zhmcclient_mock import FakedSession
+        if isinstance(faked_session, FakedSession):
+            return faked_session
+    verify_cert = ca_certs if verify else False
+    session = Session(host, userid, password, session_id=session_id,
+                      verify_cert=verify_cert)
+    cassette_file = os.environ.get(CASSETTE_ENV_VAR)
+    if cassette_file:
+        CassetteRecorder(cassette_file).attach(session)
+    rate_limiter = HmcRateLimiter.from_environment(host)
+    if rate_limiter:
+        rate_limiter.attach(session)
+    # The retry policy is attached last, so that the delays between retries
+    # do not hold a concurrency slot of the rate limiter
+    retry_policy = RetryPolicy.from_environment()
+    if retry_policy.max_attempts > 1:
+        retry_policy.attach(session)
+        RETRY_POLICIES.append(retry_policy)
+    return session
+
+
+# Manager attribute names of the zhmcclient_mock resources by HMC resource
+# class, for the resources in a snapshot file written by the zhmc_snapshot
+# module. The order is the order in which the resources are added to the
+# faked HMC, so that resources are added before resources that refer to them.
+SNAPSHOT_MANAGER_ATTRS = (
+    ('cpc', 'cpcs'),
+    ('adapter', 'adapters'),
+    ('network-port', 'ports'),
+    ('storage-port', 'ports'),
+    ('virtual-switch', 'virtual_switches'),
+    ('partition', 'partitions'),
+    ('nic', 'nics'),
+    ('hba', 'hbas'),
+    ('virtual-function', 'virtual_functions'),
+    ('logical-partition', 'lpars'),
+    ('storage-group', 'storage_groups'),
+    ('storage-volume', 'storage_volumes'),
+    ('password-rule', 'password_rules'),
+    ('user-role', 'user_roles'),
+    ('user', 'users'),
+)
+
+# Properties with the URIs of child resources in a snapshot. They are
+# re-created by the faked HMC when the child resources are added.
+SNAPSHOT_CHILD_URI_PROPS = (
+    'nic-uris', 'hba-uris', 'virtual-function-uris', 'network-port-uris',
+    'storage-port-uris', 'storage-volume-uris', 'connected-vnic-uris')
+
+CONSOLE_URI = '/api/console'
+
+
+def load_snapshot(snapshot_file):
+    """
+    Load a snapshot file written by the zhmc_snapshot module, in JSON or
+    JSON Lines format.
+
+    Returns:
+      tuple(hmc_info, resources): The HMC information as a dict, and the
+      resources as a list of tuple(class_name, properties).
+
+    Raises:
+      ParameterError: The snapshot file cannot be read or is invalid.
+    """
+    try:
+        with open(snapshot_file, 'r') as fp:
+            content = fp.read()
+        lines = [line for line in content.splitlines() if line.strip()]
+        # In the JSON Lines format, the first line is a complete JSON object
+        # with only the HMC information. In the JSON format, the first line
+        # is only the start of a JSON object, unless the entire object is on
+        # that line.
+        try:
+            first_item = json.loads(lines[0]) if lines else None
+        except ValueError:
+            first_item = None
+        if isinstance(first_item, dict) and 'resources' not in first_item:
+            items = [json.loads(line) for line in lines]
+            hmc_info = items[0]['hmc']
+            resources = [(item['class'], item['properties'])
+                         for item in items[1:]]
+        else:
+            snapshot = json.loads(content)
+            hmc_info = snapshot['hmc']
+            resources = [(class_name, properties)
+                         for class_name, props_list
+                         in snapshot['resources'].items()
+                         for properties in props_list]
+    except (IOError, OSError, ValueError, KeyError, TypeError) as exc:
+        raise ParameterError(
+            "Cannot load snapshot file {0!r}: {1}: {2}".
+            format(snapshot_file, exc.__class__.__name__, exc))
+    return hmc_info, resources
+
+
+def snapshot_session(snapshot_file, host, userid):
+    """
+    Return a new `zhmcclient_mock.FakedSession` object for a faked HMC with
+    the resources of a snapshot file written by the zhmc_snapshot module.
+
+    Raises:
+      ParameterError: The snapshot file cannot be loaded.
+    """
+    from zhmcclient_mock import FakedSession, InputError
+
+    hmc_info, resources = load_snapshot(snapshot_file)
+    class_order = [class_name for class_name, _ in SNAPSHOT_MANAGER_ATTRS]
+    manager_attrs = dict(SNAPSHOT_MANAGER_ATTRS)
+
+    # Build the resource tree for FakedHmc.add_resources(), based on the
+    # 'parent' property of the resources. OrderedDict is used so that the
+    # managers of each resource are processed in the order of
+    # SNAPSHOT_MANAGER_ATTRS.
+    console = OrderedDict(properties={'name': hmc_info.get('hmc-name')})
+    nodes = {CONSOLE_URI: console}
+    cpcs = []
+    resources = [r for r in resources if r[0] in manager_attrs]
+    resources.sort(key=lambda r: class_order.index(r[0]))
+    for class_name, properties in resources:
+        properties = dict(properties)
+        for prop in SNAPSHOT_CHILD_URI_PROPS:
+            if prop in properties:
+                properties[prop] = []
+        node = OrderedDict(properties=properties)
+        uri = properties.get('object-uri') or properties.get('element-uri')
+        nodes[uri] = node
+        if class_name == 'cpc':
+            cpcs.append(node)
+            continue
+        parent = nodes.get(properties.get('parent'))
+        if parent is None:
+            continue  # The parent is not in the snapshot
+        parent.setdefault(manager_attrs[class_name], []).append(node)
+
+    api_version = '{0}.{1}'.format(hmc_info.get('api-major-version'),
+                                   hmc_info.get('api-minor-version'))
+    session = FakedSession(host, hmc_info.get('hmc-name'),
+                           hmc_info.get('hmc-version'), api_version,
+                           userid=userid)
+    try:
+        session.hmc.add_resources({'cpcs': cpcs})
+        session.hmc.add_resources({'consoles': [console]})
+    except InputError as exc:
+        raise ParameterError(
+            "Cannot load snapshot file {0!r}: {1}".format(snapshot_file, exc))
+    return session
+
+
+def snapshot_check_mode(params, check_mode):
+    """
+    Return the module parameters and check mode flag to be used for running
+    a module, for support of the 'check_mode_snapshot' module parameter.
+
+    If the module runs in check mode and a snapshot file is specified in
+    'check_mode_snapshot', the module parameters are returned with a faked
+    session for the snapshot in '_faked_session', and check mode is returned
+    as False. The module then performs its real code paths, with the changes
+    applied only to the faked HMC. Otherwise, the input is returned.
+    """
+    snapshot_file = params.get('check_mode_snapshot')
+    if not check_mode or not snapshot_file:
+        return params, check_mode
+    userid, _, _, _ = get_hmc_auth(params['hmc_auth'])
+    params = dict(params)
+    params['_faked_session'] = snapshot_session(
+        snapshot_file, params['hmc_host'], userid)
+    return params, False
+
+
+# Name of the environment variable that enables recording of HMC cassettes
+CASSETTE_ENV_VAR = 'ZHMC_ANSIBLE_CASSETTE'
+
+# Pattern for the names of properties whose values are scrubbed in cassettes
+CASSETTE_SECRET_PATTERN = re.compile(
+    r'password|credential|secret|api-session|private-key|passphrase', re.I)
+
+# Replacement value for scrubbed property values in cassettes
+CASSETTE_SECRET_VALUE = '********'
+
+
+def scrub_secrets(value):
+    """
+    Return a copy of a JSON-like value where the string values of all
+    dictionary items whose key matches CASSETTE_SECRET_PATTERN are replaced
+    with CASSETTE_SECRET_VALUE. URIs (e.g. 'password-rule-uri') and
+    non-string values (e.g. 'min-password-length') are not secrets.
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, val in value.items():
+            if CASSETTE_SECRET_PATTERN.search(key) and \
+                    not key.endswith('-uri') and \
+                    isinstance(val, six.string_types):
+                result[key] = CASSETTE_SECRET_VALUE
+            else:
+                result[key] = scrub_secrets(val)
+        return result
+    if isinstance(value, (list, tuple)):
+        return [scrub_secrets(val) for val in value]
+    return value
+
+
+class CassetteRecorder(object):
+    """
+    Records the HTTP methods issued through a zhmcclient session to a cassette
+    file, for replaying them in offline performance tests.
+
+    The cassette file is in JSON Lines format, with one JSON object per HTTP
+    method that has the following items:
+
+    * method: HTTP method ('GET', 'POST', 'DELETE')
+    * uri: URI of the HTTP method, including any query parameters
+    * request_body: Request body (POST only), or `None`
+    * status: HTTP status code (200 for success)
+    * response_body: Response body, or the HMC error body (for HTTP errors)
+    * job_uri: URI of the job, if the POST returned an asynchronous job
+    * error: Exception class name for errors other than HTTP errors
+    * duration: Elapsed time of the HTTP method in seconds
+
+    Secrets in request and response bodies are scrubbed (see scrub_secrets()).
+    Records are appended to the file, so multiple module invocations can
+    record to the same cassette.
+    """
+
+    def __init__(self, filename):
+        """
+        Parameters:
+          filename (string): Path name of the cassette file.
+        """
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def attach(self, session):
+        """
+        Attach this recorder to a zhmcclient session object, by wrapping its
+        get(), post() and delete() methods.
+        """
+        orig_get = session.get
+        orig_post = session.post
+        orig_delete = session.delete
+
+        def get(uri, **kwargs):
+            return self._record('GET', uri, None, orig_get, (uri,), kwargs)
+
+        def post(uri, body=None, **kwargs):
+            kwargs['body'] = body
+            return self._record('POST', uri, body, orig_post, (uri,), kwargs)
+
+        def delete(uri, **kwargs):
+            return self._record('DELETE', uri, None, orig_delete, (uri,),
+                                kwargs)
+
+        session.get = get
+        session.post = post
+        session.delete = delete
+
+    def _record(self, method, uri, request_body, func, args, kwargs):
+        # The zhmcclient session methods call themselves recursively when
+        # renewing an expired session. Only the outermost call is recorded.
+        depth = getattr(self._local, 'depth', 0)
+        if depth > 0:
+            return func(*args, **kwargs)
+        record = dict(method=method, uri=uri,
+                      request_body=scrub_secrets(request_body))
+        self._local.depth = depth + 1
+        start_time = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except HTTPError as exc:
+            record['status'] = exc.http_status
+            record['response_body'] = dict(
+                reason=exc.reason, message=exc.message)
+            raise
+        except Exception as exc:
+            record['status'] = None
+            record['response_body'] = dict(message=str(exc))
+            record['error'] = exc.__class__.__name__
+            raise
+        else:
+            record['status'] = 200
+            job_uri = getattr(result, 'uri', None)
+            if job_uri:
+                # An asynchronous job (zhmcclient.Job)
+                record['response_body'] = None
+                record['job_uri'] = job_uri
+            else:
+                record['response_body'] = scrub_secrets(result)
+            return result
+        finally:
+            record['duration'] = time.time() - start_time
+            self._local.depth = depth
+            self._write(record)
+
+    def _write(self, record):
+        line = json.dumps(record, sort_keys=True)
+        with self._lock:
+            with open(self.filename, 'a') as fp:
+                fp.write(line + '\n')
+
+
+# Name of the environment variable with the limits for HMC operations
+RATE_LIMITS_ENV_VAR = 'ZHMC_ANSIBLE_RATE_LIMITS'
+
+# Name of the environment variable with the directory for the lock files of
+# the HMC rate limiter
+RATE_LIMIT_DIR_ENV_VAR = 'ZHMC_ANSIBLE_RATE_LIMIT_DIR'
+
+# Key in the limits for the limits of HMCs that are not specified
+RATE_LIMITS_DEFAULT_KEY = '*'
+
+# Interval in seconds for polling for a free concurrency slot
+RATE_LIMIT_POLL_INTERVAL = 0.05
+
+
+class HmcRateLimiter(object):
+    """
+    Limits the rate and the concurrency of the HTTP methods issued to an HMC
+    across all processes on the system, e.g. the module processes of the
+    forks of an Ansible run.
+
+    The limits are coordinated through lock files in a directory, using
+    file locks (fcntl.flock), so they apply to all processes that use the
+    same directory:
+
+    * The rate is limited with a token bucket that allows 'rate' HTTP methods
+      per second on average, with bursts of up to 'burst' methods. The state
+      of the bucket is kept in the file '{host}.bucket'.
+
+    * The concurrency is limited to 'max_concurrency' HTTP methods at a time,
+      with one slot file '{host}.slot{n}' that is locked while an HTTP method
+      is in progress. The lock is released by the operating system if the
+      process ends.
+
+    File locks are not available on all platforms; there, no limits are
+    applied.
+    """
+
+    def __init__(self, host, rate=None, burst=None, max_concurrency=None,
+                 lock_dir=None):
+        """
+        Parameters:
+          host (string): Hostname or IP address of the HMC.
+          rate (float): Average number of HTTP methods per second, or `None`
+            for no rate limit.
+          burst (int): Maximum number of HTTP methods in a burst. `None`
+            means 1 if rate is below 1, and rate otherwise.
+          max_concurrency (int): Maximum number of HTTP methods in progress
+            at a time, or `None` for no concurrency limit.
+          lock_dir (string): Directory for the lock files. `None` means a
+            directory in the temporary directory of the system.
+        """
+        self.host = host
+        self.rate = rate
+        self.burst = burst or max(1, rate or 0)
+        self.max_concurrency = max_concurrency
+        if lock_dir is None:
+            lock_dir = os.path.join(tempfile.gettempdir(),
+                                    'zhmc-ansible-rate-limits')
+        self.lock_dir = lock_dir
+        self._file_prefix = os.path.join(
+            lock_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', host))
+        self._local = threading.local()
+        self.wait_time = 0.0
+
+    @staticmethod
+    def from_environment(host):
+        """
+        Return a HmcRateLimiter object for an HMC with the limits defined in
+        the environment variable named by RATE_LIMITS_ENV_VAR, or `None` if
+        no limits are defined for the HMC.
+
+        The environment variable must be a JSON object with the HMC hostnames
+        or IP addresses as keys, or '*' for all other HMCs, and JSON objects
+        with optional items 'rate', 'burst' and 'max_concurrency' as values.
+
+        Raises:
+          ParameterError: Invalid limits in the environment variable.
+        """
+        limits_str = os.environ.get(RATE_LIMITS_ENV_VAR)
+        if not limits_str or fcntl is None:
+            return None
+        try:
+            all_limits = json.loads(limits_str)
+            limits = all_limits.get(host, all_limits.get(
+                RATE_LIMITS_DEFAULT_KEY))
+            if not limits:
+                return None
+            rate = limits.get('rate')
+            burst = limits.get('burst')
+            max_concurrency = limits.get('max_concurrency')
+            unknown = set(limits) - set(['rate', 'burst', 'max_concurrency'])
+        except (ValueError, AttributeError) as exc:
+            raise ParameterError(
+                "Environment variable {0} is not a JSON object with limits "
+                "by HMC: {1}".format(RATE_LIMITS_ENV_VAR, exc))
+        if unknown:
+            raise ParameterError(
+                "Environment variable {0} has invalid limits for HMC {1!r}: "
+                "{2}".format(RATE_LIMITS_ENV_VAR, host,
+                             ', '.join(sorted(unknown))))
+        for name, value in (('rate', rate), ('burst', burst),
+                            ('max_concurrency', max_concurrency)):
+            if value is not None and not (
+                    isinstance(value, (int, float)) and value > 0):
+                raise ParameterError(
+                    "Environment variable {0} has an invalid {1!r} limit for "
+                    "HMC {2!r}: {3!r}".format(
+                        RATE_LIMITS_ENV_VAR, name, host, value))
+        return HmcRateLimiter(
+            host, rate, burst, max_concurrency,
+            os.environ.get(RATE_LIMIT_DIR_ENV_VAR))
+
+    def attach(self, session):
+        """
+        Attach this rate limiter to a zhmcclient session object, by wrapping
+        its get(), post() and delete() methods.
+        """
+        orig_get = session.get
+        orig_post = session.post
+        orig_delete = session.delete
+
+        def get(uri, **kwargs):
+            return self.call(orig_get, (uri,), kwargs)
+
+        def post(uri, body=None, **kwargs):
+            kwargs['body'] = body
+            return self.call(orig_post, (uri,), kwargs)
+
+        def delete(uri, **kwargs):
+            return self.call(orig_delete, (uri,), kwargs)
+
+        session.get = get
+        session.post = post
+        session.delete = delete
+
+    def call(self, func, args, kwargs):
+        """
+        Call a function that issues an HTTP method to the HMC, within the
+        limits.
+        """
+        # The zhmcclient session methods call themselves recursively when
+        # renewing an expired session. Only the outermost call is limited.
+        depth = getattr(self._local, 'depth', 0)
+        if depth > 0:
+            return func(*args, **kwargs)
+        self._local.depth = depth + 1
+        try:
+            slot = self.acquire()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.release(slot)
+        finally:
+            self._local.depth = depth
+
+    def acquire(self):
+        """
+        Wait until an HTTP method can be issued within the limits, and return
+        the concurrency slot (an open file object, or `None`) that must be
+        passed to release() when the HTTP method has completed.
+        """
+        if not os.path.isdir(self.lock_dir):
+            try:
+                os.makedirs(self.lock_dir)
+            except OSError:
+                pass  # Created concurrently
+        start_time = time.time()
+        slot = self._acquire_slot()
+        try:
+            self._acquire_token()
+        except Exception:
+            self.release(slot)
+            raise
+        self.wait_time += time.time() - start_time
+        return slot
+
+    @staticmethod
+    def release(slot):
+        """
+        Release a concurrency slot returned by acquire().
+        """
+        if slot is not None:
+            slot.close()  # Releases the lock
+
+    def _acquire_slot(self):
+        if not self.max_concurrency:
+            return None
+        while True:
+            for index in range(int(self.max_concurrency)):
+                fp = open('{0}.slot{1}'.format(self._file_prefix, index), 'a')
+                try:
+                    fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fp
+                except (IOError, OSError):
+                    fp.close()
+            time.sleep(RATE_LIMIT_POLL_INTERVAL)
+
+    def _acquire_token(self):
+        if not self.rate:
+            return
+        while True:
+            with open(self._file_prefix + '.bucket', 'a+') as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                fp.seek(0)
+                state = fp.read().split()
+                now = time.time()
+                if len(state) == 2:
+                    tokens, last_time = float(state[0]), float(state[1])
+                    tokens = min(self.burst,
+                                 tokens + (now - last_time) * self.rate)
+                else:
+                    tokens = self.burst
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0
+                else:
+                    wait = (1 - tokens) / self.rate
+                fp.seek(0)
+                fp.truncate()
+                fp.write('{0!r} {1!r}'.format(tokens, now))
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+# Name of the environment variable with the retry policy for HMC operations
+RETRY_ENV_VAR = 'ZHMC_ANSIBLE_RETRY'
+
+# HTTP status codes and reason codes (None for any reason code) of HMC errors
+# that are considered transient, i.e. that may succeed when retried:
+# * 503: The HMC is temporarily unavailable or overloaded.
+# * 409 reason 2: The object is busy with another operation.
+RETRY_HTTP_STATUS = {
+    503: None,
+    409: (2,),
+}
+
+# Retries of the HMC operations issued by the sessions of this process
+# (see retry_result())
+RETRY_POLICIES = []
+
+
+class RetryPolicy(object):
+    """
+    Retries HMC operations that failed with a transient error, with an
+    exponential backoff with full jitter between the attempts and an overall
+    deadline per operation.
+
+    HTTP GET methods are idempotent and are retried on transient HTTP errors
+    and on any connection error. HTTP POST and DELETE methods are retried
+    only if the HMC has not started the operation, i.e. on transient HTTP
+    errors and on connection timeouts, and only if no other HTTP methods
+    were issued during the failed method (e.g. polling for the completion
+    of an asynchronous job), because the operation may already have been
+    performed in that case.
+    """
+
+    def __init__(self, max_attempts=3, initial_delay=1.0, max_delay=30.0,
+                 deadline=300.0):
+        """
+        Parameters:
+          max_attempts (int): Maximum number of attempts of an HMC operation,
+            including the first attempt. 1 disables retrying.
+          initial_delay (float): Upper bound in seconds for the random delay
+            before the first retry. The upper bound doubles with each retry.
+          max_delay (float): Maximum upper bound in seconds for the random
+            delay before a retry.
+          deadline (float): Time in seconds since the first attempt of an HMC
+            operation, after which it is no longer retried.
+        """
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._local = threading.local()
+        self.retries = 0
+
+    @staticmethod
+    def from_environment():
+        """
+        Return a RetryPolicy object with the parameters defined in the
+        environment variable named by RETRY_ENV_VAR, or with default
+        parameters if the environment variable is not set.
+
+        The environment variable must be a JSON object with optional items
+        'max_attempts', 'initial_delay', 'max_delay' and 'deadline'.
+
+        Raises:
+          ParameterError: Invalid retry policy in the environment variable.
+        """
+        policy_str = os.environ.get(RETRY_ENV_VAR)
+        if not policy_str:
+            return RetryPolicy()
+        names = ('max_attempts', 'initial_delay', 'max_delay', 'deadline')
+        try:
+            policy = json.loads(policy_str)
+            unknown = set(policy) - set(names)
+        except (ValueError, TypeError) as exc:
+            raise ParameterError(
+                "Environment variable {0} is not a JSON object with a retry "
+                "policy: {1}".format(RETRY_ENV_VAR, exc))
+        if not isinstance(policy, dict) or unknown:
+            raise ParameterError(
+                "Environment variable {0} has an invalid retry policy: "
+                "{1}".format(RETRY_ENV_VAR, policy_str))
+        for name in names:
+            value = policy.get(name)
+            if value is None:
+                continue
+            if name == 'max_attempts':
+                valid = isinstance(value, int) and value >= 1
+            else:
+                valid = isinstance(value, (int, float)) and value >= 0
+            if isinstance(value, bool) or not valid:
+                raise ParameterError(
+                    "Environment variable {0} has an invalid {1!r} value: "
+                    "{2!r}".format(RETRY_ENV_VAR, name, value))
+        return RetryPolicy(**policy)
+
+    def attach(self, session):
+        """
+        Attach this retry policy to a zhmcclient session object, by wrapping
+        its get(), post() and delete() methods.
+        """
+        orig_get = session.get
+        orig_post = session.post
+        orig_delete = session.delete
+
+        def get(uri, **kwargs):
+            return self.call('get', orig_get, (uri,), kwargs)
+
+        def post(uri, body=None, **kwargs):
+            kwargs['body'] = body
+            return self.call('post', orig_post, (uri,), kwargs)
+
+        def delete(uri, **kwargs):
+            return self.call('delete', orig_delete, (uri,), kwargs)
+
+        session.get = get
+        session.post = post
+        session.delete = delete
+
+    def is_transient(self, method, exc):
+        """
+        Return whether an exception raised by an HTTP method is a transient
+        error for which the HTTP method may be retried.
+        """
+        if isinstance(exc, HTTPError):
+            reasons = RETRY_HTTP_STATUS.get(exc.http_status, ())
+            return reasons is None or exc.reason in reasons
+        if method == 'get':
+            return isinstance(exc, ZhmcConnectionError)
+        return isinstance(exc, ConnectTimeout)
+
+    def delay(self, retry):
+        """
+        Return the random delay in seconds before a retry (0-based).
+        """
+        upper = min(self.max_delay, self.initial_delay * 2 ** retry)
+        return random.uniform(0, upper)
+
+    def call(self, method, func, args, kwargs):
+        """
+        Call a function that issues an HTTP method to the HMC, and retry it
+        according to this policy.
+        """
+        # Count the HTTP methods issued during the enclosing HTTP method
+        self._local.calls = getattr(self._local, 'calls', 0) + 1
+        start_time = time.time()
+        attempt = 1
+        while True:
+            calls = self._local.calls
+            try:
+                return func(*args, **kwargs)
+            except (HTTPError, ZhmcConnectionError) as exc:
+                if attempt >= self.max_attempts or \
+                        not self.is_transient(method, exc) or \
+                        (method != 'get' and self._local.calls != calls):
+                    raise
+                delay = self.delay(attempt - 1)
+                if time.time() + delay - start_time > self.deadline:
+                    raise
+                logging.getLogger(HMC_LOGGER_NAME).warning(
+                    "Retrying HTTP %s %s in %.1f s after attempt %d failed "
+                    "with %s: %s", method.upper(), args[0], delay, attempt,
+                    exc.__class__.__name__, exc)
+                self.retries += 1
+                time.sleep(delay)
+                attempt += 1
+
+
+def retry_result():
+    """
+    Return the items for the module result that report the retries of HMC
+    operations in this process: A dictionary with item 'retries' if HMC
+    operations were retried, and an empty dictionary otherwise.
+    """
+    retries = sum(policy.retries for policy in RETRY_POLICIES)
+    if retries:
+        return dict(retries=retries)
+    return {}
+
+
+# Name of the environment variable with the directory of the locator cache
+LOCATOR_CACHE_DIR_ENV_VAR = 'ZHMC_ANSIBLE_LOCATOR_CACHE_DIR'
+
+# Maximum age in seconds of the entries in the locator cache
+LOCATOR_CACHE_MAX_AGE = 24 * 3600
+
+# Maximum number of entries in the locator cache of an HMC. The least recently
+# used entries are evicted first.
+LOCATOR_CACHE_MAX_ENTRIES = 10000
+
+# Locator caches of this process, by cache file path
+_LOCATOR_CACHES = {}
+
+
+class LocatorCache(object):
+    """
+    Persistent cache that maps the names of HMC resources to their URIs, so
+    that resources can be looked up by name without listing the resources of
+    their collection (see find_by_name()).
+
+    The cache for an HMC is kept in the JSON file '{host}.json' in the cache
+    directory, and is shared by all processes that use the same directory.
+    Its entries are keyed by resource class, URI of the parent resource and
+    resource name. Entries are evicted when they are older than 'max_age',
+    and the least recently used entries are evicted when there are more than
+    'max_entries' entries.
+
+    Changes are accumulated in memory and are merged into the cache file by
+    flush(), which is called when the process ends.
+    """
+
+    def __init__(self, cache_dir, host, max_age=LOCATOR_CACHE_MAX_AGE,
+                 max_entries=LOCATOR_CACHE_MAX_ENTRIES):
+        """
+        Parameters:
+          cache_dir (string): Directory of the cache files.
+          host (string): Hostname or IP address of the HMC.
+          max_age (float): Maximum age of the entries in seconds.
+          max_entries (int): Maximum number of entries.
+        """
+        self.cache_dir = cache_dir
+        self.host = host
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.filename = os.path.join(
+            cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', host) + '.json')
+        self._entries = None
+        self._updates = {}
+        self._flush_registered = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def for_session(session):
+        """
+        Return the LocatorCache object of this process for the HMC of a
+        zhmcclient session, or `None` if the environment variable named by
+        LOCATOR_CACHE_DIR_ENV_VAR is not set.
+        """
+        cache_dir = os.environ.get(LOCATOR_CACHE_DIR_ENV_VAR)
+        if not cache_dir:
+            return None
+        cache = LocatorCache(cache_dir, session.host)
+        return _LOCATOR_CACHES.setdefault(cache.filename, cache)
+
+    @staticmethod
+    def key(manager, name):
+        """
+        Return the key of the cache entry for a resource in a zhmcclient
+        manager.
+        """
+        parent_uri = manager.parent.uri if manager.parent else None
+        return json.dumps([manager.class_name, parent_uri, name])
+
+    def get(self, key):
+        """
+        Return the URI for a key, or `None` if there is no current entry for
+        the key.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entry = self._entries.get(key)
+            if entry is None or \
+                    time.time() - entry['created'] > self.max_age:
+                return None
+            entry['used'] = time.time()
+            self._update(key, entry)
+            return entry['uri']
+
+    def put(self, key, uri):
+        """
+        Add or replace the entry for a key.
+        """
+        now = time.time()
+        entry = dict(uri=uri, created=now, used=now)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            self._entries[key] = entry
+            self._update(key, entry)
+
+    def remove(self, key):
+        """
+        Remove the entry for a key, if it exists.
+        """
+        with self._lock:
+            if self._entries is not None:
+                self._entries.pop(key, None)
+            self._update(key, None)
+
+    def flush(self):
+        """
+        Merge the changes of this process into the cache file, and evict
+        entries that are too old or exceed the maximum number of entries.
+        """
+        with self._lock:
+            if not self._updates:
+                return
+            if not os.path.isdir(self.cache_dir):
+                try:
+                    os.makedirs(self.cache_dir)
+                except OSError:
+                    pass  # Created concurrently
+            with open(self.filename + '.lock', 'a') as lock_fp:
+                if fcntl is not None:
+                    fcntl.flock(lock_fp, fcntl.LOCK_EX)
+                entries = self._read()
+                for key, entry in self._updates.items():
+                    if entry is None:
+                        entries.pop(key, None)
+                    else:
+                        entries[key] = entry
+                min_created = time.time() - self.max_age
+                entries = sorted(
+                    [item for item in entries.items()
+                     if item[1]['created'] >= min_created],
+                    key=lambda item: item[1]['used'], reverse=True)
+                entries = dict(entries[0:self.max_entries])
+                fd, tmp_file = tempfile.mkstemp(
+                    prefix='.locators-', dir=self.cache_dir)
+                with os.fdopen(fd, 'w') as fp:
+                    json.dump(entries, fp)
+                os.rename(tmp_file, self.filename)
+            self._entries = entries
+            self._updates = {}
+
+    def _update(self, key, entry):
+        self._updates[key] = entry
+        if not self._flush_registered:
+            atexit.register(self.flush)
+            self._flush_registered = True
+
+    def _read(self):
+        try:
+            with open(self.filename) as fp:
+                entries = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+
+def find_by_name(manager, name):
+    """
+    Find a resource by name in a zhmcclient manager, like
+    `manager.find(name=name)`, and return its zhmcclient resource object.
+
+    If the locator cache is enabled (see LocatorCache), the resource is
+    retrieved directly by its cached URI, and is verified to still have that
+    name. If there is no cached URI, or if the resource no longer exists or
+    has been renamed, the resource is found by listing the collection, and
+    its URI is cached.
+
+    Raises:
+      zhmcclient.NotFound: The resource was not found.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    cache = LocatorCache.for_session(manager.session)
+    if cache is None:
+        return manager.find(name=name)
+    key = cache.key(manager, name)
+    uri = cache.get(key)
+    if uri is not None:
+        try:
+            properties = manager.session.get(uri)
+        except HTTPError as exc:
+            if exc.http_status != 404:
+                raise
+            properties = None
+        if properties is not None and properties.get('name') == name:
+            return manager.resource_object(uri, properties)
+        cache.remove(key)
+    resource = manager.find(name=name)
+    cache.put(key, resource.uri)
+    return resource
+
+
+# Name of the environment variable with the directory of the capability cache
+CAPABILITY_CACHE_DIR_ENV_VAR = 'ZHMC_ANSIBLE_CAPABILITY_CACHE_DIR'
+
+# Time to live in seconds of the capability record of an HMC in the
+# capability cache
+CAPABILITY_CACHE_TTL = 24 * 3600
+
+# Minimum HMC version for the "List Permitted ..." operations, by the kind of
+# resources that are listed
+LIST_PERMITTED_HMC_VERSIONS = {
+    'partitions': [2, 14, 0],
+    'lpars': [2, 14, 0],
+    'adapters': [2, 14, 0],
+}
+
+# Capability objects of this process, by HMC host
+_CAPABILITIES = {}
+
+
+class HmcCapabilities(object):
+    """
+    Facts about an HMC that change only when the HMC or its CPCs are upgraded
+    or reconfigured: The API version, the HMC version, the available list
+    operations, and the SE version and DPM mode of the CPCs.
+
+    The facts are retrieved from the HMC when first needed. If the
+    environment variable named by CAPABILITY_CACHE_DIR_ENV_VAR is set, the
+    capability record of the HMC is persisted in the file
+    '{host}.capabilities.json' in that directory, so that it is shared by
+    all modules and module runs until it expires after 'ttl' seconds.
+
+    A module that issued an HMC operation based on a cached capability can
+    call refresh_on_error() when the operation fails, to retrieve the facts
+    again in case the HMC has been changed.
+    """
+
+    def __init__(self, client, cache_dir=None, ttl=CAPABILITY_CACHE_TTL):
+        """
+        Parameters:
+          client (zhmcclient.Client): Client for the HMC.
+          cache_dir (string): Directory of the cache files, or `None` for not
+            persisting the capability record.
+          ttl (float): Time to live of the capability record in seconds.
+        """
+        self.client = client
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        if cache_dir:
+            self.filename = os.path.join(
+                cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_',
+                                  client.session.host) + '.capabilities.json')
+        else:
+            self.filename = None
+        self._record = None
+        self._cached = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def for_client(client):
+        """
+        Return the HmcCapabilities object of this process for the HMC of a
+        zhmcclient client, persisted in the directory specified in the
+        environment variable named by CAPABILITY_CACHE_DIR_ENV_VAR.
+        """
+        host = client.session.host
+        caps = _CAPABILITIES.get(host)
+        if caps is None or caps.client.session is not client.session:
+            caps = HmcCapabilities(
+                client, os.environ.get(CAPABILITY_CACHE_DIR_ENV_VAR))
+            _CAPABILITIES[host] = caps
+        return caps
+
+    @property
+    def cached(self):
+        """
+        bool: Whether the capability record was read from the cache file
+        instead of being retrieved from the HMC by this object.
+        """
+        self._get_record()
+        return self._cached
+
+    @property
+    def hmc_version(self):
+        """
+        string: The HMC version, e.g. '2.15.0'.
+        """
+        return self._get_record()['hmc-version']
+
+    @property
+    def hmc_version_info(self):
+        """
+        list of int: The HMC version, e.g. [2, 15, 0].
+        """
+        return [int(x) for x in self.hmc_version.split('.')]
+
+    @property
+    def api_version(self):
+        """
+        string: The HMC API version, e.g. '4.10'.
+        """
+        return self._get_record()['api-version']
+
+    def has_list_permitted(self, kind):
+        """
+        Return whether the HMC supports the "List Permitted ..." operation for
+        a kind of resources ('partitions', 'lpars', 'adapters').
+        """
+        return self._get_record()['list-permitted'][kind]
+
+    def cpc_se_version(self, cpc):
+        """
+        Return the SE version of a CPC (zhmcclient.Cpc).
+        """
+        return self._cpc_fact(cpc, 'se-version')
+
+    def cpc_dpm_enabled(self, cpc):
+        """
+        Return whether a CPC (zhmcclient.Cpc) is in DPM mode.
+        """
+        return self._cpc_fact(cpc, 'dpm-enabled')
+
+    def refresh(self):
+        """
+        Retrieve the facts from the HMC again, and update the cache file.
+        """
+        with self._lock:
+            self._record = self._query()
+            self._cached = False
+            self._write()
+
+    def refresh_on_error(self, exc):
+        """
+        Refresh the facts if an HMC operation that was issued based on a
+        cached capability failed with an error that may be caused by a
+        change of the HMC, and return whether the facts were refreshed.
+
+        Errors that may be caused by a change of the HMC are HTTP errors with
+        status 400 (bad request) or 404 (not found).
+        """
+        if not isinstance(exc, HTTPError) or \
+                exc.http_status not in (400, 404):
+            return False
+        with self._lock:
+            if not self.cached:
+                return False
+            self.refresh()
+        return True
+
+    def _cpc_fact(self, cpc, prop_name):
+        with self._lock:
+            record = self._get_record()
+            facts = record['cpcs'].setdefault(cpc.uri, {})
+            if prop_name not in facts:
+                facts[prop_name] = cpc.get_property(prop_name)
+                self._write()
+            return facts[prop_name]
+
+    def _get_record(self):
+        with self._lock:
+            if self._record is None:
+                self._record = self._read()
+                self._cached = self._record is not None
+                if self._record is None:
+                    self._record = self._query()
+                    self._write()
+            return self._record
+
+    def _query(self):
+        api_version = self.client.query_api_version()
+        hmc_version = api_version['hmc-version']
+        hmc_version_info = [int(x) for x in hmc_version.split('.')]
+        return {
+            'time': time.time(),
+            'hmc-name': api_version.get('hmc-name'),
+            'hmc-version': hmc_version,
+            'api-version': '{0}.{1}'.format(
+                api_version.get('api-major-version'),
+                api_version.get('api-minor-version')),
+            'list-permitted': dict(
+                (kind, hmc_version_info >= min_version)
+                for kind, min_version in LIST_PERMITTED_HMC_VERSIONS.items()),
+            'cpcs': {},
+        }
+
+    def _read(self):
+        if not self.filename:
+            return None
+        try:
+            with open(self.filename) as fp:
+                record = json.load(fp)
+            valid = time.time() - record['time'] <= self.ttl and \
+                'hmc-version' in record and \
+                isinstance(record.get('cpcs'), dict) and \
+                set(record['list-permitted']) == \
+                set(LIST_PERMITTED_HMC_VERSIONS)
+        except (IOError, OSError, ValueError, TypeError, KeyError):
+            return None
+        return record if valid else None
+
+    def _write(self):
+        if not self.filename:
+            return
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                pass  # Created concurrently
+        fd, tmp_file = tempfile.mkstemp(
+            prefix='.capabilities-', dir=self.cache_dir)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(self._record, fp)
+        os.rename(tmp_file, self.filename)
+
+
+class MetricsContextCache(object):
+    """
+    Persistent record of the metrics contexts of an HMC userid, so that a
+    metrics context can be reused by later module runs instead of being
+    created and deleted in each run.
+
+    The HMC deletes a metrics context when the API session that created it
+    ends. The record therefore also contains the ID of that session, which
+    is reused by the later module runs and is not logged off.
+
+    The record for an HMC and userid is kept in the JSON file
+    '{host}.{userid}.metrics.json' in the cache directory. The file is
+    readable only by its owner, because the session ID is a credential. The
+    metrics contexts in the record are keyed by their metric groups and
+    anticipated frequency.
+    """
+
+    def __init__(self, cache_dir, host, userid):
+        """
+        Parameters:
+          cache_dir (string): Directory of the cache files.
+          host (string): Hostname or IP address of the HMC.
+          userid (string): HMC userid.
+        """
+        self.cache_dir = cache_dir
+        self.filename = os.path.join(
+            cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_',
+                              '{0}.{1}'.format(host, userid)) +
+            '.metrics.json')
+        record = self._read()
+        self.session_id = record.get('session-id')
+        self._contexts = record.get('contexts', {})
+        self._updates = {}
+
+    @staticmethod
+    def key(metric_groups, interval):
+        """
+        Return the key of the metrics context for a set of metric groups and
+        an anticipated frequency in seconds.
+        """
+        return json.dumps([sorted(set(metric_groups)), interval])
+
+    def get(self, key):
+        """
+        Return the properties of the metrics context for a key, as returned
+        by the "Create Metrics Context" operation, or `None` if there is no
+        metrics context for the key.
+        """
+        return self._contexts.get(key)
+
+    def put(self, key, properties):
+        """
+        Add or replace the properties of the metrics context for a key.
+        """
+        self._contexts[key] = properties
+        self._updates[key] = properties
+
+    def remove(self, key):
+        """
+        Remove the metrics context for a key, if it exists.
+        """
+        self._contexts.pop(key, None)
+        self._updates[key] = None
+
+    def write(self, session_id):
+        """
+        Merge the changes of this process into the cache file, with the ID of
+        the HMC session the metrics contexts were used with.
+
+        If the cache file has a different session ID (e.g. because the HMC
+        session has expired), its metrics contexts are dropped, because the
+        HMC has deleted them together with their session.
+        """
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                pass  # Created concurrently
+        with open(self.filename + '.lock', 'a') as lock_fp:
+            if fcntl is not None:
+                fcntl.flock(lock_fp, fcntl.LOCK_EX)
+            record = self._read()
+            if record.get('session-id') == session_id:
+                contexts = record.get('contexts', {})
+            else:
+                contexts = {}
+            for key, properties in self._updates.items():
+                if properties is None:
+                    contexts.pop(key, None)
+                else:
+                    contexts[key] = properties
+            # The temporary file is created readable only by its owner
+            fd, tmp_file = tempfile.mkstemp(
+                prefix='.metrics-', dir=self.cache_dir)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'session-id': session_id, 'contexts': contexts},
+                          fp)
+            os.rename(tmp_file, self.filename)
+        self.session_id = session_id
+        self._contexts = contexts
+        self._updates = {}
+
+    def _read(self):
+        try:
+            with open(self.filename) as fp:
+                record = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(record, dict) or \
+                not isinstance(record.get('contexts'), dict):
+            return {}
+        return record
 
 
 def to_unicode(value):
@@ -701,6 +1978,564 @@ def to_unicode(value):
                         format(type(value), value))
 
 
+def required_boot_storage_adapter(partition_properties):
+    """
+    Indicates whether 'boot_storage_adapter' is a required input parameter.
+    """
+    boot_device = partition_properties.get('boot-device')
+    return boot_device == 'storage-adapter'
+
+
+def required_partition_id(partition_properties):
+    """
+    Indicates whether 'partition_id' is a required input parameter.
+    """
+    auto_generate = partition_properties.get('autogenerate-partition-id', True)
+    return not auto_generate
+
+
+def required_ifl_processors(partition_properties):
+    """
+    Indicates whether 'ifl_processors' is a required input parameter.
+    """
+    cp_processors = partition_properties.get('cp-processors', 0)
+    return cp_processors == 0
+
+
+def required_cp_processors(partition_properties):
+    """
+    Indicates whether 'cp_processors' is a required input parameter.
+    """
+    ifl_processors = partition_properties.get('ifl-processors', 0)
+    return ifl_processors == 0
+
+
+def required_boot_ftp(partition_properties):
+    """
+    Indicates whether 'boot_ftp_*' are required input parameters.
+    """
+    boot_device = partition_properties.get('boot-device')
+    return boot_device == 'ftp'
+
+
+def required_boot_removable_media(partition_properties):
+    """
+    Indicates whether 'boot_removable_media*' are required input parameters.
+    """
+    boot_device = partition_properties.get('boot-device')
+    return boot_device == 'removable-media'
+
+
+def required_type_ssc(partition_properties):
+    """
+    Indicates whether 'ssc_*' are required input parameters.
+    """
+    part_type = partition_properties.get('type', 'linux')
+    return part_type == 'ssc'
+
+
+# Marker in ZHMC_PARTITION_PROPERTIES.default to indicate special handling
+SPECIAL_DEFAULT = 'special_default'
+
+# Dictionary of properties of partition resources, in this format:
+#   name: (allowed, create, update, update_while_active, eq_func, type_cast)
+# where:
+#   name: Name of the property according to the data model, with hyphens
+#     replaced by underscores (this is how it is or would be specified in
+#     the 'properties' module parameter).
+#   allowed: Indicates whether it is allowed in the 'properties' module
+#     parameter.
+#   create: Indicates whether it can be specified for the "Create Partition"
+#     operation.
+#   update: Indicates whether it can be specified for the "Update Partition
+#     Properties" operation (at all).
+#   update_while_active: Indicates whether it can be specified for the "Update
+#     Partition Properties" operation while the partition is active. None means
+#     "not applicable" (i.e. update=False).
+#   eq_func: Equality test function for two values of the property; None means
+#     to use Python equality.
+#   type_cast: Type cast function for an input value of the property; None
+#     means to use it directly. This can be used for example to convert
+#     integers provided as strings by Ansible back into integers (that is a
+#     current deficiency of Ansible).
+#   create_required: Indicates whether the property is required in the HMC
+#     create operation. None for artificial properties. Can be a function that
+#     returns True or False, if it depends.
+#     depends whether the property is required.
+#   create_default: Default value for optional create properties. None for
+#     required and artificial properties. Can be a function that returns a
+#     default value, if it depends.
+ZHMC_PARTITION_PROPERTIES = {
+
+    # create-only properties:
+    'type': (
+        True, True, False, None, None, None,
+        False, 'linux'),
+
+    # update-only properties:
+    'boot_network_device': (
+        # Updated via boot_network_nic_name
+        False, False, True, True, None, None,
+        False, None),
+    'boot_network_nic_name': (
+        # Artificial property
+        True, False, True, True, None, to_unicode,
+        None, None),
+    'boot_storage_device': (
+        # Updated via boot_storage_hba_name
+        False, False, True, True, None, None,
+        False, None),
+    'boot_storage_hba_name': (
+        True, False, True, True, None, to_unicode,
+        None, None),  # artificial property
+    'boot_storage_volume': (
+        # Was added in API version 2.23 (HMC 2.14.0)
+        False, False, True, True, None, None,
+        False, None),  # via boot_storage_volume_name
+    'boot_storage_volume_name': (
+        # Artificial property
+        True, False, True, True, None, to_unicode,
+        None, None),
+    'crypto_configuration': (
+        # Contains artificial properties, type_cast ignored
+        True, False, False, None, None, None,
+        False, None),
+    'acceptable_status': (
+        # TODO: Default value
+        True, False, True, True, None, None,
+        False, []),
+    'processor_management_enabled': (
+        True, False, True, True, None, None,
+        False, False),
+    'ifl_absolute_processor_capping': (
+        True, False, True, True, None, None,
+        False, False),
+    'ifl_absolute_processor_capping_value': (
+        True, False, True, True, None, float,
+        False, 1.0),
+    'ifl_processing_weight_capped': (
+        True, False, True, True, None, None,
+        False, False),
+    'minimum_ifl_processing_weight': (
+        True, False, True, True, None, int,
+        False, 1),
+    'maximum_ifl_processing_weight': (
+        True, False, True, True, None, int,
+        False, 999),
+    'initial_ifl_processing_weight': (
+        True, False, True, True, None, int,
+        False, 100),
+    'cp_absolute_processor_capping': (
+        True, False, True, True, None, None,
+        False, False),
+    'cp_absolute_processor_capping_value': (
+        True, False, True, True, None, float,
+        False, 1.0),
+    'cp_processing_weight_capped': (
+        True, False, True, True, None, None,
+        False, False),
+    'minimum_cp_processing_weight': (
+        True, False, True, True, None, int,
+        False, 1),
+    'maximum_cp_processing_weight': (
+        True, False, True, True, None, int,
+        False, 999),
+    'initial_cp_processing_weight': (
+        True, False, True, True, None, int,
+        False, 100),
+    'boot_logical_unit_number': (
+        True, False, True, True, eq_hex, None,
+        required_boot_storage_adapter, ''),
+    'boot_world_wide_port_name': (
+        True, False, True, True, eq_hex, None,
+        required_boot_storage_adapter, ''),
+    'boot_load_parameters': (
+        # Was added in API version 2.23 (HMC 2.14.0)
+        True, False, True, True, None, to_unicode,
+        False, ''),
+    'boot_os_specific_parameters': (
+        True, False, True, True, None, to_unicode,
+        False, ''),
+    'boot_iso_ins_file': (
+        True, False, True, True, None, to_unicode,
+        False, None),
+    'ssc_boot_selection': (
+        True, False, True, True, None, None,
+        False, 'installer'),
+
+    # create+update properties:
+    'name': (
+        # Note: Provided in 'name' module parm
+        False, True, True, True, None, None,
+        True, None),
+    'description': (
+        True, True, True, True, None, to_unicode,
+        False, ''),
+    'short_name': (
+        True, True, True, False, None, None,
+        False, SPECIAL_DEFAULT),
+    'partition_id': (
+        True, True, True, False, None, None,
+        required_partition_id, SPECIAL_DEFAULT),
+    'autogenerate_partition_id': (
+        True, True, True, False, None, None,
+        False, True),
+    'ifl_processors': (
+        True, True, True, True, None, int,
+        required_ifl_processors, 0),
+    'cp_processors': (
+        True, True, True, True, None, int,
+        required_cp_processors, 0),
+    'processor_mode': (
+        True, True, True, False, None, None,
+        False, 'shared'),
+    'initial_memory': (
+        True, True, True, True, None, int,
+        True, None),
+    'maximum_memory': (
+        True, True, True, False, None, int,
+        True, None),
+    'reserve_resources': (
+        True, True, True, True, None, None,
+        False, False),
+    'boot_device': (
+        True, True, True, True, None, None,
+        False, 'none'),
+    'boot_timeout': (
+        True, True, True, True, None, int,
+        False, 60),
+    'boot_ftp_host': (
+        True, True, True, True, None, to_unicode,
+        required_boot_ftp, None),
+    'boot_ftp_username': (
+        True, True, True, True, None, to_unicode,
+        required_boot_ftp, None),
+    'boot_ftp_password': (
+        True, True, True, True, None, to_unicode,
+        required_boot_ftp, None),
+    'boot_ftp_insfile': (
+        True, True, True, True, None, to_unicode,
+        required_boot_ftp, None),
+    'boot_removable_media': (
+        True, True, True, True, None, to_unicode,
+        required_boot_removable_media, None),
+    'boot_removable_media_type': (
+        True, True, True, True, None, None,
+        required_boot_removable_media, None),
+    'boot_configuration_selector': (
+        True, True, True, True, None, int,
+        False, 0),
+    'boot_record_lba': (
+        True, True, True, True, None, None,
+        False, 0),
+    'access_global_performance_data': (
+        True, True, True, True, None, None,
+        False, False),
+    'permit_cross_partition_commands': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_basic_counter_set': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_problem_state_counter_set': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_crypto_activity_counter_set': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_extended_counter_set': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_coprocessor_group_set': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_basic_sampling': (
+        True, True, True, True, None, None,
+        False, False),
+    'access_diagnostic_sampling': (
+        True, True, True, True, None, None,
+        False, False),
+    'permit_des_key_import_functions': (
+        True, True, True, False, None, None,
+        False, True),
+    'permit_aes_key_import_functions': (
+        True, True, True, False, None, None,
+        False, True),
+    'permit_ecc_key_import_functions': (
+        # Was added in API version 3.2 (HMC 2.15.0)
+        True, True, True, True, None, None,
+        False, True),
+    'ssc_host_name': (
+        True, True, True, True, None, to_unicode,
+        required_type_ssc, SPECIAL_DEFAULT),
+    'ssc_ipv4_gateway': (
+        True, True, True, True, None, to_unicode,
+        False, None),
+    'ssc_ipv6_gateway': (
+        # Was added in HMC 2.14.0
+        True, True, True, True, None, to_unicode,
+        False, None),
+    'ssc_dns_servers': (
+        True, True, True, True, None, to_unicode,
+        False, []),
+    'ssc_master_userid': (
+        True, True, True, True, None, to_unicode,
+        required_type_ssc, SPECIAL_DEFAULT),
+    'ssc_master_pw': (
+        True, True, True, True, None, to_unicode,
+        required_type_ssc, SPECIAL_DEFAULT),
+    'secure_boot': (
+        # Added in SE/CPC 2.15.0
+        True, True, True, True, None, None,
+        False, False),
+
+    # read-only properties:
+    'object_uri': (
+        False, False, False, None, None, None,
+        False, SPECIAL_DEFAULT),
+    'object_id': (
+        False, False, False, None, None, None,
+        False, SPECIAL_DEFAULT),
+    'parent': (
+        False, False, False, None, None, None,
+        False, SPECIAL_DEFAULT),
+    'class': (
+        False, False, False, None, None, None,
+        False, 'partition'),
+    'status': (
+        False, False, False, None, None, None,
+        False, 'stopped'),
+    'has_unacceptable_status': (
+        False, False, False, None, None, None,
+        False, False),
+    'is_locked': (
+        False, False, False, None, None, None,
+        False, False),
+    'os_name': (
+        False, False, False, None, None, None,
+        False, ''),
+    'os_type': (
+        False, False, False, None, None, None,
+        False, ''),
+    'os_version': (
+        False, False, False, None, None, None,
+        False, ''),
+    'degraded_adapters': (
+        False, False, False, None, None, None,
+        False, []),
+    'current_ifl_processing_weight': (
+        False, False, False, None, None, None,
+        False, 100),
+    'current_cp_processing_weight': (
+        False, False, False, None, None, None,
+        False, 100),
+    'reserved_memory': (
+        False, False, False, None, None, None,
+        False, SPECIAL_DEFAULT),
+    'auto_start': (
+        False, False, False, None, None, None,
+        False, False),
+    'secure_execution': (
+        # Added in SE/CPC 2.15.0
+        False, False, False, None, None, None,
+        False, None),
+    'boot_iso_image_name': (
+        # Note: Property is updated via mount/unmount operations
+        False, False, False, None, None, None,
+        False, None),
+    'threads_per_processor': (
+        False, False, False, None, None, None,
+        False, SPECIAL_DEFAULT),
+    'virtual_function_uris': (
+        False, False, False, None, None, None,
+        False, []),
+    'nic_uris': (
+        False, False, False, None, None, None,
+        False, []),
+    'hba_uris': (
+        False, False, False, None, None, None,
+        False, []),
+    'storage_group_uris': (
+        False, False, False, None, None, None,
+        False, []),
+    'tape_link_uris': (
+        # Was added in API version 3.10 (HMC 2.15.0)
+        False, False, False, None, None, None,
+        False, []),
+    'partition_link_uris': (
+        # Was added in API version 4.1 (HMC 2.16.0)
+        False, False, False, None, None, None,
+        False, []),
+    'available_features_list': (
+        False, False, False, None, None, None,
+        False, []),
+}
+
+# Names of the artificial properties in ZHMC_PARTITION_PROPERTIES
+PARTITION_ARTIFICIAL_PROPERTIES = (
+    'boot_network_nic_name',
+    'boot_storage_hba_name',
+    'boot_storage_volume_name',
+    'crypto_configuration',
+)
+
+
+# Dictionary of properties of NIC resources, in this format:
+#   name: (allowed, create, update, update_while_active, eq_func, type_cast)
+# where:
+#   name: Name of the property according to the data model, with hyphens
+#     replaced by underscores (this is how it is or would be specified in
+#     the 'properties' module parameter).
+#   allowed: Indicates whether it is allowed in the 'properties' module
+#     parameter.
+#   create: Indicates whether it can be specified for the "Create NIC"
+#     operation.
+#   update: Indicates whether it can be specified for the "Update NIC
+#     Properties" operation (at all).
+#   update_while_active: Indicates whether it can be specified for the "Update
+#     NIC Properties" operation while the partition of the NIC is active. None
+#     means "not applicable" (i.e. update=False).
+#   eq_func: Equality test function for two values of the property; None means
+#     to use Python equality.
+#   type_cast: Type cast function for an input value of the property; None
+#     means to use it directly. This can be used for example to convert
+#     integers provided as strings by Ansible back into integers (that is a
+#     current deficiency of Ansible).
+# Note: This should always represent the latest version of the HMC/SE.
+# Attempts to set a property that does not exist or that is not writeable in
+# the target HMC will be handled by the HMC rejecting the operation.
+ZHMC_NIC_PROPERTIES = {
+
+    # create+update properties:
+    'name': (
+        False, True, True, True, None, None),  # provided in 'name' module parm
+    'description': (True, True, True, True, None, to_unicode),
+    'device_number': (True, True, True, True, eq_hex, None),
+    'network_adapter_port_uri': (
+        False, True, True, True, None, None),  # via adapter_name/_port
+    'virtual_switch_uri': (
+        False, True, True, True, None, None),  # via adapter_name/_port
+    'adapter_name': (
+        True, True, True, True, None,
+        None),  # artificial property, type_cast ignored
+    'adapter_port': (
+        True, True, True, True, None,
+        None),  # artificial property, type_cast ignored
+    # The ssc-*, vlan-id and mac-address properties were introduced in
+    # API version 2.2 (an update of SE 2.13.1).
+    # The mac-address property was changed to be writeable in API version 2.20
+    # (SE 2.14.0).
+    'ssc_management_nic': (True, True, True, True, None, None),
+    'ssc_ip_address_type': (True, True, True, True, None, None),
+    'ssc_ip_address': (True, True, True, True, None, None),
+    'ssc_mask_prefix': (True, True, True, True, None, None),
+    'vlan_id': (True, True, True, True, None, int),
+    'mac_address': (True, True, True, None, eq_mac, None),
+    # The vlan-type property was introduced in API version 2.20 (SE 2.14.0).
+    'vlan_type': (True, True, True, True, None, None),
+    # The function-* properties were introduced in API version 3.4
+    # (SE 2.15 GA2).
+    'function_number': (True, True, True, True, None, int),
+    'function_range': (True, True, True, True, None, int),
+
+    # read-only properties:
+    'element_uri': (False, False, False, None, None, None),
+    'element_id': (False, False, False, None, None, None),
+    'parent': (False, False, False, None, None, None),
+    'class': (False, False, False, None, None, None),
+    'type': (False, False, False, None, None, None),
+}
+
+# Names of the artificial properties in ZHMC_NIC_PROPERTIES
+NIC_ARTIFICIAL_PROPERTIES = ('adapter_name', 'adapter_port')
+
+
+class PropertyDefinition(object):
+    """
+    Compiled definition of a property of a resource type, with the HMC
+    property name precomputed.
+
+    The attributes correspond to the items of the tuples in the property
+    definition dictionaries (e.g. ZHMC_PARTITION_PROPERTIES).
+    """
+
+    __slots__ = ('name', 'hmc_name', 'allowed', 'create', 'update',
+                 'update_while_active', 'eq_func', 'type_cast', 'required',
+                 'default')
+
+    def __init__(self, name, prop_def):
+        self.name = name
+        self.hmc_name = name.replace('_', '-')
+        self.allowed, self.create, self.update, self.update_while_active, \
+            self.eq_func, self.type_cast = prop_def[0:6]
+        self.required = prop_def[6] if len(prop_def) > 6 else False
+        self.default = prop_def[7] if len(prop_def) > 7 else None
+
+
+class PropertySchema(object):
+    """
+    Compiled form of a property definition dictionary of a resource type
+    (e.g. ZHMC_PARTITION_PROPERTIES), built once when the module is imported.
+
+    Looking up a property returns its PropertyDefinition. In addition, the
+    schema has precomputed sequences for the create requiredness and the
+    create defaults of the properties:
+
+    * required_names: Names of the properties that are always required.
+    * required_funcs: Tuples (PropertyDefinition, func) for the properties
+      whose requiredness is determined by a function of the input properties.
+    * defaults: Tuples (hmc_name, default) for the properties with a direct
+      default value (i.e. not special_default).
+    """
+
+    __slots__ = ('_defs', 'required_names', 'required_funcs', 'defaults')
+
+    def __init__(self, resource_properties, special_default=None):
+        self._defs = dict(
+            (name, PropertyDefinition(name, prop_def))
+            for name, prop_def in resource_properties.items())
+        defs = [self._defs[name] for name in resource_properties]
+        self.required_names = tuple(
+            d.name for d in defs if d.required and not callable(d.required))
+        self.required_funcs = tuple(
+            (d, d.required) for d in defs if callable(d.required))
+        self.defaults = tuple(
+            (d.hmc_name, d.default) for d in defs
+            if special_default is None or d.default != special_default)
+
+    def __getitem__(self, name):
+        return self._defs[name]
+
+    def __contains__(self, name):
+        return name in self._defs
+
+    def __len__(self):
+        return len(self._defs)
+
+
+# Compiled schemas for property definition dictionaries that are passed to
+# process_normal_property(), by id of the dictionary. The dictionary is kept
+# in the value so that its id cannot be reused.
+_PROPERTY_SCHEMAS = {}
+
+
+def property_schema(resource_properties):
+    """
+    Return the compiled PropertySchema for a property definition dictionary.
+    A PropertySchema is returned unchanged, and a dictionary is compiled
+    only the first time.
+    """
+    if isinstance(resource_properties, PropertySchema):
+        return resource_properties
+    try:
+        return _PROPERTY_SCHEMAS[id(resource_properties)][1]
+    except KeyError:
+        schema = PropertySchema(resource_properties)
+        _PROPERTY_SCHEMAS[id(resource_properties)] = \
+            (resource_properties, schema)
+        return schema
+
+
 def process_normal_property(
         prop_name, resource_properties, input_props, resource):
     """
@@ -710,8 +2545,10 @@ def process_normal_property(
 
       prop_name (string): Property name (using Ansible module names).
 
-      resource_properties (dict): Dictionary of property definitions for the
-        resource type (e.g. ZHMC_PARTITION_PROPERTIES). Each value must be a
+      resource_properties (PropertySchema or dict): Compiled property
+        definitions for the resource type (e.g. ZHMC_PARTITION_SCHEMA), or
+        the dictionary of property definitions it is compiled from (e.g.
+        ZHMC_PARTITION_PROPERTIES). Each value of the dictionary must be a
         tuple (allowed, create, update, update_while_active, eq_func,
         type_cast, required(o), default(o)). For details, see the modules
         using this function. (o) means optional.
@@ -738,45 +2575,35 @@ def process_normal_property(
     update_props = {}
     deactivate = False
 
-    p = resource_properties[prop_name]
-    allowed, create, update, update_while_active, eq_func, type_cast = p[0:6]
-    # Note: If and when required/default are be used here:
-    # try:
-    #     required = p[6]
-    # except IndexError:
-    #     required = False
-    # try:
-    #     default = p[7]
-    # except IndexError:
-    #     default = None
+    p = property_schema(resource_properties)[prop_name]
 
     # Double check that the property is not a read-only property
-    if not allowed:
+    if not p.allowed:
         raise AssertionError()
-    if not (create or update):
+    if not (p.create or p.update):
         raise AssertionError()
 
-    hmc_prop_name = prop_name.replace('_', '-')
+    hmc_prop_name = p.hmc_name
     input_prop_value = input_props[prop_name]
 
-    if type_cast:
-        input_prop_value = type_cast(input_prop_value)
+    if p.type_cast:
+        input_prop_value = p.type_cast(input_prop_value)
 
     if resource:
         # Resource does exist.
 
         current_prop_value = resource.properties.get(hmc_prop_name)
 
-        if eq_func:
-            equal = eq_func(current_prop_value, input_prop_value,
-                            prop_name)
+        if p.eq_func:
+            equal = p.eq_func(current_prop_value, input_prop_value,
+                              prop_name)
         else:
             equal = (current_prop_value == input_prop_value)
 
         if not equal:
-            if update:
+            if p.update:
                 update_props[hmc_prop_name] = input_prop_value
-                if not update_while_active:
+                if not p.update_while_active:
                     deactivate = True
             else:
                 raise ParameterError(
@@ -788,25 +2615,405 @@ def process_normal_property(
     else:
         # Resource does not exist.
         # Prefer setting the property during resource creation.
-        if create:
+        if p.create:
             create_props[hmc_prop_name] = input_prop_value
         else:
             update_props[hmc_prop_name] = input_prop_value
-            if not update_while_active:
+            if not p.update_while_active:
                 deactivate = True
 
     return create_props, update_props, deactivate
 
 
-def log_init(logger_name, log_file=None):
+def parallel_map(func, items, max_workers):
+    """
+    Call a function for each item and return the list of results, in the
+    order of the items.
+
+    The function is called concurrently in up to max_workers threads. This is
+    used for issuing independent HMC operations (e.g. retrieving the
+    properties of many resources) with bounded parallelism. If max_workers is
+    1 or concurrent.futures is not available, the function is called serially.
+
+    An exception raised by the function is raised by parallel_map().
+    """
+    return list(parallel_imap(func, items, max_workers))
+
+
+def parallel_imap(func, items, max_workers):
+    """
+    Like parallel_map(), but return an iterator that yields each result, in
+    the order of the items, as soon as it and the results before it are
+    available. This allows the results to be processed (e.g. written to a
+    file) while the function is still called for the remaining items.
+    """
+    items = list(items)
+    if ThreadPoolExecutor is None or max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        for result in executor.map(func, items):
+            yield result
+    finally:
+        executor.shutdown(wait=True)
+
+
+class PropertiesCache(object):
+    """
+    Thread-safe cache of the full properties of HMC resources by resource URI,
+    so that each resource is retrieved from the HMC only once, even when it is
+    reached via multiple paths.
+    """
+
+    def __init__(self):
+        self._properties = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._properties)
+
+    def __contains__(self, uri):
+        return uri in self._properties
+
+    def pull(self, resource):
+        """
+        Return the full properties of a zhmcclient resource object as a dict,
+        retrieving them from the HMC if not yet cached.
+        """
+        uri = resource.uri
+        with self._lock:
+            properties = self._properties.get(uri)
+        if properties is None:
+            resource.pull_full_properties()
+            properties = dict(resource.properties)
+            with self._lock:
+                properties = self._properties.setdefault(uri, properties)
+        return properties
+
+
+class SelectedPropertiesPuller(object):
+    """
+    Retrieves selected properties of HMC resources, using the 'properties'
+    query parameter of the "Get Properties" operations.
+
+    Not all zhmcclient and HMC versions support the selection of properties.
+    With zhmcclient versions before 1.8, which do not have
+    `pull_properties()`, the full properties are always retrieved. When the
+    HMC has rejected a selection once, the full properties are retrieved for
+    all subsequent resources, so that there is only one failed operation.
+    When called concurrently, the first retrieval is done while the others
+    wait for it, so that this also holds for parallel callers.
+    """
+
+    def __init__(self):
+        self.selection_supported = True
+        self._probed = False
+        self._probe_lock = threading.Lock()
+
+    def pull(self, resource, prop_names, refresh=False):
+        """
+        Retrieve the specified properties of a zhmcclient resource object
+        from the HMC, if not yet present in the object or if refresh is True
+        (e.g. for retrieving the current status of a partition).
+
+        Raises:
+          zhmcclient.Error: Any zhmcclient exception can happen.
+        """
+        if not refresh and all(p in resource.properties for p in prop_names):
+            return
+        if not self._probed:
+            with self._probe_lock:
+                if not self._probed:
+                    self._pull(resource, prop_names)
+                    self._probed = True
+                    return
+        self._pull(resource, prop_names)
+
+    def _pull(self, resource, prop_names):
+        """
+        Retrieve the specified properties of a zhmcclient resource object
+        from the HMC.
+        """
+        if self.selection_supported and \
+                not hasattr(resource, 'pull_properties'):
+            # zhmcclient version before 1.8
+            self.selection_supported = False
+        if self.selection_supported:
+            try:
+                resource.pull_properties(list(prop_names))
+                return
+            except HTTPError as exc:
+                # zhmcclient itself falls back to the full properties if the
+                # HMC rejects the query parameter with HTTP status 400,1, but
+                # some HMC versions and the zhmcclient mock support reject it
+                # with other errors.
+                if exc.http_status not in (400, 404):
+                    raise
+                self.selection_supported = False
+        resource.pull_full_properties()
+
+
+class ResultList(list):
+    """
+    The items of the result of a list module, when they are returned in the
+    module result.
+
+    It has the same interface as JsonLinesWriter, so that list modules can
+    produce their items in the same way for both.
+    """
+
+    # Returning the items does not change anything
+    changed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        return False
+
+    def result(self):
+        """
+        Return the list of items.
+        """
+        return list(self)
+
+
+class JsonLinesWriter(object):
+    """
+    Writes the items of the result of a list module to a JSON Lines file
+    (one JSON object per line) as they are produced, so that the items do not
+    need to be kept in memory and are not returned in the module result.
+
+    The items are written to a temporary file in the directory of the output
+    file, which replaces the output file when the writer is closed, if its
+    content has changed and if not in check mode. The SHA-256 checksum of the
+    content is computed while writing.
+
+    Used as a context manager; if an exception is raised, the temporary file
+    is removed and the output file is left unchanged.
+
+    Raises ParameterError if the temporary file cannot be created, e.g.
+    because the directory of the output file does not exist or is not
+    writable.
+    """
+
+    def __init__(self, output_file, check_mode):
+        self.output_file = output_file
+        self.check_mode = check_mode
+        self.count = 0
+        self.changed = None
+        self._hash = hashlib.sha256()
+        dir_name = os.path.dirname(os.path.abspath(output_file))
+        try:
+            fd, self._tmp_file = tempfile.mkstemp(
+                dir=dir_name, prefix='.' + os.path.basename(output_file) + '.')
+        except (IOError, OSError) as exc:
+            raise ParameterError(
+                "Cannot create output file {0!r}: {1}".
+                format(output_file, exc))
+        self._fp = os.fdopen(fd, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        self._fp.close()
+        if exc_type is None:
+            self.changed = self._checksum() != file_checksum(self.output_file)
+            if self.changed and not self.check_mode:
+                os.rename(self._tmp_file, self.output_file)
+                return False
+        os.remove(self._tmp_file)
+        return False
+
+    def _checksum(self):
+        return 'sha256:' + self._hash.hexdigest()
+
+    def _write(self, line):
+        self._fp.write(line)
+        self._hash.update(line.encode('utf-8'))
+
+    def append(self, item):
+        """
+        Write an item (a JSON-serializable dict) as a line to the file.
+        """
+        self._write(json.dumps(item, sort_keys=True) + '\n')
+        self.count += 1
+
+    def result(self):
+        """
+        Return the summary of the written file for the module result, as a
+        dict with items 'path', 'count' and 'checksum'.
+        """
+        return {
+            'path': self.output_file,
+            'count': self.count,
+            'checksum': self._checksum(),
+        }
+
+
+class CsvWriter(JsonLinesWriter):
+    """
+    Writes the items of the result of a list module to a CSV file with a
+    header line, as they are produced. The columns are the specified item
+    keys, in that order.
+
+    Apart from the file format, it behaves like JsonLinesWriter.
+    """
+
+    def __init__(self, output_file, check_mode, fieldnames):
+        super(CsvWriter, self).__init__(output_file, check_mode)
+        self.fieldnames = list(fieldnames)
+        self._write_row(self.fieldnames)
+
+    def _write_row(self, values):
+        buf = six.StringIO()
+        csv.writer(buf, lineterminator='\n').writerow(values)
+        self._write(buf.getvalue())
+
+    def append(self, item):
+        """
+        Write an item (a dict) as a row to the file. Keys of the item that are
+        not columns are ignored, and missing keys result in empty values.
+        """
+        self._write_row([item.get(name, '') for name in self.fieldnames])
+        self.count += 1
+
+
+def file_checksum(path):
+    """
+    Return the SHA-256 checksum of a file in the format 'sha256:{hexdigest}',
+    or None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(65536), b''):
+            file_hash.update(chunk)
+    return 'sha256:' + file_hash.hexdigest()
+
+
+def open_result_list(output_file, check_mode, output_format='jsonl',
+                     fieldnames=None):
+    """
+    Return the container for the items of the result of a list module: A
+    JsonLinesWriter or CsvWriter (for output_format 'csv', with the columns
+    in fieldnames) if the 'output_file' module parameter is specified, or a
+    ResultList otherwise.
+    """
+    if output_file:
+        if output_format == 'csv':
+            return CsvWriter(output_file, check_mode, fieldnames)
+        return JsonLinesWriter(output_file, check_mode)
+    return ResultList()
+
+
+# Log levels for the 'log_level' module parameter
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+# Name of the zhmcclient logger for HMC requests and responses
+HMC_LOGGER_NAME = 'zhmcclient.hmc'
+
+# Maximum length of the log messages of the HMC logger in the log file. The
+# zhmcclient package itself truncates HMC bodies only at 30000 characters.
+HMC_LOG_MAX_LENGTH = 4000
+
+# Log handlers for the log files, by absolute path name
+_LOG_HANDLERS = {}
+
+
+class TruncatingFilter(logging.Filter):
+    """
+    Log filter that truncates the messages of the log records of a logger
+    (and its descendants) to a maximum length.
+    """
+
+    def __init__(self, name, max_length):
+        super(TruncatingFilter, self).__init__()
+        self.logger_name = name
+        self.max_length = max_length
+
+    def filter(self, record):
+        if record.name == self.logger_name or \
+                record.name.startswith(self.logger_name + '.'):
+            msg = record.getMessage()
+            if len(msg) > self.max_length:
+                record.msg = "{0}...(truncated, {1} of {2} characters)". \
+                    format(msg[0:self.max_length], self.max_length, len(msg))
+                record.args = None
+        return True
+
+
+def log_file_handler(log_file):
+    """
+    Return the log handler for a log file, creating it the first time.
+
+    The log records are written to the log file asynchronously by a
+    background thread that is stopped (after writing all pending log records)
+    when the Python process exits. On Python 2, they are written
+    synchronously.
+
+    The returned handler has the absolute path name of the log file in its
+    'baseFilename' attribute, like a logging.FileHandler.
+    """
+    filename = os.path.abspath(log_file)
+    handler = _LOG_HANDLERS.get(filename)
+    if handler is None:
+
+        # The datefmt parameter of logging.Formatter() supports the datetime
+        # formatting placeholders of time.strftime(). Unfortunately, the %f
+        # placeholder for microseconds is not supported by time.strftime().
+        # If datefmt=None, the milliseconds are added manually by the
+        # logging.Formatter() class. So this is a choice between precision
+        # and indicating the timezone offset.
+        # The time is in the local timezone.
+        #
+        DATEFMT = '%Y-%m-%dT%H:%M:%S%z'  # 2019-02-20T10:54:26+0100
+        # DATEFMT = None  # 2019-02-20 10:54:26,123 (= local time)
+
+        file_handler = logging.FileHandler(filename)
+        fmt = logging.Formatter(
+            fmt='%(asctime)s %(levelname)s %(name)s %(process)d %(message)s',
+            datefmt=DATEFMT)
+        file_handler.setFormatter(fmt)
+
+        if QueueHandler is None:
+            handler = file_handler
+        else:
+            log_queue = queue.Queue(-1)
+            handler = QueueHandler(log_queue)
+            handler.baseFilename = filename
+            listener = QueueListener(log_queue, file_handler)
+            listener.start()
+            atexit.register(listener.stop)
+
+        handler.addFilter(
+            TruncatingFilter(HMC_LOGGER_NAME, HMC_LOG_MAX_LENGTH))
+        _LOG_HANDLERS[filename] = handler
+    return handler
+
+
+def log_init(logger_name, log_file=None, log_level='debug'):
     """
     Set up logging for the loggers of the current Ansible module, and for the
     loggers of the underlying zhmcclient package.
 
-    The log level of these loggers is set to debug.
+    If a log file is specified, the log level of these loggers is set to the
+    specified log level, and a log handler for that log file is attached to
+    these loggers (see log_file_handler()).
 
-    If a log file is specified, a log file handler for that log file (with a
-    log formatter) is created and attached to these loggers.
+    If no log file is specified, the log level of these loggers is reset, so
+    that logging is propagated to the Python root logger with its log level.
+    In the default setup of the root logger, debug log records are then not
+    even created.
 
     Parameters:
 
@@ -815,48 +3022,34 @@ def log_init(logger_name, log_file=None):
 
         log_file (string): Path name of a log file to log to, or `None`.
           If `None`, logging will be propagated to the Python root logger.
-    """
 
-    # The datefmt parameter of logging.Formatter() supports the datetime
-    # formatting placeholders of time.strftime(). Unfortunately, the %f
-    # placeholder for microseconds is not supported by time.strftime().
-    # If datefmt=None, the milliseconds are added manually by the
-    # logging.Formatter() class. So this is a choice between precision and
-    # indicating the timezone offset.
-    # The time is in the local timezone.
-    #
-    DATEFMT = '%Y-%m-%dT%H:%M:%S%z'  # 2019-02-20T10:54:26+0100
-    # DATEFMT = None  # 2019-02-20 10:54:26,123 (= local time)
+        log_level (string): Log level for the log file, as a key in
+          LOG_LEVELS. Ignored if no log file is specified.
+    """
 
     if log_file:
-        handler = logging.FileHandler(log_file)
-        fmt = logging.Formatter(
-            fmt='%(asctime)s %(levelname)s %(name)s %(process)d %(message)s',
-            datefmt=DATEFMT)
-        handler.setFormatter(fmt)
+        handler = log_file_handler(log_file)
+        level = LOG_LEVELS[log_level or 'debug']
     else:
         handler = None
+        level = logging.NOTSET
 
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
-    if handler:
-        ensure_one_handler(logger, handler)
-
-    logger = logging.getLogger('zhmcclient.hmc')
-    logger.setLevel(logging.DEBUG)
-    if handler:
-        ensure_one_handler(logger, handler)
+    for name in (logger_name, HMC_LOGGER_NAME):
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        if handler:
+            ensure_one_handler(logger, handler)
 
 
 def ensure_one_handler(logger, handler):
     """
     Ensure that the logger has the specified handler exactly once. The handler
-    must be a FileHandler, and the handler is recognized by the file name it
-    logs to (i.e. the new and existing handler may be different Python objects).
+    must be a log file handler, and the handler is recognized by the file name
+    it logs to (i.e. the new and existing handler may be different Python
+    objects).
     """
     for hdlr in logger.handlers:
-        if isinstance(hdlr, logging.FileHandler) and \
-                hdlr.stream.name == handler.stream.name:
+        if getattr(hdlr, 'baseFilename', None) == handler.baseFilename:
             break
     else:
         logger.addHandler(handler)
@@ -176,6 +176,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -255,6 +263,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 adapter:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -330,8 +344,8 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, \
     Error, ParameterError, get_hmc_auth, get_session, to_unicode, \
-    process_normal_property, eq_hex, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    process_normal_property, PropertySchema, eq_hex, missing_required_lib, \
+    common_fail_on_import_errors, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -411,6 +425,9 @@ ZHMC_ADAPTER_PROPERTIES = {
     'udx_loaded': (False, None, False, None, None, None),
 }
 
+# Compiled form of ZHMC_ADAPTER_PROPERTIES
+ZHMC_ADAPTER_SCHEMA = PropertySchema(ZHMC_ADAPTER_PROPERTIES)
+
 
 # Conversion of crypto types between module parameter values and HMC values
 CRYPTO_TYPES_MOD2HMC = {
@@ -502,7 +519,7 @@ def process_properties(adapter, params):
         else:
             # Process a normal (= non-artificial) property
             _create_props, _update_props, _stop = process_normal_property(
-                prop_name, ZHMC_ADAPTER_PROPERTIES, input_props, adapter)
+                prop_name, ZHMC_ADAPTER_SCHEMA, input_props, adapter)
             create_props.update(_create_props)
             update_props.update(_update_props)
             if _stop:
@@ -517,7 +534,7 @@ def identify_adapter(cpc, name, match_props):
     name does not exist in the CPC, based on its match properties.
     """
     try:
-        adapter = cpc.adapters.find(name=name)
+        adapter = find_by_name(cpc.adapters, name)
     except zhmcclient.NotFound:
         if not match_props:
             raise
@@ -582,7 +599,7 @@ def ensure_set(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         adapter = identify_adapter(cpc, adapter_name, adapter_match)
         # The default exception handling is sufficient for the above.
 
@@ -652,11 +669,11 @@ def ensure_present(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            adapter = cpc.adapters.find(name=adapter_name)
+            adapter = find_by_name(cpc.adapters, adapter_name)
         except zhmcclient.NotFound:
             adapter = None
 
@@ -784,11 +801,11 @@ def ensure_absent(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            adapter = cpc.adapters.find(name=adapter_name)
+            adapter = find_by_name(cpc.adapters, adapter_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -822,8 +839,8 @@ def facts(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        adapter = cpc.adapters.find(name=adapter_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        adapter = find_by_name(cpc.adapters, adapter_name)
         # The default exception handling is sufficient for the above.
 
         adapter.pull_full_properties()
@@ -880,6 +897,8 @@ def main():
                    choices=['set', 'present', 'absent', 'facts']),
         properties=dict(required=False, type='dict', default={}),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -900,7 +919,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -923,8 +943,7 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, adapter: %r", changed, result)
-    module.exit_json(
-        changed=changed, adapter=result)
+    module.exit_json(changed=changed, adapter=result, **retry_result())
 
 
 if __name__ == '__main__':
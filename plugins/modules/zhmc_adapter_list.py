@@ -133,6 +133,18 @@ options:
     type: str
     required: false
     default: null
+  output_file:
+    description:
+      - "Path name of a JSON Lines file to which the adapters are written as
+         they are listed, one JSON object per line. The adapters are then not
+         returned in the C(adapters) return value, so that large results do not
+         need to be kept in memory. Instead, the C(output) return value
+         describes the file. The file is written on the system the module runs
+         on, and only if its content changes. If null, the adapters are
+         returned in the C(adapters) return value."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -141,6 +153,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -186,11 +206,17 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 adapters:
   description: The list of adapters, with a subset of their properties.
     For details on the properties, see the data model of the 'Adapter' resource
     (see :term:`HMC API`)
-  returned: success
+  returned: success, if output_file is not specified
   type: list
   elements: dict
   contains:
@@ -223,6 +249,27 @@ adapters:
             "status": "active",
         }
     ]
+output:
+  description: Summary of the JSON Lines file with the adapters.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of adapters in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "adapters.jsonl",
+        "count": 2,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
 """
 
 import logging  # noqa: E402
@@ -230,7 +277,8 @@ import traceback  # noqa: E402
 from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, \
-    get_hmc_auth, get_session, missing_required_lib  # noqa: E402
+    get_hmc_auth, get_session, missing_required_lib, \
+    open_result_list, retry_result, find_by_name, HmcCapabilities  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -250,10 +298,57 @@ LOGGER_NAME = 'zhmc_adapter_list'
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def perform_list(params):
+def list_adapters(client, capabilities, cpc_name, filter_args):
+    """
+    List the adapters of a CPC or of all managed CPCs that match the filter
+    arguments, using the "List Permitted Adapters" operation if the HMC
+    supports it.
+
+    Returns:
+      list of zhmcclient.Adapter: The adapters.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # The "List Permitted Adapters" operation was added in HMC
+    # version 2.14.0. The operation depends only on the HMC version and not
+    # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
+    # a z13 CPC.
+    console = client.consoles.console
+    # TODO: Remove check on list_permitted_adapters() once supported
+    if not capabilities.has_list_permitted('adapters') or \
+            not hasattr(console, 'list_permitted_adapters'):
+        # List the adapters in the traditional way
+        if cpc_name:
+            LOGGER.debug("Listing adapters of CPC %s", cpc_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            adapters = cpc.adapters.list(filter_args=filter_args)
+        else:
+            LOGGER.debug("Listing adapters of all managed CPCs")
+            cpcs = client.cpcs.list()
+            adapters = []
+            for cpc in cpcs:
+                adapters.extend(cpc.adapters.list(filter_args=filter_args))
+    else:
+        # List the adapters using the new operation
+        if cpc_name:
+            LOGGER.debug("Listing permitted adapters of CPC %s", cpc_name)
+            filter_args = dict(filter_args)
+            filter_args['cpc-name'] = cpc_name
+        else:
+            LOGGER.debug("Listing permitted adapters of all managed CPCs")
+        adapters = console.list_permitted_adapters(filter_args=filter_args)
+    return adapters
+
+
+def perform_list(params, check_mode=False):
     """
     List the adapters and return a subset of properties.
 
+    Returns:
+      ResultList or JsonLinesWriter: The result items, depending on the
+      'output_file' module parameter (see open_result_list()).
+
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
@@ -268,13 +363,13 @@ def perform_list(params):
     type = params.get('type', None)
     status = params.get('status', None)
 
+    output_file = params.get('output_file', None)
     _faked_session = params.get('_faked_session', None)  # No default specified
 
     session = get_session(
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        console = client.consoles.console
 
         filter_args = {}
         if name is not None:
@@ -288,48 +383,32 @@ def perform_list(params):
         if status is not None:
             filter_args['status'] = status
 
-        # The "List Permitted Adapters" operation was added in HMC
-        # version 2.14.0. The operation depends only on the HMC version and not
-        # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
-        # a z13 CPC.
-        hmc_version = client.query_api_version()['hmc-version']
-        hmc_version_info = [int(x) for x in hmc_version.split('.')]
-        # TODO: Remove check on list_permitted_adapters() once supported
-        if hmc_version_info < [2, 14, 0] or \
-                not hasattr(console, 'list_permitted_adapters'):
-            # List the adapters in the traditional way
-            if cpc_name:
-                LOGGER.debug("Listing adapters of CPC %s", cpc_name)
-                cpc = client.cpcs.find(name=cpc_name)
-                adapters = cpc.adapters.list(filter_args=filter_args)
-            else:
-                LOGGER.debug("Listing adapters of all managed CPCs")
-                cpcs = client.cpcs.list()
-                adapters = []
-                for cpc in cpcs:
-                    adapters.extend(cpc.adapters.list(filter_args=filter_args))
-        else:
-            # List the adapters using the new operation
-            if cpc_name:
-                LOGGER.debug("Listing permitted adapters of CPC %s", cpc_name)
-                filter_args['cpc-name'] = cpc_name
-            else:
-                LOGGER.debug("Listing permitted adapters of all managed CPCs")
-            adapters = console.list_permitted_adapters(filter_args=filter_args)
+        # The HMC capabilities are cached across module runs. If the HMC has
+        # been downgraded in the meantime, the listing is repeated with the
+        # capabilities retrieved again.
+        capabilities = HmcCapabilities.for_client(client)
+        try:
+            adapters = list_adapters(
+                client, capabilities, cpc_name, filter_args)
+        except zhmcclient.HTTPError as exc:
+            if not capabilities.refresh_on_error(exc):
+                raise
+            adapters = list_adapters(
+                client, capabilities, cpc_name, filter_args)
         # The default exception handling is sufficient for the above.
 
-        adapter_list = []
-        for adapter in adapters:
-            parent_cpc = adapter.manager.cpc
-            adapter_properties = {
-                "name": adapter.name,
-                "cpc_name": parent_cpc.name,
-                "adapter_id": adapter.get_property('adapter-id'),
-                "adapter_family": adapter.get_property('adapter-family'),
-                "type": adapter.get_property('type'),
-                "status": adapter.get_property('status'),
-            }
-            adapter_list.append(adapter_properties)
+        with open_result_list(output_file, check_mode) as adapter_list:
+            for adapter in adapters:
+                parent_cpc = adapter.manager.cpc
+                adapter_properties = {
+                    "name": adapter.name,
+                    "cpc_name": parent_cpc.name,
+                    "adapter_id": adapter.get_property('adapter-id'),
+                    "adapter_family": adapter.get_property('adapter-family'),
+                    "type": adapter.get_property('type'),
+                    "status": adapter.get_property('status'),
+                }
+                adapter_list.append(adapter_properties)
 
         return adapter_list
 
@@ -359,7 +438,10 @@ def main():
         adapter_family=dict(required=False, type='str', default=None),
         type=dict(required=False, type='str', default=None),
         status=dict(required=False, type='str', default=None),
+        output_file=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -378,16 +460,16 @@ def main():
                          exception=IMP_ZHMCCLIENT_ERR)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
     LOGGER.debug("Module entry: params: %r", _params)
 
-    changed = False
     try:
 
-        result_list = perform_list(module.params)
+        results = perform_list(module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -399,9 +481,15 @@ def main():
     # Other exceptions are considered module errors and are handled by Ansible
     # by showing the traceback.
 
+    changed = results.changed
+    result_list = results.result()
     LOGGER.debug("Module exit (success): changed: %s, result: %r",
                  changed, result_list)
-    module.exit_json(changed=changed, adapters=result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(
+            changed=changed, adapters=result_list, **retry_result())
 
 
 if __name__ == '__main__':
@@ -37,7 +37,9 @@ description:
   - Deactivate/Stop a CPC (Z system).
   - Activate/Start a CPC and update its properties.
   - Gather facts about a CPC, and for DPM operational mode, including its
-    adapters, partitions and storage groups.
+    adapters, partitions and storage groups. Each of these child resource
+    lists can be excluded, and selected additional properties can be
+    retrieved for them.
   - Update the properties of a CPC.
 author:
   - Andreas Maier (@andy-maier)
@@ -137,6 +139,76 @@ options:
     type: dict
     required: false
     default: null
+  expand_partitions:
+    description:
+      - "Include the partitions of the CPC in the 'partitions' artificial
+         property of the result, for all C(state) values except C(inactive)."
+    type: bool
+    required: false
+    default: true
+  expand_adapters:
+    description:
+      - "Include the adapters of the CPC in the 'adapters' artificial property
+         of the result, for all C(state) values except C(inactive)."
+    type: bool
+    required: false
+    default: true
+  expand_storage_groups:
+    description:
+      - "Include the storage groups associated with the CPC in the
+         'storage-groups' artificial property of the result, for all C(state)
+         values except C(inactive)."
+    type: bool
+    required: false
+    default: true
+  partition_properties:
+    description:
+      - "Names of properties of the partitions to be returned in addition to
+         the subset of properties returned by the 'List Partitions of a CPC'
+         operation, with underscores instead of hyphens. Ignored if
+         C(expand_partitions) is false."
+      - "If specified, the properties are retrieved for each partition. On
+         HMC versions that support it, only the specified properties are
+         retrieved."
+    type: list
+    elements: str
+    required: false
+    default: null
+  adapter_properties:
+    description:
+      - "Names of properties of the adapters to be returned in addition to
+         the subset of properties returned by the 'List Adapters of a CPC'
+         operation, with underscores instead of hyphens. Ignored if
+         C(expand_adapters) is false."
+      - "If specified, the properties are retrieved for each adapter. On HMC
+         versions that support it, only the specified properties are
+         retrieved."
+    type: list
+    elements: str
+    required: false
+    default: null
+  storage_group_properties:
+    description:
+      - "Names of properties of the storage groups to be returned in addition
+         to the subset of properties returned by the 'List Storage Groups'
+         operation, with underscores instead of hyphens. Ignored if
+         C(expand_storage_groups) is false."
+      - "If specified, the properties are retrieved for each storage group.
+         On HMC versions that support it, only the specified properties are
+         retrieved."
+    type: list
+    elements: str
+    required: false
+    default: null
+  max_workers:
+    description:
+      - "Maximum number of HMC operations for listing the child resources and
+         retrieving their properties that are performed in parallel. The
+         child resource lists that are included are retrieved concurrently.
+         1 retrieves them serially."
+    type: int
+    required: false
+    default: 8
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -145,6 +217,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -165,6 +245,19 @@ EXAMPLES = """
     state: facts
   register: cpc1
 
+- name: Gather facts about the CPC, with its partitions and their memory
+  zhmc_cpc:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    name: "{{ my_cpc_name }}"
+    state: facts
+    expand_adapters: false
+    expand_storage_groups: false
+    partition_properties:
+      - initial_memory
+      - maximum_memory
+  register: cpc1
+
 - name: Ensure the CPC is inactive
   zhmc_cpc:
     hmc_host: "{{ my_hmc_host }}"
@@ -204,9 +297,15 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 cpc:
   description: "The CPC and its adapters, partitions, and storage groups."
-  returned: success
+  returned: "success, except for C(state=inactive)"
   type: dict
   contains:
     name:
@@ -217,8 +316,10 @@ cpc:
         model of the 'CPC' object in the :term:`HMC API` book.
         The property names have hyphens (-) as described in that book."
     adapters:
-      description: "The adapters of the CPC, with a subset of their
-        properties. For details, see the :term:`HMC API` book."
+      description: "Only present if C(expand_adapters=true): The adapters of
+        the CPC, with a subset of their properties and the properties
+        specified in C(adapter_properties). For details, see the
+        :term:`HMC API` book."
       type: list
       elements: dict
       contains:
@@ -241,8 +342,10 @@ cpc:
           description: "Status of the adapter"
           type: str
     partitions:
-      description: "The defined partitions of the CPC, with a subset of their
-        properties. For details, see the :term:`HMC API` book."
+      description: "Only present if C(expand_partitions=true): The defined
+        partitions of the CPC, with a subset of their properties and the
+        properties specified in C(partition_properties). For details, see the
+        :term:`HMC API` book."
       type: list
       elements: dict
       contains:
@@ -259,8 +362,10 @@ cpc:
           description: "Status of the partition"
           type: str
     storage-groups:
-      description: "The storage groups associated with the CPC, with a subset
-        of their properties. For details, see the :term:`HMC API` book."
+      description: "Only present if C(expand_storage_groups=true): The storage
+        groups associated with the CPC, with a subset of their properties and
+        the properties specified in C(storage_group_properties). For details,
+        see the :term:`HMC API` book."
       type: list
       elements: dict
       contains:
@@ -341,7 +446,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 from ..module_utils.common import log_init, Error, StatusError, \
     ParameterError, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, SelectedPropertiesPuller, parallel_map, \
+    missing_required_lib, common_fail_on_import_errors, \
+    retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -360,6 +467,9 @@ LOGGER_NAME = 'zhmc_cpc'
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
+# Defaults for module input parameters
+DEFAULT_MAX_WORKERS = 8
+
 # Dictionary of properties of CPC resources, in this format:
 #   name: (allowed, create, update, eq_func, type_cast)
 # where:
@@ -405,6 +515,17 @@ ZHMC_CPC_PROPERTIES = {
     # The properties not specified here default to allow=False.
 }
 
+# Compiled form of ZHMC_CPC_PROPERTIES
+ZHMC_CPC_SCHEMA = PropertySchema(ZHMC_CPC_PROPERTIES)
+
+# Child resources of a CPC that can be included in the result, as tuples of:
+#   (artificial property name, expand parameter, properties parameter)
+CPC_CHILDREN = (
+    ('partitions', 'expand_partitions', 'partition_properties'),
+    ('adapters', 'expand_adapters', 'adapter_properties'),
+    ('storage-groups', 'expand_storage_groups', 'storage_group_properties'),
+)
+
 
 def process_properties(cpc, params):
     """
@@ -451,7 +572,7 @@ def process_properties(cpc, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_CPC_PROPERTIES, input_props, cpc)
+            prop_name, ZHMC_CPC_SCHEMA, input_props, cpc)
         update_props.update(_update_props)
         if _create_props:
             raise AssertionError()
@@ -461,12 +582,40 @@ def process_properties(cpc, params):
     return update_props
 
 
-def add_artificial_properties(cpc_properties, cpc):
+def cpc_children(params):
+    """
+    Return the child resources of the CPC to be included in the result, as a
+    dict with the artificial property name as a key and the list of the
+    additional properties to be retrieved (with hyphens) as a value.
+    """
+    children = {}
+    for prop_name, expand_parm, properties_parm in CPC_CHILDREN:
+        if params.get(expand_parm, True):
+            children[prop_name] = [
+                name.replace('_', '-')
+                for name in params.get(properties_parm) or []]
+    return children
+
+
+def list_children(cpc, prop_name):
+    """
+    List the child resources of the CPC for an artificial property, with the
+    subset of their properties returned by the list operation.
+    """
+    if prop_name == 'partitions':
+        return cpc.partitions.list()
+    if prop_name == 'adapters':
+        return cpc.adapters.list()
+    return cpc.manager.console.storage_groups.list(
+        filter_args={'cpc-uri': cpc.uri})
+
+
+def add_artificial_properties(cpc_properties, cpc, children, max_workers):
     """
     Add artificial properties to the CPC properties.
 
     Upon return, the cpc_properties dict has been extended by these artificial
-    properties:
+    properties, if they are in children:
 
     * 'partitions': List of partitions of the CPC, with the list subset of
       their properties.
@@ -476,17 +625,38 @@ def add_artificial_properties(cpc_properties, cpc):
 
     * 'storage-groups': List of storage groups attached to the partition, with
       the list subset of their properties.
-    """
-    partitions = cpc.partitions.list()
-    cpc_properties['partitions'] = [dict(p.properties) for p in partitions]
-
-    adapters = cpc.adapters.list()
-    cpc_properties['adapters'] = [dict(a.properties) for a in adapters]
 
-    storage_groups = cpc.manager.console.storage_groups.list(
-        filter_args={'cpc-uri': cpc.uri})
-    cpc_properties['storage-groups'] = [dict(sg.properties)
-                                        for sg in storage_groups]
+    The child resources are listed concurrently first. Then the additional
+    properties specified for a child type in children are retrieved for each
+    child resource of that type, for all child types in a single set of up
+    to max_workers threads.
+    """
+    prop_names = sorted(children)
+    resources_by_prop = dict(zip(prop_names, parallel_map(
+        lambda prop_name: list_children(cpc, prop_name), prop_names,
+        max_workers)))
+
+    puller = SelectedPropertiesPuller()
+
+    def pull(item):
+        resource, selected = item
+        names = set(resource.properties) | set(selected)
+        puller.pull(resource, selected)
+        # Only the listed and selected properties are returned, also if the
+        # full properties had to be retrieved.
+        return dict((name, resource.properties.get(name)) for name in names)
+
+    pull_items = [
+        (resource, children[prop_name]) for prop_name in prop_names
+        if children[prop_name] for resource in resources_by_prop[prop_name]]
+    pulled = iter(parallel_map(pull, pull_items, max_workers))
+
+    for prop_name in prop_names:
+        resources = resources_by_prop[prop_name]
+        if children[prop_name]:
+            cpc_properties[prop_name] = [next(pulled) for _ in resources]
+        else:
+            cpc_properties[prop_name] = [dict(r.properties) for r in resources]
 
 
 def ensure_active(params, check_mode):
@@ -512,7 +682,7 @@ def ensure_active(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         # Activate the CPC
@@ -559,7 +729,9 @@ def ensure_active(params, check_mode):
             # changes, and not based upon newly retrieved properties.
             result.update(update_props)
             changed = True
-        add_artificial_properties(result, cpc)
+        add_artificial_properties(
+            result, cpc, cpc_children(params),
+            params.get('max_workers', DEFAULT_MAX_WORKERS))
 
         return changed, result
 
@@ -589,7 +761,7 @@ def ensure_inactive(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         # Inactivate the CPC
@@ -643,7 +815,7 @@ def ensure_set(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         # Set the properties
@@ -661,7 +833,9 @@ def ensure_set(params, check_mode):
             result.update(update_props)
             changed = True
 
-        add_artificial_properties(result, cpc)
+        add_artificial_properties(
+            result, cpc, cpc_children(params),
+            params.get('max_workers', DEFAULT_MAX_WORKERS))
 
         return changed, result
 
@@ -688,12 +862,14 @@ def facts(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         cpc.pull_full_properties()
         result = dict(cpc.properties)
-        add_artificial_properties(result, cpc)
+        add_artificial_properties(
+            result, cpc, cpc_children(params),
+            params.get('max_workers', DEFAULT_MAX_WORKERS))
 
         return False, result
 
@@ -743,7 +919,20 @@ def main():
                    choices=['inactive', 'active', 'set', 'facts']),
         activation_profile_name=dict(required=False, type='str', default=None),
         properties=dict(required=False, type='dict', default={}),
+        expand_partitions=dict(required=False, type='bool', default=True),
+        expand_adapters=dict(required=False, type='bool', default=True),
+        expand_storage_groups=dict(required=False, type='bool', default=True),
+        partition_properties=dict(
+            required=False, type='list', elements='str', default=None),
+        adapter_properties=dict(
+            required=False, type='list', elements='str', default=None),
+        storage_group_properties=dict(
+            required=False, type='list', elements='str', default=None),
+        max_workers=dict(required=False, type='int',
+                         default=DEFAULT_MAX_WORKERS),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -764,7 +953,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -786,8 +976,7 @@ def main():
 
     LOGGER.debug("Module exit (success): changed: %s, cpc: %r",
                  changed, result)
-    module.exit_json(
-        changed=changed, cpc=result)
+    module.exit_json(changed=changed, cpc=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -91,6 +91,27 @@ options:
     type: bool
     required: false
     default: false
+  output_file:
+    description:
+      - "Path name of a JSON Lines file to which the cpcs are written as they
+         are listed, one JSON object per line. The cpcs are then not returned
+         in the C(cpcs) return value, so that large results do not need to be
+         kept in memory. Instead, the C(output) return value describes the
+         file. The file is written on the system the module runs on, and only
+         if its content changes. If null, the cpcs are returned in the C(cpcs)
+         return value."
+    type: str
+    required: false
+    default: null
+  max_workers:
+    description:
+      - "Maximum number of HMC operations that are performed in parallel
+         for retrieving the properties of the managed CPCs and for listing
+         the unmanaged CPCs, after the managed CPCs have been listed. 1
+         performs all HMC operations serially."
+    type: int
+    required: false
+    default: 8
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -99,6 +120,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -136,9 +165,15 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 cpcs:
   description: The list of CPCs, with a subset of their properties.
-  returned: success
+  returned: success, if output_file is not specified
   type: list
   elements: dict
   contains:
@@ -184,14 +219,38 @@ cpcs:
             "is_managed": False
         }
     ]
+output:
+  description: Summary of the JSON Lines file with the cpcs.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of cpcs in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "cpcs.jsonl",
+        "count": 2,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
 """
 
 import logging  # noqa: E402
+import functools  # noqa: E402
 import traceback  # noqa: E402
 from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, get_hmc_auth, get_session, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    missing_required_lib, common_fail_on_import_errors, \
+    open_result_list, retry_result, parallel_imap, \
+    SelectedPropertiesPuller  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -210,11 +269,59 @@ LOGGER_NAME = 'zhmc_cpc_list'
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
+# Defaults for module input parameters
+DEFAULT_MAX_WORKERS = 8
+
+# Properties of managed CPCs that are returned, as tuples of:
+#   (result item key, HMC property name)
+MANAGED_CPC_PROPERTIES = (
+    ('status', 'status'),
+    ('has_unacceptable_status', 'has-unacceptable-status'),
+    ('dpm_enabled', 'dpm-enabled'),
+    ('se_version', 'se-version'),
+)
 
-def perform_list(params):
+
+def managed_cpc_items(puller, cpc):
+    """
+    Return the result items for a managed CPC, as a list with one item.
+
+    The properties that are not returned by the list operation are retrieved
+    using a property-selective request if the HMC supports it.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    prop_names = [hmc_name for _, hmc_name in MANAGED_CPC_PROPERTIES]
+    puller.pull(cpc, prop_names)
+    item = {
+        "name": cpc.name,
+        "is_managed": True,
+    }
+    for key, hmc_name in MANAGED_CPC_PROPERTIES:
+        item[key] = cpc.properties.get(hmc_name)
+    return [item]
+
+
+def unmanaged_cpc_items(client):
+    """
+    List the unmanaged CPCs and return the result items for them.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    cpcs = client.consoles.console.list_unmanaged_cpcs()
+    return [{"name": cpc.name, "is_managed": False} for cpc in cpcs]
+
+
+def perform_list(params, check_mode=False):
     """
     List the managed CPCs and return a subset of properties.
 
+    Returns:
+      ResultList or JsonLinesWriter: The result items, depending on the
+      'output_file' module parameter (see open_result_list()).
+
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
@@ -223,6 +330,8 @@ def perform_list(params):
     host = params['hmc_host']
     userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
     include_unmanaged_cpcs = params.get('include_unmanaged_cpcs', False)
+    output_file = params.get('output_file', None)
+    max_workers = params.get('max_workers', DEFAULT_MAX_WORKERS)
     _faked_session = params.get('_faked_session', None)  # No default specified
 
     session = get_session(
@@ -230,33 +339,25 @@ def perform_list(params):
     try:
         client = zhmcclient.Client(session)
 
-        cpc_list = []
-
-        # List the managed CPCs
-        cpcs = client.cpcs.list()
-        # The default exception handling is sufficient for the above.
-        for cpc in cpcs:
-            cpc_properties = {
-                "name": cpc.name,
-                "is_managed": True,
-                "status": cpc.get_property('status'),
-                "has_unacceptable_status": cpc.get_property(
-                    'has-unacceptable-status'),
-                "dpm_enabled": cpc.get_property('dpm-enabled'),
-                "se_version": cpc.get_property('se-version'),
-            }
-            cpc_list.append(cpc_properties)
-
-        # List the unmanaged CPCs
-        if include_unmanaged_cpcs:
-            cpcs = client.consoles.console.list_unmanaged_cpcs()
+        with open_result_list(output_file, check_mode) as cpc_list:
+
+            # The first HMC operation is done serially, so that the session
+            # is logged on only once.
+            cpcs = client.cpcs.list()
             # The default exception handling is sufficient for the above.
-            for cpc in cpcs:
-                cpc_properties = {
-                    "name": cpc.name,
-                    "is_managed": False,
-                }
-                cpc_list.append(cpc_properties)
+
+            # The properties of the managed CPCs are retrieved and the
+            # unmanaged CPCs are listed in a single thread pool. The items
+            # are added to the result as they become available, in order.
+            puller = SelectedPropertiesPuller()
+            tasks = [functools.partial(managed_cpc_items, puller, cpc)
+                     for cpc in cpcs]
+            if include_unmanaged_cpcs:
+                tasks.append(functools.partial(unmanaged_cpc_items, client))
+            for items in parallel_imap(
+                    lambda task: task(), tasks, max_workers):
+                for item in items:
+                    cpc_list.append(item)
 
         return cpc_list
 
@@ -281,7 +382,12 @@ def main():
             ),
         ),
         include_unmanaged_cpcs=dict(required=False, type='bool', default=False),
+        output_file=dict(required=False, type='str', default=None),
+        max_workers=dict(required=False, type='int',
+                         default=DEFAULT_MAX_WORKERS),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -302,16 +408,16 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
     LOGGER.debug("Module entry: params: %r", _params)
 
-    changed = False
     try:
 
-        result_list = perform_list(module.params)
+        results = perform_list(module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -323,9 +429,14 @@ def main():
     # Other exceptions are considered module errors and are handled by Ansible
     # by showing the traceback.
 
+    changed = results.changed
+    result_list = results.result()
     LOGGER.debug("Module exit (success): changed: %s, result: %r",
                  changed, result_list)
-    module.exit_json(changed=changed, cpcs=result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(changed=changed, cpcs=result_list, **retry_result())
 
 
 if __name__ == '__main__':
@@ -175,6 +175,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -256,6 +264,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 changes:
   description: The changes that were performed by the module.
   returned: success
@@ -358,7 +372,7 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     get_hmc_auth, get_session, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    common_fail_on_import_errors, retry_result, find_by_name  # noqa: E402
 
 
 try:
@@ -521,8 +535,8 @@ def ensure_attached(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         # Determine all crypto adapters of the specified crypto type.
@@ -937,8 +951,8 @@ def ensure_detached(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         # Determine all crypto adapters of any crypto type
@@ -1023,8 +1037,8 @@ def facts(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         # Determine all crypto adapters of any crypto type
@@ -1092,6 +1106,8 @@ def main():
         crypto_type=dict(required=False, type='str',
                          choices=['ep11', 'cca', 'acc'], default='ep11'),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1112,7 +1128,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1137,7 +1154,8 @@ def main():
         "Module exit (success): changed: %r, crypto_configuration: %r, "
         "changes: %r", changed, result, changes)
     module.exit_json(
-        changed=changed, crypto_configuration=result, changes=changes)
+        changed=changed, crypto_configuration=result, changes=changes,
+        **retry_result())
 
 
 if __name__ == '__main__':
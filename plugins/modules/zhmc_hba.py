@@ -36,8 +36,17 @@ short_description: Create HBAs in partitions
 description:
   - Create, update, or delete an HBA (virtual Host Bus Adapter) in a partition
     of a CPC (Z system).
+  - "In batch mode (if C(hbas) is specified), this is done for many HBAs in
+    many partitions of the CPC in a single task. The adapter ports backing
+    the HBAs are looked up only once, and the partitions are processed in
+    parallel, bounded by C(max_workers). All items are validated before
+    anything is changed. If an error occurs for a partition, the other
+    partitions are still processed, and the module fails with the C(hbas)
+    return value showing which items have been processed."
   - Note that the Ansible module zhmc_partition can be used to gather facts
-    about existing HBAs of a partition.
+    about existing HBAs of a partition, and the Ansible module
+    zhmc_wwpn_list can be used to list the WWPNs of the HBAs of many
+    partitions.
 author:
   - Andreas Maier (@andy-maier)
   - Andreas Scheuring (@scheuran)
@@ -101,15 +110,19 @@ options:
     required: true
   partition_name:
     description:
-      - The name of the partition containing the HBA.
+      - The name of the partition containing the HBA. Required, unless
+        C(hbas) is specified.
     type: str
-    required: true
+    required: false
+    default: null
   name:
     description:
       - The name of the target HBA that is managed. If the HBA needs to be
-        created, this value becomes its name.
+        created, this value becomes its name. Required, unless C(hbas) is
+        specified.
     type: str
-    required: true
+    required: false
+    default: null
   state:
     description:
       - "The desired state for the HBA. All states are fully idempotent
@@ -147,6 +160,41 @@ options:
     type: dict
     required: false
     default: null
+  hbas:
+    description:
+      - "The target HBAs for batch mode, each in a partition. If specified,
+         C(partition_name) and C(name) must not be specified, C(properties)
+         is ignored, and C(state) applies to all target HBAs. The partitions
+         must exist."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      partition_name:
+        description:
+          - The name of the partition containing the HBA.
+        type: str
+        required: true
+      name:
+        description:
+          - The name of the HBA.
+        type: str
+        required: true
+      properties:
+        description:
+          - Input properties for the HBA, as described for the C(properties)
+            module parameter.
+        type: dict
+        required: false
+        default: null
+  max_workers:
+    description:
+      - Maximum number of partitions that are processed in parallel in batch
+        mode. 1 processes the partitions serially.
+    type: int
+    required: false
+    default: 8
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -155,6 +203,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -190,6 +246,28 @@ EXAMPLES = """
     partition_name: "{{ my_partition_name }}"
     name: "{{ my_hba_name }}"
     state: absent
+
+- name: Ensure an HBA on the same FCP port exists in many partitions
+  zhmc_hba:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    state: present
+    hbas:
+      - partition_name: "prod-db1"
+        name: "hba-san1"
+        properties:
+          adapter_name: FCP-1
+          adapter_port: 0
+          device_number: "1200"
+      - partition_name: "prod-db2"
+        name: "hba-san1"
+        properties:
+          adapter_name: FCP-1
+          adapter_port: 0
+          device_number: "1200"
+    max_workers: 16
+  register: hba_batch
 """
 
 RETURN = """
@@ -202,12 +280,18 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 hba:
   description:
     - "For C(state=absent), an empty dictionary."
     - "For C(state=present), the resource properties of the HBA after any
        changes."
-  returned: success
+  returned: success, if hbas is not specified
   type: dict
   contains:
     name:
@@ -218,6 +302,47 @@ hba:
         model of the 'HBA' element object of the 'Partition' object in the
         :term:`HMC API` book.
         The property names have hyphens (-) as described in that book."
+hbas:
+  description: The result for each item of the C(hbas) module parameter,
+    in the same order.
+  returned: success, or failure after partitions have been processed, if
+    hbas is specified
+  type: list
+  elements: dict
+  contains:
+    partition_name:
+      description: "Name of the partition of the HBA"
+      type: str
+    name:
+      description: "HBA name"
+      type: str
+    changed:
+      description: "Indicates if the HBA has been changed"
+      type: bool
+    msg:
+      description: "The error message, if an error occurred for the
+        partition of the HBA at this item or at an earlier item. The item
+        has not been processed."
+      type: str
+    properties:
+      description: "For C(state=present), the resource properties of the HBA
+        after any changes, as described for the C(hba) return value. Empty
+        for C(state=absent), and for HBAs that would be created in check
+        mode."
+      type: dict
+  sample:
+    [
+        {
+            "partition_name": "prod-db1",
+            "name": "hba-san1",
+            "changed": true,
+            "properties": {
+                "name": "hba-san1",
+                "device-number": "1200",
+                "wwpn": "C05076FFEB800004"
+            }
+        }
+    ]
 """
 
 import logging  # noqa: E402
@@ -226,8 +351,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     wait_for_transition_completion, eq_hex, get_hmc_auth, get_session, \
-    to_unicode, process_normal_property, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    to_unicode, process_normal_property, \
+    PropertySchema, missing_required_lib, parallel_map, \
+    common_fail_on_import_errors, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -294,8 +420,37 @@ ZHMC_HBA_PROPERTIES = {
     'wwpn': (False, False, False, None, None, None),
 }
 
+# Compiled form of ZHMC_HBA_PROPERTIES
+ZHMC_HBA_SCHEMA = PropertySchema(ZHMC_HBA_PROPERTIES)
+
+
+def adapter_port_uri(cpc, adapter_name, adapter_port_index):
+    """
+    Return the URI of the port of a storage adapter, by the adapter name and
+    the port index, as specified in the artificial properties.
+
+    Raises:
+      ParameterError: The adapter or port does not exist.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    try:
+        adapter = find_by_name(cpc.adapters, adapter_name)
+    except zhmcclient.NotFound:
+        raise ParameterError(
+            "Artificial property {0!r} does not specify the name of an "
+            "existing adapter: {1!r}".
+            format('adapter_name', adapter_name))
+    try:
+        port = adapter.ports.find(index=adapter_port_index)
+    except zhmcclient.NotFound:
+        raise ParameterError(
+            "Artificial property {0!r} does not specify the index of an "
+            "existing port on adapter {1!r}: {2!r}".
+            format('adapter_port', adapter_name, adapter_port_index))
+    return port.uri
+
 
-def process_properties(partition, hba, params):
+def process_properties(partition, hba, params, port_uris=None):
     """
     Process the properties specified in the 'properties' module parameter,
     and return two dictionaries (create_props, update_props) that contain
@@ -320,7 +475,12 @@ def process_properties(partition, hba, params):
       hba (zhmcclient.Hba): HBA to be updated with the full set of current
         properties, or `None` if it did not previously exist.
 
-      params (dict): Module input parameters.
+      params (dict): Module input parameters, or an item of the 'hbas'
+        module parameter.
+
+      port_uris (dict): URIs of the adapter ports by tuple (adapter_name,
+        adapter_port) that have already been looked up, or `None` to look up
+        the adapter port.
 
     Returns:
       tuple of (create_props, update_props, stop), where:
@@ -372,7 +532,7 @@ def process_properties(partition, hba, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_HBA_PROPERTIES, input_props, hba)
+            prop_name, ZHMC_HBA_SCHEMA, input_props, hba)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -389,35 +549,101 @@ def process_properties(partition, hba, params):
             adapter_port_art_name in input_props:
         adapter_name = to_unicode(input_props[adapter_name_art_name])
         adapter_port_index = int(input_props[adapter_port_art_name])
-        try:
-            adapter = partition.manager.cpc.adapters.find(
-                name=adapter_name)
-        except zhmcclient.NotFound:
-            raise ParameterError(
-                "Artificial property {0!r} does not specify the name of an "
-                "existing adapter: {1!r}".
-                format(adapter_name_art_name, adapter_name))
-        try:
-            port = adapter.ports.find(index=adapter_port_index)
-        except zhmcclient.NotFound:
-            raise ParameterError(
-                "Artificial property {0!r} does not specify the index of an "
-                "existing port on adapter {1!r}: {2!r}".
-                format(adapter_port_art_name, adapter_name,
-                       adapter_port_index))
+        if port_uris is None:
+            port_uri = adapter_port_uri(
+                partition.manager.cpc, adapter_name, adapter_port_index)
+        else:
+            port_uri = port_uris[(adapter_name, adapter_port_index)]
         hmc_prop_name = 'adapter-port-uri'
         if hba:
             existing_port_uri = hba.get_property(hmc_prop_name)
-            if port.uri != existing_port_uri:
+            if port_uri != existing_port_uri:
                 raise ParameterError(
                     "Artificial properties {0!r} and {1!r} cannot be used to "
                     "change the adapter port of an existing HBA".
                     format(adapter_name_art_name, adapter_port_art_name))
-        create_props[hmc_prop_name] = port.uri
+        create_props[hmc_prop_name] = port_uri
 
     return create_props, update_props, stop
 
 
+def ensure_hba_present(partition, hba, params, check_mode, port_uris=None):
+    """
+    Ensure that an HBA of an existing partition exists and has the specified
+    properties.
+
+    Parameters:
+
+      partition (zhmcclient.Partition): Partition containing the HBA.
+
+      hba (zhmcclient.Hba): HBA with the full set of current properties, or
+        `None` if it does not exist.
+
+      params (dict): Module input parameters, or an item of the 'hbas'
+        module parameter.
+
+      port_uris (dict): See process_properties().
+
+    Returns:
+      tuple of (changed, hba), where hba is the HBA after any changes with
+      its full set of properties, or `None` if it would be created in check
+      mode.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      StatusError: An issue with the partition status.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    changed = False
+
+    if not hba:
+        # It does not exist. Create it and update it if there are
+        # update-only properties.
+        if not check_mode:
+            create_props, update_props, stop = process_properties(
+                partition, hba, params, port_uris)
+            hba = partition.hbas.create(create_props)
+            update2_props = {}
+            for name, value in update_props.items():
+                if name not in create_props:
+                    update2_props[name] = value
+            if update2_props:
+                hba.update_properties(update2_props)
+            # We refresh the properties after the update, in case an
+            # input property value gets changed (for example, the
+            # partition does that with memory properties).
+            hba.pull_full_properties()
+        else:
+            # TODO: Show props in module result also in check mode.
+            pass
+        changed = True
+    else:
+        # It exists. Stop the partition if needed due to the HBA property
+        # update requirements, or wait for an updateable partition status,
+        # and update the HBA properties.
+        create_props, update_props, stop = process_properties(
+            partition, hba, params, port_uris)
+        if update_props:
+            if not check_mode:
+                # HBA properties can all be updated while the partition is
+                # active, therefore:
+                if stop:
+                    raise AssertionError()
+
+                wait_for_transition_completion(partition)
+                hba.update_properties(update_props)
+                # We refresh the properties after the update, in case an
+                # input property value gets changed (for example, the
+                # partition does that with memory properties).
+                hba.pull_full_properties()
+            else:
+                # TODO: Show updated props in mod.result also in chk.mode
+                pass
+            changed = True
+
+    return changed, hba
+
+
 def ensure_present(params, check_mode):
     """
     Ensure that the HBA exists and has the specified properties.
@@ -442,11 +668,11 @@ def ensure_present(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
         except zhmcclient.NotFound:
             if check_mode:
                 # Once the partition is created, the HBA will also need to be
@@ -456,55 +682,12 @@ def ensure_present(params, check_mode):
             raise
 
         try:
-            hba = partition.hbas.find(name=hba_name)
+            hba = find_by_name(partition.hbas, hba_name)
             hba.pull_full_properties()
         except zhmcclient.NotFound:
             hba = None
 
-        if not hba:
-            # It does not exist. Create it and update it if there are
-            # update-only properties.
-            if not check_mode:
-                create_props, update_props, stop = process_properties(
-                    partition, hba, params)
-                hba = partition.hbas.create(create_props)
-                update2_props = {}
-                for name, value in update_props.items():
-                    if name not in create_props:
-                        update2_props[name] = value
-                if update2_props:
-                    hba.update_properties(update2_props)
-                # We refresh the properties after the update, in case an
-                # input property value gets changed (for example, the
-                # partition does that with memory properties).
-                hba.pull_full_properties()
-            else:
-                # TODO: Show props in module result also in check mode.
-                pass
-            changed = True
-        else:
-            # It exists. Stop the partition if needed due to the HBA property
-            # update requirements, or wait for an updateable partition status,
-            # and update the HBA properties.
-            create_props, update_props, stop = process_properties(
-                partition, hba, params)
-            if update_props:
-                if not check_mode:
-                    # HBA properties can all be updated while the partition is
-                    # active, therefore:
-                    if stop:
-                        raise AssertionError()
-
-                    wait_for_transition_completion(partition)
-                    hba.update_properties(update_props)
-                    # We refresh the properties after the update, in case an
-                    # input property value gets changed (for example, the
-                    # partition does that with memory properties).
-                    hba.pull_full_properties()
-                else:
-                    # TODO: Show updated props in mod.result also in chk.mode
-                    pass
-                changed = True
+        changed, hba = ensure_hba_present(partition, hba, params, check_mode)
 
         if hba:
             result = dict(hba.properties)
@@ -539,12 +722,12 @@ def ensure_absent(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            hba = partition.hbas.find(name=hba_name)
+            hba = find_by_name(partition.hbas, hba_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -558,10 +741,158 @@ def ensure_absent(params, check_mode):
         session.logoff()
 
 
+def batch_partitions(hbas):
+    """
+    Validate the 'hbas' module parameter and return its items grouped by
+    partition, as a dict with the partition names as keys and lists of
+    tuples (index, item) as values.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    hbas_by_partition = {}
+    for index, item in enumerate(hbas):
+        partition_hbas = hbas_by_partition.setdefault(
+            item['partition_name'], [])
+        if any(i['name'] == item['name'] for _, i in partition_hbas):
+            raise ParameterError(
+                "Item {0} in module parameter 'hbas' specifies HBA {1!r} in "
+                "partition {2!r} again.".
+                format(index, item['name'], item['partition_name']))
+        partition_hbas.append((index, item))
+    return hbas_by_partition
+
+
+def validate_batch(cpc, hbas):
+    """
+    Validate the properties of all items of the 'hbas' module parameter for
+    state 'present', before anything is changed. Each adapter port is looked
+    up only once.
+
+    Returns:
+      dict: URIs of the adapter ports by tuple (adapter_name, adapter_port).
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    port_uris = {}
+    for index, item in enumerate(hbas):
+        props = item.get('properties') or {}
+        try:
+            if 'adapter_name' in props and 'adapter_port' in props:
+                key = (to_unicode(props['adapter_name']),
+                       int(props['adapter_port']))
+                if key not in port_uris:
+                    port_uris[key] = adapter_port_uri(cpc, *key)
+            process_properties(None, None, item, port_uris)
+        except (TypeError, ValueError) as exc:
+            raise ParameterError(
+                "Item {0} in module parameter 'hbas' has an invalid property "
+                "value: {1}".format(index, exc))
+    return port_uris
+
+
+def ensure_batch(params, check_mode):
+    """
+    Ensure the state of the HBAs specified in the 'hbas' module parameter.
+
+    All items are validated before anything is changed. An error while
+    processing a partition does not stop the processing of the other
+    partitions; the results of the failed item and of the items after it in
+    the same partition then have an error message in item 'msg'.
+
+    Returns:
+      tuple of (changed, results), where results is the list of results for
+      the items of the 'hbas' module parameter.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    present = params['state'] == 'present'
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)
+
+    hbas_by_partition = batch_partitions(params['hbas'])
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        # The default exception handling is sufficient for the above.
+
+        partitions = dict((p.name, p) for p in cpc.partitions.list())
+        missing = sorted(set(hbas_by_partition) - set(partitions))
+        if missing:
+            raise ParameterError(
+                "Partitions specified in module parameter 'hbas' do not "
+                "exist in CPC {0!r}: {1}".format(cpc.name, ', '.join(missing)))
+
+        port_uris = validate_batch(cpc, params['hbas']) if present else {}
+
+        def process_partition(partition_name):
+            partition = partitions[partition_name]
+            items = hbas_by_partition[partition_name]
+            results = []
+            try:
+                hbas = dict(
+                    (hba.name, hba)
+                    for hba in partition.hbas.list(full_properties=present))
+                for index, item in items:
+                    hba = hbas.get(item['name'])
+                    if present:
+                        changed, hba = ensure_hba_present(
+                            partition, hba, item, check_mode, port_uris)
+                        properties = dict(hba.properties) if hba else {}
+                    else:
+                        changed = hba is not None
+                        if changed and not check_mode:
+                            hba.delete()
+                        properties = {}
+                    results.append((index, {
+                        'partition_name': partition_name,
+                        'name': item['name'],
+                        'changed': changed,
+                        'properties': properties,
+                    }))
+            except (Error, zhmcclient.Error) as exc:
+                msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+                LOGGER.debug("Processing of HBAs failed for partition %r: %s",
+                             partition_name, msg)
+                for index, item in items[len(results):]:
+                    results.append((index, {
+                        'partition_name': partition_name,
+                        'name': item['name'],
+                        'changed': False,
+                        'properties': {},
+                        'msg': msg,
+                    }))
+            return results
+
+        indexed_results = []
+        for results in parallel_map(
+                process_partition, sorted(hbas_by_partition), max_workers):
+            indexed_results.extend(results)
+
+    finally:
+        session.logoff()
+
+    results = [result for _, result in sorted(
+        indexed_results, key=lambda index_result: index_result[0])]
+    changed = any(result['changed'] for result in results)
+    return changed, results
+
+
 def perform_task(params, check_mode):
     """
     Perform the task for this module, dependent on the 'state' module
-    parameter.
+    parameter, and on whether the 'hbas' module parameter is specified.
 
     If check_mode is True, check whether changes would occur, but don't
     actually perform any changes.
@@ -571,6 +902,18 @@ def perform_task(params, check_mode):
       StatusError: An issue with the partition status.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    if params.get('hbas') is not None:
+        for name in ('partition_name', 'name'):
+            if params.get(name) is not None:
+                raise ParameterError(
+                    "Module parameter {0!r} must not be specified together "
+                    "with module parameter 'hbas'.".format(name))
+        return ensure_batch(params, check_mode)
+    for name in ('partition_name', 'name'):
+        if params.get(name) is None:
+            raise ParameterError(
+                "Module parameter {0!r} is required unless module parameter "
+                "'hbas' is specified.".format(name))
     actions = {
         "absent": ensure_absent,
         "present": ensure_present,
@@ -595,12 +938,23 @@ def main():
             ),
         ),
         cpc_name=dict(required=True, type='str'),
-        partition_name=dict(required=True, type='str'),
-        name=dict(required=True, type='str'),
+        partition_name=dict(required=False, type='str', default=None),
+        name=dict(required=False, type='str', default=None),
         state=dict(required=True, type='str',
                    choices=['absent', 'present']),
         properties=dict(required=False, type='dict', default={}),
+        hbas=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                partition_name=dict(required=True, type='str'),
+                name=dict(required=True, type='str'),
+                properties=dict(required=False, type='dict', default=None),
+            ),
+        ),
+        max_workers=dict(required=False, type='int', default=8),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -621,7 +975,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -644,7 +999,18 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, hba=result)
+    if module.params.get('hbas') is not None:
+        failed = [item for item in result if 'msg' in item]
+        if failed:
+            msg = "Processing failed for {0} of {1} HBAs: {2}".format(
+                len(failed), len(result), failed[0]['msg'])
+            LOGGER.debug(
+                "Module exit (failure): msg: %s, hbas: %r", msg, result)
+            module.fail_json(msg=msg, changed=changed, hbas=result,
+                             **retry_result())
+        module.exit_json(changed=changed, hbas=result, **retry_result())
+    else:
+        module.exit_json(changed=changed, hba=result, **retry_result())
 
 
 if __name__ == '__main__':
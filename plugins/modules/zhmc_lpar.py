@@ -36,6 +36,9 @@ short_description: Manage LPARs
 description:
   - Gather facts about an LPAR of a CPC (Z system) in classic mode.
   - Update modifiable properties of an active LPAR.
+  - Update modifiable properties of multiple active LPARs of a CPC in a
+    single task (batch mode), e.g. for rebalancing their processing weights
+    and capping.
   - Activate an LPAR and update its properties.
   - Load an LPAR and update its properties.
   - Deactivate an LPAR using the 'Deactivate Logical Partition' operation.
@@ -101,8 +104,10 @@ options:
   name:
     description:
       - The name of the target LPAR.
+      - Required unless C(lpars) is specified.
     type: str
-    required: true
+    required: false
+    default: null
   state:
     description:
       - "The desired state for the LPAR:"
@@ -140,6 +145,7 @@ options:
          the LPAR if that is not the case."
       - "* C(facts): Returns the current LPAR properties."
       - "In all cases, the LPAR must exist."
+      - "If C(lpars) is specified, only C(set) is supported."
     type: str
     required: true
     choices: ['inactive', 'reset_clear', 'reset_normal', 'active', 'loaded',
@@ -196,6 +202,43 @@ options:
     type: dict
     required: false
     default: null
+  lpars:
+    description:
+      - "The target LPARs for batch mode, with their new property values. If
+         specified, C(name) must not be specified, C(properties) is ignored,
+         and C(state) must be C(set). The LPARs must exist and must be
+         active."
+      - "The current values of the specified properties of all target LPARs
+         are retrieved before anything is updated. The resulting processing
+         weights of each LPAR are checked for consistency (the initial weight
+         must be in the range 1 to 999 and between a non-zero minimum and
+         maximum weight), and the status of the LPARs is checked, so that
+         no LPAR is updated if any of these checks fails. The LPARs are then
+         updated in parallel."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      name:
+        description:
+          - The name of the LPAR.
+        type: str
+        required: true
+      properties:
+        description:
+          - New values for the LPAR properties, as described for the
+            C(properties) module parameter.
+        type: dict
+        required: false
+        default: null
+  max_workers:
+    description:
+      - Maximum number of LPARs that are retrieved or updated in parallel in
+        batch mode. 1 processes the LPARs serially.
+    type: int
+    required: false
+    default: 8
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -204,6 +247,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -293,6 +344,22 @@ EXAMPLES = """
     state: facts
   register: lpar1
 
+- name: Rebalance the CP sharing weights of multiple LPARs
+  zhmc_lpar:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    state: set
+    lpars:
+      - name: PROD1
+        properties:
+          initial_processing_weight: 60
+      - name: TEST1
+        properties:
+          initial_processing_weight: 10
+          initial_processing_weight_capped: true
+  register: lpar_batch
+
 """
 
 RETURN = """
@@ -305,6 +372,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 lpar:
   description:
     - "The resource properties of the LPAR, after any specified updates have
@@ -315,7 +388,7 @@ lpar:
        different representation format, and other properties may change as a
        result of updating some properties. For details, see the data model of
        the 'Logical Partition' object in the :term:`HMC API` book."
-  returned: success
+  returned: success, if lpars is not specified
   type: dict
   contains:
     name:
@@ -480,6 +553,51 @@ lpar:
         "sysplex-name": null,
         "workload-manager-enabled": false
     }
+lpars:
+  description: The result for each item of the C(lpars) module parameter,
+    in the same order.
+  returned: success, if lpars is specified
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: "LPAR name"
+      type: str
+    changed:
+      description: "Indicates if the LPAR has been updated"
+      type: bool
+    properties:
+      description: "The specified properties of the LPAR and the status of
+        the LPAR, after any updates have been applied. The property names
+        have hyphens (-) as described in the data model of the 'Logical
+        Partition' object in the :term:`HMC API` book."
+      type: dict
+  sample:
+    [
+        {
+            "name": "PROD1",
+            "changed": true,
+            "properties": {
+                "initial-processing-weight": 60,
+                "maximum-processing-weight": 0,
+                "minimum-processing-weight": 0,
+                "name": "PROD1",
+                "status": "operating"
+            }
+        },
+        {
+            "name": "TEST1",
+            "changed": false,
+            "properties": {
+                "initial-processing-weight": 10,
+                "initial-processing-weight-capped": true,
+                "maximum-processing-weight": 0,
+                "minimum-processing-weight": 0,
+                "name": "TEST1",
+                "status": "operating"
+            }
+        }
+    ]
 """
 
 import logging  # noqa: E402
@@ -489,7 +607,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 from ..module_utils.common import log_init, Error, ParameterError, \
     StatusError, ensure_lpar_inactive, ensure_lpar_active, ensure_lpar_loaded, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, SelectedPropertiesPuller, parallel_map, \
+    missing_required_lib, common_fail_on_import_errors, \
+    retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -654,6 +774,16 @@ ZHMC_LPAR_PROPERTIES = {
     'request_origin': (False, False, False, None, None, None),
 }
 
+# Compiled form of ZHMC_LPAR_PROPERTIES
+ZHMC_LPAR_SCHEMA = PropertySchema(ZHMC_LPAR_PROPERTIES)
+
+# Infixes of the names of the processing weight properties of the processor
+# types, e.g. 'initial-ifl-processing-weight' for IFL processors.
+PROCESSING_WEIGHT_TYPES = ('', 'ifl-', 'aap-', 'ziip-', 'cbp-', 'cf-')
+
+# LPAR status values that allow updating the LPAR properties
+ACTIVE_STATUSES = ('not-operating', 'operating', 'acceptable')
+
 
 def process_properties(cpc, lpar, params):
     """
@@ -717,7 +847,7 @@ def process_properties(cpc, lpar, params):
         else:
             # Process a normal (= non-artificial) property
             _create_props, _update_props, _stop = process_normal_property(
-                prop_name, ZHMC_LPAR_PROPERTIES, input_props, lpar)
+                prop_name, ZHMC_LPAR_SCHEMA, input_props, lpar)
             create_props.update(_create_props)
             update_props.update(_update_props)
             if _stop:
@@ -775,8 +905,8 @@ def ensure_inactive(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -822,8 +952,8 @@ def perform_reset_clear(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -872,8 +1002,8 @@ def perform_reset_normal(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -919,8 +1049,8 @@ def ensure_active(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -981,8 +1111,8 @@ def ensure_loaded(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -1043,8 +1173,8 @@ def ensure_set(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        lpar = cpc.lpars.find(name=lpar_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         # The default exception handling is sufficient for the above.
 
         # If we got here, the LPAR exists.
@@ -1079,6 +1209,187 @@ def ensure_set(params, check_mode):
         session.logoff()
 
 
+def weight_properties(weight_type):
+    """
+    Return the names of the initial, minimum and maximum processing weight
+    properties of a processor type.
+    """
+    return tuple(
+        '{0}-{1}processing-weight'.format(kind, weight_type)
+        for kind in ('initial', 'minimum', 'maximum'))
+
+
+def check_processing_weights(lpar_name, lpar_properties, weight_types):
+    """
+    Check the processing weights of an LPAR for the specified processor types
+    for consistency, as the HMC would when updating them.
+
+    Parameters:
+
+      lpar_name (string): Name of the LPAR, for the error message.
+
+      lpar_properties (dict): Properties of the LPAR with the specified
+        updates applied. Properties that are not present are not checked.
+
+      weight_types (iterable): Processor types to be checked, as items of
+        PROCESSING_WEIGHT_TYPES.
+
+    Raises:
+      ParameterError: The processing weights are not consistent.
+    """
+    for weight_type in weight_types:
+        names = weight_properties(weight_type)
+        initial, minimum, maximum = \
+            [lpar_properties.get(name) for name in names]
+        if initial is not None and not 1 <= initial <= 999:
+            raise ParameterError(
+                "Property {0!r} of LPAR {1!r} must be in the range 1 to 999: "
+                "{2}".format(names[0], lpar_name, initial))
+        for name, value in zip(names[1:], (minimum, maximum)):
+            if value is not None and not 0 <= value <= 999:
+                raise ParameterError(
+                    "Property {0!r} of LPAR {1!r} must be in the range 0 to "
+                    "999: {2}".format(name, lpar_name, value))
+        # A minimum or maximum weight of 0 means that there is no limit.
+        ordered = []
+        if minimum:
+            ordered.append((names[1], minimum))
+        if initial is not None:
+            ordered.append((names[0], initial))
+        if maximum:
+            ordered.append((names[2], maximum))
+        for (name1, value1), (name2, value2) in zip(ordered, ordered[1:]):
+            if value1 > value2:
+                raise ParameterError(
+                    "Property {0!r} of LPAR {1!r} must not be greater than "
+                    "property {2!r}: {3} > {4}".
+                    format(name1, lpar_name, name2, value1, value2))
+
+
+def ensure_set_batch(params, check_mode):
+    """
+    Ensure that the properties of the LPARs specified in the 'lpars' module
+    parameter have been updated, without activating or deactivating the
+    LPARs.
+
+    The specified properties of all LPARs are retrieved and checked before
+    any LPAR is updated, and the LPARs are then updated in parallel.
+
+    Returns:
+      tuple of (changed, results), where results is the list of results for
+      the items of the 'lpars' module parameter.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      StatusError: An issue with the LPAR status.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    items = params['lpars']
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)
+
+    if params['state'] != 'set':
+        raise ParameterError(
+            "Module parameter 'lpars' is supported only for state=set, "
+            "but state={0} was specified.".format(params['state']))
+
+    names = set()
+    for index, item in enumerate(items):
+        if item['name'] in names:
+            raise ParameterError(
+                "Item {0} in module parameter 'lpars' specifies LPAR {1!r} "
+                "again.".format(index, item['name']))
+        names.add(item['name'])
+        for prop_name in item.get('properties') or {}:
+            if prop_name not in ZHMC_LPAR_SCHEMA:
+                raise ParameterError(
+                    "Property {0!r} in item {1} of module parameter 'lpars' "
+                    "is not defined in the data model for LPARs.".
+                    format(prop_name, index))
+            if not ZHMC_LPAR_SCHEMA[prop_name].allowed:
+                raise ParameterError(
+                    "Property {0!r} in item {1} of module parameter 'lpars' "
+                    "is not allowed.".format(prop_name, index))
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        # The default exception handling is sufficient for the above.
+
+        # The LPARs are listed with their name and status.
+        lpars = dict((lpar.name, lpar) for lpar in cpc.lpars.list())
+        missing = sorted(names - set(lpars))
+        if missing:
+            raise ParameterError(
+                "LPARs specified in module parameter 'lpars' do not exist in "
+                "CPC {0!r}: {1}".format(cpc.name, ', '.join(missing)))
+
+        puller = SelectedPropertiesPuller()
+
+        def pull_lpar(item):
+            lpar = lpars[item['name']]
+            prop_names = set(
+                ZHMC_LPAR_SCHEMA[name].hmc_name
+                for name in item.get('properties') or {})
+            weight_types = [
+                weight_type for weight_type in PROCESSING_WEIGHT_TYPES
+                if prop_names.intersection(weight_properties(weight_type))]
+            for weight_type in weight_types:
+                prop_names.update(weight_properties(weight_type))
+            puller.pull(lpar, sorted(prop_names))
+            lpar_properties = dict(
+                (name, lpar.properties.get(name))
+                for name in prop_names | set(['name', 'status']))
+            return lpar, lpar_properties, weight_types
+
+        pulled = parallel_map(pull_lpar, items, max_workers)
+
+        # Determine and check all updates before updating any LPAR.
+        updates = []
+        inactive = []
+        for item, (lpar, lpar_properties, weight_types) in \
+                zip(items, pulled):
+            update_props = process_properties(cpc, lpar, item)
+            lpar_properties.update(update_props)
+            check_processing_weights(
+                lpar.name, lpar_properties, weight_types)
+            if update_props and lpar_properties['status'] not in \
+                    ACTIVE_STATUSES:
+                inactive.append("{0} ({1})".format(
+                    lpar.name, lpar_properties['status']))
+            updates.append((lpar, update_props, lpar_properties))
+        if inactive:
+            raise StatusError(
+                "LPARs specified in module parameter 'lpars' are not active "
+                "and cannot be updated: {0}".format(', '.join(inactive)))
+
+        def update_lpar(update):
+            lpar, update_props, lpar_properties = update
+            if update_props and not check_mode:
+                LOGGER.debug("Updating LPAR %s with properties %r",
+                             lpar.name, update_props)
+                lpar.update_properties(update_props)
+            return {
+                'name': lpar.name,
+                'changed': bool(update_props),
+                'properties': lpar_properties,
+            }
+
+        results = parallel_map(update_lpar, updates, max_workers)
+
+    finally:
+        session.logoff()
+
+    changed = any(result['changed'] for result in results)
+    return changed, results
+
+
 def facts(params, check_mode):
     """
     Return LPAR facts.
@@ -1108,9 +1419,9 @@ def facts(params, check_mode):
     try:
         # The default exception handling is sufficient for this code
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
 
-        lpar = cpc.lpars.find(name=lpar_name)
+        lpar = find_by_name(cpc.lpars, lpar_name)
         lpar.pull_full_properties()
 
         result = dict(lpar.properties)
@@ -1125,7 +1436,7 @@ def facts(params, check_mode):
 def perform_task(params, check_mode):
     """
     Perform the task for this module, dependent on the 'state' module
-    parameter.
+    parameter, and on whether the 'lpars' module parameter is specified.
 
     If check_mode is True, check whether changes would occur, but don't
     actually perform any changes.
@@ -1135,6 +1446,16 @@ def perform_task(params, check_mode):
       StatusError: An issue with the LPAR status.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    if params.get('lpars') is not None:
+        if params.get('name') is not None:
+            raise ParameterError(
+                "Module parameter 'name' must not be specified together "
+                "with module parameter 'lpars'.")
+        return ensure_set_batch(params, check_mode)
+    if params.get('name') is None:
+        raise ParameterError(
+            "Module parameter 'name' is required unless module parameter "
+            "'lpars' is specified.")
     actions = {
         'inactive': ensure_inactive,
         'reset_clear': perform_reset_clear,
@@ -1164,7 +1485,7 @@ def main():
             ),
         ),
         cpc_name=dict(required=True, type='str'),
-        name=dict(required=True, type='str'),
+        name=dict(required=False, type='str', default=None),
         state=dict(
             required=True, type='str',
             choices=['inactive', 'reset_clear', 'reset_normal', 'active',
@@ -1176,7 +1497,17 @@ def main():
         os_ipl_token=dict(required=False, type='str', default=None),
         # Note: os_ipl_token is not a secret
         properties=dict(required=False, type='dict', default={}),
+        lpars=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                name=dict(required=True, type='str'),
+                properties=dict(required=False, type='dict', default=None),
+            ),
+        ),
+        max_workers=dict(required=False, type='int', default=8),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1197,7 +1528,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1220,7 +1552,10 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, lpar=result)
+    if module.params.get('lpars') is not None:
+        module.exit_json(changed=changed, lpars=result, **retry_result())
+    else:
+        module.exit_json(changed=changed, lpar=result, **retry_result())
 
 
 if __name__ == '__main__':
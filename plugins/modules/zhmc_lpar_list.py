@@ -95,6 +95,18 @@ options:
     type: str
     required: false
     default: null
+  output_file:
+    description:
+      - "Path name of a JSON Lines file to which the lpars are written as they
+         are listed, one JSON object per line. The lpars are then not returned
+         in the C(lpars) return value, so that large results do not need to be
+         kept in memory. Instead, the C(output) return value describes the
+         file. The file is written on the system the module runs on, and only
+         if its content changes. If null, the lpars are returned in the
+         C(lpars) return value."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -103,6 +115,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -140,9 +160,15 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 lpars:
   description: The list of permitted LPARs, with a subset of their properties.
-  returned: success
+  returned: success, if output_file is not specified
   type: list
   elements: dict
   contains:
@@ -180,6 +206,27 @@ lpars:
             "activation_mode": 'linux'
         }
     ]
+output:
+  description: Summary of the JSON Lines file with the lpars.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of lpars in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "lpars.jsonl",
+        "count": 2,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
 """
 
 import logging  # noqa: E402
@@ -188,7 +235,8 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, \
     get_hmc_auth, get_session, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    common_fail_on_import_errors, \
+    open_result_list, retry_result, find_by_name, HmcCapabilities  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -208,10 +256,54 @@ LOGGER_NAME = 'zhmc_lpar_list'
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def perform_list(params):
+def list_lpars(client, capabilities, cpc_name):
+    """
+    List the LPARs of a CPC or of all managed CPCs, using the "List Permitted
+    Logical Partitions" operation if the HMC supports it.
+
+    Returns:
+      list of zhmcclient.Lpar: The LPARs.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # The "List Permitted Logical Partitions" operation was added in HMC
+    # version 2.14.0. The operation depends only on the HMC version and not
+    # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
+    # a z13 CPC.
+    if not capabilities.has_list_permitted('lpars'):
+        # List the LPARs in the traditional way
+        if cpc_name:
+            LOGGER.debug("Listing LPARs of CPC %s", cpc_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            lpars = cpc.lpars.list()
+        else:
+            LOGGER.debug("Listing LPARs of all managed CPCs")
+            cpcs = client.cpcs.list()
+            lpars = []
+            for cpc in cpcs:
+                lpars.extend(cpc.lpars.list())
+    else:
+        # List the LPARs using the new operation
+        if cpc_name:
+            LOGGER.debug("Listing permitted LPARs of CPC %s", cpc_name)
+            filter_args = {'cpc-name': cpc_name}
+        else:
+            LOGGER.debug("Listing permitted LPARs of all managed CPCs")
+            filter_args = None
+        lpars = client.consoles.console.list_permitted_lpars(
+            filter_args=filter_args)
+    return lpars
+
+
+def perform_list(params, check_mode=False):
     """
     List the LPARs and return a subset of properties.
 
+    Returns:
+      ResultList or JsonLinesWriter: The result items, depending on the
+      'output_file' module parameter (see open_result_list()).
+
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
@@ -220,6 +312,7 @@ def perform_list(params):
     host = params['hmc_host']
     userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
     cpc_name = params.get('cpc_name', None)
+    output_file = params.get('output_file', None)
     _faked_session = params.get('_faked_session', None)  # No default specified
 
     session = get_session(
@@ -227,53 +320,38 @@ def perform_list(params):
     try:
         client = zhmcclient.Client(session)
 
-        # The "List Permitted Logical Partitions" operation was added in HMC
-        # version 2.14.0. The operation depends only on the HMC version and not
-        # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
-        # a z13 CPC.
-        hmc_version = client.query_api_version()['hmc-version']
-        hmc_version_info = [int(x) for x in hmc_version.split('.')]
-        if hmc_version_info < [2, 14, 0]:
-            # List the LPARs in the traditional way
-            if cpc_name:
-                LOGGER.debug("Listing LPARs of CPC %s", cpc_name)
-                cpc = client.cpcs.find(name=cpc_name)
-                lpars = cpc.lpars.list()
-            else:
-                LOGGER.debug("Listing LPARs of all managed CPCs")
-                cpcs = client.cpcs.list()
-                lpars = []
-                for cpc in cpcs:
-                    lpars.extend(cpc.lpars.list())
-        else:
-            # List the LPARs using the new operation
-            if cpc_name:
-                LOGGER.debug("Listing permitted LPARs of CPC %s", cpc_name)
-                filter_args = {'cpc-name': cpc_name}
-            else:
-                LOGGER.debug("Listing permitted LPARs of all managed CPCs")
-                filter_args = None
-            lpars = client.consoles.console.list_permitted_lpars(
-                filter_args=filter_args)
+        # The HMC capabilities are cached across module runs. If the HMC has
+        # been downgraded in the meantime, the listing is repeated with the
+        # capabilities retrieved again.
+        capabilities = HmcCapabilities.for_client(client)
+        try:
+            lpars = list_lpars(client, capabilities, cpc_name)
+        except zhmcclient.HTTPError as exc:
+            if not capabilities.refresh_on_error(exc):
+                raise
+            lpars = list_lpars(client, capabilities, cpc_name)
         # The default exception handling is sufficient for the above.
 
-        lpar_list = []
-        for lpar in lpars:
-            # se-version has been added to the result of List Permitted
-            # LPARs in HMC/SE 2.14.1. Before that, it triggers the
-            # retrieval of CPC properties.
-            parent_cpc = lpar.manager.cpc
-            se_version = parent_cpc.get_property('se-version')
-            lpar_properties = {
-                "name": lpar.name,
-                "cpc_name": parent_cpc.name,
-                "se_version": se_version,
-                "status": lpar.get_property('status'),
-                "has_unacceptable_status": lpar.get_property(
-                    'has-unacceptable-status'),
-                "activation_mode": lpar.get_property('activation-mode'),
-            }
-            lpar_list.append(lpar_properties)
+        with open_result_list(output_file, check_mode) as lpar_list:
+            for lpar in lpars:
+                # se-version has been added to the result of List Permitted
+                # LPARs in HMC/SE 2.14.1. Before that, it is taken from the
+                # HMC capabilities.
+                parent_cpc = lpar.manager.cpc
+                try:
+                    se_version = lpar.properties['se-version']
+                except KeyError:
+                    se_version = capabilities.cpc_se_version(parent_cpc)
+                lpar_properties = {
+                    "name": lpar.name,
+                    "cpc_name": parent_cpc.name,
+                    "se_version": se_version,
+                    "status": lpar.get_property('status'),
+                    "has_unacceptable_status": lpar.get_property(
+                        'has-unacceptable-status'),
+                    "activation_mode": lpar.get_property('activation-mode'),
+                }
+                lpar_list.append(lpar_properties)
 
         return lpar_list
 
@@ -298,7 +376,10 @@ def main():
             ),
         ),
         cpc_name=dict(required=False, type='str', default=None),
+        output_file=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -319,16 +400,16 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
     LOGGER.debug("Module entry: params: %r", _params)
 
-    changed = False
     try:
 
-        result_list = perform_list(module.params)
+        results = perform_list(module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -340,9 +421,14 @@ def main():
     # Other exceptions are considered module errors and are handled by Ansible
     # by showing the traceback.
 
+    changed = results.changed
+    result_list = results.result()
     LOGGER.debug("Module exit (success): changed: %s, result: %r",
                  changed, result_list)
-    module.exit_json(changed=changed, lpars=result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(changed=changed, lpars=result_list, **retry_result())
 
 
 if __name__ == '__main__':
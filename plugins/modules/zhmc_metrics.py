@@ -0,0 +1,692 @@
+#!/usr/bin/python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+# For information on the format of the ANSIBLE_METADATA, DOCUMENTATION,
+# EXAMPLES, and RETURN strings, see
+# http://docs.ansible.com/ansible/dev_guide/developing_modules_documenting.html
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community',
+    'shipped_by': 'other',
+    'other_repo_url': 'https://github.com/zhmcclient/zhmc-ansible-modules'
+}
+
+DOCUMENTATION = """
+---
+module: zhmc_metrics
+version_added: "2.9.0"
+short_description: Retrieve metrics of CPCs, partitions, LPARs and adapters
+description:
+  - Retrieve the values of metric groups (e.g. utilization) for the CPCs and
+    their partitions, LPARs, adapters and NICs.
+  - "All specified metric groups are retrieved for all resources with a
+    single metrics context on the HMC and a single 'Get Metrics' operation
+    per sample, instead of retrieving the metrics of each resource
+    separately. The metrics context is deleted when the module ends,
+    unless it is persisted for later module runs (see
+    C(context_cache_dir))."
+  - The metric values are returned with the Python type of their metric
+    type, together with the names of the resources and of their CPCs.
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - "The HMC userid must have object-access permissions to these objects:
+    The CPCs and the resources whose metrics are retrieved. Metrics are
+    returned only for resources the HMC userid has access to."
+options:
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - The authentication credentials for the HMC.
+    type: dict
+    required: true
+    suboptions:
+      userid:
+        description:
+          - The userid (username) for authenticating with the HMC.
+        type: str
+        required: true
+      password:
+        description:
+          - The password for authenticating with the HMC.
+        type: str
+        required: true
+      ca_certs:
+        description:
+          - Path name of certificate file or certificate directory to be used
+            for verifying the HMC certificate. If null (default), the path name
+            in the 'REQUESTS_CA_BUNDLE' environment variable or the path name
+            in the 'CURL_CA_BUNDLE' environment variable is used, or if neither
+            of these variables is set, the certificates in the Mozilla CA
+            Certificate List provided by the 'certifi' Python package are used
+            for verifying the HMC certificate.
+        type: str
+        required: false
+        default: null
+      verify:
+        description:
+          - If True (default), verify the HMC certificate as specified in the
+            C(ca_certs) parameter. If False, ignore what is specified in the
+            C(ca_certs) parameter and do not verify the HMC certificate.
+        type: bool
+        required: false
+        default: true
+  cpc_names:
+    description:
+      - The names of the CPCs whose metrics and whose resources' metrics are
+        returned. The CPCs must exist and must be managed by the HMC. If
+        null, the metrics for all managed CPCs are returned.
+    type: list
+    elements: str
+    required: false
+    default: null
+  metric_groups:
+    description:
+      - "The names of the metric groups to be retrieved, as defined in the
+         HMC WS API book, e.g. C(cpc-usage-overview), C(partition-usage),
+         C(logical-partition-usage), C(adapter-usage) or
+         C(channel-usage)."
+    type: list
+    elements: str
+    required: true
+  samples:
+    description:
+      - "Number of samples of the metric values to be retrieved. The
+         samples are retrieved every C(interval) seconds."
+    type: int
+    required: false
+    default: 1
+  interval:
+    description:
+      - "Interval in seconds between the samples. This is also the
+         anticipated frequency of the retrievals that is specified when
+         creating the metrics context, which determines how often the HMC
+         collects the metric values. Must be between 15 and 3600."
+    type: int
+    required: false
+    default: 15
+  context_cache_dir:
+    description:
+      - "Path name of a directory in which the metrics context is persisted
+         for reuse by later module runs, on the system the module runs on.
+         The metrics context is persisted for the HMC, the HMC userid and
+         the set of metric groups and interval, and is recreated only when
+         the HMC has deleted it. Because the HMC deletes a metrics context
+         when its HMC session ends, the ID of the HMC session is persisted
+         as well, and the HMC session is not logged off. The files in the
+         directory are readable only by their owner. If null, the metrics
+         context is created and deleted by each module run."
+    type: str
+    required: false
+    default: null
+  output_file:
+    description:
+      - "Path name of a file to which the metric values of all samples are
+         written as a time series, in the format specified in
+         C(output_format). The metric values are then not returned in the
+         C(metrics) return value. Instead, the C(output) return value
+         describes the file. The file is written on the system the module
+         runs on. If null, the metric values are returned in the C(metrics)
+         return value."
+    type: str
+    required: false
+    default: null
+  output_format:
+    description:
+      - "Format of the file specified in C(output_file):"
+      - "* C(jsonl): JSON Lines, one JSON object per line with the keys of
+         the items of the C(metrics) return value."
+      - "* C(csv): CSV with a header line, one line per item of the
+         C(metrics) return value. The columns are the keys of the items
+         except C(metrics), followed by one column for each metric of the
+         metric groups. Columns of metrics that are not in the metric group
+         of a line are empty."
+    type: str
+    required: false
+    default: jsonl
+    choices: ['jsonl', 'csv']
+  max_workers:
+    description:
+      - "Maximum number of HMC operations that are performed in parallel
+         for listing the resources of the CPCs, whose names are returned
+         with the metrics. 1 performs all HMC operations serially."
+    type: int
+    required: false
+    default: 8
+  log_file:
+    description:
+      - "File path of a log file to which the logic flow of this module as well
+         as interactions with the HMC are logged. If null, logging will be
+         propagated to the Python root logger."
+    type: str
+    required: false
+    default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
+  _faked_session:
+    description:
+      - "An internal parameter used for testing the module."
+    required: false
+    type: raw
+    default: null
+"""
+
+EXAMPLES = """
+---
+# Note: The following examples assume that some variables named 'my_*' are set.
+
+- name: Retrieve the utilization of all CPCs and their partitions and LPARs
+  zhmc_metrics:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    metric_groups:
+      - cpc-usage-overview
+      - partition-usage
+      - logical-partition-usage
+  register: metrics_result
+
+- name: Retrieve 4 samples of the adapter utilization of a CPC, once a minute
+  zhmc_metrics:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_names:
+      - "{{ my_cpc_name }}"
+    metric_groups:
+      - adapter-usage
+    samples: 4
+    interval: 60
+  register: metrics_result
+
+- name: Write the partition utilization to a CSV file, reusing the context
+  zhmc_metrics:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    metric_groups:
+      - partition-usage
+    samples: 20
+    interval: 15
+    context_cache_dir: "{{ my_cache_dir }}"
+    output_file: "partition-usage.csv"
+    output_format: csv
+"""
+
+RETURN = """
+changed:
+  description: Indicates if any change has been made by the module.
+    This will always be false, unless C(output_file) is specified and the
+    file content has changed.
+  returned: always
+  type: bool
+msg:
+  description: An error message that describes the failure.
+  returned: failure
+  type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
+metrics:
+  description: "The metric values, one item for each sample, metric group
+    and resource, in the order of the samples."
+  returned: success, if output_file is not specified
+  type: list
+  elements: dict
+  contains:
+    sample:
+      description: "Index of the sample, starting at 0"
+      type: int
+    metric_group:
+      description: "Name of the metric group"
+      type: str
+    resource_class:
+      description: "Class of the resource, e.g. 'cpc', 'partition',
+        'logical-partition', 'adapter' or 'nic'"
+      type: str
+    resource_uri:
+      description: "Canonical URI of the resource"
+      type: str
+    resource_name:
+      description: "Name of the resource, or null if the name is not known
+        (e.g. for NICs)"
+      type: str
+    cpc_name:
+      description: "Name of the CPC of the resource, or null if it is not
+        known"
+      type: str
+    timestamp:
+      description: "Point in time of the metric values, in ISO 8601 format"
+      type: str
+    metrics:
+      description: "The metric values, with the metric names as keys and
+        the values with the type of the metric (integer, float, boolean or
+        string)"
+      type: dict
+  sample:
+    [
+        {
+            "sample": 0,
+            "metric_group": "partition-usage",
+            "resource_class": "partition",
+            "resource_uri": "/api/partitions/d0b6b3a4-7de3-11e8-a3c1-fa163e2d9ed5",
+            "resource_name": "prod-db1",
+            "cpc_name": "CPC1",
+            "timestamp": "2023-05-11T14:02:30+00:00",
+            "metrics": {
+                "processor-usage": 12,
+                "network-usage": 3,
+                "storage-usage": 1,
+                "accelerator-usage": 0,
+                "crypto-usage": 0
+            }
+        }
+    ]
+output:
+  description: Summary of the file with the metric values.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of items (lines without header) in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "partition-usage.csv",
+        "count": 40,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
+"""
+
+import logging  # noqa: E402
+import time  # noqa: E402
+import traceback  # noqa: E402
+from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+
+from ..module_utils.common import log_init, Error, ParameterError, \
+    get_hmc_auth, get_session, missing_required_lib, \
+    common_fail_on_import_errors, open_result_list, retry_result, \
+    parallel_map, HmcCapabilities, MetricsContextCache  # noqa: E402
+
+try:
+    import requests.packages.urllib3
+    IMP_URLLIB3_ERR = None
+except ImportError:
+    IMP_URLLIB3_ERR = traceback.format_exc()
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Python logger name for this module
+LOGGER_NAME = 'zhmc_metrics'
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Default for the maximum number of HMC operations performed in parallel
+DEFAULT_MAX_WORKERS = 8
+
+# Resources of a CPC whose names are needed for the metrics of a resource
+# class, as tuples (dpm_enabled, name of the manager attribute of the CPC).
+# The metrics of NICs are related to the resources of their partitions.
+RESOURCE_MANAGERS = {
+    'partition': (True, 'partitions'),
+    'nic': (True, 'partitions'),
+    'adapter': (True, 'adapters'),
+    'logical-partition': (False, 'lpars'),
+}
+
+# Keys of the items in the result except 'metrics', which are also the first
+# columns of a CSV file
+METRICS_FIELDS = ('sample', 'metric_group', 'resource_class', 'resource_uri',
+                  'resource_name', 'cpc_name', 'timestamp')
+
+
+def select_cpcs(client, cpc_names):
+    """
+    Return the managed CPCs with the specified names, or all managed CPCs
+    if cpc_names is None, in the order of the names.
+
+    Raises:
+      ParameterError: CPCs do not exist.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    cpcs = dict((c.name, c) for c in client.cpcs.list())
+    if cpc_names is None:
+        return [cpcs[name] for name in sorted(cpcs)]
+    missing = [name for name in cpc_names if name not in cpcs]
+    if missing:
+        raise ParameterError(
+            "CPCs specified in module parameter 'cpc_names' do not exist: "
+            "{0}".format(', '.join(missing)))
+    return [cpcs[name] for name in cpc_names]
+
+
+def resource_names(client, cpcs, resource_classes, max_workers):
+    """
+    Return the names of the CPCs and of those of their resources that are
+    needed for the specified resource classes, as a dict of tuples
+    (resource name, CPC name) by resource URI.
+
+    The resources of the CPCs are listed in parallel.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    capabilities = HmcCapabilities.for_client(client)
+    managers = sorted(set(
+        RESOURCE_MANAGERS[rc] for rc in resource_classes
+        if rc in RESOURCE_MANAGERS))
+
+    def cpc_resource_names(cpc):
+        names = {cpc.uri: (cpc.name, cpc.name)}
+        if managers:
+            dpm_enabled = capabilities.cpc_dpm_enabled(cpc)
+        for dpm, attr in managers:
+            if dpm != dpm_enabled:
+                continue
+            for resource in getattr(cpc, attr).list():
+                names[resource.uri] = (resource.name, cpc.name)
+        return names
+
+    names = {}
+    for cpc_names in parallel_map(cpc_resource_names, cpcs, max_workers):
+        names.update(cpc_names)
+    return names
+
+
+def metrics_item(sample, group_name, resource_class, object_values, names):
+    """
+    Return the result item for the metric values of a resource.
+    """
+    uri = object_values.resource_uri
+    resource_name, cpc_name = names.get(uri, (None, None))
+    if resource_name is None and '/nics/' in uri:
+        # The name of a NIC is not known, but its CPC is that of its partition
+        cpc_name = names.get(uri.split('/nics/')[0], (None, None))[1]
+    return {
+        'sample': sample,
+        'metric_group': group_name,
+        'resource_class': resource_class,
+        'resource_uri': uri,
+        'resource_name': resource_name,
+        'cpc_name': cpc_name,
+        'timestamp': object_values.timestamp.isoformat(),
+        'metrics': dict(object_values.metrics),
+    }
+
+
+def create_metrics_context(client, metric_groups, interval):
+    """
+    Create a metrics context for the metric groups and return it.
+
+    Raises:
+      ParameterError: Metric groups are not supported by the HMC.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    mc = client.metrics_contexts.create({
+        'anticipated-frequency-seconds': interval,
+        'metric-groups': list(metric_groups),
+    })
+    missing = [name for name in metric_groups
+               if name not in mc.metric_group_definitions]
+    if missing:
+        mc.delete()
+        raise ParameterError(
+            "Metric groups specified in module parameter 'metric_groups' are "
+            "not supported by the HMC: {0}".format(', '.join(missing)))
+    return mc
+
+
+def metrics_fields(definitions):
+    """
+    Return the columns of a CSV file for the metric group definitions: The
+    keys of the result items except 'metrics', followed by the names of the
+    metrics in the order of their definitions.
+    """
+    fields = list(METRICS_FIELDS)
+    for definition in definitions.values():
+        for metric in sorted(definition.metric_definitions.values(),
+                             key=lambda m: m.index):
+            if metric.name not in fields:
+                fields.append(metric.name)
+    return fields
+
+
+def perform_metrics(params, check_mode=False):
+    """
+    Retrieve the metric values.
+
+    Returns:
+      ResultList, JsonLinesWriter or CsvWriter: The result items, depending
+      on the 'output_file' and 'output_format' module parameters (see
+      open_result_list()).
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_names = params.get('cpc_names', None)
+    metric_groups = params['metric_groups']
+    samples = params.get('samples', 1)
+    interval = params.get('interval', 15)
+    context_cache_dir = params.get('context_cache_dir', None)
+    output_file = params.get('output_file', None)
+    output_format = params.get('output_format', None) or 'jsonl'
+    max_workers = params.get('max_workers', None) or DEFAULT_MAX_WORKERS
+    _faked_session = params.get('_faked_session', None)  # No default specified
+
+    if samples < 1:
+        raise ParameterError(
+            "Module parameter 'samples' must be at least 1: {0}".
+            format(samples))
+    if not metric_groups:
+        raise ParameterError(
+            "Module parameter 'metric_groups' must specify at least one "
+            "metric group.")
+
+    if context_cache_dir:
+        cache = MetricsContextCache(context_cache_dir, host, userid)
+        session_id = cache.session_id
+    else:
+        cache = None
+        session_id = None
+    key = MetricsContextCache.key(metric_groups, interval)
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify,
+        session_id=session_id)
+    try:
+        client = zhmcclient.Client(session)
+        cpcs = select_cpcs(client, cpc_names)
+        cpc_name_set = set(cpc.name for cpc in cpcs)
+
+        properties = cache.get(key) if cache else None
+        if properties:
+            LOGGER.debug("Reusing metrics context %s",
+                         properties['metrics-context-uri'])
+            mc = zhmcclient.MetricsContext(
+                client.metrics_contexts, properties['metrics-context-uri'],
+                None, properties)
+        else:
+            mc = create_metrics_context(client, metric_groups, interval)
+        try:
+            definitions = mc.metric_group_definitions
+            names = resource_names(
+                client, cpcs,
+                set(d.resource_class for d in definitions.values()),
+                max_workers)
+
+            with open_result_list(output_file, check_mode, output_format,
+                                  metrics_fields(definitions)) as metrics:
+                start_time = time.time()
+                for sample in range(samples):
+                    if sample > 0:
+                        delay = start_time + sample * interval - time.time()
+                        if delay > 0:
+                            time.sleep(delay)
+                    try:
+                        raw_metrics = mc.get_metrics()
+                    except zhmcclient.HTTPError as exc:
+                        if exc.http_status != 404:
+                            raise
+                        # The metrics context has been deleted on the HMC,
+                        # e.g. because its HMC session has ended
+                        LOGGER.debug("Recreating deleted metrics context %s",
+                                     mc.uri)
+                        mc = create_metrics_context(
+                            client, metric_groups, interval)
+                        raw_metrics = mc.get_metrics()
+                    response = zhmcclient.MetricsResponse(mc, raw_metrics)
+                    for group_values in response.metric_group_values:
+                        resource_class = \
+                            definitions[group_values.name].resource_class
+                        for object_values in group_values.object_values:
+                            item = metrics_item(
+                                sample, group_values.name, resource_class,
+                                object_values, names)
+                            if cpc_names is not None and \
+                                    item['cpc_name'] not in cpc_name_set:
+                                continue
+                            if output_format == 'csv':
+                                item = dict(item, **item.pop('metrics'))
+                            metrics.append(item)
+        finally:
+            if cache:
+                cache.put(key, dict(mc.properties))
+            else:
+                mc.delete()
+
+        return metrics
+
+    finally:
+        if cache:
+            # The HMC session of persisted metrics contexts must not end
+            cache.write(session.session_id)
+        else:
+            session.logoff()
+
+
+def main():
+
+    # The following definition of module input parameters must match the
+    # description of the options in the DOCUMENTATION string.
+    argument_spec = dict(
+        hmc_host=dict(required=True, type='str'),
+        hmc_auth=dict(
+            required=True,
+            type='dict',
+            options=dict(
+                userid=dict(required=True, type='str'),
+                password=dict(required=True, type='str', no_log=True),
+                ca_certs=dict(required=False, type='str', default=None),
+                verify=dict(required=False, type='bool', default=True),
+            ),
+        ),
+        cpc_names=dict(required=False, type='list', elements='str',
+                       default=None),
+        metric_groups=dict(required=True, type='list', elements='str'),
+        samples=dict(required=False, type='int', default=1),
+        interval=dict(required=False, type='int', default=15),
+        context_cache_dir=dict(required=False, type='str', default=None),
+        output_file=dict(required=False, type='str', default=None),
+        output_format=dict(required=False, type='str', default='jsonl',
+                           choices=['jsonl', 'csv']),
+        max_workers=dict(required=False, type='int',
+                         default=DEFAULT_MAX_WORKERS),
+        log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
+        _faked_session=dict(required=False, type='raw'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True)
+
+    if IMP_URLLIB3_ERR is not None:
+        module.fail_json(msg=missing_required_lib("requests"),
+                         exception=IMP_URLLIB3_ERR)
+
+    requests.packages.urllib3.disable_warnings()
+
+    if IMP_ZHMCCLIENT_ERR is not None:
+        module.fail_json(msg=missing_required_lib("zhmcclient"),
+                         exception=IMP_ZHMCCLIENT_ERR)
+
+    common_fail_on_import_errors(module)
+
+    log_file = module.params['log_file']
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
+
+    _params = dict(module.params)
+    del _params['hmc_auth']
+    LOGGER.debug("Module entry: params: %r", _params)
+
+    try:
+
+        results = perform_metrics(module.params, module.check_mode)
+
+    except (Error, zhmcclient.Error) as exc:
+        # These exceptions are considered errors in the environment or in user
+        # input. They have a proper message that stands on its own, so we
+        # simply pass that message on and will not need a traceback.
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug("Module exit (failure): msg: %r", msg)
+        module.fail_json(msg=msg)
+    # Other exceptions are considered module errors and are handled by Ansible
+    # by showing the traceback.
+
+    changed = results.changed
+    result_list = results.result()
+    LOGGER.debug("Module exit (success): changed: %s, result: %r",
+                 changed, result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(changed=changed, metrics=result_list,
+                         **retry_result())
+
+
+if __name__ == '__main__':
+    main()
@@ -154,6 +154,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -201,6 +209,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 nic:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -246,9 +260,10 @@ import traceback  # noqa: E402
 from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
-    wait_for_transition_completion, eq_hex, eq_mac, get_hmc_auth, \
-    get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    wait_for_transition_completion, get_hmc_auth, get_session, \
+    to_unicode, process_normal_property, PropertySchema, \
+    ZHMC_NIC_PROPERTIES, missing_required_lib, \
+    common_fail_on_import_errors, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -268,71 +283,8 @@ LOGGER_NAME = 'zhmc_nic'
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
-# Dictionary of properties of NIC resources, in this format:
-#   name: (allowed, create, update, update_while_active, eq_func, type_cast)
-# where:
-#   name: Name of the property according to the data model, with hyphens
-#     replaced by underscores (this is how it is or would be specified in
-#     the 'properties' module parameter).
-#   allowed: Indicates whether it is allowed in the 'properties' module
-#     parameter.
-#   create: Indicates whether it can be specified for the "Create NIC"
-#     operation.
-#   update: Indicates whether it can be specified for the "Update NIC
-#     Properties" operation (at all).
-#   update_while_active: Indicates whether it can be specified for the "Update
-#     NIC Properties" operation while the partition of the NIC is active. None
-#     means "not applicable" (i.e. update=False).
-#   eq_func: Equality test function for two values of the property; None means
-#     to use Python equality.
-#   type_cast: Type cast function for an input value of the property; None
-#     means to use it directly. This can be used for example to convert
-#     integers provided as strings by Ansible back into integers (that is a
-#     current deficiency of Ansible).
-# Note: This should always represent the latest version of the HMC/SE.
-# Attempts to set a property that does not exist or that is not writeable in
-# the target HMC will be handled by the HMC rejecting the operation.
-ZHMC_NIC_PROPERTIES = {
-
-    # create+update properties:
-    'name': (
-        False, True, True, True, None, None),  # provided in 'name' module parm
-    'description': (True, True, True, True, None, to_unicode),
-    'device_number': (True, True, True, True, eq_hex, None),
-    'network_adapter_port_uri': (
-        False, True, True, True, None, None),  # via adapter_name/_port
-    'virtual_switch_uri': (
-        False, True, True, True, None, None),  # via adapter_name/_port
-    'adapter_name': (
-        True, True, True, True, None,
-        None),  # artificial property, type_cast ignored
-    'adapter_port': (
-        True, True, True, True, None,
-        None),  # artificial property, type_cast ignored
-    # The ssc-*, vlan-id and mac-address properties were introduced in
-    # API version 2.2 (an update of SE 2.13.1).
-    # The mac-address property was changed to be writeable in API version 2.20
-    # (SE 2.14.0).
-    'ssc_management_nic': (True, True, True, True, None, None),
-    'ssc_ip_address_type': (True, True, True, True, None, None),
-    'ssc_ip_address': (True, True, True, True, None, None),
-    'ssc_mask_prefix': (True, True, True, True, None, None),
-    'vlan_id': (True, True, True, True, None, int),
-    'mac_address': (True, True, True, None, eq_mac, None),
-    # The vlan-type property was introduced in API version 2.20 (SE 2.14.0).
-    'vlan_type': (True, True, True, True, None, None),
-    # The function-* properties were introduced in API version 3.4
-    # (SE 2.15 GA2).
-    'function_number': (True, True, True, True, None, int),
-    'function_range': (True, True, True, True, None, int),
-
-    # read-only properties:
-    'element-uri': (False, False, False, None, None, None),
-    'element-id': (False, False, False, None, None, None),
-    'parent': (False, False, False, None, None, None),
-    'class': (False, False, False, None, None, None),
-    'type': (False, False, False, None, None, None),
-}
+# Compiled form of ZHMC_NIC_PROPERTIES
+ZHMC_NIC_SCHEMA = PropertySchema(ZHMC_NIC_PROPERTIES)
 
 
 def process_properties(partition, nic, params):
@@ -412,7 +364,7 @@ def process_properties(partition, nic, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_NIC_PROPERTIES, input_props, nic)
+            prop_name, ZHMC_NIC_SCHEMA, input_props, nic)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -430,8 +382,8 @@ def process_properties(partition, nic, params):
         adapter_name = to_unicode(input_props[adapter_name_art_name])
         adapter_port_index = int(input_props[adapter_port_art_name])
         try:
-            adapter = partition.manager.cpc.adapters.find(
-                name=adapter_name)
+            adapter = find_by_name(
+                partition.manager.cpc.adapters, adapter_name)
         except zhmcclient.NotFound:
             raise ParameterError(
                 "Artificial property {0!r} does not specify the name of an "
@@ -521,11 +473,11 @@ def ensure_present(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
         except zhmcclient.NotFound:
             if check_mode:
                 # Once the partition is created, the NIC will also need to be
@@ -535,7 +487,7 @@ def ensure_present(params, check_mode):
             raise
 
         try:
-            nic = partition.nics.find(name=nic_name)
+            nic = find_by_name(partition.nics, nic_name)
             nic.pull_full_properties()
         except zhmcclient.NotFound:
             nic = None
@@ -617,12 +569,12 @@ def ensure_absent(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            nic = partition.nics.find(name=nic_name)
+            nic = find_by_name(partition.nics, nic_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -679,6 +631,8 @@ def main():
                    choices=['absent', 'present']),
         properties=dict(required=False, type='dict', default={}),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -699,7 +653,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -722,7 +677,7 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, nic=result)
+    module.exit_json(changed=changed, nic=result, **retry_result())
 
 
 if __name__ == '__main__':
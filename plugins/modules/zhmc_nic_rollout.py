@@ -0,0 +1,720 @@
+#!/usr/bin/python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+# For information on the format of the ANSIBLE_METADATA, DOCUMENTATION,
+# EXAMPLES, and RETURN strings, see
+# http://docs.ansible.com/ansible/dev_guide/developing_modules_documenting.html
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community',
+    'shipped_by': 'other',
+    'other_repo_url': 'https://github.com/zhmcclient/zhmc-ansible-modules'
+}
+
+DOCUMENTATION = """
+---
+module: zhmc_nic_rollout
+version_added: "2.9.0"
+short_description: Ensure NICs in many partitions (DPM mode)
+description:
+  - Ensure that NICs exist in many partitions of a CPC (in DPM mode) and
+    have the specified properties, in a single task.
+  - "This is equivalent to running the M(ibm.ibm_zhmc.zhmc_nic) module with
+    C(state=present) for each item of C(nics), but the network adapters,
+    ports and virtual switches backing the NICs are looked up only once,
+    the partitions are looked up with a single list operation, and the
+    partitions are processed in parallel, bounded by C(max_workers)."
+  - NICs that do not exist are created, and NICs whose properties differ
+    from the specified properties are updated. NICs of the partitions that
+    are not specified are not changed.
+  - "An HMC error while processing a partition does not stop the processing
+    of the other partitions. The module fails after all partitions have been
+    processed if there was an error for any partition, and the C(rollout)
+    return value then shows which partitions failed."
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - The targeted CPC must be in the Dynamic Partition Manager (DPM)
+    operational mode.
+  - "The HMC userid must have these task permissions:
+    'Partition Details'."
+  - "The HMC userid must have object-access permissions to these objects:
+    Target CPC, target partitions, network adapters backing the NICs."
+options:
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - The authentication credentials for the HMC.
+    type: dict
+    required: true
+    suboptions:
+      userid:
+        description:
+          - The userid (username) for authenticating with the HMC.
+        type: str
+        required: true
+      password:
+        description:
+          - The password for authenticating with the HMC.
+        type: str
+        required: true
+      ca_certs:
+        description:
+          - Path name of certificate file or certificate directory to be used
+            for verifying the HMC certificate. If null (default), the path name
+            in the 'REQUESTS_CA_BUNDLE' environment variable or the path name
+            in the 'CURL_CA_BUNDLE' environment variable is used, or if neither
+            of these variables is set, the certificates in the Mozilla CA
+            Certificate List provided by the 'certifi' Python package are used
+            for verifying the HMC certificate.
+        type: str
+        required: false
+        default: null
+      verify:
+        description:
+          - If True (default), verify the HMC certificate as specified in the
+            C(ca_certs) parameter. If False, ignore what is specified in the
+            C(ca_certs) parameter and do not verify the HMC certificate.
+        type: bool
+        required: false
+        default: true
+  cpc_name:
+    description:
+      - The name of the CPC with the partitions.
+    type: str
+    required: true
+  nics:
+    description:
+      - The NICs to be ensured, each in a target partition.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      partition_name:
+        description:
+          - The name of the partition containing the NIC. The partition
+            must exist.
+        type: str
+        required: true
+      name:
+        description:
+          - The name of the NIC.
+        type: str
+        required: true
+      adapter_name:
+        description:
+          - The name of the network adapter backing the NIC. Required for
+            creating a NIC. If null, the backing of an existing NIC is not
+            changed.
+        type: str
+        required: false
+        default: null
+      adapter_port:
+        description:
+          - The port index on the network adapter backing the NIC. Only
+            used if C(adapter_name) is specified.
+        type: int
+        required: false
+        default: 0
+      properties:
+        description:
+          - "Properties of the NIC, as in the C(properties) parameter of the
+            M(ibm.ibm_zhmc.zhmc_nic) module, except that the artificial
+            properties C(adapter_name) and C(adapter_port) are specified as
+            the suboptions of the same name."
+        type: dict
+        required: false
+        default: null
+  max_workers:
+    description:
+      - Maximum number of partitions that are processed in parallel.
+        1 processes the partitions serially.
+    type: int
+    required: false
+    default: 8
+  log_file:
+    description:
+      - "File path of a log file to which the logic flow of this module as well
+         as interactions with the HMC are logged. If null, logging will be
+         propagated to the Python root logger."
+    type: str
+    required: false
+    default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
+  _faked_session:
+    description:
+      - "An internal parameter used for testing the module."
+    required: false
+    type: raw
+    default: null
+"""
+
+EXAMPLES = """
+---
+# Note: The following examples assume that some variables named 'my_*' are set.
+
+- name: Define the data NIC in all application partitions
+  set_fact:
+    my_data_nics: "{{ my_data_nics | default([]) +
+      [my_data_nic | combine({'partition_name': item})] }}"
+  loop: "{{ my_app_partition_names }}"
+  vars:
+    my_data_nic:
+      name: "nic-data"
+      adapter_name: "OSD 0128 A13B-13"
+      adapter_port: 0
+      properties:
+        description: "Data network"
+        device_number: "0200"
+
+- name: Ensure the data NIC on the same OSA port in all application partitions
+  zhmc_nic_rollout:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    nics: "{{ my_data_nics }}"
+    max_workers: 16
+  register: rollout_result
+
+- name: Ensure NICs in two partitions
+  zhmc_nic_rollout:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    nics:
+      - partition_name: "prod-db1"
+        name: "nic-data"
+        adapter_name: "OSD 0128 A13B-13"
+        properties:
+          device_number: "0200"
+      - partition_name: "prod-db2"
+        name: "nic-data"
+        adapter_name: "OSD 0128 A13B-13"
+        properties:
+          device_number: "0200"
+  register: rollout_result
+"""
+
+RETURN = """
+changed:
+  description: Indicates if any change has been made by the module.
+  returned: always
+  type: bool
+msg:
+  description: An error message that describes the failure.
+  returned: failure
+  type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
+rollout:
+  description: The result of the rollout, by partition. In check mode, the
+    NICs that would be created or updated are reported.
+  returned: success, or failure after partitions have been processed
+  type: dict
+  contains:
+    cpc_name:
+      description: "Name of the CPC"
+      type: str
+    created:
+      description: "Number of NICs that were created"
+      type: int
+    updated:
+      description: "Number of NICs that were updated"
+      type: int
+    unchanged:
+      description: "Number of NICs that already had the specified
+        properties"
+      type: int
+    failed:
+      description: "Number of partitions for which an error occurred"
+      type: int
+    partitions:
+      description: "The result for each partition, with the partition names
+        as keys."
+      type: dict
+      contains:
+        nics:
+          description: "The result for each NIC that was processed, with the
+            NIC names as keys. Each value has item C(action) with one of
+            'created', 'updated', 'unchanged', and item C(properties) with
+            the HMC properties that were set (with hyphens in the property
+            names)."
+          type: dict
+        msg:
+          description: "The error message, if an error occurred for the
+            partition. The NICs after the failed NIC have not been
+            processed."
+          type: str
+  sample:
+    {
+        "cpc_name": "CPCA",
+        "created": 1,
+        "updated": 1,
+        "unchanged": 0,
+        "failed": 0,
+        "partitions": {
+            "prod-db1": {
+                "nics": {
+                    "nic-data": {
+                        "action": "created",
+                        "properties": {
+                            "name": "nic-data",
+                            "device-number": "0200",
+                            "virtual-switch-uri": "/api/virtual-switches/a1"
+                        }
+                    }
+                }
+            },
+            "prod-db2": {
+                "nics": {
+                    "nic-data": {
+                        "action": "updated",
+                        "properties": {
+                            "device-number": "0200"
+                        }
+                    }
+                }
+            }
+        }
+    }
+"""
+
+import logging  # noqa: E402
+import traceback  # noqa: E402
+from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+
+from ..module_utils.common import log_init, Error, ParameterError, \
+    wait_for_transition_completion, get_hmc_auth, get_session, \
+    to_unicode, process_normal_property, PropertySchema, \
+    ZHMC_NIC_PROPERTIES, NIC_ARTIFICIAL_PROPERTIES, missing_required_lib, \
+    common_fail_on_import_errors, parallel_map, SelectedPropertiesPuller, \
+    retry_result, find_by_name  # noqa: E402
+
+try:
+    import requests.packages.urllib3
+    IMP_URLLIB3_ERR = None
+except ImportError:
+    IMP_URLLIB3_ERR = traceback.format_exc()
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Python logger name for this module
+LOGGER_NAME = 'zhmc_nic_rollout'
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Property definitions of the NICs that can be specified in the 'properties'
+# suboption: The normal (= non-artificial) properties that are allowed in
+# ZHMC_NIC_PROPERTIES. The backing properties 'network-adapter-port-uri' and
+# 'virtual-switch-uri' are determined from the 'adapter_name' and
+# 'adapter_port' suboptions.
+ROLLOUT_NIC_PROPERTIES = dict(
+    (name, prop_def) for name, prop_def in ZHMC_NIC_PROPERTIES.items()
+    if prop_def[0] and name not in NIC_ARTIFICIAL_PROPERTIES)
+
+# Compiled form of ROLLOUT_NIC_PROPERTIES
+ROLLOUT_NIC_SCHEMA = PropertySchema(ROLLOUT_NIC_PROPERTIES)
+
+
+def validate_nics(nics):
+    """
+    Validate the 'nics' module parameter and return the items grouped by
+    partition, as a dict with the partition names as keys and the lists of
+    items as values, in the order of the module parameter.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    nics_by_partition = {}
+    for index, nic_spec in enumerate(nics):
+        partition_name = nic_spec['partition_name']
+        partition_nics = nics_by_partition.setdefault(partition_name, [])
+        if any(n['name'] == nic_spec['name'] for n in partition_nics):
+            raise ParameterError(
+                "Item {0} in module parameter 'nics' specifies NIC {1!r} in "
+                "partition {2!r} again.".
+                format(index, nic_spec['name'], partition_name))
+        for prop_name in nic_spec.get('properties') or {}:
+            if prop_name in NIC_ARTIFICIAL_PROPERTIES:
+                raise ParameterError(
+                    "Artificial property {0!r} must be specified as a "
+                    "suboption in item {1} of module parameter 'nics'.".
+                    format(prop_name, index))
+            if prop_name not in ROLLOUT_NIC_PROPERTIES:
+                raise ParameterError(
+                    "Property {0!r} in item {1} of module parameter 'nics' "
+                    "is not allowed or not defined in the data model for "
+                    "NICs.".format(prop_name, index))
+        partition_nics.append(nic_spec)
+    return nics_by_partition
+
+
+class NicBackingResolver(object):
+    """
+    Determines the HMC property and URI for the backing of NICs by the name
+    of a network adapter and a port index, retrieving each adapter and port
+    and the virtual switches of the CPC only once.
+    """
+
+    def __init__(self, cpc):
+        self.cpc = cpc
+        self._vswitches = None
+        self._backings = {}
+
+    def vswitch_uri(self, adapter, adapter_port):
+        """
+        Return the URI of the virtual switch for a port of an OSA or
+        HiperSockets adapter.
+        """
+        if self._vswitches is None:
+            self._vswitches = dict(
+                ((vs.properties['backing-adapter-uri'],
+                  vs.properties['port']), vs.uri)
+                for vs in self.cpc.virtual_switches.list(
+                    full_properties=True))
+        # Adapters of this family always have a vswitch for each port, and
+        # the existence of the port has already been checked.
+        return self._vswitches[(adapter.uri, adapter_port)]
+
+    def resolve(self, adapter_name, adapter_port):
+        """
+        Return the HMC property name and value for the backing of a NIC, as a
+        tuple (hmc_prop_name, uri).
+
+        Raises:
+          ParameterError: The adapter or port does not exist, or the adapter
+            is not a network adapter.
+          zhmcclient.Error: Any zhmcclient exception can happen.
+        """
+        key = (adapter_name, adapter_port)
+        backing = self._backings.get(key)
+        if backing is not None:
+            return backing
+
+        try:
+            adapter = find_by_name(self.cpc.adapters, adapter_name)
+        except zhmcclient.NotFound:
+            raise ParameterError(
+                "Suboption 'adapter_name' does not specify the name of an "
+                "existing adapter: {0!r}".format(adapter_name))
+        try:
+            port = adapter.ports.find(index=adapter_port)
+        except zhmcclient.NotFound:
+            raise ParameterError(
+                "Suboption 'adapter_port' does not specify the index of an "
+                "existing port on adapter {0!r}: {1!r}".
+                format(adapter_name, adapter_port))
+
+        adapter_family = adapter.get_property('adapter-family')
+        if adapter_family in ('roce', 'cna'):
+            backing = ('network-adapter-port-uri', port.uri)
+        elif adapter_family in ('osa', 'hipersockets'):
+            backing = ('virtual-switch-uri',
+                       self.vswitch_uri(adapter, adapter_port))
+        else:
+            raise ParameterError(
+                "Suboption 'adapter_name' specifies the name of a "
+                "non-network adapter of family {0!r}: {1!r}".
+                format(adapter_family, adapter_name))
+        self._backings[key] = backing
+        return backing
+
+
+def process_nic(partition, nic, nic_spec, backing, check_mode):
+    """
+    Ensure that a NIC of a partition exists, and return its result as a dict
+    with items 'action' and 'properties'.
+
+    A missing NIC is created. The properties of an existing NIC are not
+    updated, but the properties to be updated are returned in the result
+    with action 'updated', so that the caller can update all NICs of the
+    partition after waiting for a partition status transition only once.
+
+    Parameters:
+
+      partition (zhmcclient.Partition): Partition containing the NIC.
+
+      nic (zhmcclient.Nic): NIC with the full set of current properties, or
+        `None` if it does not exist.
+
+      nic_spec (dict): Item of the 'nics' module parameter.
+
+      backing (tuple): HMC property name and value for the backing of the
+        NIC, or `None` if the backing is not specified.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      StatusError: An issue with the partition status.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    create_props = {}
+    update_props = {}
+    input_props = nic_spec.get('properties') or {}
+    for prop_name in input_props:
+        _create_props, _update_props, _ = process_normal_property(
+            prop_name, ROLLOUT_NIC_SCHEMA, input_props, nic)
+        create_props.update(_create_props)
+        update_props.update(_update_props)
+    if backing is not None:
+        hmc_prop_name, uri = backing
+        create_props[hmc_prop_name] = uri
+        if nic and nic.properties.get(hmc_prop_name) != uri:
+            update_props[hmc_prop_name] = uri
+
+    if nic is None:
+        create_props['name'] = to_unicode(nic_spec['name'])
+        if not check_mode:
+            partition.nics.create(create_props)
+        return {'action': 'created', 'properties': create_props}
+
+    if update_props:
+        return {'action': 'updated', 'properties': update_props}
+
+    return {'action': 'unchanged', 'properties': {}}
+
+
+def rollout_nics(cpc, nics_by_partition, max_workers, check_mode):
+    """
+    Ensure the NICs in the partitions of a CPC and return the result for the
+    'rollout' return value.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    partitions = dict((p.name, p) for p in cpc.partitions.list())
+    missing = sorted(set(nics_by_partition) - set(partitions))
+    if missing:
+        raise ParameterError(
+            "Partitions specified in module parameter 'nics' do not exist "
+            "in CPC {0!r}: {1}".format(cpc.name, ', '.join(missing)))
+
+    # Resolve the backings before changing anything, so that errors in the
+    # adapter names or port indexes cannot leave a partial rollout.
+    resolver = NicBackingResolver(cpc)
+    backings = {}
+    for nic_specs in nics_by_partition.values():
+        for nic_spec in nic_specs:
+            if nic_spec.get('adapter_name') is not None:
+                key = (nic_spec['adapter_name'],
+                       nic_spec.get('adapter_port') or 0)
+                backings[key] = resolver.resolve(*key)
+    puller = SelectedPropertiesPuller()
+
+    def process_partition(partition_name):
+        partition = partitions[partition_name]
+        nic_results = {}
+        partition_result = {'nics': nic_results}
+        try:
+            nics = dict((nic.name, nic)
+                        for nic in partition.nics.list(full_properties=True))
+            updates = []
+            for nic_spec in nics_by_partition[partition_name]:
+                backing = None
+                if nic_spec.get('adapter_name') is not None:
+                    backing = backings[(nic_spec['adapter_name'],
+                                        nic_spec.get('adapter_port') or 0)]
+                nic = nics.get(nic_spec['name'])
+                nic_result = process_nic(
+                    partition, nic, nic_spec, backing, check_mode)
+                if nic_result['action'] == 'updated' and not check_mode:
+                    updates.append((nic, nic_result))
+                else:
+                    nic_results[nic_spec['name']] = nic_result
+            if updates:
+                # NIC properties can all be updated while the partition is
+                # active, therefore only a transition needs to complete. Only
+                # the current status of the partition is retrieved for that.
+                puller.pull(partition, ['status'], refresh=True)
+                wait_for_transition_completion(
+                    partition, pull_properties=False)
+                for nic, nic_result in updates:
+                    nic.update_properties(nic_result['properties'])
+                    nic_results[nic.name] = nic_result
+        except (Error, zhmcclient.Error) as exc:
+            partition_result['msg'] = "{0}: {1}".format(
+                exc.__class__.__name__, exc)
+            LOGGER.debug("Rollout failed for partition %r: %s",
+                         partition_name, partition_result['msg'])
+        return partition_name, partition_result
+
+    partition_results = dict(parallel_map(
+        process_partition, sorted(nics_by_partition), max_workers))
+
+    result = {
+        'cpc_name': cpc.name,
+        'created': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'failed': 0,
+        'partitions': partition_results,
+    }
+    for partition_result in partition_results.values():
+        if 'msg' in partition_result:
+            result['failed'] += 1
+        for nic_result in partition_result['nics'].values():
+            result[nic_result['action']] += 1
+    return result
+
+
+def perform_task(params, check_mode):
+    """
+    Ensure the NICs in the partitions.
+
+    Returns:
+      tuple of (changed, result), where result is the value for the 'rollout'
+      return value.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # No need to ensure 'cpc_name' and 'nics' are set, because they are
+    # required.
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)  # No default specified
+
+    nics_by_partition = validate_nics(params['nics'])
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        result = rollout_nics(cpc, nics_by_partition, max_workers, check_mode)
+        # The default exception handling is sufficient for the above.
+
+    finally:
+        session.logoff()
+
+    changed = bool(result['created'] or result['updated'])
+    return changed, result
+
+
+def main():
+
+    # The following definition of module input parameters must match the
+    # description of the options in the DOCUMENTATION string.
+    argument_spec = dict(
+        hmc_host=dict(required=True, type='str'),
+        hmc_auth=dict(
+            required=True,
+            type='dict',
+            options=dict(
+                userid=dict(required=True, type='str'),
+                password=dict(required=True, type='str', no_log=True),
+                ca_certs=dict(required=False, type='str', default=None),
+                verify=dict(required=False, type='bool', default=True),
+            ),
+        ),
+        cpc_name=dict(required=True, type='str'),
+        nics=dict(
+            required=True, type='list', elements='dict',
+            options=dict(
+                partition_name=dict(required=True, type='str'),
+                name=dict(required=True, type='str'),
+                adapter_name=dict(required=False, type='str', default=None),
+                adapter_port=dict(required=False, type='int', default=0),
+                properties=dict(required=False, type='dict', default=None),
+            ),
+        ),
+        max_workers=dict(required=False, type='int', default=8),
+        log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
+        _faked_session=dict(required=False, type='raw'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True)
+
+    if IMP_URLLIB3_ERR is not None:
+        module.fail_json(msg=missing_required_lib("requests"),
+                         exception=IMP_URLLIB3_ERR)
+
+    requests.packages.urllib3.disable_warnings()
+
+    if IMP_ZHMCCLIENT_ERR is not None:
+        module.fail_json(msg=missing_required_lib("zhmcclient"),
+                         exception=IMP_ZHMCCLIENT_ERR)
+
+    common_fail_on_import_errors(module)
+
+    log_file = module.params['log_file']
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
+
+    _params = dict(module.params)
+    del _params['hmc_auth']
+    LOGGER.debug("Module entry: params: %r", _params)
+
+    try:
+
+        changed, result = perform_task(module.params, module.check_mode)
+
+    except (Error, zhmcclient.Error) as exc:
+        # These exceptions are considered errors in the environment or in user
+        # input. They have a proper message that stands on its own, so we
+        # simply pass that message on and will not need a traceback.
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug(
+            "Module exit (failure): msg: %s", msg)
+        module.fail_json(msg=msg)
+    # Other exceptions are considered module errors and are handled by Ansible
+    # by showing the traceback.
+
+    if result['failed']:
+        msg = "NIC rollout failed for {0} of {1} partitions".format(
+            result['failed'], len(result['partitions']))
+        LOGGER.debug(
+            "Module exit (failure): msg: %s, rollout: %r", msg, result)
+        module.fail_json(msg=msg, changed=changed, rollout=result,
+                         **retry_result())
+
+    LOGGER.debug(
+        "Module exit (success): changed: %r, rollout: %r", changed, result)
+    module.exit_json(changed=changed, rollout=result, **retry_result())
+
+
+if __name__ == '__main__':
+    main()
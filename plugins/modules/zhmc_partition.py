@@ -38,7 +38,9 @@ description:
     NICs, virtual functions, and crypto configuration including crypto
     adapters.
   - Create, update, or delete a partition. The HBAs, NICs, and virtual
-   functions of the partition are managed by separate Ansible modules.
+   functions of the partition are managed by separate Ansible modules, or
+   as a whole with the partition, using the C(nics), C(hbas),
+   C(virtual_functions) and C(storage_groups) parameters.
   - Start or stop a partition.
 seealso:
   - module: zhmc_partition_list
@@ -54,7 +56,9 @@ requirements:
     operational mode.
   - "The HMC userid must have these task permissions:
     'New Partition', 'Delete Partition', 'Partition Details',
-    'Start Partition', 'Stop Partition', 'Dump Partition', 'PSW Restart'."
+    'Start Partition', 'Stop Partition', 'Dump Partition', 'PSW Restart'.
+    For the C(storage_groups) parameter, in addition: 'Configure Storage -
+    System Programmer'."
   - "The HMC userid must have object-access permissions to these objects:
     Target partitions, CPCs of target partitions, Crypto adapters of target
     partitions."
@@ -166,6 +170,122 @@ options:
     type: dict
     required: false
     default: null
+  nics:
+    description:
+      - "The desired NICs of the partition. If specified, the NICs of the
+         partition are reconciled with this list for C(state=stopped) and
+         C(state=active): NICs that are not in the list are deleted, NICs that
+         do not exist are created, and NICs with different properties are
+         updated. If null, the NICs of the partition are not changed."
+      - "The NICs are identified by their names. The NIC properties in
+         C(properties) are specified as for the zhmc_nic module, except that
+         the backing adapter port is specified in the C(adapter_name) and
+         C(adapter_port) items instead of the artificial properties."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      name:
+        description:
+          - The name of the NIC.
+        type: str
+        required: true
+      adapter_name:
+        description:
+          - The name of the network adapter backing the NIC.
+        type: str
+        required: true
+      adapter_port:
+        description:
+          - The port index of the adapter port backing the NIC.
+        type: int
+        required: false
+        default: 0
+      properties:
+        description:
+          - "Other properties of the NIC: C(description), C(device_number),
+             C(ssc_management_nic), C(ssc_ip_address_type),
+             C(ssc_ip_address), C(ssc_mask_prefix), C(vlan_id),
+             C(mac_address), C(vlan_type), C(function_number),
+             C(function_range)."
+        type: dict
+        required: false
+        default: {}
+  hbas:
+    description:
+      - "The desired HBAs of the partition, reconciled in the same way as
+         described for C(nics). Since the adapter port of an HBA cannot be
+         changed, an HBA whose adapter port differs is deleted and re-created.
+         If null, the HBAs of the partition are not changed."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      name:
+        description:
+          - The name of the HBA.
+        type: str
+        required: true
+      adapter_name:
+        description:
+          - The name of the FCP adapter backing the HBA.
+        type: str
+        required: true
+      adapter_port:
+        description:
+          - The port index of the adapter port backing the HBA.
+        type: int
+        required: false
+        default: 0
+      properties:
+        description:
+          - "Other properties of the HBA: C(description), C(device_number)."
+        type: dict
+        required: false
+        default: {}
+  virtual_functions:
+    description:
+      - "The desired virtual functions of the partition, reconciled in the
+         same way as described for C(nics). If null, the virtual functions of
+         the partition are not changed."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      name:
+        description:
+          - The name of the virtual function.
+        type: str
+        required: true
+      adapter_name:
+        description:
+          - The name of the accelerator adapter backing the virtual function.
+        type: str
+        required: true
+      properties:
+        description:
+          - "Other properties of the virtual function: C(description),
+             C(device_number)."
+        type: dict
+        required: false
+        default: {}
+  storage_groups:
+    description:
+      - "The names of the storage groups that should be attached to the
+         partition. If specified, the storage groups of the partition are
+         reconciled with this list for C(state=stopped) and C(state=active):
+         Storage groups that are not in the list are detached, and the others
+         are attached. If null, the storage group attachments of the partition
+         are not changed."
+      - "The crypto configuration of the partition is specified with the
+         C(crypto_configuration) property in C(properties)."
+    type: list
+    elements: str
+    required: false
+    default: null
   expand_storage_groups:
     description:
       - "Boolean that controls whether the returned partition contains
@@ -185,6 +305,18 @@ options:
     required: false
     type: bool
     default: false
+  check_mode_snapshot:
+    description:
+      - "Path name of a snapshot file written by the zhmc_snapshot module. If
+         specified and the module runs in check mode, the module does not
+         access the HMC, but runs against a faked HMC that is loaded from the
+         snapshot file. In that case, the changes are performed on the faked
+         HMC, so that the result reflects the actual behavior of the module
+         more closely. The snapshot file is not changed. Ignored if not in
+         check mode."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -193,6 +325,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -269,6 +409,32 @@ EXAMPLES = """
             access_mode: control
   register: part1
 
+- name: Ensure the partition exists with its NICs, HBAs and storage groups
+  zhmc_partition:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    name: "{{ my_partition_name }}"
+    state: active
+    properties:
+      ifl_processors: 2
+      initial_memory: 4096
+      maximum_memory: 4096
+    nics:
+      - name: nic1
+        adapter_name: "{{ my_osa_adapter_name }}"
+        adapter_port: 0
+        properties:
+          device_number: "1000"
+    hbas:
+      - name: hba1
+        adapter_name: "{{ my_fcp_adapter_name }}"
+        properties:
+          device_number: "2000"
+    storage_groups:
+      - "{{ my_storage_group_name }}"
+  register: part1
+
 - name: Gather facts about a partition
   zhmc_partition:
     hmc_host: "{{ my_hmc_host }}"
@@ -292,6 +458,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 partition:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -486,6 +658,39 @@ partition:
         "virtual-function-uris": [],
         "virtual-functions": []
     }
+update_plan:
+  description:
+    - "For C(state=active) and C(state=stopped), a summary of how the changes
+       to the partition were applied. For other states, an empty
+       dictionary."
+    - "All changes to an existing partition are applied in a single stop
+       window if some of the property updates require the partition to be
+       stopped, so that the partition is stopped and started at most once."
+  returned: success
+  type: dict
+  contains:
+    offline_properties:
+      description: "Names of the updated properties that required the
+        partition to be stopped."
+      type: list
+      elements: str
+    change_groups:
+      description: "Groups of changes that were applied: 'properties',
+        'crypto_configuration', 'nics', 'hbas', 'virtual_functions',
+        'storage_groups'."
+      type: list
+      elements: str
+    stopped:
+      description: "Indicates whether the partition was stopped by the module
+        in order to apply the changes (for C(state=active), it was started
+        again)."
+      type: bool
+  sample:
+    {
+        "offline_properties": ["maximum-memory"],
+        "change_groups": ["properties", "nics"],
+        "stopped": true
+    }
 """
 
 from collections import OrderedDict  # noqa: E402
@@ -493,15 +698,19 @@ import logging  # noqa: E402
 import traceback  # noqa: E402
 import uuid
 import random
-import types
 from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 from operator import itemgetter  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     StatusError, stop_partition, start_partition, \
-    wait_for_transition_completion, eq_hex, get_hmc_auth, get_session, \
-    to_unicode, process_normal_property, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    wait_for_transition_completion, eq_hex, get_hmc_auth, \
+    get_session, to_unicode, process_normal_property, \
+    PropertySchema, ZHMC_PARTITION_PROPERTIES, SPECIAL_DEFAULT, \
+    ZHMC_NIC_PROPERTIES, NIC_ARTIFICIAL_PROPERTIES, \
+    required_boot_ftp, required_boot_removable_media, \
+    required_boot_storage_adapter, missing_required_lib, \
+    common_fail_on_import_errors, snapshot_check_mode, \
+    retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -521,398 +730,9 @@ LOGGER_NAME = 'zhmc_partition'
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def required_boot_storage_adapter(partition_properties):
-    """
-    Indicates whether 'boot_storage_adapter' is a required input parameter.
-    """
-    boot_device = partition_properties.get('boot-device')
-    return boot_device == 'storage-adapter'
-
-
-def required_partition_id(partition_properties):
-    """
-    Indicates whether 'partition_id' is a required input parameter.
-    """
-    auto_generate = partition_properties.get('autogenerate-partition-id', True)
-    return not auto_generate
-
-
-def required_ifl_processors(partition_properties):
-    """
-    Indicates whether 'ifl_processors' is a required input parameter.
-    """
-    cp_processors = partition_properties.get('cp-processors', 0)
-    return cp_processors == 0
-
-
-def required_cp_processors(partition_properties):
-    """
-    Indicates whether 'cp_processors' is a required input parameter.
-    """
-    ifl_processors = partition_properties.get('ifl-processors', 0)
-    return ifl_processors == 0
-
-
-def required_boot_ftp(partition_properties):
-    """
-    Indicates whether 'boot_ftp_*' are required input parameters.
-    """
-    boot_device = partition_properties.get('boot-device')
-    return boot_device == 'ftp'
-
-
-def required_boot_removable_media(partition_properties):
-    """
-    Indicates whether 'boot_removable_media*' are required input parameters.
-    """
-    boot_device = partition_properties.get('boot-device')
-    return boot_device == 'removable-media'
-
-
-def required_type_ssc(partition_properties):
-    """
-    Indicates whether 'ssc_*' are required input parameters.
-    """
-    part_type = partition_properties.get('type', 'linux')
-    return part_type == 'ssc'
-
-
-# Marker in ZHMC_PARTITION_PROPERTIES.default to indicate special handling
-SPECIAL_DEFAULT = 'special_default'
-
-# Dictionary of properties of partition resources, in this format:
-#   name: (allowed, create, update, update_while_active, eq_func, type_cast)
-# where:
-#   name: Name of the property according to the data model, with hyphens
-#     replaced by underscores (this is how it is or would be specified in
-#     the 'properties' module parameter).
-#   allowed: Indicates whether it is allowed in the 'properties' module
-#     parameter.
-#   create: Indicates whether it can be specified for the "Create Partition"
-#     operation.
-#   update: Indicates whether it can be specified for the "Update Partition
-#     Properties" operation (at all).
-#   update_while_active: Indicates whether it can be specified for the "Update
-#     Partition Properties" operation while the partition is active. None means
-#     "not applicable" (i.e. update=False).
-#   eq_func: Equality test function for two values of the property; None means
-#     to use Python equality.
-#   type_cast: Type cast function for an input value of the property; None
-#     means to use it directly. This can be used for example to convert
-#     integers provided as strings by Ansible back into integers (that is a
-#     current deficiency of Ansible).
-#   create_required: Indicates whether the property is required in the HMC
-#     create operation. None for artificial properties. Can be a function that
-#     returns True or False, if it depends.
-#     depends whether the property is required.
-#   create_default: Default value for optional create properties. None for
-#     required and artificial properties. Can be a function that returns a
-#     default value, if it depends.
-ZHMC_PARTITION_PROPERTIES = {
-
-    # create-only properties:
-    'type': (
-        True, True, False, None, None, None,
-        False, 'linux'),
-
-    # update-only properties:
-    'boot_network_device': (
-        # Updated via boot_network_nic_name
-        False, False, True, True, None, None,
-        False, None),
-    'boot_network_nic_name': (
-        # Artificial property
-        True, False, True, True, None, to_unicode,
-        None, None),
-    'boot_storage_device': (
-        # Updated via boot_storage_hba_name
-        False, False, True, True, None, None,
-        False, None),
-    'boot_storage_hba_name': (
-        True, False, True, True, None, to_unicode,
-        None, None),  # artificial property
-    'boot_storage_volume': (
-        # Was added in API version 2.23 (HMC 2.14.0)
-        False, False, True, True, None, None,
-        False, None),  # via boot_storage_volume_name
-    'boot_storage_volume_name': (
-        # Artificial property
-        True, False, True, True, None, to_unicode,
-        None, None),
-    'crypto_configuration': (
-        # Contains artificial properties, type_cast ignored
-        True, False, False, None, None, None,
-        False, None),
-    'acceptable_status': (
-        # TODO: Default value
-        True, False, True, True, None, None,
-        False, []),
-    'processor_management_enabled': (
-        True, False, True, True, None, None,
-        False, False),
-    'ifl_absolute_processor_capping': (
-        True, False, True, True, None, None,
-        False, False),
-    'ifl_absolute_processor_capping_value': (
-        True, False, True, True, None, float,
-        False, 1.0),
-    'ifl_processing_weight_capped': (
-        True, False, True, True, None, None,
-        False, False),
-    'minimum_ifl_processing_weight': (
-        True, False, True, True, None, int,
-        False, 1),
-    'maximum_ifl_processing_weight': (
-        True, False, True, True, None, int,
-        False, 999),
-    'initial_ifl_processing_weight': (
-        True, False, True, True, None, int,
-        False, 100),
-    'cp_absolute_processor_capping': (
-        True, False, True, True, None, None,
-        False, False),
-    'cp_absolute_processor_capping_value': (
-        True, False, True, True, None, float,
-        False, 1.0),
-    'cp_processing_weight_capped': (
-        True, False, True, True, None, None,
-        False, False),
-    'minimum_cp_processing_weight': (
-        True, False, True, True, None, int,
-        False, 1),
-    'maximum_cp_processing_weight': (
-        True, False, True, True, None, int,
-        False, 999),
-    'initial_cp_processing_weight': (
-        True, False, True, True, None, int,
-        False, 100),
-    'boot_logical_unit_number': (
-        True, False, True, True, eq_hex, None,
-        required_boot_storage_adapter, ''),
-    'boot_world_wide_port_name': (
-        True, False, True, True, eq_hex, None,
-        required_boot_storage_adapter, ''),
-    'boot_load_parameters': (
-        # Was added in API version 2.23 (HMC 2.14.0)
-        True, False, True, True, None, to_unicode,
-        False, ''),
-    'boot_os_specific_parameters': (
-        True, False, True, True, None, to_unicode,
-        False, ''),
-    'boot_iso_ins_file': (
-        True, False, True, True, None, to_unicode,
-        False, None),
-    'ssc_boot_selection': (
-        True, False, True, True, None, None,
-        False, 'installer'),
-
-    # create+update properties:
-    'name': (
-        # Note: Provided in 'name' module parm
-        False, True, True, True, None, None,
-        True, None),
-    'description': (
-        True, True, True, True, None, to_unicode,
-        False, ''),
-    'short_name': (
-        True, True, True, False, None, None,
-        False, SPECIAL_DEFAULT),
-    'partition_id': (
-        True, True, True, False, None, None,
-        required_partition_id, SPECIAL_DEFAULT),
-    'autogenerate_partition_id': (
-        True, True, True, False, None, None,
-        False, True),
-    'ifl_processors': (
-        True, True, True, True, None, int,
-        required_ifl_processors, 0),
-    'cp_processors': (
-        True, True, True, True, None, int,
-        required_cp_processors, 0),
-    'processor_mode': (
-        True, True, True, False, None, None,
-        False, 'shared'),
-    'initial_memory': (
-        True, True, True, True, None, int,
-        True, None),
-    'maximum_memory': (
-        True, True, True, False, None, int,
-        True, None),
-    'reserve_resources': (
-        True, True, True, True, None, None,
-        False, False),
-    'boot_device': (
-        True, True, True, True, None, None,
-        False, 'none'),
-    'boot_timeout': (
-        True, True, True, True, None, int,
-        False, 60),
-    'boot_ftp_host': (
-        True, True, True, True, None, to_unicode,
-        required_boot_ftp, None),
-    'boot_ftp_username': (
-        True, True, True, True, None, to_unicode,
-        required_boot_ftp, None),
-    'boot_ftp_password': (
-        True, True, True, True, None, to_unicode,
-        required_boot_ftp, None),
-    'boot_ftp_insfile': (
-        True, True, True, True, None, to_unicode,
-        required_boot_ftp, None),
-    'boot_removable_media': (
-        True, True, True, True, None, to_unicode,
-        required_boot_removable_media, None),
-    'boot_removable_media_type': (
-        True, True, True, True, None, None,
-        required_boot_removable_media, None),
-    'boot_configuration_selector': (
-        True, True, True, True, None, int,
-        False, 0),
-    'boot_record_lba': (
-        True, True, True, True, None, None,
-        False, 0),
-    'access_global_performance_data': (
-        True, True, True, True, None, None,
-        False, False),
-    'permit_cross_partition_commands': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_basic_counter_set': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_problem_state_counter_set': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_crypto_activity_counter_set': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_extended_counter_set': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_coprocessor_group_set': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_basic_sampling': (
-        True, True, True, True, None, None,
-        False, False),
-    'access_diagnostic_sampling': (
-        True, True, True, True, None, None,
-        False, False),
-    'permit_des_key_import_functions': (
-        True, True, True, False, None, None,
-        False, True),
-    'permit_aes_key_import_functions': (
-        True, True, True, False, None, None,
-        False, True),
-    'permit_ecc_key_import_functions': (
-        # Was added in API version 3.2 (HMC 2.15.0)
-        True, True, True, True, None, None,
-        False, True),
-    'ssc_host_name': (
-        True, True, True, True, None, to_unicode,
-        required_type_ssc, SPECIAL_DEFAULT),
-    'ssc_ipv4_gateway': (
-        True, True, True, True, None, to_unicode,
-        False, None),
-    'ssc_ipv6_gateway': (
-        # Was added in HMC 2.14.0
-        True, True, True, True, None, to_unicode,
-        False, None),
-    'ssc_dns_servers': (
-        True, True, True, True, None, to_unicode,
-        False, []),
-    'ssc_master_userid': (
-        True, True, True, True, None, to_unicode,
-        required_type_ssc, SPECIAL_DEFAULT),
-    'ssc_master_pw': (
-        True, True, True, True, None, to_unicode,
-        required_type_ssc, SPECIAL_DEFAULT),
-    'secure_boot': (
-        # Added in SE/CPC 2.15.0
-        True, True, True, True, None, None,
-        False, False),
-
-    # read-only properties:
-    'object_uri': (
-        False, False, False, None, None, None,
-        False, SPECIAL_DEFAULT),
-    'object_id': (
-        False, False, False, None, None, None,
-        False, SPECIAL_DEFAULT),
-    'parent': (
-        False, False, False, None, None, None,
-        False, SPECIAL_DEFAULT),
-    'class': (
-        False, False, False, None, None, None,
-        False, 'partition'),
-    'status': (
-        False, False, False, None, None, None,
-        False, 'stopped'),
-    'has_unacceptable_status': (
-        False, False, False, None, None, None,
-        False, False),
-    'is_locked': (
-        False, False, False, None, None, None,
-        False, False),
-    'os_name': (
-        False, False, False, None, None, None,
-        False, ''),
-    'os_type': (
-        False, False, False, None, None, None,
-        False, ''),
-    'os_version': (
-        False, False, False, None, None, None,
-        False, ''),
-    'degraded_adapters': (
-        False, False, False, None, None, None,
-        False, []),
-    'current_ifl_processing_weight': (
-        False, False, False, None, None, None,
-        False, 100),
-    'current_cp_processing_weight': (
-        False, False, False, None, None, None,
-        False, 100),
-    'reserved_memory': (
-        False, False, False, None, None, None,
-        False, SPECIAL_DEFAULT),
-    'auto_start': (
-        False, False, False, None, None, None,
-        False, False),
-    'secure_execution': (
-        # Added in SE/CPC 2.15.0
-        False, False, False, None, None, None,
-        False, None),
-    'boot_iso_image_name': (
-        # Note: Property is updated via mount/unmount operations
-        False, False, False, None, None, None,
-        False, None),
-    'threads_per_processor': (
-        False, False, False, None, None, None,
-        False, SPECIAL_DEFAULT),
-    'virtual_function_uris': (
-        False, False, False, None, None, None,
-        False, []),
-    'nic_uris': (
-        False, False, False, None, None, None,
-        False, []),
-    'hba_uris': (
-        False, False, False, None, None, None,
-        False, []),
-    'storage_group_uris': (
-        False, False, False, None, None, None,
-        False, []),
-    'tape_link_uris': (
-        # Was added in API version 3.10 (HMC 2.15.0)
-        False, False, False, None, None, None,
-        False, []),
-    'partition_link_uris': (
-        # Was added in API version 4.1 (HMC 2.16.0)
-        False, False, False, None, None, None,
-        False, []),
-    'available_features_list': (
-        False, False, False, None, None, None,
-        False, []),
-}
+# Compiled form of ZHMC_PARTITION_PROPERTIES
+ZHMC_PARTITION_SCHEMA = PropertySchema(
+    ZHMC_PARTITION_PROPERTIES, special_default=SPECIAL_DEFAULT)
 
 
 def process_properties(cpc, partition, params):
@@ -1012,7 +832,7 @@ def process_properties(cpc, partition, params):
                 hba_name = type_cast(hba_name)
 
             try:
-                hba = partition.hbas.find(name=hba_name)
+                hba = find_by_name(partition.hbas, hba_name)
             except zhmcclient.NotFound:
                 raise ParameterError(
                     "Artificial property {0!r} does not name an existing HBA: "
@@ -1037,7 +857,7 @@ def process_properties(cpc, partition, params):
                 nic_name = type_cast(nic_name)
 
             try:
-                nic = partition.nics.find(name=nic_name)
+                nic = find_by_name(partition.nics, nic_name)
             except zhmcclient.NotFound:
                 raise ParameterError(
                     "Artificial property {0!r} does not name an existing NIC: "
@@ -1193,7 +1013,7 @@ def process_properties(cpc, partition, params):
                 if input_props[prop_name] == '':
                     input_props[prop_name] = None
             _create_props, _update_props, _stop = process_normal_property(
-                prop_name, ZHMC_PARTITION_PROPERTIES, input_props, partition)
+                prop_name, ZHMC_PARTITION_SCHEMA, input_props, partition)
             create_props.update(_create_props)
             update_props.update(_update_props)
             if _stop:
@@ -1296,6 +1116,368 @@ def change_crypto_config(partition, crypto_changes, check_mode):
     return changed
 
 
+# Properties of the child resources in the 'properties' item of the 'nics',
+# 'hbas' and 'virtual_functions' module parameters, by child kind.
+# Each dictionary item has:
+#   key (string): Name of the property (with underscores)
+#   value (tuple(eq_func, type_cast)): Flags for the property, with the same
+#     meaning as in ZHMC_PARTITION_PROPERTIES.
+# All of these properties can be specified for creating the child resource,
+# and for updating it while the partition is active. For NICs, these are the
+# normal (= non-artificial) properties that are allowed in ZHMC_NIC_PROPERTIES.
+ZHMC_CHILD_PROPERTIES = {
+    'nics': dict(
+        (name, prop_def[4:6])
+        for name, prop_def in ZHMC_NIC_PROPERTIES.items()
+        if prop_def[0] and name not in NIC_ARTIFICIAL_PROPERTIES),
+    'hbas': {
+        'description': (None, to_unicode),
+        'device_number': (eq_hex, None),
+    },
+    'virtual_functions': {
+        'description': (None, to_unicode),
+        'device_number': (eq_hex, None),
+    },
+}
+
+# Properties of the child resources that cannot be updated, by child kind.
+# If they differ, the child resource is deleted and re-created.
+ZHMC_CHILD_CREATE_ONLY_PROPERTIES = {
+    'nics': (),
+    'hbas': ('adapter-port-uri',),
+    'virtual_functions': (),
+}
+
+# Order in which the changes to the partition children are applied: Deletions
+# first, so that device numbers and adapter resources are freed up for the
+# creations, then updates, then creations.
+CHILD_ACTION_ORDER = ('delete', 'detach', 'update', 'create', 'attach')
+
+
+def child_adapter_props(kind, cpc, spec, adapters):
+    """
+    Return the properties of a child resource of a partition that reference
+    its backing adapter, as a dict of HMC property name and value.
+
+    Parameters:
+
+      kind (string): Kind of child resource ('nics', 'hbas',
+        'virtual_functions').
+
+      cpc (zhmcclient.Cpc): CPC of the partition.
+
+      spec (dict): Desired child resource, from the module parameter.
+
+      adapters (dict): Cache of the Adapter objects of the CPC by name,
+        for all children of the partition.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    adapter_name = to_unicode(spec['adapter_name'])
+    adapter = adapters.get(adapter_name)
+    if adapter is None:
+        try:
+            adapter = find_by_name(cpc.adapters, adapter_name)
+        except zhmcclient.NotFound:
+            raise ParameterError(
+                "Item 'adapter_name' in module parameter {0!r} does not "
+                "specify the name of an existing adapter: {1!r}".
+                format(kind, adapter_name))
+        adapters[adapter_name] = adapter
+
+    if kind == 'virtual_functions':
+        return {'adapter-uri': adapter.uri}
+
+    port_index = int(spec.get('adapter_port') or 0)
+    try:
+        port = adapter.ports.find(index=port_index)
+    except zhmcclient.NotFound:
+        raise ParameterError(
+            "Item 'adapter_port' in module parameter {0!r} does not specify "
+            "the index of an existing port on adapter {1!r}: {2!r}".
+            format(kind, adapter_name, port_index))
+
+    if kind == 'hbas':
+        return {'adapter-port-uri': port.uri}
+
+    adapter_family = adapter.get_property('adapter-family')
+    if adapter_family in ('roce', 'cna'):
+        return {'network-adapter-port-uri': port.uri}
+    if adapter_family in ('osa', 'hipersockets'):
+        vswitches = cpc.virtual_switches.findall(
+            **{'backing-adapter-uri': adapter.uri})
+        for vswitch in vswitches:
+            if vswitch.get_property('port') == port_index:
+                return {'virtual-switch-uri': vswitch.uri}
+        # Adapters of this family always have a vswitch for each port
+        raise AssertionError()
+    raise ParameterError(
+        "Item 'adapter_name' in module parameter 'nics' specifies the name of "
+        "a non-network adapter of family {0!r}: {1!r}".
+        format(adapter_family, adapter_name))
+
+
+def child_input_props(kind, cpc, spec, adapters):
+    """
+    Return the desired properties of a child resource of a partition, as a
+    dict of HMC property name and value, suitable for creating it.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    prop_defs = ZHMC_CHILD_PROPERTIES[kind]
+    props = {'name': to_unicode(spec['name'])}
+    for prop_name, value in (spec.get('properties') or {}).items():
+        if prop_name not in prop_defs:
+            raise ParameterError(
+                "Property {0!r} is not allowed in the 'properties' item of "
+                "module parameter {1!r}.".format(prop_name, kind))
+        _, type_cast = prop_defs[prop_name]
+        if type_cast and value is not None:
+            value = type_cast(value)
+        props[prop_name.replace('_', '-')] = value
+    props.update(child_adapter_props(kind, cpc, spec, adapters))
+    return props
+
+
+def child_update_props(kind, child, input_props):
+    """
+    Return the properties of an existing child resource of a partition that
+    need to be updated, as a dict of HMC property name and value, or `None`
+    if the child resource needs to be re-created.
+    """
+    prop_defs = ZHMC_CHILD_PROPERTIES[kind]
+    update_props = {}
+    for hmc_prop_name, value in input_props.items():
+        current_value = child.properties.get(hmc_prop_name)
+        prop_name = hmc_prop_name.replace('-', '_')
+        eq_func = prop_defs.get(prop_name, (None, None))[0]
+        if eq_func:
+            equal = eq_func(current_value, value, prop_name)
+        else:
+            equal = current_value == value
+        if equal:
+            continue
+        if hmc_prop_name in ZHMC_CHILD_CREATE_ONLY_PROPERTIES[kind]:
+            return None
+        update_props[hmc_prop_name] = value
+    return update_props
+
+
+def process_children(cpc, partition, params):
+    """
+    Process the 'nics', 'hbas', 'virtual_functions' and 'storage_groups'
+    module parameters, compare them with the current child resources and
+    storage group attachments of the partition, and return the minimal list
+    of changes to reconcile the partition with them.
+
+    Module parameters that are null are not processed. The current child
+    resources are retrieved once, with their full properties.
+
+    Parameters:
+
+      cpc (zhmcclient.Cpc): CPC of the partition.
+
+      partition (zhmcclient.Partition): The partition. It may be a local
+        Partition object in check mode, which has no child resources.
+
+      params (dict): Module input parameters.
+
+    Returns:
+      list of tuple(action, kind, target, props), sorted in the order in which
+      the changes need to be applied (see CHILD_ACTION_ORDER), where:
+        * action (string): 'delete', 'update', 'create', 'detach', 'attach'.
+        * kind (string): 'nics', 'hbas', 'virtual_functions',
+          'storage_groups'.
+        * target: The child resource object for 'delete' and 'update', the
+          child manager for 'create', and the StorageGroup object for 'detach'
+          and 'attach'.
+        * props (dict): The properties for 'update' and 'create', else `None`.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    changes = []
+    adapters = {}
+
+    for kind in ('nics', 'hbas', 'virtual_functions'):
+        specs = params.get(kind)
+        if specs is None:
+            continue
+        manager = getattr(partition, kind)
+        current = dict((child.name, child)
+                       for child in manager.list(full_properties=True))
+        for spec in specs:
+            input_props = child_input_props(kind, cpc, spec, adapters)
+            child = current.pop(input_props['name'], None)
+            if child is None:
+                changes.append(('create', kind, manager, input_props))
+                continue
+            update_props = child_update_props(kind, child, input_props)
+            if update_props is None:
+                changes.append(('delete', kind, child, None))
+                changes.append(('create', kind, manager, input_props))
+            elif update_props:
+                changes.append(('update', kind, child, update_props))
+        for child in current.values():
+            changes.append(('delete', kind, child, None))
+
+    sg_names = params.get('storage_groups')
+    if sg_names is not None:
+        console = cpc.manager.client.consoles.console
+        current_uris = partition.get_property('storage-group-uris') or []
+        desired_uris = []
+        for sg_name in sg_names:
+            try:
+                storage_group = find_by_name(console.storage_groups, sg_name)
+            except zhmcclient.NotFound:
+                raise ParameterError(
+                    "Module parameter 'storage_groups' specifies a storage "
+                    "group that does not exist: {0!r}".format(sg_name))
+            desired_uris.append(storage_group.uri)
+            if storage_group.uri not in current_uris:
+                changes.append(
+                    ('attach', 'storage_groups', storage_group, None))
+        for sg_uri in current_uris:
+            if sg_uri not in desired_uris:
+                storage_group = console.storage_groups.resource_object(sg_uri)
+                changes.append(
+                    ('detach', 'storage_groups', storage_group, None))
+
+    changes.sort(key=lambda change: CHILD_ACTION_ORDER.index(change[0]))
+    return changes
+
+
+def change_children(partition, changes, check_mode):
+    """
+    Apply the changes to the child resources and storage group attachments
+    of the partition, as returned by process_children().
+
+    Returns whether the partition has or would have changed.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    for action, kind, target, props in changes:
+        name = props['name'] if action == 'create' else target.name
+        LOGGER.debug("%s %s %r of partition %r",
+                     action.capitalize(), kind, name, partition.name)
+        if check_mode:
+            continue
+        if action == 'delete':
+            target.delete()
+        elif action == 'update':
+            target.update_properties(props)
+        elif action == 'create':
+            target.create(props)
+        elif action == 'detach':
+            partition.detach_storage_group(target)
+        elif action == 'attach':
+            partition.attach_storage_group(target)
+    return bool(changes)
+
+
+def offline_properties(update_props):
+    """
+    Return the sorted names of the properties to be updated that can be
+    updated only while the partition is stopped.
+    """
+    names = []
+    for hmc_prop_name in update_props:
+        prop_def = ZHMC_PARTITION_PROPERTIES.get(
+            hmc_prop_name.replace('-', '_'))
+        if prop_def and prop_def[2] and prop_def[3] is False:
+            names.append(hmc_prop_name)
+    return sorted(names)
+
+
+def update_change_groups(props_changed, crypto_changes, child_changes):
+    """
+    Return the list of groups of changes that are applied to the partition.
+    """
+    change_groups = []
+    if props_changed:
+        change_groups.append('properties')
+    if crypto_changes and any(crypto_changes):
+        change_groups.append('crypto_configuration')
+    for kind in ('nics', 'hbas', 'virtual_functions', 'storage_groups'):
+        if any(change[1] == kind for change in child_changes):
+            change_groups.append(kind)
+    return change_groups
+
+
+def apply_updates(partition, update_props, stop, crypto_changes,
+                  child_changes, check_mode):
+    """
+    Apply all pending changes to an existing partition: The property updates,
+    the crypto configuration changes, and the changes to the child resources
+    and storage group attachments.
+
+    If some of the property updates require the partition to be stopped, the
+    partition is stopped once, and all changes are applied in that single stop
+    window, so that the partition goes through at most one stop and start
+    cycle. Otherwise, the changes are applied in the current status of the
+    partition, after waiting for any status transition to complete.
+
+    Returns:
+      tuple of (changed, update_plan), where:
+        * changed (bool): Indicates whether the partition has or would have
+          changed.
+        * update_plan (dict): Summary of the update plan for the
+          'update_plan' return value.
+
+    Raises:
+      StatusError: An issue with the partition status.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    change_groups = update_change_groups(
+        bool(update_props), crypto_changes, child_changes)
+
+    changed = False
+    stopped = False
+    if update_props and stop:
+        stopped = stop_partition(partition, check_mode)
+        changed |= stopped
+    elif change_groups and not check_mode:
+        wait_for_transition_completion(partition)
+
+    if update_props:
+        if not check_mode:
+            partition.update_properties(update_props)
+            # Properties are refreshed by the caller
+        else:
+            # Update the local object's properties
+            partition.update_properties_local(update_props)
+        changed = True
+    if crypto_changes:
+        changed |= change_crypto_config(partition, crypto_changes,
+                                        check_mode)
+    changed |= change_children(partition, child_changes, check_mode)
+
+    update_plan = {
+        'offline_properties': offline_properties(update_props) if stop else [],
+        'change_groups': change_groups,
+        'stopped': stopped,
+    }
+    if stopped:
+        LOGGER.debug("Applied %d groups of changes to partition %r in one "
+                     "stop window", len(change_groups), partition.name)
+    return changed, update_plan
+
+
+def new_update_plan(crypto_changes, child_changes):
+    """
+    Return the summary of the update plan for a newly created partition.
+    """
+    return {
+        'offline_properties': [],
+        'change_groups': update_change_groups(
+            True, crypto_changes, child_changes),
+        'stopped': False,
+    }
+
+
 def add_artificial_properties(
         partition_properties, partition, expand_storage_groups,
         expand_crypto_adapters):
@@ -1346,6 +1528,25 @@ def add_artificial_properties(
     console = cpc.manager.console
     session = cpc.manager.client.session
 
+    # Virtual switches and adapters backing the NICs, by URI. NICs often share
+    # the same backing adapter, so each of them is retrieved only once.
+    vswitches = {}
+    adapters = {}
+
+    def get_vswitch(vswitch_uri):
+        if vswitch_uri not in vswitches:
+            vswitch = cpc.virtual_switches.resource_object(vswitch_uri)
+            vswitch.pull_full_properties()
+            vswitches[vswitch_uri] = vswitch
+        return vswitches[vswitch_uri]
+
+    def get_adapter(adapter_uri):
+        if adapter_uri not in adapters:
+            adapter = cpc.adapters.resource_object(adapter_uri)
+            adapter.pull_full_properties()
+            adapters[adapter_uri] = adapter
+        return adapters[adapter_uri]
+
     # Get the HBA child elements of the partition
     hbas_prop = []
     if partition.hbas is not None:
@@ -1362,10 +1563,10 @@ def add_artificial_properties(
         vswitch_uri = nic.prop("virtual-switch-uri", None)
         if vswitch_uri:
             # OSA, Hipersockets
-            vswitch = cpc.virtual_switches.find(**{'object-uri': vswitch_uri})
+            vswitch = get_vswitch(vswitch_uri)
             adapter_uri = vswitch.get_property('backing-adapter-uri')
             adapter_port = vswitch.get_property('port')
-            adapter = cpc.adapters.find(**{'object-uri': adapter_uri})
+            adapter = get_adapter(adapter_uri)
             nic_props['adapter-name'] = adapter.name
             nic_props['adapter-port'] = adapter_port
             nic_props['adapter-id'] = adapter.get_property('adapter-id')
@@ -1374,7 +1575,7 @@ def add_artificial_properties(
             port_uri = nic.prop("network-adapter-port-uri", None)
             port_props = session.get(port_uri)
             adapter_uri = port_props['parent']
-            adapter = cpc.adapters.find(**{'object-uri': adapter_uri})
+            adapter = get_adapter(adapter_uri)
             nic_props['adapter-name'] = adapter.name
             nic_props['adapter-port'] = port_props['index']
             nic_props['adapter-id'] = adapter.get_property('adapter-id')
@@ -1480,18 +1681,12 @@ def create_check_mode_partition(cpc, create_props, update_props):
     missing_props = []
 
     # Handle direct requiredness, direct defaults specified in prop defs
-    for prop_name in ZHMC_PARTITION_PROPERTIES:
-        prop_hmc_name = prop_name.replace('_', '-')
-        prop_defs = ZHMC_PARTITION_PROPERTIES[prop_name]
-        required = prop_defs[6]
-        default = prop_defs[7]
-
-        if not isinstance(required, types.FunctionType) and required and \
-                prop_hmc_name not in input_props:
+    for prop_name in ZHMC_PARTITION_SCHEMA.required_names:
+        if ZHMC_PARTITION_SCHEMA[prop_name].hmc_name not in input_props:
             missing_props.append(prop_name)
 
-        if default != SPECIAL_DEFAULT:
-            input_props.setdefault(prop_hmc_name, default)
+    for prop_hmc_name, default in ZHMC_PARTITION_SCHEMA.defaults:
+        input_props.setdefault(prop_hmc_name, default)
 
     if missing_props:
         raise ParameterError(
@@ -1522,15 +1717,9 @@ def create_check_mode_partition(cpc, create_props, update_props):
         '{0}{1:04X}'.format(name, random.randint(0, 16 ^ 4))
 
     # Handle function-based requiredness specified in prop defs
-    for prop_name in ZHMC_PARTITION_PROPERTIES:
-        prop_hmc_name = prop_name.replace('_', '-')
-        prop_defs = ZHMC_PARTITION_PROPERTIES[prop_name]
-        required = prop_defs[6]
-
-        if isinstance(required, types.FunctionType):
-            required_ = required(input_props)
-            if required_ and prop_hmc_name not in input_props:
-                missing_props.append(prop_name)
+    for prop_def, required in ZHMC_PARTITION_SCHEMA.required_funcs:
+        if required(input_props) and prop_def.hmc_name not in input_props:
+            missing_props.append(prop_def.name)
 
     if required_boot_ftp(input_props):
         if input_props['boot-ftp-host'] is None:
@@ -1585,16 +1774,17 @@ def ensure_active(params, check_mode):
 
     changed = False
     result = {}
+    update_plan = {}
 
     session = get_session(
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
             partition.pull_full_properties()
         except zhmcclient.NotFound:
             partition = None
@@ -1620,29 +1810,23 @@ def ensure_active(params, check_mode):
                 partition = create_check_mode_partition(
                     cpc, create_props, update2_props)
             changed = True
+            # The children are created before the partition is started
+            child_changes = process_children(cpc, partition, params)
+            change_children(partition, child_changes, check_mode)
+            update_plan = new_update_plan(crypto_changes, child_changes)
         else:
-            # It exists. Stop if needed due to property update requirements,
-            # or wait for an updateable partition status, and update its
-            # properties.
+            # It exists. Apply all changes, in a single stop window if some
+            # property updates require the partition to be stopped. The
+            # partition is started further down.
             create_props, update_props, stop, crypto_changes = \
                 process_properties(cpc, partition, params)
             # Note: create_props in this case only contains 'name' and can be
             # ignored.
-            if update_props:
-                if not check_mode:
-                    if stop:
-                        stop_partition(partition, check_mode)
-                    else:
-                        wait_for_transition_completion(partition)
-                    partition.update_properties(update_props)
-                    # Properties are refreshed further down
-                else:
-                    # Update the local object's properties
-                    partition.update_properties_local(update_props)
-                changed = True
-            if crypto_changes:
-                changed |= change_crypto_config(partition, crypto_changes,
-                                                check_mode)
+            child_changes = process_children(cpc, partition, params)
+            _changed, update_plan = apply_updates(
+                partition, update_props, stop, crypto_changes, child_changes,
+                check_mode)
+            changed |= _changed
 
         if not partition:
             raise AssertionError()
@@ -1666,7 +1850,7 @@ def ensure_active(params, check_mode):
         add_artificial_properties(
             result, partition, expand_storage_groups, expand_crypto_adapters)
 
-        return changed, result
+        return changed, result, update_plan
 
     finally:
         session.logoff()
@@ -1693,16 +1877,17 @@ def ensure_stopped(params, check_mode):
 
     changed = False
     result = {}
+    update_plan = {}
 
     session = get_session(
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
             partition.pull_full_properties()
         except zhmcclient.NotFound:
             partition = None
@@ -1728,24 +1913,22 @@ def ensure_stopped(params, check_mode):
             changed = True
             if crypto_changes:
                 change_crypto_config(partition, crypto_changes, check_mode)
+            child_changes = process_children(cpc, partition, params)
+            change_children(partition, child_changes, check_mode)
+            update_plan = new_update_plan(crypto_changes, child_changes)
         else:
-            # It exists. Stop it and update its properties.
+            # It exists. Stop it and apply all changes.
             create_props, update_props, stop, crypto_changes = \
                 process_properties(cpc, partition, params)
             # Note: create_props in this case only contains 'name' and can be
             # ignored.
             changed |= stop_partition(partition, check_mode)
-            if update_props:
-                if not check_mode:
-                    partition.update_properties(update_props)
-                    # Properties are refreshed further down
-                else:
-                    # Update the local object's properties
-                    partition.update_properties_local(update_props)
-                changed = True
-            if crypto_changes:
-                changed |= change_crypto_config(partition, crypto_changes,
-                                                check_mode)
+            child_changes = process_children(cpc, partition, params)
+            # The partition is already stopped for all changes
+            _changed, update_plan = apply_updates(
+                partition, update_props, False, crypto_changes,
+                child_changes, check_mode)
+            changed |= _changed
 
         if not partition:
             raise AssertionError()
@@ -1766,7 +1949,7 @@ def ensure_stopped(params, check_mode):
         add_artificial_properties(
             result, partition, expand_storage_groups, expand_crypto_adapters)
 
-        return changed, result
+        return changed, result, update_plan
 
     finally:
         session.logoff()
@@ -1795,20 +1978,20 @@ def ensure_absent(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
         except zhmcclient.NotFound:
-            return changed, result
+            return changed, result, {}
 
         if not check_mode:
             stop_partition(partition, check_mode)
             partition.delete()
         changed = True
 
-        return changed, result
+        return changed, result, {}
 
     finally:
         session.logoff()
@@ -1839,16 +2022,16 @@ def facts(params, check_mode):
     try:
         # The default exception handling is sufficient for this code
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
 
-        partition = cpc.partitions.find(name=partition_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         partition.pull_full_properties()
 
         result = dict(partition.properties)
         add_artificial_properties(
             result, partition, expand_storage_groups, expand_crypto_adapters)
 
-        return changed, result
+        return changed, result, {}
 
     finally:
         session.logoff()
@@ -1860,13 +2043,21 @@ def perform_task(params, check_mode):
     parameter.
 
     If check_mode is True, check whether changes would occur, but don't
-    actually perform any changes.
+    actually perform any changes. If in addition a snapshot file is specified
+    in the 'check_mode_snapshot' module parameter, the changes are performed
+    on a faked HMC loaded from the snapshot.
+
+    Returns:
+      tuple of (changed, result, update_plan), where update_plan is the
+      summary of the update plan for state 'active' and 'stopped', and an
+      empty dict otherwise.
 
     Raises:
       ParameterError: An issue with the module parameters.
       StatusError: An issue with the partition status.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    params, check_mode = snapshot_check_mode(params, check_mode)
     actions = {
         "absent": ensure_absent,
         "active": ensure_active,
@@ -1897,10 +2088,41 @@ def main():
         state=dict(required=True, type='str',
                    choices=['absent', 'stopped', 'active', 'facts']),
         properties=dict(required=False, type='dict', default={}),
+        nics=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                name=dict(required=True, type='str'),
+                adapter_name=dict(required=True, type='str'),
+                adapter_port=dict(required=False, type='int', default=0),
+                properties=dict(required=False, type='dict', default={}),
+            ),
+        ),
+        hbas=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                name=dict(required=True, type='str'),
+                adapter_name=dict(required=True, type='str'),
+                adapter_port=dict(required=False, type='int', default=0),
+                properties=dict(required=False, type='dict', default={}),
+            ),
+        ),
+        virtual_functions=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                name=dict(required=True, type='str'),
+                adapter_name=dict(required=True, type='str'),
+                properties=dict(required=False, type='dict', default={}),
+            ),
+        ),
+        storage_groups=dict(required=False, type='list', elements='str',
+                            default=None),
         expand_storage_groups=dict(required=False, type='bool', default=False),
         expand_crypto_adapters=dict(required=False, type='bool',
                                     default=False),
+        check_mode_snapshot=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1921,7 +2143,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1929,7 +2152,8 @@ def main():
 
     try:
 
-        changed, result = perform_task(module.params, module.check_mode)
+        changed, result, update_plan = perform_task(
+            module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -1943,8 +2167,11 @@ def main():
     # by showing the traceback.
 
     LOGGER.debug(
-        "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, partition=result)
+        "Module exit (success): changed: %r, cpc: %r, update_plan: %r",
+        changed, result, update_plan)
+    module.exit_json(
+        changed=changed, partition=result, update_plan=update_plan,
+        **retry_result())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,753 @@
+#!/usr/bin/python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+# For information on the format of the ANSIBLE_METADATA, DOCUMENTATION,
+# EXAMPLES, and RETURN strings, see
+# http://docs.ansible.com/ansible/dev_guide/developing_modules_documenting.html
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community',
+    'shipped_by': 'other',
+    'other_repo_url': 'https://github.com/zhmcclient/zhmc-ansible-modules'
+}
+
+DOCUMENTATION = """
+---
+module: zhmc_partition_drift
+version_added: "2.9.0"
+short_description: Report configuration drift of partitions (DPM mode)
+description:
+  - Compare the partitions of a CPC (in DPM mode) against a specification of
+    their desired configuration, and report the partitions that deviate from
+    it.
+  - "The specification is a list of items that each apply to one partition
+    (C(name)) or to all partitions whose names match a pattern
+    (C(name_pattern)). If multiple items apply to a partition, they are
+    applied in the order of the list, and later items override the
+    properties and NICs of earlier items."
+  - Only the properties referenced by the specification are retrieved from
+    the HMC, and the partitions are checked in parallel, bounded by
+    C(max_workers). NICs are retrieved only for partitions whose
+    specification has C(nics).
+  - The comparison of hexadecimal and MAC address values is independent of
+    their notation, as in the M(ibm.ibm_zhmc.zhmc_partition) and
+    M(ibm.ibm_zhmc.zhmc_nic) modules.
+  - Partitions that conform to their specification are not included in the
+    result. The module never changes anything.
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - The targeted CPC must be in the Dynamic Partition Manager (DPM)
+    operational mode.
+  - "The HMC userid must have object-access permissions to the partitions
+    to be checked, and to the adapters and virtual switches if C(nics) is
+    specified."
+options:
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - The authentication credentials for the HMC.
+    type: dict
+    required: true
+    suboptions:
+      userid:
+        description:
+          - The userid (username) for authenticating with the HMC.
+        type: str
+        required: true
+      password:
+        description:
+          - The password for authenticating with the HMC.
+        type: str
+        required: true
+      ca_certs:
+        description:
+          - Path name of certificate file or certificate directory to be used
+            for verifying the HMC certificate. If null (default), the path name
+            in the 'REQUESTS_CA_BUNDLE' environment variable or the path name
+            in the 'CURL_CA_BUNDLE' environment variable is used, or if neither
+            of these variables is set, the certificates in the Mozilla CA
+            Certificate List provided by the 'certifi' Python package are used
+            for verifying the HMC certificate.
+        type: str
+        required: false
+        default: null
+      verify:
+        description:
+          - If True (default), verify the HMC certificate as specified in the
+            C(ca_certs) parameter. If False, ignore what is specified in the
+            C(ca_certs) parameter and do not verify the HMC certificate.
+        type: bool
+        required: false
+        default: true
+  cpc_name:
+    description:
+      - The name of the CPC with the partitions.
+    type: str
+    required: true
+  specs:
+    description:
+      - The specification of the desired partition configuration.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description:
+          - The name of the partition the item applies to. A partition with
+            this name that does not exist is reported as drift.
+            Mutually exclusive with C(name_pattern).
+        type: str
+        required: false
+      name_pattern:
+        description:
+          - Regular expression (Python 're' syntax) that must match the
+            entire name of the partitions the item applies to.
+            Mutually exclusive with C(name).
+        type: str
+        required: false
+      properties:
+        description:
+          - "Desired values of partition properties. The property names are
+            the names of the partition properties in the data model with
+            underscores instead of hyphens, as in the C(properties) parameter
+            of the M(ibm.ibm_zhmc.zhmc_partition) module, except that the
+            artificial properties for boot devices and for the crypto
+            configuration are not supported. Property names that are not
+            defined in the data model are rejected."
+        type: dict
+        required: false
+        default: null
+      nics:
+        description:
+          - Desired NICs of the partition, identified by their names.
+            A NIC that does not exist is reported as drift. NICs of the
+            partition that are not specified are not checked.
+        type: list
+        elements: dict
+        required: false
+        default: null
+        suboptions:
+          name:
+            description:
+              - The name of the NIC.
+            type: str
+            required: true
+          adapter_name:
+            description:
+              - The name of the network adapter backing the NIC. If null,
+                the backing adapter is not checked.
+            type: str
+            required: false
+            default: null
+          adapter_port:
+            description:
+              - The port index on the network adapter backing the NIC. Only
+                checked if C(adapter_name) is specified.
+            type: int
+            required: false
+            default: 0
+          properties:
+            description:
+              - "Desired values of NIC properties, with underscores instead
+                of hyphens in the property names (e.g. C(device_number),
+                C(mac_address)). Property names that are not defined in the
+                data model are rejected."
+            type: dict
+            required: false
+            default: null
+  max_workers:
+    description:
+      - Maximum number of HMC operations that are performed in parallel.
+        1 performs all HMC operations serially.
+    type: int
+    required: false
+    default: 8
+  log_file:
+    description:
+      - "File path of a log file to which the logic flow of this module as well
+         as interactions with the HMC are logged. If null, logging will be
+         propagated to the Python root logger."
+    type: str
+    required: false
+    default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
+  _faked_session:
+    description:
+      - "An internal parameter used for testing the module."
+    required: false
+    type: raw
+    default: null
+"""
+
+EXAMPLES = """
+---
+# Note: The following examples assume that some variables named 'my_*' are set.
+
+- name: Check the partitions of a CPC against the golden configuration
+  zhmc_partition_drift:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    specs:
+      - name_pattern: "prod-.*"
+        properties:
+          ifl_processors: 2
+          initial_memory: 8192
+          maximum_memory: 8192
+          boot_device: storage-adapter
+        nics:
+          - name: "nic-data"
+            adapter_name: "OSD 0128 A13B-13"
+            adapter_port: 0
+      - name: "prod-db1"
+        properties:
+          ifl_processors: 4
+  register: drift_result
+
+- name: Fail if some partitions deviate from the golden configuration
+  assert:
+    that: drift_result.drift.drifted == 0
+    fail_msg: "Drifted partitions: {{ drift_result.drift.partitions }}"
+"""
+
+RETURN = """
+changed:
+  description: Always false, because the module never changes anything.
+  returned: always
+  type: bool
+msg:
+  description: An error message that describes the failure.
+  returned: failure
+  type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
+drift:
+  description: The result of the drift check.
+  returned: success
+  type: dict
+  contains:
+    cpc_name:
+      description: "Name of the CPC"
+      type: str
+    checked:
+      description: "Number of partitions that were checked, including
+        partitions specified by name that do not exist"
+      type: int
+    drifted:
+      description: "Number of partitions that deviate from their
+        specification"
+      type: int
+    partitions:
+      description: "The partitions that deviate from their specification,
+        with the partition names as keys and the deviations as values. Each
+        deviation has items C(expected) and C(actual)."
+      type: dict
+      contains:
+        exists:
+          description: "Deviation in the existence of the partition, if a
+            partition specified by name does not exist"
+          type: dict
+        properties:
+          description: "Deviations of partition properties, by property
+            name"
+          type: dict
+        nics:
+          description: "Deviations of NICs, by NIC name. Each value has the
+            deviations by property name, including the artificial properties
+            C(exists), C(adapter_name) and C(adapter_port)."
+          type: dict
+  sample:
+    {
+        "cpc_name": "CPCA",
+        "checked": 3,
+        "drifted": 1,
+        "partitions": {
+            "prod-db1": {
+                "properties": {
+                    "ifl_processors": {
+                        "expected": 4,
+                        "actual": 2
+                    }
+                },
+                "nics": {
+                    "nic-data": {
+                        "adapter_port": {
+                            "expected": 0,
+                            "actual": 1
+                        }
+                    }
+                }
+            }
+        }
+    }
+"""
+
+import re  # noqa: E402
+import logging  # noqa: E402
+import traceback  # noqa: E402
+from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+from ansible.module_utils import six  # noqa: E402
+
+from ..module_utils.common import log_init, Error, ParameterError, \
+    get_hmc_auth, get_session, ZHMC_PARTITION_PROPERTIES, \
+    PARTITION_ARTIFICIAL_PROPERTIES, ZHMC_NIC_PROPERTIES, \
+    NIC_ARTIFICIAL_PROPERTIES, missing_required_lib, \
+    common_fail_on_import_errors, parallel_map, \
+    SelectedPropertiesPuller, retry_result, find_by_name  # noqa: E402
+
+try:
+    import requests.packages.urllib3
+    IMP_URLLIB3_ERR = None
+except ImportError:
+    IMP_URLLIB3_ERR = traceback.format_exc()
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Python logger name for this module
+LOGGER_NAME = 'zhmc_partition_drift'
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Property definitions of the resources, by resource kind. All properties in
+# the data model of the resources can be checked, except for the artificial
+# properties. The equality test functions of the property definitions are
+# used for the properties whose values can be specified in different
+# notations.
+DRIFT_PROPERTIES = {
+    'partition': dict(
+        (name, prop_def)
+        for name, prop_def in ZHMC_PARTITION_PROPERTIES.items()
+        if name not in PARTITION_ARTIFICIAL_PROPERTIES),
+    'nic': dict(
+        (name, prop_def)
+        for name, prop_def in ZHMC_NIC_PROPERTIES.items()
+        if name not in NIC_ARTIFICIAL_PROPERTIES),
+}
+
+
+class DriftSpec(object):
+    """
+    A validated item of the 'specs' module parameter.
+    """
+
+    def __init__(self, name, pattern, properties, nics):
+        self.name = name
+        self.pattern = pattern
+        self.properties = properties
+        self.nics = nics
+
+    def applies_to(self, partition_name):
+        """
+        Indicates whether the item applies to a partition.
+        """
+        if self.name is not None:
+            return partition_name == self.name
+        return self.pattern.match(partition_name) is not None
+
+
+def validate_specs(specs):
+    """
+    Validate the 'specs' module parameter and return it as a list of
+    DriftSpec objects.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    drift_specs = []
+    for index, spec in enumerate(specs):
+        name = spec.get('name')
+        name_pattern = spec.get('name_pattern')
+        if (name is None) == (name_pattern is None):
+            raise ParameterError(
+                "Item {0} in module parameter 'specs' must specify exactly "
+                "one of 'name' and 'name_pattern'.".format(index))
+        pattern = None
+        if name_pattern is not None:
+            try:
+                pattern = re.compile('(?:{0})$'.format(name_pattern))
+            except re.error as exc:
+                raise ParameterError(
+                    "Item {0} in module parameter 'specs' has an invalid "
+                    "'name_pattern' {1!r}: {2}".
+                    format(index, name_pattern, exc))
+        properties = spec.get('properties') or {}
+        for prop_name in properties:
+            if prop_name in PARTITION_ARTIFICIAL_PROPERTIES:
+                raise ParameterError(
+                    "Artificial property {0!r} cannot be checked in item {1} "
+                    "of module parameter 'specs'.".format(prop_name, index))
+            if prop_name not in DRIFT_PROPERTIES['partition']:
+                raise ParameterError(
+                    "Property {0!r} in item {1} of module parameter 'specs' "
+                    "is not defined in the data model for partitions.".
+                    format(prop_name, index))
+        nics = {}
+        for nic_spec in spec.get('nics') or []:
+            for prop_name in nic_spec.get('properties') or {}:
+                if prop_name not in DRIFT_PROPERTIES['nic']:
+                    raise ParameterError(
+                        "Property {0!r} of NIC {1!r} in item {2} of module "
+                        "parameter 'specs' is not defined in the data model "
+                        "for NICs.".format(prop_name, nic_spec['name'], index))
+            nics[nic_spec['name']] = nic_spec
+        drift_specs.append(DriftSpec(name, pattern, properties, nics))
+    return drift_specs
+
+
+def partition_spec(partition_name, drift_specs):
+    """
+    Return the merged specification for a partition as a tuple of
+    (properties, nics), or None if no item of the specification applies to
+    the partition.
+    """
+    properties = None
+    nics = None
+    for drift_spec in drift_specs:
+        if drift_spec.applies_to(partition_name):
+            if properties is None:
+                properties = {}
+                nics = {}
+            properties.update(drift_spec.properties)
+            nics.update(drift_spec.nics)
+    if properties is None:
+        return None
+    return properties, nics
+
+
+def values_equal(kind, prop_name, actual, expected):
+    """
+    Compare the actual and expected values of a property and return a tuple
+    (equal, expected), where expected is converted to the type of the actual
+    value if it is a string for a numeric property (Ansible may pass integers
+    as strings), and to a string for a property with an equality test
+    function (e.g. a device number specified as an integer in YAML).
+
+    Raises:
+      ParameterError: The expected value is invalid for the equality test
+        function of the property.
+    """
+    eq_func = DRIFT_PROPERTIES[kind][prop_name][4]
+    if eq_func:
+        if expected is not None and \
+                not isinstance(expected, six.string_types):
+            expected = six.text_type(expected)
+        return eq_func(actual, expected, prop_name), expected
+    if isinstance(expected, six.string_types) and \
+            isinstance(actual, (int, float)) and \
+            not isinstance(actual, bool):
+        try:
+            expected = type(actual)(expected)
+        except ValueError:
+            return False, expected
+    return actual == expected, expected
+
+
+def properties_drift(kind, properties, expected_props):
+    """
+    Return the deviations of the properties of a resource from the expected
+    properties, as a dict with the property names as keys and dicts with
+    items 'expected' and 'actual' as values.
+    """
+    drift = {}
+    for prop_name, expected in expected_props.items():
+        actual = properties.get(prop_name.replace('_', '-'))
+        equal, expected = values_equal(kind, prop_name, actual, expected)
+        if not equal:
+            drift[prop_name] = dict(expected=expected, actual=actual)
+    return drift
+
+
+class NicBacking(object):
+    """
+    Determines the network adapter and port backing NICs, retrieving the
+    adapters and virtual switches of the CPC only once.
+    """
+
+    def __init__(self, cpc):
+        self.cpc = cpc
+        self.adapter_names = dict(
+            (a.uri, a.name) for a in cpc.adapters.list())
+        self.vswitch_backing = dict(
+            (vs.uri, (vs.properties['backing-adapter-uri'],
+                      vs.properties['port']))
+            for vs in cpc.virtual_switches.list(full_properties=True))
+        self.port_indexes = {}
+
+    def port_index(self, port_uri):
+        """
+        Return the index of a network port by its URI.
+        """
+        index = self.port_indexes.get(port_uri)
+        if index is None:
+            adapter_uri = port_uri.split('/network-ports/')[0]
+            adapter = self.cpc.adapters.resource_object(adapter_uri)
+            port = adapter.ports.resource_object(port_uri)
+            index = port.get_property('index')
+            self.port_indexes[port_uri] = index
+        return index
+
+    def backing(self, nic):
+        """
+        Return the name of the adapter and the port index backing a NIC, as a
+        tuple (adapter_name, adapter_port).
+        """
+        vswitch_uri = nic.properties.get('virtual-switch-uri')
+        if vswitch_uri:
+            # OSA or HiperSockets adapter
+            adapter_uri, port = self.vswitch_backing[vswitch_uri]
+        else:
+            # RoCE or CNA adapter
+            port_uri = nic.properties['network-adapter-port-uri']
+            adapter_uri = port_uri.split('/network-ports/')[0]
+            port = self.port_index(port_uri)
+        return self.adapter_names.get(adapter_uri), port
+
+
+def nics_drift(partition, expected_nics, nic_backing):
+    """
+    Return the deviations of the NICs of a partition from the expected NICs,
+    as a dict with the NIC names as keys and the deviations of their
+    properties as values.
+    """
+    nics = dict((nic.name, nic)
+                for nic in partition.nics.list(full_properties=True))
+    drift = {}
+    for nic_name, nic_spec in expected_nics.items():
+        nic = nics.get(nic_name)
+        if nic is None:
+            drift[nic_name] = {'exists': dict(expected=True, actual=False)}
+            continue
+        nic_drift = properties_drift(
+            'nic', nic.properties, nic_spec.get('properties') or {})
+        if nic_spec.get('adapter_name') is not None:
+            adapter_name, adapter_port = nic_backing.backing(nic)
+            if adapter_name != nic_spec['adapter_name']:
+                nic_drift['adapter_name'] = dict(
+                    expected=nic_spec['adapter_name'], actual=adapter_name)
+            expected_port = nic_spec.get('adapter_port') or 0
+            if adapter_port != expected_port:
+                nic_drift['adapter_port'] = dict(
+                    expected=expected_port, actual=adapter_port)
+        if nic_drift:
+            drift[nic_name] = nic_drift
+    return drift
+
+
+def check_partitions(cpc, drift_specs, max_workers):
+    """
+    Check the partitions of a CPC against the specification and return the
+    result for the 'drift' return value.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    partitions = dict((p.name, p) for p in cpc.partitions.list())
+    drifted = {}
+
+    # Partitions specified by name that do not exist
+    for drift_spec in drift_specs:
+        if drift_spec.name is not None and \
+                drift_spec.name not in partitions:
+            drifted[drift_spec.name] = {
+                'exists': dict(expected=True, actual=False)}
+    missing_count = len(drifted)
+
+    work = []
+    for name in sorted(partitions):
+        spec = partition_spec(name, drift_specs)
+        if spec is not None:
+            work.append((partitions[name], spec))
+
+    nic_backing = None
+    if any(nics for _, (_, nics) in work):
+        nic_backing = NicBacking(cpc)
+    puller = SelectedPropertiesPuller()
+
+    def check_partition(item):
+        partition, (properties, nics) = item
+        puller.pull(partition,
+                    [p.replace('_', '-') for p in properties])
+        drift = {}
+        props_drift = properties_drift(
+            'partition', partition.properties, properties)
+        if props_drift:
+            drift['properties'] = props_drift
+        if nics:
+            nic_drift = nics_drift(partition, nics, nic_backing)
+            if nic_drift:
+                drift['nics'] = nic_drift
+        return partition.name, drift
+
+    for name, drift in parallel_map(check_partition, work, max_workers):
+        if drift:
+            drifted[name] = drift
+
+    return {
+        'cpc_name': cpc.name,
+        'checked': len(work) + missing_count,
+        'drifted': len(drifted),
+        'partitions': drifted,
+    }
+
+
+def perform_task(params, check_mode):
+    """
+    Check the partitions against the specification.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # No need to ensure 'cpc_name' and 'specs' are set, because they are
+    # required.
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)  # No default specified
+
+    drift_specs = validate_specs(params['specs'])
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        result = check_partitions(cpc, drift_specs, max_workers)
+        # The default exception handling is sufficient for the above.
+
+    finally:
+        session.logoff()
+
+    return False, result
+
+
+def main():
+
+    # The following definition of module input parameters must match the
+    # description of the options in the DOCUMENTATION string.
+    argument_spec = dict(
+        hmc_host=dict(required=True, type='str'),
+        hmc_auth=dict(
+            required=True,
+            type='dict',
+            options=dict(
+                userid=dict(required=True, type='str'),
+                password=dict(required=True, type='str', no_log=True),
+                ca_certs=dict(required=False, type='str', default=None),
+                verify=dict(required=False, type='bool', default=True),
+            ),
+        ),
+        cpc_name=dict(required=True, type='str'),
+        specs=dict(
+            required=True, type='list', elements='dict',
+            options=dict(
+                name=dict(required=False, type='str'),
+                name_pattern=dict(required=False, type='str'),
+                properties=dict(required=False, type='dict', default=None),
+                nics=dict(
+                    required=False, type='list', elements='dict',
+                    default=None,
+                    options=dict(
+                        name=dict(required=True, type='str'),
+                        adapter_name=dict(required=False, type='str',
+                                          default=None),
+                        adapter_port=dict(required=False, type='int',
+                                          default=0),
+                        properties=dict(required=False, type='dict',
+                                        default=None),
+                    ),
+                ),
+            ),
+        ),
+        max_workers=dict(required=False, type='int', default=8),
+        log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
+        _faked_session=dict(required=False, type='raw'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True)
+
+    if IMP_URLLIB3_ERR is not None:
+        module.fail_json(msg=missing_required_lib("requests"),
+                         exception=IMP_URLLIB3_ERR)
+
+    requests.packages.urllib3.disable_warnings()
+
+    if IMP_ZHMCCLIENT_ERR is not None:
+        module.fail_json(msg=missing_required_lib("zhmcclient"),
+                         exception=IMP_ZHMCCLIENT_ERR)
+
+    common_fail_on_import_errors(module)
+
+    log_file = module.params['log_file']
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
+
+    _params = dict(module.params)
+    del _params['hmc_auth']
+    LOGGER.debug("Module entry: params: %r", _params)
+
+    try:
+
+        changed, result = perform_task(module.params, module.check_mode)
+
+    except (Error, zhmcclient.Error) as exc:
+        # These exceptions are considered errors in the environment or in user
+        # input. They have a proper message that stands on its own, so we
+        # simply pass that message on and will not need a traceback.
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug(
+            "Module exit (failure): msg: %s", msg)
+        module.fail_json(msg=msg)
+    # Other exceptions are considered module errors and are handled by Ansible
+    # by showing the traceback.
+
+    LOGGER.debug(
+        "Module exit (success): changed: %r, drift: %r", changed, result)
+    module.exit_json(changed=changed, drift=result, **retry_result())
+
+
+if __name__ == '__main__':
+    main()
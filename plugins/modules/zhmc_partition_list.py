@@ -97,6 +97,18 @@ options:
     type: str
     required: false
     default: null
+  output_file:
+    description:
+      - "Path name of a JSON Lines file to which the partitions are written as
+         they are listed, one JSON object per line. The partitions are then not
+         returned in the C(partitions) return value, so that large results do
+         not need to be kept in memory. Instead, the C(output) return value
+         describes the file. The file is written on the system the module runs
+         on, and only if its content changes. If null, the partitions are
+         returned in the C(partitions) return value."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -105,6 +117,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -142,10 +162,16 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 partitions:
   description: The list of permitted partitions, with a subset of their
     properties.
-  returned: success
+  returned: success, if output_file is not specified
   type: list
   elements: dict
   contains:
@@ -177,6 +203,27 @@ partitions:
             "has_unacceptable_status": False,
         }
     ]
+output:
+  description: Summary of the JSON Lines file with the partitions.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of partitions in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "partitions.jsonl",
+        "count": 2,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
 """
 
 import logging  # noqa: E402
@@ -185,7 +232,8 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, \
     get_hmc_auth, get_session, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    common_fail_on_import_errors, \
+    open_result_list, retry_result, find_by_name, HmcCapabilities  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -205,10 +253,54 @@ LOGGER_NAME = 'zhmc_partition_list'
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def perform_list(params):
+def list_partitions(client, capabilities, cpc_name):
+    """
+    List the partitions of a CPC or of all managed CPCs, using the "List
+    Permitted Partitions" operation if the HMC supports it.
+
+    Returns:
+      list of zhmcclient.Partition: The partitions.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    # The "List Permitted Partitions" operation was added in HMC
+    # version 2.14.0. The operation depends only on the HMC version and not
+    # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
+    # a z13 CPC.
+    if not capabilities.has_list_permitted('partitions'):
+        # List the partitions in the traditional way
+        if cpc_name:
+            LOGGER.debug("Listing partitions of CPC %s", cpc_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            partitions = cpc.partitions.list()
+        else:
+            LOGGER.debug("Listing partitions of all managed CPCs")
+            cpcs = client.cpcs.list()
+            partitions = []
+            for cpc in cpcs:
+                partitions.extend(cpc.partitions.list())
+    else:
+        # List the partitions using the new operation
+        if cpc_name:
+            LOGGER.debug("Listing permitted partitions of CPC %s", cpc_name)
+            filter_args = {'cpc-name': cpc_name}
+        else:
+            LOGGER.debug("Listing permitted partitions of all managed CPCs")
+            filter_args = None
+        partitions = client.consoles.console.list_permitted_partitions(
+            filter_args=filter_args)
+    return partitions
+
+
+def perform_list(params, check_mode=False):
     """
     List the partitions and return a subset of properties.
 
+    Returns:
+      ResultList or JsonLinesWriter: The result items, depending on the
+      'output_file' module parameter (see open_result_list()).
+
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
@@ -217,6 +309,7 @@ def perform_list(params):
     host = params['hmc_host']
     userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
     cpc_name = params.get('cpc_name', None)
+    output_file = params.get('output_file', None)
     _faked_session = params.get('_faked_session', None)  # No default specified
 
     session = get_session(
@@ -224,62 +317,39 @@ def perform_list(params):
     try:
         client = zhmcclient.Client(session)
 
-        # The "List Permitted Partitions" operation was added in HMC
-        # version 2.14.0. The operation depends only on the HMC version and not
-        # on the SE/CPC version, so it is supported e.g. for a 2.14 HMC managing
-        # a z13 CPC.
-        hmc_version = client.query_api_version()['hmc-version']
-        hmc_version_info = [int(x) for x in hmc_version.split('.')]
-        if hmc_version_info < [2, 14, 0]:
-            # List the partitions in the traditional way
-            if cpc_name:
-                LOGGER.debug("Listing partitions of CPC %s", cpc_name)
-                cpc = client.cpcs.find(name=cpc_name)
-                partitions = cpc.partitions.list()
-            else:
-                LOGGER.debug("Listing partitions of all managed CPCs")
-                cpcs = client.cpcs.list()
-                partitions = []
-                for cpc in cpcs:
-                    partitions.extend(cpc.partitions.list())
-        else:
-            # List the partitions using the new operation
-            if cpc_name:
-                LOGGER.debug("Listing permitted partitions of CPC %s", cpc_name)
-                filter_args = {'cpc-name': cpc_name}
-            else:
-                LOGGER.debug("Listing permitted partitions of all managed CPCs")
-                filter_args = None
-            partitions = client.consoles.console.list_permitted_partitions(
-                filter_args=filter_args)
+        # The HMC capabilities are cached across module runs. If the HMC has
+        # been downgraded in the meantime, the listing is repeated with the
+        # capabilities retrieved again.
+        capabilities = HmcCapabilities.for_client(client)
+        try:
+            partitions = list_partitions(client, capabilities, cpc_name)
+        except zhmcclient.HTTPError as exc:
+            if not capabilities.refresh_on_error(exc):
+                raise
+            partitions = list_partitions(client, capabilities, cpc_name)
         # The default exception handling is sufficient for the above.
 
-        se_versions = {}
-        partition_list = []
-        for partition in partitions:
-
-            # se-version has been added to the result of List Permitted
-            # Partitions in HMC/SE 2.14.1. Before that, it triggers the
-            # retrieval of CPC properties.
-            parent_cpc = partition.manager.cpc
-            try:
-                se_version = se_versions[parent_cpc.name]
-            except KeyError:
+        with open_result_list(output_file, check_mode) as partition_list:
+            for partition in partitions:
+
+                # se-version has been added to the result of List Permitted
+                # Partitions in HMC/SE 2.14.1. Before that, it is taken from
+                # the HMC capabilities.
+                parent_cpc = partition.manager.cpc
                 try:
                     se_version = partition.properties['se-version']
                 except KeyError:
-                    se_version = parent_cpc.get_property('se-version')
-                se_versions[parent_cpc.name] = se_version
-
-            partition_properties = {
-                "name": partition.name,
-                "cpc_name": parent_cpc.name,
-                "se_version": se_version,
-                "status": partition.get_property('status'),
-                "has_unacceptable_status": partition.get_property(
-                    'has-unacceptable-status'),
-            }
-            partition_list.append(partition_properties)
+                    se_version = capabilities.cpc_se_version(parent_cpc)
+
+                partition_properties = {
+                    "name": partition.name,
+                    "cpc_name": parent_cpc.name,
+                    "se_version": se_version,
+                    "status": partition.get_property('status'),
+                    "has_unacceptable_status": partition.get_property(
+                        'has-unacceptable-status'),
+                }
+                partition_list.append(partition_properties)
 
         return partition_list
 
@@ -304,7 +374,10 @@ def main():
             ),
         ),
         cpc_name=dict(required=False, type='str', default=None),
+        output_file=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -325,16 +398,16 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
     LOGGER.debug("Module entry: params: %r", _params)
 
-    changed = False
     try:
 
-        result_list = perform_list(module.params)
+        results = perform_list(module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -346,9 +419,15 @@ def main():
     # Other exceptions are considered module errors and are handled by Ansible
     # by showing the traceback.
 
+    changed = results.changed
+    result_list = results.result()
     LOGGER.debug("Module exit (success): changed: %s, result: %r",
                  changed, result_list)
-    module.exit_json(changed=changed, partitions=result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(
+            changed=changed, partitions=result_list, **retry_result())
 
 
 if __name__ == '__main__':
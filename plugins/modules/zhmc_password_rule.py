@@ -119,6 +119,18 @@ options:
     type: dict
     required: false
     default: null
+  check_mode_snapshot:
+    description:
+      - "Path name of a snapshot file written by the zhmc_snapshot module. If
+         specified and the module runs in check mode, the module does not
+         access the HMC, but runs against a faked HMC that is loaded from the
+         snapshot file. In that case, the changes are performed on the faked
+         HMC, so that the result reflects the actual behavior of the module
+         more closely. The snapshot file is not changed. Ignored if not in
+         check mode."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -127,6 +139,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -176,6 +196,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 password_rule:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -244,7 +270,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, \
+    missing_required_lib, common_fail_on_import_errors, \
+    snapshot_check_mode, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -317,6 +345,9 @@ ZHMC_PASSWORD_RULE_PROPERTIES = {
     'replication_overwrite_possible': (False, False, False, True, None, bool),
 }
 
+# Compiled form of ZHMC_PASSWORD_RULE_PROPERTIES
+ZHMC_PASSWORD_RULE_SCHEMA = PropertySchema(ZHMC_PASSWORD_RULE_PROPERTIES)
+
 
 def process_properties(console, pwrule, params):
     """
@@ -388,7 +419,7 @@ def process_properties(console, pwrule, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_PASSWORD_RULE_PROPERTIES, input_props, pwrule)
+            prop_name, ZHMC_PASSWORD_RULE_SCHEMA, input_props, pwrule)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -475,7 +506,7 @@ def ensure_present(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            pwrule = console.password_rules.find(name=pwrule_name)
+            pwrule = find_by_name(console.password_rules, pwrule_name)
         except zhmcclient.NotFound:
             pwrule = None
 
@@ -559,7 +590,7 @@ def ensure_absent(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            pwrule = console.password_rules.find(name=pwrule_name)
+            pwrule = find_by_name(console.password_rules, pwrule_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -597,7 +628,7 @@ def facts(params, check_mode):
         client = zhmcclient.Client(session)
         console = client.consoles.console
 
-        pwrule = console.password_rules.find(name=pwrule_name)
+        pwrule = find_by_name(console.password_rules, pwrule_name)
         pwrule.pull_full_properties()
 
         result = dict(pwrule.properties)
@@ -613,12 +644,15 @@ def perform_task(params, check_mode):
     parameter.
 
     If check_mode is True, check whether changes would occur, but don't
-    actually perform any changes.
+    actually perform any changes. If in addition a snapshot file is specified
+    in the 'check_mode_snapshot' module parameter, the changes are performed
+    on a faked HMC loaded from the snapshot.
 
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    params, check_mode = snapshot_check_mode(params, check_mode)
     actions = {
         "absent": ensure_absent,
         "present": ensure_present,
@@ -647,7 +681,10 @@ def main():
         state=dict(required=True, type='str',
                    choices=['absent', 'present', 'facts']),
         properties=dict(required=False, type='dict', default={}),
+        check_mode_snapshot=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -668,7 +705,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -692,7 +730,7 @@ def main():
     LOGGER.debug(
         "Module exit (success): changed: %r, password_rule: %r",
         changed, result)
-    module.exit_json(changed=changed, password_rule=result)
+    module.exit_json(changed=changed, password_rule=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -82,6 +82,18 @@ options:
         type: bool
         required: false
         default: true
+  output_file:
+    description:
+      - "Path name of a JSON Lines file to which the password rules are written
+         as they are listed, one JSON object per line. The password rules are
+         then not returned in the C(password_rules) return value, so that large
+         results do not need to be kept in memory. Instead, the C(output)
+         return value describes the file. The file is written on the system the
+         module runs on, and only if its content changes. If null, the password
+         rules are returned in the C(password_rules) return value."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -90,6 +102,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -119,9 +139,15 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 password_rules:
   description: The list of Password Rules, with a subset of their properties.
-  returned: success
+  returned: success, if output_file is not specified
   type: list
   elements: dict
   contains:
@@ -137,6 +163,27 @@ password_rules:
             "name": "Standard",
         }
     ]
+output:
+  description: Summary of the JSON Lines file with the password rules.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of password rules in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "password_rules.jsonl",
+        "count": 2,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
 """
 
 import logging  # noqa: E402
@@ -144,7 +191,8 @@ import traceback  # noqa: E402
 from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, get_hmc_auth, get_session, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    missing_required_lib, common_fail_on_import_errors, \
+    open_result_list, retry_result  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -164,10 +212,14 @@ LOGGER_NAME = 'zhmc_password_rule_list'
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
-def perform_list(params):
+def perform_list(params, check_mode=False):
     """
     List the managed Password Rules and return a subset of properties.
 
+    Returns:
+      ResultList or JsonLinesWriter: The result items, depending on the
+      'output_file' module parameter (see open_result_list()).
+
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
@@ -175,6 +227,7 @@ def perform_list(params):
 
     host = params['hmc_host']
     userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    output_file = params.get('output_file', None)
     _faked_session = params.get('_faked_session', None)  # No default specified
 
     session = get_session(
@@ -183,16 +236,16 @@ def perform_list(params):
         client = zhmcclient.Client(session)
         console = client.consoles.console
 
-        pwrule_list = []
+        with open_result_list(output_file, check_mode) as pwrule_list:
 
-        # List the Password Rules
-        pwrules = console.password_rules.list()
-        # The default exception handling is sufficient for the above.
-        for pwrule in pwrules:
-            pwrule_properties = {
-                "name": pwrule.name,
-            }
-            pwrule_list.append(pwrule_properties)
+            # List the Password Rules
+            pwrules = console.password_rules.list()
+            # The default exception handling is sufficient for the above.
+            for pwrule in pwrules:
+                pwrule_properties = {
+                    "name": pwrule.name,
+                }
+                pwrule_list.append(pwrule_properties)
 
         return pwrule_list
 
@@ -216,7 +269,10 @@ def main():
                 verify=dict(required=False, type='bool', default=True),
             ),
         ),
+        output_file=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -237,16 +293,16 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
     LOGGER.debug("Module entry: params: %r", _params)
 
-    changed = False
     try:
 
-        result_list = perform_list(module.params)
+        results = perform_list(module.params, module.check_mode)
 
     except (Error, zhmcclient.Error) as exc:
         # These exceptions are considered errors in the environment or in user
@@ -258,9 +314,15 @@ def main():
     # Other exceptions are considered module errors and are handled by Ansible
     # by showing the traceback.
 
+    changed = results.changed
+    result_list = results.result()
     LOGGER.debug("Module exit (success): changed: %s, result: %r",
                  changed, result_list)
-    module.exit_json(changed=changed, password_rules=result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(
+            changed=changed, password_rules=result_list, **retry_result())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,638 @@
+#!/usr/bin/python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+# For information on the format of the ANSIBLE_METADATA, DOCUMENTATION,
+# EXAMPLES, and RETURN strings, see
+# http://docs.ansible.com/ansible/dev_guide/developing_modules_documenting.html
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community',
+    'shipped_by': 'other',
+    'other_repo_url': 'https://github.com/zhmcclient/zhmc-ansible-modules'
+}
+
+DOCUMENTATION = """
+---
+module: zhmc_snapshot
+version_added: "2.9.0"
+short_description: Snapshot of the resources managed by an HMC
+description:
+  - Retrieve the full properties of the resources managed by an HMC in a single
+    walk and write them as a snapshot to a file. The module returns only a
+    summary of the snapshot.
+  - "The walk covers: CPCs; partitions and their NICs, HBAs and virtual
+    functions; LPARs; adapters and their ports; virtual switches; storage
+    groups and their storage volumes; users, user roles and password rules."
+  - Each resource is retrieved from the HMC only once, and independent HMC
+    operations are performed in parallel, bounded by C(max_workers).
+  - "The snapshot file is written on the system the module runs on, so the
+    module is typically used with C(delegate_to: localhost)."
+  - "The snapshot is normalized: In the C(json) format, it is a JSON object
+    with the items C(hmc) (HMC version information) and C(resources) (a JSON
+    object with the HMC resource class names as keys, and lists of the
+    resource properties sorted by resource URI as values). In the C(jsonl)
+    format, the first line is a JSON object with item C(hmc), and each
+    subsequent line is a JSON object with items C(class) and C(properties)
+    for one resource, in the same order. Resources reference each other by
+    URI properties (e.g. C(parent), C(nic-uris))."
+  - The file is written one resource at a time, and only if its content
+    changes. The module reports a change in that case.
+  - "The values of properties whose names indicate secrets (e.g.
+    C(password)) are replaced with C(********) in the snapshot file."
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - "The HMC userid must have object-access permissions to the resources to
+    be included, and task permission to the 'Manage Users', 'Manage User
+    Roles' and 'Manage Password Rules' tasks for including those resources.
+    In addition, for storage groups, the 'Configure Storage - System
+    Programmer' task permission is needed."
+options:
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - The authentication credentials for the HMC.
+    type: dict
+    required: true
+    suboptions:
+      userid:
+        description:
+          - The userid (username) for authenticating with the HMC.
+        type: str
+        required: true
+      password:
+        description:
+          - The password for authenticating with the HMC.
+        type: str
+        required: true
+      ca_certs:
+        description:
+          - Path name of certificate file or certificate directory to be used
+            for verifying the HMC certificate. If null (default), the path name
+            in the 'REQUESTS_CA_BUNDLE' environment variable or the path name
+            in the 'CURL_CA_BUNDLE' environment variable is used, or if neither
+            of these variables is set, the certificates in the Mozilla CA
+            Certificate List provided by the 'certifi' Python package are used
+            for verifying the HMC certificate.
+        type: str
+        required: false
+        default: null
+      verify:
+        description:
+          - If True (default), verify the HMC certificate as specified in the
+            C(ca_certs) parameter. If False, ignore what is specified in the
+            C(ca_certs) parameter and do not verify the HMC certificate.
+        type: bool
+        required: false
+        default: true
+  snapshot_file:
+    description:
+      - Path name of the snapshot file to be written.
+    type: str
+    required: true
+  format:
+    description:
+      - "Format of the snapshot file:"
+      - "* C(json): A single JSON object."
+      - "* C(jsonl): JSON Lines, with one line per resource."
+    type: str
+    required: false
+    default: json
+    choices: ['json', 'jsonl']
+  cpc_names:
+    description:
+      - Names of the CPCs to be included in the snapshot, with their
+        partitions, LPARs, adapters and storage groups. If empty (default),
+        all managed CPCs are included.
+    type: list
+    elements: str
+    required: false
+    default: []
+  include:
+    description:
+      - "Kinds of resources to be included in the snapshot, in addition to
+         the CPCs. Child resources are included with their parents
+         (e.g. NICs with partitions, storage volumes with storage groups).
+         Virtual switches are included with adapters."
+    type: list
+    elements: str
+    required: false
+    default: ['partitions', 'lpars', 'adapters', 'storage_groups', 'users',
+              'user_roles', 'password_rules']
+    choices: ['partitions', 'lpars', 'adapters', 'storage_groups', 'users',
+              'user_roles', 'password_rules']
+  max_workers:
+    description:
+      - Maximum number of HMC operations that are performed in parallel.
+        1 performs all HMC operations serially.
+    type: int
+    required: false
+    default: 8
+  log_file:
+    description:
+      - "File path of a log file to which the logic flow of this module as well
+         as interactions with the HMC are logged. If null, logging will be
+         propagated to the Python root logger."
+    type: str
+    required: false
+    default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
+  _faked_session:
+    description:
+      - "An internal parameter used for testing the module."
+    required: false
+    type: raw
+    default: null
+"""
+
+EXAMPLES = """
+---
+# Note: The following examples assume that some variables named 'my_*' are set.
+
+- name: Write a snapshot of the HMC to a file on the control node
+  zhmc_snapshot:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    snapshot_file: "snapshots/{{ my_hmc_host }}.json"
+  delegate_to: localhost
+  register: snapshot_result
+
+- name: Write a snapshot of the partitions of a CPC in JSON Lines format
+  zhmc_snapshot:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    snapshot_file: "snapshots/{{ my_cpc_name }}.jsonl"
+    format: jsonl
+    cpc_names:
+      - "{{ my_cpc_name }}"
+    include:
+      - partitions
+  delegate_to: localhost
+"""
+
+RETURN = """
+changed:
+  description: Indicates if the snapshot file has been written, i.e. if it did
+    not exist or its content has changed.
+  returned: always
+  type: bool
+msg:
+  description: An error message that describes the failure.
+  returned: failure
+  type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
+snapshot:
+  description: Summary of the snapshot.
+  returned: success
+  type: dict
+  contains:
+    snapshot_file:
+      description: "Path name of the snapshot file"
+      type: str
+    format:
+      description: "Format of the snapshot file ('json', 'jsonl')"
+      type: str
+    hmc_version:
+      description: "HMC version"
+      type: str
+    resource_count:
+      description: "Total number of resources in the snapshot"
+      type: int
+    resource_counts:
+      description: "Number of resources in the snapshot, by HMC resource
+        class name"
+      type: dict
+  sample:
+    {
+        "snapshot_file": "snapshots/10.11.12.13.json",
+        "format": "json",
+        "hmc_version": "2.15.0",
+        "resource_count": 7,
+        "resource_counts": {
+            "cpc": 1,
+            "partition": 2,
+            "nic": 2,
+            "adapter": 1,
+            "network-port": 1
+        }
+    }
+"""
+
+import os  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import traceback  # noqa: E402
+from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+
+from ..module_utils.common import log_init, Error, get_hmc_auth, get_session, \
+    missing_required_lib, common_fail_on_import_errors, parallel_map, \
+    PropertiesCache, retry_result, scrub_secrets, \
+    JsonLinesWriter  # noqa: E402
+
+try:
+    import requests.packages.urllib3
+    IMP_URLLIB3_ERR = None
+except ImportError:
+    IMP_URLLIB3_ERR = traceback.format_exc()
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Python logger name for this module
+LOGGER_NAME = 'zhmc_snapshot'
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Properties of partitions with the URIs of their child resources, and the
+# name of the attribute of zhmcclient.Partition with their manager
+PARTITION_CHILD_URI_PROPS = (
+    ('nic-uris', 'nics'),
+    ('hba-uris', 'hbas'),
+    ('virtual-function-uris', 'virtual_functions'),
+)
+
+# Properties of adapters with the URIs of their ports
+ADAPTER_PORT_URI_PROPS = ('network-port-uris', 'storage-port-uris')
+
+
+class Snapshot(object):
+    """
+    The resources of a snapshot, with their properties by HMC resource class.
+    """
+
+    def __init__(self):
+        self.resources = {}
+
+    def add(self, resource, properties):
+        """
+        Add the properties of a resource.
+        """
+        class_name = properties.get('class') or resource.manager.class_name
+        self.resources.setdefault(class_name, []).append(properties)
+
+    def counts(self):
+        """
+        Return the number of resources by HMC resource class name.
+        """
+        return dict((c, len(r)) for c, r in self.resources.items())
+
+    def sorted_resources(self):
+        """
+        Return the resources as a list of tuple(class_name, properties),
+        sorted by class name and resource URI.
+        """
+        result = []
+        for class_name in sorted(self.resources):
+            props_list = sorted(
+                self.resources[class_name], key=resource_uri)
+            result.extend((class_name, p) for p in props_list)
+        return result
+
+
+def resource_uri(properties):
+    """
+    Return the URI of a resource from its properties.
+    """
+    return properties.get('element-uri') or properties.get('object-uri')
+
+
+def walk_hmc(client, cpc_names, include, max_workers):
+    """
+    Walk the resources managed by the HMC and return a Snapshot object.
+
+    Raises:
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    snapshot = Snapshot()
+    cache = PropertiesCache()
+
+    def pull_all(resources):
+        resources = [r for r in resources if r.uri not in cache]
+        props_list = parallel_map(cache.pull, resources, max_workers)
+        for resource, properties in zip(resources, props_list):
+            snapshot.add(resource, properties)
+        return props_list
+
+    def list_all(list_funcs):
+        lists = parallel_map(lambda func: func(), list_funcs, max_workers)
+        return [r for resources in lists for r in resources]
+
+    # The first HMC operation is done serially, so that the session is
+    # logged on before the parallel operations.
+    LOGGER.debug("Listing CPCs")
+    cpcs = client.cpcs.list()
+    if cpc_names:
+        cpcs = [cpc for cpc in cpcs if cpc.name in cpc_names]
+    cpc_props = pull_all(cpcs)
+
+    # Children of CPCs
+    list_funcs = []
+    for cpc, properties in zip(cpcs, cpc_props):
+        if properties.get('dpm-enabled'):
+            if 'partitions' in include:
+                list_funcs.append(cpc.partitions.list)
+            if 'adapters' in include:
+                list_funcs.append(cpc.adapters.list)
+                list_funcs.append(cpc.virtual_switches.list)
+        else:
+            if 'lpars' in include:
+                list_funcs.append(cpc.lpars.list)
+    LOGGER.debug("Listing partitions, LPARs, adapters and virtual switches "
+                 "of %d CPCs",
+                 len(cpcs))
+    cpc_children = list_all(list_funcs)
+    LOGGER.debug("Retrieving properties of %d CPC children",
+                 len(cpc_children))
+    pull_all(cpc_children)
+
+    # Children of partitions and adapters, which are referenced by URI in
+    # their properties, so they do not need to be listed
+    elements = []
+    for resource in cpc_children:
+        properties = cache.pull(resource)
+        if isinstance(resource, zhmcclient.Partition):
+            for uri_prop, manager_attr in PARTITION_CHILD_URI_PROPS:
+                manager = getattr(resource, manager_attr)
+                for uri in properties.get(uri_prop) or []:
+                    elements.append(manager.resource_object(uri))
+        elif isinstance(resource, zhmcclient.Adapter):
+            for uri_prop in ADAPTER_PORT_URI_PROPS:
+                for uri in properties.get(uri_prop) or []:
+                    elements.append(resource.ports.resource_object(uri))
+    LOGGER.debug("Retrieving properties of %d NICs, HBAs, virtual functions "
+                 "and ports", len(elements))
+    pull_all(elements)
+
+    console = client.consoles.console
+
+    if 'storage_groups' in include:
+        LOGGER.debug("Listing storage groups")
+        cpc_uris = set(cpc.uri for cpc in cpcs)
+        storage_groups = [
+            sg for sg in console.storage_groups.list()
+            if sg.get_property('cpc-uri') in cpc_uris]
+        pull_all(storage_groups)
+        # The storage volumes are created from the 'storage-volume-uris'
+        # property, because the 'List Storage Volumes of a Storage Group'
+        # operation returns an empty list for auto-discovered volumes.
+        volumes = []
+        for sg in storage_groups:
+            properties = cache.pull(sg)
+            for uri in properties.get('storage-volume-uris') or []:
+                volumes.append(sg.storage_volumes.resource_object(uri))
+        LOGGER.debug("Retrieving properties of %d storage volumes of %d "
+                     "storage groups", len(volumes), len(storage_groups))
+        pull_all(volumes)
+
+    console_list_funcs = []
+    if 'users' in include:
+        console_list_funcs.append(console.users.list)
+    if 'user_roles' in include:
+        console_list_funcs.append(console.user_roles.list)
+    if 'password_rules' in include:
+        console_list_funcs.append(console.password_rules.list)
+    if console_list_funcs:
+        LOGGER.debug("Listing users, user roles and password rules")
+        pull_all(list_all(console_list_funcs))
+
+    return snapshot
+
+
+def indent_json(value, indent):
+    """
+    Return the JSON representation of a value with an indentation of 2 per
+    level, for a value that is nested at the specified indentation.
+    """
+    text = json.dumps(value, indent=2, sort_keys=True, separators=(',', ': '))
+    return text.replace('\n', '\n' + ' ' * indent)
+
+
+class JsonSnapshotWriter(JsonLinesWriter):
+    """
+    Writes a snapshot file in the C(json) format one resource at a time, with
+    the same content as a JSON object with the items 'hmc' and 'resources'
+    that is formatted with an indentation of 2 and sorted keys.
+
+    The resources must be appended sorted by class name. Apart from the file
+    format, it behaves like JsonLinesWriter.
+    """
+
+    def __init__(self, output_file, check_mode, hmc_info):
+        super(JsonSnapshotWriter, self).__init__(output_file, check_mode)
+        self._class_name = None
+        self._write('{\n  "hmc": ' + indent_json(hmc_info, 2) +
+                    ',\n  "resources": {')
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        if exc_type is None:
+            if self._class_name is None:
+                self._write('}\n}\n')
+            else:
+                self._write('\n    ]\n  }\n}\n')
+        return super(JsonSnapshotWriter, self).__exit__(
+            exc_type, exc_value, traceback_)
+
+    def append(self, item):
+        """
+        Write a resource (a dict with items 'class' and 'properties') to the
+        file.
+        """
+        class_name = item['class']
+        if class_name == self._class_name:
+            self._write(',\n      ')
+        else:
+            if self._class_name is not None:
+                self._write('\n    ],')
+            self._write('\n    ' + json.dumps(class_name) + ': [\n      ')
+            self._class_name = class_name
+        self._write(indent_json(item['properties'], 6))
+        self.count += 1
+
+
+def write_snapshot(snapshot, hmc_info, fmt, snapshot_file, check_mode):
+    """
+    Write the snapshot to the snapshot file one resource at a time, with
+    secrets in the resource properties scrubbed, and return whether the file
+    content has changed.
+
+    The file is replaced atomically and only if its content has changed, so
+    readers never see a partially written snapshot. In check mode, the file
+    is not written.
+    """
+    if fmt == 'jsonl':
+        writer = JsonLinesWriter(snapshot_file, check_mode)
+    else:
+        writer = JsonSnapshotWriter(snapshot_file, check_mode, hmc_info)
+    with writer:
+        if fmt == 'jsonl':
+            writer.append({'hmc': hmc_info})
+        for class_name, properties in snapshot.sorted_resources():
+            writer.append({'class': class_name,
+                           'properties': scrub_secrets(properties)})
+    return writer.changed
+
+
+def perform_task(params, check_mode):
+    """
+    Take the snapshot, write it to the snapshot file, and return a summary.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    snapshot_file = os.path.expanduser(params['snapshot_file'])
+    fmt = params['format']
+    cpc_names = params['cpc_names']
+    include = params['include']
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)  # No default specified
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        api_version = client.query_api_version()
+        hmc_info = {
+            'hmc-name': api_version.get('hmc-name'),
+            'hmc-version': api_version.get('hmc-version'),
+            'api-major-version': api_version.get('api-major-version'),
+            'api-minor-version': api_version.get('api-minor-version'),
+        }
+
+        snapshot = walk_hmc(client, cpc_names, include, max_workers)
+        # The default exception handling is sufficient for the above.
+
+    finally:
+        session.logoff()
+
+    changed = write_snapshot(
+        snapshot, hmc_info, fmt, snapshot_file, check_mode)
+
+    counts = snapshot.counts()
+    result = {
+        'snapshot_file': snapshot_file,
+        'format': fmt,
+        'hmc_version': hmc_info['hmc-version'],
+        'resource_count': sum(counts.values()),
+        'resource_counts': counts,
+    }
+    return changed, result
+
+
+def main():
+
+    # The following definition of module input parameters must match the
+    # description of the options in the DOCUMENTATION string.
+    include_choices = ['partitions', 'lpars', 'adapters', 'storage_groups',
+                       'users', 'user_roles', 'password_rules']
+    argument_spec = dict(
+        hmc_host=dict(required=True, type='str'),
+        hmc_auth=dict(
+            required=True,
+            type='dict',
+            options=dict(
+                userid=dict(required=True, type='str'),
+                password=dict(required=True, type='str', no_log=True),
+                ca_certs=dict(required=False, type='str', default=None),
+                verify=dict(required=False, type='bool', default=True),
+            ),
+        ),
+        snapshot_file=dict(required=True, type='str'),
+        format=dict(required=False, type='str', default='json',
+                    choices=['json', 'jsonl']),
+        cpc_names=dict(required=False, type='list', elements='str',
+                       default=[]),
+        include=dict(required=False, type='list', elements='str',
+                     default=include_choices, choices=include_choices),
+        max_workers=dict(required=False, type='int', default=8),
+        log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
+        _faked_session=dict(required=False, type='raw'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True)
+
+    if IMP_URLLIB3_ERR is not None:
+        module.fail_json(msg=missing_required_lib("requests"),
+                         exception=IMP_URLLIB3_ERR)
+
+    requests.packages.urllib3.disable_warnings()
+
+    if IMP_ZHMCCLIENT_ERR is not None:
+        module.fail_json(msg=missing_required_lib("zhmcclient"),
+                         exception=IMP_ZHMCCLIENT_ERR)
+
+    common_fail_on_import_errors(module)
+
+    log_file = module.params['log_file']
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
+
+    _params = dict(module.params)
+    del _params['hmc_auth']
+    LOGGER.debug("Module entry: params: %r", _params)
+
+    try:
+
+        changed, result = perform_task(module.params, module.check_mode)
+
+    except (Error, zhmcclient.Error) as exc:
+        # These exceptions are considered errors in the environment or in user
+        # input. They have a proper message that stands on its own, so we
+        # simply pass that message on and will not need a traceback.
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug(
+            "Module exit (failure): msg: %s", msg)
+        module.fail_json(msg=msg)
+    # Other exceptions are considered module errors and are handled by Ansible
+    # by showing the traceback.
+
+    LOGGER.debug(
+        "Module exit (success): changed: %r, snapshot: %r", changed, result)
+    module.exit_json(changed=changed, snapshot=result, **retry_result())
+
+
+if __name__ == '__main__':
+    main()
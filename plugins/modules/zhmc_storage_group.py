@@ -161,6 +161,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -219,6 +227,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 storage_group:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -528,7 +542,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, \
+    missing_required_lib, common_fail_on_import_errors, \
+    retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -611,6 +627,9 @@ ZHMC_STORAGE_GROUP_PROPERTIES = {
     'unassigned-worldwide-port-names': (False, False, False, None, None, None),
 }
 
+# Compiled form of ZHMC_STORAGE_GROUP_PROPERTIES
+ZHMC_STORAGE_GROUP_SCHEMA = PropertySchema(ZHMC_STORAGE_GROUP_PROPERTIES)
+
 
 def process_properties(cpc, storage_group, params):
     """
@@ -692,7 +711,7 @@ def process_properties(cpc, storage_group, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_STORAGE_GROUP_PROPERTIES, input_props,
+            prop_name, ZHMC_STORAGE_GROUP_SCHEMA, input_props,
             storage_group)
         create_props.update(_create_props)
         update_props.update(_update_props)
@@ -813,12 +832,12 @@ def ensure_present(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            storage_group = console.storage_groups.find(
-                name=storage_group_name)
+            storage_group = find_by_name(
+                console.storage_groups, storage_group_name)
         except zhmcclient.NotFound:
             storage_group = None
 
@@ -897,12 +916,12 @@ def ensure_absent(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            storage_group = console.storage_groups.find(
-                name=storage_group_name)
+            storage_group = find_by_name(
+                console.storage_groups, storage_group_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -954,9 +973,10 @@ def facts(params, check_mode):
         # The default exception handling is sufficient for this code
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
 
-        storage_group = console.storage_groups.find(name=storage_group_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
         storage_group.pull_full_properties()
 
         sg_cpc = storage_group.cpc
@@ -1018,6 +1038,8 @@ def main():
         properties=dict(required=False, type='dict', default={}),
         expand=dict(required=False, type='bool', default=False),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1038,7 +1060,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1061,7 +1084,7 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, storage_group=result)
+    module.exit_json(changed=changed, storage_group=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -134,6 +134,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -186,6 +194,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 storage_group_attachment:
   description: "Attachment state of the storage group. If no check mode was
     requested, the attachment state after any changes is returned. If check
@@ -209,7 +223,7 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, \
     get_hmc_auth, get_session, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    common_fail_on_import_errors, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -253,9 +267,10 @@ def ensure_attached(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         attached_partitions = storage_group.list_attached_partitions(
@@ -308,9 +323,10 @@ def ensure_detached(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         attached_partitions = storage_group.list_attached_partitions(
@@ -363,9 +379,10 @@ def facts(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
-        cpc.partitions.find(name=partition_name)  # check existance
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
+        find_by_name(cpc.partitions, partition_name)  # check existance
         # The default exception handling is sufficient for the above.
 
         attached_partitions = storage_group.list_attached_partitions(
@@ -432,6 +449,8 @@ def main():
         state=dict(required=True, type='str',
                    choices=['detached', 'attached', 'facts']),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -452,7 +471,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -475,7 +495,8 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, storage_group_attachment=result)
+    module.exit_json(
+        changed=changed, storage_group_attachment=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -152,6 +152,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -208,6 +216,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 storage_volume:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -259,7 +273,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     eq_hex, get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, \
+    missing_required_lib, common_fail_on_import_errors, \
+    retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -333,6 +349,9 @@ ZHMC_STORAGE_VOLUME_PROPERTIES = {
     # 'type': 'fc' or 'fcp', as defined in its storage group
 }
 
+# Compiled form of ZHMC_STORAGE_VOLUME_PROPERTIES
+ZHMC_STORAGE_VOLUME_SCHEMA = PropertySchema(ZHMC_STORAGE_VOLUME_PROPERTIES)
+
 
 def process_properties(cpc, storage_group, storage_volume, params):
     """
@@ -409,7 +428,7 @@ def process_properties(cpc, storage_group, storage_volume, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_STORAGE_VOLUME_PROPERTIES, input_props,
+            prop_name, ZHMC_STORAGE_VOLUME_SCHEMA, input_props,
             storage_volume)
         create_props.update(_create_props)
         update_props.update(_update_props)
@@ -459,8 +478,9 @@ def ensure_present(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
         # The default exception handling is sufficient for the above.
 
         sg_cpc = storage_group.cpc
@@ -471,8 +491,8 @@ def ensure_present(params, check_mode):
                 format(storage_group_name, cpc.name, sg_cpc.name))
 
         try:
-            storage_volume = storage_group.storage_volumes.find(
-                name=storage_volume_name)
+            storage_volume = find_by_name(
+                storage_group.storage_volumes, storage_volume_name)
         except zhmcclient.NotFound:
             storage_volume = None
         except zhmcclient.NoUniqueMatch:
@@ -559,8 +579,9 @@ def ensure_absent(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
         # The default exception handling is sufficient for the above.
 
         sg_cpc = storage_group.cpc
@@ -571,8 +592,8 @@ def ensure_absent(params, check_mode):
                 format(storage_group_name, cpc.name, sg_cpc.name))
 
         try:
-            storage_volume = storage_group.storage_volumes.find(
-                name=storage_volume_name)
+            storage_volume = find_by_name(
+                storage_group.storage_volumes, storage_volume_name)
         except zhmcclient.NotFound:
             return changed, result
         except zhmcclient.NoUniqueMatch:
@@ -614,8 +635,9 @@ def facts(params, check_mode):
     try:
         client = zhmcclient.Client(session)
         console = client.consoles.console
-        cpc = client.cpcs.find(name=cpc_name)
-        storage_group = console.storage_groups.find(name=storage_group_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        storage_group = find_by_name(
+            console.storage_groups, storage_group_name)
         # The default exception handling is sufficient for the above.
 
         sg_cpc = storage_group.cpc
@@ -626,8 +648,8 @@ def facts(params, check_mode):
                 format(storage_group_name, cpc.name, sg_cpc.name))
 
         try:
-            storage_volume = storage_group.storage_volumes.find(
-                name=storage_volume_name)
+            storage_volume = find_by_name(
+                storage_group.storage_volumes, storage_volume_name)
         except zhmcclient.NoUniqueMatch:
             # The name of storage volumes within their storage group is not
             # enforced to be unique.
@@ -686,6 +708,8 @@ def main():
                    choices=['absent', 'present', 'facts']),
         properties=dict(required=False, type='dict', default={}),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -706,7 +730,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -729,7 +754,7 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %r", changed, result)
-    module.exit_json(changed=changed, storage_volume=result)
+    module.exit_json(changed=changed, storage_volume=result, **retry_result())
 
 
 if __name__ == '__main__':
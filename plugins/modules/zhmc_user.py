@@ -146,6 +146,18 @@ options:
     type: bool
     required: false
     default: false
+  check_mode_snapshot:
+    description:
+      - "Path name of a snapshot file written by the zhmc_snapshot module. If
+         specified and the module runs in check mode, the module does not
+         access the HMC, but runs against a faked HMC that is loaded from the
+         snapshot file. In that case, the changes are performed on the faked
+         HMC, so that the result reflects the actual behavior of the module
+         more closely. The snapshot file is not changed. Ignored if not in
+         check mode."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -154,6 +166,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -212,6 +232,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 user:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -388,7 +414,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, \
+    missing_required_lib, common_fail_on_import_errors, \
+    snapshot_check_mode, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -500,6 +528,9 @@ ZHMC_USER_PROPERTIES = {
     'user_role_objects': (False, False, False, None, None, None),
 }
 
+# Compiled form of ZHMC_USER_PROPERTIES
+ZHMC_USER_SCHEMA = PropertySchema(ZHMC_USER_PROPERTIES)
+
 
 def process_properties(console, user, params):
     """
@@ -679,7 +710,7 @@ def process_properties(console, user, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_USER_PROPERTIES, input_props, user)
+            prop_name, ZHMC_USER_SCHEMA, input_props, user)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -937,7 +968,7 @@ def ensure_present(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            user = console.users.find(name=user_name)
+            user = find_by_name(console.users, user_name)
         except zhmcclient.NotFound:
             user = None
 
@@ -1055,7 +1086,7 @@ def ensure_absent(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            user = console.users.find(name=user_name)
+            user = find_by_name(console.users, user_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -1094,7 +1125,7 @@ def facts(params, check_mode):
         client = zhmcclient.Client(session)
         console = client.consoles.console
 
-        user = console.users.find(name=user_name)
+        user = find_by_name(console.users, user_name)
         user.pull_full_properties()
 
         result = dict(user.properties)
@@ -1112,12 +1143,15 @@ def perform_task(params, check_mode):
     parameter.
 
     If check_mode is True, check whether changes would occur, but don't
-    actually perform any changes.
+    actually perform any changes. If in addition a snapshot file is specified
+    in the 'check_mode_snapshot' module parameter, the changes are performed
+    on a faked HMC loaded from the snapshot.
 
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    params, check_mode = snapshot_check_mode(params, check_mode)
     actions = {
         "absent": ensure_absent,
         "present": ensure_present,
@@ -1147,7 +1181,10 @@ def main():
                    choices=['absent', 'present', 'facts']),
         properties=dict(required=False, type='dict', default={}),
         expand=dict(required=False, type='bool', default=False),
+        check_mode_snapshot=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1168,7 +1205,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1191,7 +1229,7 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, user: %r", changed, result)
-    module.exit_json(changed=changed, user=result)
+    module.exit_json(changed=changed, user=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -217,6 +217,18 @@ options:
                 specified CPC (in DPM mode)."
               - "Requires C(cpc) to be specified as a scoping item."
             type: str
+  check_mode_snapshot:
+    description:
+      - "Path name of a snapshot file written by the zhmc_snapshot module. If
+         specified and the module runs in check mode, the module does not
+         access the HMC, but runs against a faked HMC that is loaded from the
+         snapshot file. In that case, the changes are performed on the faked
+         HMC, so that the result reflects the actual behavior of the module
+         more closely. The snapshot file is not changed. Ignored if not in
+         check mode."
+    type: str
+    required: false
+    default: null
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -225,6 +237,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -282,6 +302,12 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 user_role:
   description:
     - "For C(state=absent), an empty dictionary."
@@ -426,7 +452,9 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     get_hmc_auth, get_session, to_unicode, process_normal_property, \
-    missing_required_lib, common_fail_on_import_errors  # noqa: E402
+    PropertySchema, \
+    missing_required_lib, common_fail_on_import_errors, \
+    snapshot_check_mode, retry_result, find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -488,6 +516,9 @@ ZHMC_USER_ROLE_PROPERTIES = {
     'type': (False, False, False, True, None, None),
 }
 
+# Compiled form of ZHMC_USER_ROLE_PROPERTIES
+ZHMC_USER_ROLE_SCHEMA = PropertySchema(ZHMC_USER_ROLE_PROPERTIES)
+
 
 def process_properties(client, urole, params):
     """
@@ -574,7 +605,7 @@ def process_properties(client, urole, params):
         if prop_name == 'associated_system_defined_user_role_name':
             sys_urole_name = input_props[prop_name]
             try:
-                sys_urole = console.user_roles.find(name=sys_urole_name)
+                sys_urole = find_by_name(console.user_roles, sys_urole_name)
             except zhmcclient.NotFound:
                 raise ParameterError(
                     "Cannot find system-defined user role {0!r} specified in "
@@ -602,7 +633,7 @@ def process_properties(client, urole, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_USER_ROLE_PROPERTIES, input_props, urole)
+            prop_name, ZHMC_USER_ROLE_SCHEMA, input_props, urole)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -639,7 +670,7 @@ def create_check_mode_urole(client, create_props, update_props):
             "Create User Role: {p}".format(p=missing_props),
         })
 
-    optasks_urole = console.user_roles.find(name='hmc-operator-tasks')
+    optasks_urole = find_by_name(console.user_roles, 'hmc-operator-tasks')
 
     # Defaults for properties
     props = {
@@ -813,7 +844,7 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "CPC {n!r}: {i!r}".
                     format(n=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
             tgt_perms[cpc.uri] = ({}, cpc)
         elif 'task' in keys:
             task_name = perm_item2.pop('task')
@@ -826,7 +857,7 @@ def target_perm_dict(client, ansi_permissions):
             kwargs = {}
             if view_only is not None:
                 kwargs['view_only'] = view_only
-            task = console.tasks.find(name=task_name)
+            task = find_by_name(console.tasks, task_name)
             tgt_perms[task.uri] = (kwargs, task)
         elif 'group' in keys:
             group_name = perm_item2.pop('group')
@@ -839,7 +870,7 @@ def target_perm_dict(client, ansi_permissions):
             kwargs = {}
             if include_members is not None:
                 kwargs['include_members'] = include_members
-            group = console.groups.find(name=group_name)
+            group = find_by_name(console.groups, group_name)
             tgt_perms[group.uri] = (kwargs, group)
         elif keys == {'partition', 'cpc'}:
             cpc_name = perm_item2.pop('cpc')
@@ -849,8 +880,8 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "partition {n!r} on CPC {c!r}: {i!r}".
                     format(n=part_name, c=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
-            part = cpc.partitions.find(name=part_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            part = find_by_name(cpc.partitions, part_name)
             tgt_perms[part.uri] = ({}, part)
         elif keys == {'logical_partition', 'cpc'}:
             cpc_name = perm_item2.pop('cpc')
@@ -860,8 +891,8 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "LPAR {n!r} on CPC {c!r}: {i!r}".
                     format(n=lpar_name, c=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
-            lpar = cpc.lpars.find(name=lpar_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            lpar = find_by_name(cpc.lpars, lpar_name)
             tgt_perms[lpar.uri] = (perm_item2, lpar)
         elif keys == {'adapter', 'cpc'}:
             cpc_name = perm_item2.pop('cpc')
@@ -871,8 +902,8 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "adapter {n!r} on CPC {c!r}: {i!r}".
                     format(n=adapter_name, c=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
-            adapter = cpc.adapters.find(name=adapter_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            adapter = find_by_name(cpc.adapters, adapter_name)
             tgt_perms[adapter.uri] = (perm_item2, adapter)
         elif keys == {'storage_group', 'cpc'}:
             cpc_name = perm_item2.pop('cpc')
@@ -882,8 +913,8 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "storage group {n!r} on CPC {c!r}: {i!r}".
                     format(n=sg_name, c=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
-            sg = cpc.storage_groups.find(name=sg_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            sg = find_by_name(cpc.storage_groups, sg_name)
             tgt_perms[sg.uri] = (perm_item2, sg)
         elif keys == {'storage_group_template', 'cpc'}:
             cpc_name = perm_item2.pop('cpc')
@@ -893,8 +924,8 @@ def target_perm_dict(client, ansi_permissions):
                     "Invalid additional items in permission item for "
                     "storage group template {n!r} on CPC {c!r}: {i!r}".
                     format(n=st_name, c=cpc_name, i=perm_item2))
-            cpc = client.cpcs.find(name=cpc_name)
-            st = cpc.storage_group_templates.find(name=st_name)
+            cpc = find_by_name(client.cpcs, cpc_name)
+            st = find_by_name(cpc.storage_group_templates, st_name)
             tgt_perms[st.uri] = (perm_item2, st)
         else:
             raise ParameterError(
@@ -1016,7 +1047,7 @@ def ensure_present(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            urole = console.user_roles.find(name=urole_name)
+            urole = find_by_name(console.user_roles, urole_name)
         except zhmcclient.NotFound:
             urole = None
 
@@ -1163,7 +1194,7 @@ def ensure_absent(params, check_mode):
         # The default exception handling is sufficient for the above.
 
         try:
-            urole = console.user_roles.find(name=urole_name)
+            urole = find_by_name(console.user_roles, urole_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -1201,7 +1232,7 @@ def facts(params, check_mode):
         client = zhmcclient.Client(session)
         console = client.consoles.console
 
-        urole = console.user_roles.find(name=urole_name)
+        urole = find_by_name(console.user_roles, urole_name)
         urole.pull_full_properties()
 
         result = dict(urole.properties)
@@ -1230,12 +1261,15 @@ def perform_task(params, check_mode):
     parameter.
 
     If check_mode is True, check whether changes would occur, but don't
-    actually perform any changes.
+    actually perform any changes. If in addition a snapshot file is specified
+    in the 'check_mode_snapshot' module parameter, the changes are performed
+    on a faked HMC loaded from the snapshot.
 
     Raises:
       ParameterError: An issue with the module parameters.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    params, check_mode = snapshot_check_mode(params, check_mode)
     actions = {
         "absent": ensure_absent,
         "present": ensure_present,
@@ -1264,7 +1298,10 @@ def main():
         state=dict(required=True, type='str',
                    choices=['absent', 'present', 'facts']),
         properties=dict(required=False, type='dict', default={}),
+        check_mode_snapshot=dict(required=False, type='str', default=None),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -1285,7 +1322,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -1309,7 +1347,7 @@ def main():
     LOGGER.debug(
         "Module exit (success): changed: %r, user_role: %r",
         changed, result)
-    module.exit_json(changed=changed, user_role=result)
+    module.exit_json(changed=changed, user_role=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -36,6 +36,17 @@ short_description: Create virtual functions in partitions
 description:
   - Create, update, or delete a virtual function in a partition of a CPC
     (Z system).
+  - "In batch mode (if C(virtual_functions) is specified), this is done for
+    many virtual functions in many partitions of the CPC in a single task.
+    The backing adapters are looked up only once, the virtual functions of
+    each partition are retrieved once, the updates of the virtual functions
+    of a partition retrieve the partition status and wait for a partition
+    status transition only once, and the partitions are processed in
+    parallel, bounded by C(max_workers). All items are validated before
+    anything is changed. If an error occurs for a partition, the other
+    partitions are still processed, and the module fails with the
+    C(virtual_functions) return value showing which items have been
+    processed."
   - Note that the Ansible module zhmc_partition can be used to gather facts
     about existing virtual functions of a partition.
 author:
@@ -99,15 +110,19 @@ options:
     required: true
   partition_name:
     description:
-      - The name of the partition containing the virtual function.
+      - The name of the partition containing the virtual function. Required,
+        unless C(virtual_functions) is specified.
     type: str
-    required: true
+    required: false
+    default: null
   name:
     description:
       - The name of the target virtual function that is managed. If the virtual
-        function needs to be created, this value becomes its name.
+        function needs to be created, this value becomes its name. Required,
+        unless C(virtual_functions) is specified.
     type: str
-    required: true
+    required: false
+    default: null
   state:
     description:
       - "The desired state for the virtual function. All states are fully
@@ -143,6 +158,41 @@ options:
     type: dict
     required: false
     default: null
+  virtual_functions:
+    description:
+      - "The target virtual functions for batch mode, each in a partition. If
+         specified, C(partition_name) and C(name) must not be specified,
+         C(properties) is ignored, and C(state) applies to all target virtual
+         functions. The partitions must exist."
+    type: list
+    elements: dict
+    required: false
+    default: null
+    suboptions:
+      partition_name:
+        description:
+          - The name of the partition containing the virtual function.
+        type: str
+        required: true
+      name:
+        description:
+          - The name of the virtual function.
+        type: str
+        required: true
+      properties:
+        description:
+          - Input properties for the virtual function, as described for the
+            C(properties) module parameter.
+        type: dict
+        required: false
+        default: null
+  max_workers:
+    description:
+      - Maximum number of partitions that are processed in parallel in batch
+        mode. 1 processes the partitions serially.
+    type: int
+    required: false
+    default: 8
   log_file:
     description:
       - "File path of a log file to which the logic flow of this module as well
@@ -151,6 +201,14 @@ options:
     type: str
     required: false
     default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
   _faked_session:
     description:
       - "An internal parameter used for testing the module."
@@ -185,6 +243,26 @@ EXAMPLES = """
     partition_name: "{{ my_partition_name }}"
     name: "{{ my_vfunction_name }}"
     state: absent
+
+- name: Ensure a zEDC virtual function exists in many partitions
+  zhmc_virtual_function:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    state: present
+    virtual_functions:
+      - partition_name: "prod-db1"
+        name: "vf-zedc"
+        properties:
+          adapter_name: "ZEDC-1"
+          device_number: "0400"
+      - partition_name: "prod-db2"
+        name: "vf-zedc"
+        properties:
+          adapter_name: "ZEDC-1"
+          device_number: "0400"
+    max_workers: 16
+  register: vfunction_batch
 """
 
 RETURN = """
@@ -197,12 +275,18 @@ msg:
   description: An error message that describes the failure.
   returned: failure
   type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
 virtual_function:
   description:
     - "For C(state=absent), an empty dictionary."
     - "For C(state=present), the resource properties of the virtual function
        after any changes."
-  returned: success
+  returned: success, if virtual_functions is not specified
   type: dict
   contains:
     name:
@@ -213,6 +297,47 @@ virtual_function:
         in the data model of the 'Virtual Function' element object of the
         'Partition' object in the :term:`HMC API` book.
         The property names have hyphens (-) as described in that book."
+virtual_functions:
+  description: The result for each item of the C(virtual_functions) module
+    parameter, in the same order.
+  returned: success, or failure after partitions have been processed, if
+    virtual_functions is specified
+  type: list
+  elements: dict
+  contains:
+    partition_name:
+      description: "Name of the partition of the virtual function"
+      type: str
+    name:
+      description: "Virtual function name"
+      type: str
+    changed:
+      description: "Indicates if the virtual function has been changed"
+      type: bool
+    msg:
+      description: "The error message, if an error occurred for the
+        partition of the virtual function before this item has been
+        processed."
+      type: str
+    properties:
+      description: "For C(state=present), the resource properties of the
+        virtual function after any changes, as described for the
+        C(virtual_function) return value. Empty for C(state=absent), and for
+        virtual functions that would be created in check mode."
+      type: dict
+  sample:
+    [
+        {
+            "partition_name": "prod-db1",
+            "name": "vf-zedc",
+            "changed": true,
+            "properties": {
+                "name": "vf-zedc",
+                "device-number": "0400",
+                "adapter-uri": "/api/adapters/a1"
+            }
+        }
+    ]
 """
 
 import logging  # noqa: E402
@@ -221,8 +346,10 @@ from ansible.module_utils.basic import AnsibleModule  # noqa: E402
 
 from ..module_utils.common import log_init, Error, ParameterError, \
     wait_for_transition_completion, eq_hex, get_hmc_auth, get_session, \
-    to_unicode, process_normal_property, missing_required_lib, \
-    common_fail_on_import_errors  # noqa: E402
+    to_unicode, process_normal_property, \
+    PropertySchema, missing_required_lib, parallel_map, \
+    SelectedPropertiesPuller, common_fail_on_import_errors, retry_result, \
+    find_by_name  # noqa: E402
 
 try:
     import requests.packages.urllib3
@@ -283,8 +410,29 @@ ZHMC_VFUNCTION_PROPERTIES = {
     'class': (False, False, False, None, None, None),
 }
 
+# Compiled form of ZHMC_VFUNCTION_PROPERTIES
+ZHMC_VFUNCTION_SCHEMA = PropertySchema(ZHMC_VFUNCTION_PROPERTIES)
+
 
-def process_properties(partition, vfunction, params):
+def adapter_uri(cpc, adapter_name):
+    """
+    Return the URI of the adapter backing a virtual function, by the adapter
+    name specified in the artificial property.
+
+    Raises:
+      ParameterError: The adapter does not exist.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    try:
+        adapter = find_by_name(cpc.adapters, adapter_name)
+    except zhmcclient.NotFound:
+        raise ParameterError(
+            "Artificial property {0!r} does not specify the name of an "
+            "existing adapter: {1!r}".format('adapter_name', adapter_name))
+    return adapter.uri
+
+
+def process_properties(partition, vfunction, params, adapter_uris=None):
     """
     Process the properties specified in the 'properties' module parameter,
     and return two dictionaries (create_props, update_props) that contain
@@ -310,7 +458,11 @@ def process_properties(partition, vfunction, params):
         with the full set of current properties, or `None` if it did not
         previously exist.
 
-      params (dict): Module input parameters.
+      params (dict): Module input parameters, or an item of the
+        'virtual_functions' module parameter.
+
+      adapter_uris (dict): URIs of the adapters by adapter name that have
+        already been looked up, or `None` to look up the adapter.
 
     Returns:
       tuple of (create_props, update_props, stop), where:
@@ -363,7 +515,7 @@ def process_properties(partition, vfunction, params):
 
         # Process a normal (= non-artificial) property
         _create_props, _update_props, _stop = process_normal_property(
-            prop_name, ZHMC_VFUNCTION_PROPERTIES, input_props, vfunction)
+            prop_name, ZHMC_VFUNCTION_SCHEMA, input_props, vfunction)
         create_props.update(_create_props)
         update_props.update(_update_props)
         if _stop:
@@ -372,20 +524,16 @@ def process_properties(partition, vfunction, params):
     # Process artificial properties
     if adapter_name_art_name in input_props:
         adapter_name = to_unicode(input_props[adapter_name_art_name])
-        try:
-            adapter = partition.manager.cpc.adapters.find(
-                name=adapter_name)
-        except zhmcclient.NotFound:
-            raise ParameterError(
-                "Artificial property {0!r} does not specify the name of an "
-                "existing adapter: {1!r}".
-                format(adapter_name_art_name, adapter_name))
+        if adapter_uris is None:
+            input_prop_value = adapter_uri(
+                partition.manager.cpc, adapter_name)
+        else:
+            input_prop_value = adapter_uris[adapter_name]
 
         # Here we perform the same logic as in the property loop, just now
         # simplified by the knowledge about the property flags (create, update,
         # etc.).
         hmc_prop_name = 'adapter-uri'
-        input_prop_value = adapter.uri
         if vfunction:
             if vfunction.properties.get(hmc_prop_name) != input_prop_value:
                 update_props[hmc_prop_name] = input_prop_value
@@ -396,6 +544,44 @@ def process_properties(partition, vfunction, params):
     return create_props, update_props, stop
 
 
+def create_vfunction(partition, params, adapter_uris=None):
+    """
+    Create a virtual function in a partition, and update it if there are
+    update-only properties.
+
+    Parameters:
+
+      partition (zhmcclient.Partition): Partition for the virtual function.
+
+      params (dict): Module input parameters, or an item of the
+        'virtual_functions' module parameter.
+
+      adapter_uris (dict): See process_properties().
+
+    Returns:
+      zhmcclient.VirtualFunction: The new virtual function with its full set
+      of properties.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    create_props, update_props, stop = process_properties(
+        partition, None, params, adapter_uris)
+    vfunction = partition.virtual_functions.create(create_props)
+    update2_props = {}
+    for name, value in update_props.items():
+        if name not in create_props:
+            update2_props[name] = value
+    if update2_props:
+        vfunction.update_properties(update2_props)
+    # We refresh the properties after the update, in case an
+    # input property value gets changed (for example, the
+    # partition does that with memory properties).
+    vfunction.pull_full_properties()
+    return vfunction
+
+
 def ensure_present(params, check_mode):
     """
     Ensure that the virtual function exists and has the specified properties.
@@ -420,11 +606,11 @@ def ensure_present(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            partition = cpc.partitions.find(name=partition_name)
+            partition = find_by_name(cpc.partitions, partition_name)
         except zhmcclient.NotFound:
             if check_mode:
                 # Once the partition is created, the virtual function  will
@@ -434,7 +620,8 @@ def ensure_present(params, check_mode):
             raise
 
         try:
-            vfunction = partition.virtual_functions.find(name=vfunction_name)
+            vfunction = find_by_name(
+                partition.virtual_functions, vfunction_name)
             vfunction.pull_full_properties()
         except zhmcclient.NotFound:
             vfunction = None
@@ -443,19 +630,7 @@ def ensure_present(params, check_mode):
             # It does not exist. Create it and update it if there are
             # update-only properties.
             if not check_mode:
-                create_props, update_props, stop = process_properties(
-                    partition, vfunction, params)
-                vfunction = partition.virtual_functions.create(create_props)
-                update2_props = {}
-                for name, value in update_props.items():
-                    if name not in create_props:
-                        update2_props[name] = value
-                if update2_props:
-                    vfunction.update_properties(update2_props)
-                # We refresh the properties after the update, in case an
-                # input property value gets changed (for example, the
-                # partition does that with memory properties).
-                vfunction.pull_full_properties()
+                vfunction = create_vfunction(partition, params)
             else:
                 # TODO: Show props in module result also in check mode.
                 pass
@@ -516,12 +691,13 @@ def ensure_absent(params, check_mode):
         _faked_session, host, userid, password, ca_certs, verify)
     try:
         client = zhmcclient.Client(session)
-        cpc = client.cpcs.find(name=cpc_name)
-        partition = cpc.partitions.find(name=partition_name)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partition = find_by_name(cpc.partitions, partition_name)
         # The default exception handling is sufficient for the above.
 
         try:
-            vfunction = partition.virtual_functions.find(name=vfunction_name)
+            vfunction = find_by_name(
+                partition.virtual_functions, vfunction_name)
         except zhmcclient.NotFound:
             return changed, result
 
@@ -535,10 +711,209 @@ def ensure_absent(params, check_mode):
         session.logoff()
 
 
+def batch_partitions(vfunctions):
+    """
+    Validate the 'virtual_functions' module parameter and return its items
+    grouped by partition, as a dict with the partition names as keys and
+    lists of tuples (index, item) as values.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+    """
+    vfunctions_by_partition = {}
+    for index, item in enumerate(vfunctions):
+        partition_vfunctions = vfunctions_by_partition.setdefault(
+            item['partition_name'], [])
+        if any(i['name'] == item['name'] for _, i in partition_vfunctions):
+            raise ParameterError(
+                "Item {0} in module parameter 'virtual_functions' specifies "
+                "virtual function {1!r} in partition {2!r} again.".
+                format(index, item['name'], item['partition_name']))
+        partition_vfunctions.append((index, item))
+    return vfunctions_by_partition
+
+
+def validate_batch(cpc, vfunctions):
+    """
+    Validate the properties of all items of the 'virtual_functions' module
+    parameter for state 'present', before anything is changed. Each adapter
+    is looked up only once.
+
+    Returns:
+      dict: URIs of the adapters by adapter name.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    adapter_uris = {}
+    for index, item in enumerate(vfunctions):
+        props = item.get('properties') or {}
+        try:
+            if 'adapter_name' in props:
+                adapter_name = to_unicode(props['adapter_name'])
+                if adapter_name not in adapter_uris:
+                    adapter_uris[adapter_name] = adapter_uri(
+                        cpc, adapter_name)
+            process_properties(None, None, item, adapter_uris)
+        except (TypeError, ValueError) as exc:
+            raise ParameterError(
+                "Item {0} in module parameter 'virtual_functions' has an "
+                "invalid property value: {1}".format(index, exc))
+    return adapter_uris
+
+
+def ensure_batch_partition(partition, items, present, check_mode,
+                           adapter_uris, puller):
+    """
+    Ensure the state of the virtual functions of one partition in batch mode,
+    and return the list of tuples (index, result) for the items.
+
+    The virtual functions of the partition are retrieved once, and the
+    updates of existing virtual functions retrieve the partition status and
+    wait for a partition status transition only once.
+
+    If an error occurs, the results of the items that have not been
+    processed have the error message in item 'msg'.
+    """
+
+    def item_result(item, changed, vfunction):
+        return {
+            'partition_name': partition.name,
+            'name': item['name'],
+            'changed': changed,
+            'properties': dict(vfunction.properties) if vfunction else {},
+        }
+
+    results = []
+    try:
+        vfunctions = dict(
+            (vf.name, vf) for vf in
+            partition.virtual_functions.list(full_properties=present))
+        updates = []
+        for index, item in items:
+            vfunction = vfunctions.get(item['name'])
+            changed = False
+            if not present:
+                if vfunction:
+                    if not check_mode:
+                        vfunction.delete()
+                    changed = True
+                vfunction = None
+            elif not vfunction:
+                if not check_mode:
+                    vfunction = create_vfunction(
+                        partition, item, adapter_uris)
+                changed = True
+            else:
+                create_props, update_props, stop = process_properties(
+                    partition, vfunction, item, adapter_uris)
+                if update_props:
+                    # Virtual function properties can all be updated while
+                    # the partition is active, therefore:
+                    if stop:
+                        raise AssertionError()
+                    if not check_mode:
+                        updates.append((index, item, vfunction, update_props))
+                        continue
+                    changed = True
+            results.append((index, item_result(item, changed, vfunction)))
+
+        if updates:
+            puller.pull(partition, ['status'], refresh=True)
+            wait_for_transition_completion(partition, pull_properties=False)
+            for index, item, vfunction, update_props in updates:
+                vfunction.update_properties(update_props)
+                # We refresh the properties after the update, in case an
+                # input property value gets changed.
+                vfunction.pull_full_properties()
+                results.append((index, item_result(item, True, vfunction)))
+    except (Error, zhmcclient.Error) as exc:
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug("Processing of virtual functions failed for partition "
+                     "%r: %s", partition.name, msg)
+        processed = set(index for index, _ in results)
+        for index, item in items:
+            if index not in processed:
+                result = item_result(item, False, None)
+                result['msg'] = msg
+                results.append((index, result))
+    return results
+
+
+def ensure_batch(params, check_mode):
+    """
+    Ensure the state of the virtual functions specified in the
+    'virtual_functions' module parameter.
+
+    All items are validated before anything is changed. An error while
+    processing a partition does not stop the processing of the other
+    partitions; the results of the items of the partition that have not been
+    processed then have an error message in item 'msg'.
+
+    Returns:
+      tuple of (changed, results), where results is the list of results for
+      the items of the 'virtual_functions' module parameter.
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    present = params['state'] == 'present'
+    max_workers = params['max_workers']
+    _faked_session = params.get('_faked_session', None)
+
+    vfunctions_by_partition = batch_partitions(params['virtual_functions'])
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        # The default exception handling is sufficient for the above.
+
+        partitions = dict((p.name, p) for p in cpc.partitions.list())
+        missing = sorted(set(vfunctions_by_partition) - set(partitions))
+        if missing:
+            raise ParameterError(
+                "Partitions specified in module parameter "
+                "'virtual_functions' do not exist in CPC {0!r}: {1}".
+                format(cpc.name, ', '.join(missing)))
+
+        adapter_uris = validate_batch(cpc, params['virtual_functions']) \
+            if present else {}
+        puller = SelectedPropertiesPuller()
+
+        def process_partition(partition_name):
+            return ensure_batch_partition(
+                partitions[partition_name],
+                vfunctions_by_partition[partition_name], present,
+                check_mode, adapter_uris, puller)
+
+        indexed_results = []
+        for results in parallel_map(
+                process_partition, sorted(vfunctions_by_partition),
+                max_workers):
+            indexed_results.extend(results)
+
+    finally:
+        session.logoff()
+
+    results = [result for _, result in sorted(
+        indexed_results, key=lambda index_result: index_result[0])]
+    changed = any(result['changed'] for result in results)
+    return changed, results
+
+
 def perform_task(params, check_mode):
     """
     Perform the task for this module, dependent on the 'state' module
-    parameter.
+    parameter, and on whether the 'virtual_functions' module parameter is
+    specified.
 
     If check_mode is True, check whether changes would occur, but don't
     actually perform any changes.
@@ -548,6 +923,18 @@ def perform_task(params, check_mode):
       StatusError: An issue with the partition status.
       zhmcclient.Error: Any zhmcclient exception can happen.
     """
+    if params.get('virtual_functions') is not None:
+        for name in ('partition_name', 'name'):
+            if params.get(name) is not None:
+                raise ParameterError(
+                    "Module parameter {0!r} must not be specified together "
+                    "with module parameter 'virtual_functions'.".format(name))
+        return ensure_batch(params, check_mode)
+    for name in ('partition_name', 'name'):
+        if params.get(name) is None:
+            raise ParameterError(
+                "Module parameter {0!r} is required unless module parameter "
+                "'virtual_functions' is specified.".format(name))
     actions = {
         "absent": ensure_absent,
         "present": ensure_present,
@@ -572,12 +959,23 @@ def main():
             ),
         ),
         cpc_name=dict(required=True, type='str'),
-        partition_name=dict(required=True, type='str'),
-        name=dict(required=True, type='str'),
+        partition_name=dict(required=False, type='str', default=None),
+        name=dict(required=False, type='str', default=None),
         state=dict(required=True, type='str',
                    choices=['absent', 'present']),
         properties=dict(required=False, type='dict', default={}),
+        virtual_functions=dict(
+            required=False, type='list', elements='dict', default=None,
+            options=dict(
+                partition_name=dict(required=True, type='str'),
+                name=dict(required=True, type='str'),
+                properties=dict(required=False, type='dict', default=None),
+            ),
+        ),
+        max_workers=dict(required=False, type='int', default=8),
         log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
         _faked_session=dict(required=False, type='raw'),
     )
 
@@ -598,7 +996,8 @@ def main():
     common_fail_on_import_errors(module)
 
     log_file = module.params['log_file']
-    log_init(LOGGER_NAME, log_file)
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
 
     _params = dict(module.params)
     del _params['hmc_auth']
@@ -621,7 +1020,20 @@ def main():
 
     LOGGER.debug(
         "Module exit (success): changed: %r, cpc: %s", changed, result)
-    module.exit_json(changed=changed, virtual_function=result)
+    if module.params.get('virtual_functions') is not None:
+        failed = [item for item in result if 'msg' in item]
+        if failed:
+            msg = "Processing failed for {0} of {1} virtual functions: " \
+                "{2}".format(len(failed), len(result), failed[0]['msg'])
+            LOGGER.debug("Module exit (failure): msg: %s, "
+                         "virtual_functions: %r", msg, result)
+            module.fail_json(msg=msg, changed=changed,
+                             virtual_functions=result, **retry_result())
+        module.exit_json(
+            changed=changed, virtual_functions=result, **retry_result())
+    else:
+        module.exit_json(
+            changed=changed, virtual_function=result, **retry_result())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,421 @@
+#!/usr/bin/python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+# For information on the format of the ANSIBLE_METADATA, DOCUMENTATION,
+# EXAMPLES, and RETURN strings, see
+# http://docs.ansible.com/ansible/dev_guide/developing_modules_documenting.html
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community',
+    'shipped_by': 'other',
+    'other_repo_url': 'https://github.com/zhmcclient/zhmc-ansible-modules'
+}
+
+DOCUMENTATION = """
+---
+module: zhmc_wwpn_list
+version_added: "2.9.0"
+short_description: List the WWPNs of the HBAs of partitions (DPM mode)
+description:
+  - List the WWPNs of the HBAs of partitions of a CPC (in DPM mode), e.g. for
+    the zoning in the SAN.
+  - "The WWPNs of all selected partitions are retrieved with a single
+    'Export WWPN List' operation on the HMC, instead of retrieving the
+    properties of the HBAs of each partition."
+author:
+  - Andreas Maier (@andy-maier)
+requirements:
+  - The targeted CPC must be in the Dynamic Partition Manager (DPM)
+    operational mode, and must have HBAs, i.e. must not have the
+    "dpm-storage-management" firmware feature enabled (see the
+    M(ibm.ibm_zhmc.zhmc_hba) module).
+  - "The HMC userid must have these task permissions:
+    'Export WWPNs'."
+  - "The HMC userid must have object-access permissions to these objects:
+    Target CPC, target partitions."
+options:
+  hmc_host:
+    description:
+      - The hostname or IP address of the HMC.
+    type: str
+    required: true
+  hmc_auth:
+    description:
+      - The authentication credentials for the HMC.
+    type: dict
+    required: true
+    suboptions:
+      userid:
+        description:
+          - The userid (username) for authenticating with the HMC.
+        type: str
+        required: true
+      password:
+        description:
+          - The password for authenticating with the HMC.
+        type: str
+        required: true
+      ca_certs:
+        description:
+          - Path name of certificate file or certificate directory to be used
+            for verifying the HMC certificate. If null (default), the path name
+            in the 'REQUESTS_CA_BUNDLE' environment variable or the path name
+            in the 'CURL_CA_BUNDLE' environment variable is used, or if neither
+            of these variables is set, the certificates in the Mozilla CA
+            Certificate List provided by the 'certifi' Python package are used
+            for verifying the HMC certificate.
+        type: str
+        required: false
+        default: null
+      verify:
+        description:
+          - If True (default), verify the HMC certificate as specified in the
+            C(ca_certs) parameter. If False, ignore what is specified in the
+            C(ca_certs) parameter and do not verify the HMC certificate.
+        type: bool
+        required: false
+        default: true
+  cpc_name:
+    description:
+      - The name of the CPC with the partitions.
+    type: str
+    required: true
+  partition_names:
+    description:
+      - The names of the partitions whose WWPNs are listed. The partitions
+        must exist. If null, the WWPNs of all partitions of the CPC are
+        listed.
+    type: list
+    elements: str
+    required: false
+    default: null
+  output_file:
+    description:
+      - "Path name of a file to which the WWPNs are written, in the format
+         specified in C(output_format). The WWPNs are then not returned in
+         the C(wwpns) return value. Instead, the C(output) return value
+         describes the file. The file is written on the system the module
+         runs on, and only if its content changes. If null, the WWPNs are
+         returned in the C(wwpns) return value."
+    type: str
+    required: false
+    default: null
+  output_format:
+    description:
+      - "Format of the file specified in C(output_file):"
+      - "* C(jsonl): JSON Lines, one JSON object per WWPN and line."
+      - "* C(csv): CSV with a header line, one line per WWPN with the
+         columns C(partition_name), C(adapter_id), C(device_number) and
+         C(wwpn)."
+    type: str
+    required: false
+    default: jsonl
+    choices: ['jsonl', 'csv']
+  log_file:
+    description:
+      - "File path of a log file to which the logic flow of this module as well
+         as interactions with the HMC are logged. If null, logging will be
+         propagated to the Python root logger."
+    type: str
+    required: false
+    default: null
+  log_level:
+    description:
+      - "Log level for the log file specified in C(log_file). Ignored if
+         C(log_file) is null."
+    type: str
+    required: false
+    default: debug
+    choices: ['debug', 'info', 'warning', 'error']
+  _faked_session:
+    description:
+      - "An internal parameter used for testing the module."
+    required: false
+    type: raw
+    default: null
+"""
+
+EXAMPLES = """
+---
+# Note: The following examples assume that some variables named 'my_*' are set.
+
+- name: List the WWPNs of all partitions of a CPC
+  zhmc_wwpn_list:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+  register: wwpn_list
+
+- name: Export the WWPNs of some partitions to a CSV file for the SAN zoning
+  zhmc_wwpn_list:
+    hmc_host: "{{ my_hmc_host }}"
+    hmc_auth: "{{ my_hmc_auth }}"
+    cpc_name: "{{ my_cpc_name }}"
+    partition_names:
+      - "prod-db1"
+      - "prod-db2"
+    output_file: "wwpns.csv"
+    output_format: csv
+"""
+
+RETURN = """
+changed:
+  description: Indicates if any change has been made by the module.
+    This will always be false, unless C(output_file) is specified and the
+    file content has changed.
+  returned: always
+  type: bool
+msg:
+  description: An error message that describes the failure.
+  returned: failure
+  type: str
+retries:
+  description: "Number of retries of HMC operations that failed with a
+    transient error (see the ZHMC_ANSIBLE_RETRY environment variable)."
+  returned: when HMC operations were retried
+  type: int
+  sample: 2
+wwpns:
+  description: The list of WWPNs, one item for each HBA.
+  returned: success, if output_file is not specified
+  type: list
+  elements: dict
+  contains:
+    partition_name:
+      description: "Name of the partition of the HBA"
+      type: str
+    adapter_id:
+      description: "Adapter ID (PCHID) of the FCP adapter backing the HBA"
+      type: str
+    device_number:
+      description: "Device number of the HBA"
+      type: str
+    wwpn:
+      description: "WWPN of the HBA"
+      type: str
+  sample:
+    [
+        {
+            "partition_name": "prod-db1",
+            "adapter_id": "12C",
+            "device_number": "1200",
+            "wwpn": "C05076FFEB800004"
+        }
+    ]
+output:
+  description: Summary of the file with the WWPNs.
+  returned: success, if output_file is specified
+  type: dict
+  contains:
+    path:
+      description: "Path name of the file"
+      type: str
+    count:
+      description: "Number of WWPNs in the file"
+      type: int
+    checksum:
+      description: "Checksum of the file content, in the format
+        'sha256:{hexdigest}'"
+      type: str
+  sample:
+    {
+        "path": "wwpns.csv",
+        "count": 1,
+        "checksum": "sha256:2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae"
+    }
+"""
+
+import logging  # noqa: E402
+import traceback  # noqa: E402
+from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+
+from ..module_utils.common import log_init, Error, ParameterError, \
+    get_hmc_auth, get_session, missing_required_lib, \
+    common_fail_on_import_errors, open_result_list, retry_result, \
+    find_by_name  # noqa: E402
+
+try:
+    import requests.packages.urllib3
+    IMP_URLLIB3_ERR = None
+except ImportError:
+    IMP_URLLIB3_ERR = traceback.format_exc()
+
+try:
+    import zhmcclient
+    IMP_ZHMCCLIENT_ERR = None
+except ImportError:
+    IMP_ZHMCCLIENT_ERR = traceback.format_exc()
+
+# Python logger name for this module
+LOGGER_NAME = 'zhmc_wwpn_list'
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+# Keys of the items in the result, which are also the columns of a CSV file
+WWPN_FIELDS = ('partition_name', 'adapter_id', 'device_number', 'wwpn')
+
+
+def select_partitions(cpc, partition_names):
+    """
+    Return the partitions of the CPC with the specified names, or all
+    partitions of the CPC if partition_names is None, in the order of the
+    names.
+
+    Raises:
+      ParameterError: Partitions do not exist.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+    partitions = dict((p.name, p) for p in cpc.partitions.list())
+    if partition_names is None:
+        return [partitions[name] for name in sorted(partitions)]
+    missing = [name for name in partition_names if name not in partitions]
+    if missing:
+        raise ParameterError(
+            "Partitions specified in module parameter 'partition_names' do "
+            "not exist in CPC {0!r}: {1}".
+            format(cpc.name, ', '.join(missing)))
+    return [partitions[name] for name in partition_names]
+
+
+def perform_list(params, check_mode=False):
+    """
+    List the WWPNs of the HBAs of the partitions.
+
+    Returns:
+      ResultList, JsonLinesWriter or CsvWriter: The result items, depending
+      on the 'output_file' and 'output_format' module parameters (see
+      open_result_list()).
+
+    Raises:
+      ParameterError: An issue with the module parameters.
+      zhmcclient.Error: Any zhmcclient exception can happen.
+    """
+
+    host = params['hmc_host']
+    userid, password, ca_certs, verify = get_hmc_auth(params['hmc_auth'])
+    cpc_name = params['cpc_name']
+    partition_names = params.get('partition_names', None)
+    output_file = params.get('output_file', None)
+    output_format = params.get('output_format', None) or 'jsonl'
+    _faked_session = params.get('_faked_session', None)  # No default specified
+
+    session = get_session(
+        _faked_session, host, userid, password, ca_certs, verify)
+    try:
+        client = zhmcclient.Client(session)
+        cpc = find_by_name(client.cpcs, cpc_name)
+        partitions = select_partitions(cpc, partition_names)
+
+        with open_result_list(output_file, check_mode, output_format,
+                              WWPN_FIELDS) as wwpn_list:
+
+            # The HMC rejects the operation for an empty list of partitions
+            if partitions:
+                wwpns = cpc.get_wwpns(partitions)
+                # The default exception handling is sufficient for the above.
+                for wwpn in wwpns:
+                    wwpn_list.append(dict(
+                        (name, wwpn[name.replace('_', '-')])
+                        for name in WWPN_FIELDS))
+
+        return wwpn_list
+
+    finally:
+        session.logoff()
+
+
+def main():
+
+    # The following definition of module input parameters must match the
+    # description of the options in the DOCUMENTATION string.
+    argument_spec = dict(
+        hmc_host=dict(required=True, type='str'),
+        hmc_auth=dict(
+            required=True,
+            type='dict',
+            options=dict(
+                userid=dict(required=True, type='str'),
+                password=dict(required=True, type='str', no_log=True),
+                ca_certs=dict(required=False, type='str', default=None),
+                verify=dict(required=False, type='bool', default=True),
+            ),
+        ),
+        cpc_name=dict(required=True, type='str'),
+        partition_names=dict(required=False, type='list', elements='str',
+                             default=None),
+        output_file=dict(required=False, type='str', default=None),
+        output_format=dict(required=False, type='str', default='jsonl',
+                           choices=['jsonl', 'csv']),
+        log_file=dict(required=False, type='str', default=None),
+        log_level=dict(required=False, type='str', default='debug',
+                       choices=['debug', 'info', 'warning', 'error']),
+        _faked_session=dict(required=False, type='raw'),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True)
+
+    if IMP_URLLIB3_ERR is not None:
+        module.fail_json(msg=missing_required_lib("requests"),
+                         exception=IMP_URLLIB3_ERR)
+
+    requests.packages.urllib3.disable_warnings()
+
+    if IMP_ZHMCCLIENT_ERR is not None:
+        module.fail_json(msg=missing_required_lib("zhmcclient"),
+                         exception=IMP_ZHMCCLIENT_ERR)
+
+    common_fail_on_import_errors(module)
+
+    log_file = module.params['log_file']
+    log_level = module.params['log_level']
+    log_init(LOGGER_NAME, log_file, log_level)
+
+    _params = dict(module.params)
+    del _params['hmc_auth']
+    LOGGER.debug("Module entry: params: %r", _params)
+
+    try:
+
+        results = perform_list(module.params, module.check_mode)
+
+    except (Error, zhmcclient.Error) as exc:
+        # These exceptions are considered errors in the environment or in user
+        # input. They have a proper message that stands on its own, so we
+        # simply pass that message on and will not need a traceback.
+        msg = "{0}: {1}".format(exc.__class__.__name__, exc)
+        LOGGER.debug("Module exit (failure): msg: %r", msg)
+        module.fail_json(msg=msg)
+    # Other exceptions are considered module errors and are handled by Ansible
+    # by showing the traceback.
+
+    changed = results.changed
+    result_list = results.result()
+    LOGGER.debug("Module exit (success): changed: %s, result: %r",
+                 changed, result_list)
+    if module.params['output_file']:
+        module.exit_json(changed=changed, output=result_list, **retry_result())
+    else:
+        module.exit_json(changed=changed, wwpns=result_list, **retry_result())
+
+
+if __name__ == '__main__':
+    main()
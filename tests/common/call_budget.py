@@ -0,0 +1,169 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Support for asserting budgets on the number of HMC operations that are issued
+by the modules, in order to detect N+1 lookups introduced by refactorings.
+
+A CallCountingSession wraps a faked session and counts the HTTP methods
+issued through it. It can be passed to the modules via their
+'_faked_session' parameter. Test modules that use the 'hmc_session' fixture
+of zhmcclient.testutils can use the 'hmc_counting_session' fixture, by
+importing it in the same way as the 'hmc_session' fixture.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import threading
+from collections import Counter
+
+import pytest
+from zhmcclient_mock import FakedSession
+
+from .session_wrappers import FakedSessionWrapper
+
+# Resource names in URIs that are not followed by an object ID
+SINGLETON_NAMES = ('console',)
+
+
+def operation_key(method, uri):
+    """
+    Return a key for the HMC operation performed by an HTTP method on a URI,
+    where object IDs are replaced with '*' and query parameters are removed.
+
+    Example: ('GET', '/api/partitions/*/nics/*')
+    """
+    path = uri.split('?')[0]
+    parts = path.strip('/').split('/')
+    key_parts = parts[0:1]  # 'api'
+    state = 'name'
+    for part in parts[1:]:
+        if state == 'id':
+            key_parts.append('*')
+            state = 'name'
+        elif state == 'op':
+            key_parts.append(part)
+            state = 'name'
+        else:
+            key_parts.append(part)
+            if part == 'operations':
+                state = 'op'
+            elif part not in SINGLETON_NAMES:
+                state = 'id'
+    return method, '/' + '/'.join(key_parts)
+
+
+class CallCountingSession(FakedSessionWrapper):
+    """
+    A faked session that counts the HTTP methods issued through it.
+
+    The 'calls' attribute is the list of tuple(method, uri) for the issued
+    HTTP methods, in the order they were issued.
+    """
+
+    def __init__(self, session):
+        """
+        Parameters:
+          session (zhmcclient_mock.FakedSession): The faked session to be
+            wrapped.
+        """
+        super(CallCountingSession, self).__init__(session)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _count(self, method, uri):
+        with self._lock:
+            self.calls.append((method, uri))
+
+    def reset(self):
+        """
+        Reset the recorded calls.
+        """
+        with self._lock:
+            self.calls = []
+
+    def count(self, method=None, uri_pattern=None):
+        """
+        Return the number of recorded calls, optionally limited to an HTTP
+        method and to URIs matching a regular expression pattern.
+        """
+        n = 0
+        for _method, _uri in self.calls:
+            if method and _method != method:
+                continue
+            if uri_pattern and not re.search(uri_pattern, _uri):
+                continue
+            n += 1
+        return n
+
+    def operations(self):
+        """
+        Return a collections.Counter with the number of recorded calls by
+        operation key (see operation_key()).
+        """
+        return Counter(operation_key(m, u) for m, u in self.calls)
+
+    def assert_budget(self, max_calls, method=None, uri_pattern=None):
+        """
+        Assert that the number of recorded calls (optionally limited as
+        described for count()) does not exceed a budget.
+        """
+        n = self.count(method, uri_pattern)
+        if n > max_calls:
+            ops = '\n'.join(
+                "  {0:3d} {1} {2}".format(cnt, m, u)
+                for (m, u), cnt in sorted(self.operations().items()))
+            raise AssertionError(
+                "HMC call budget exceeded: {0} calls{1}{2}, budget is {3}. "
+                "Operations:\n{4}".
+                format(n,
+                       " for method {0}".format(method) if method else "",
+                       " for URIs matching {0!r}".format(uri_pattern)
+                       if uri_pattern else "",
+                       max_calls, ops))
+
+    def get(self, uri, logon_required=True, renew_session=True):
+        self._count('GET', uri)
+        return super(CallCountingSession, self).get(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+    def post(self, uri, body=None, logon_required=True,
+             wait_for_completion=True, operation_timeout=None,
+             renew_session=True):
+        self._count('POST', uri)
+        return super(CallCountingSession, self).post(
+            uri, body=body, logon_required=logon_required,
+            wait_for_completion=wait_for_completion,
+            operation_timeout=operation_timeout, renew_session=renew_session)
+
+    def delete(self, uri, logon_required=True, renew_session=True):
+        self._count('DELETE', uri)
+        return super(CallCountingSession, self).delete(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+
+@pytest.fixture
+def hmc_counting_session(hmc_session):
+    """
+    Pytest fixture representing a CallCountingSession wrapping the faked
+    session of the 'hmc_session' fixture of zhmcclient.testutils.
+
+    The test is skipped when the HMC is not mocked, because the modules
+    create their own sessions for real HMCs.
+    """
+    if not isinstance(hmc_session, FakedSession):
+        pytest.skip("HMC call budgets can only be verified with a mocked HMC")
+    return CallCountingSession(hmc_session)
@@ -0,0 +1,169 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Replay of HMC cassettes recorded by the modules, for offline performance
+tests.
+
+Cassettes are recorded by running the modules against a real HMC with the
+environment variable ZHMC_ANSIBLE_CASSETTE set to the path name of the
+cassette file (see CassetteRecorder in plugins/module_utils/common.py).
+
+A ReplaySession serves the recorded responses and can be passed to the
+modules via their '_faked_session' parameter.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+# HMC operations that are part of logon and logoff. They are recorded by
+# real sessions, but are not issued by faked sessions.
+SESSION_URI_PATTERN = re.compile(r'^/api/sessions(/|$)')
+
+
+class CassetteMismatch(Exception):
+    """
+    Indicates that a HTTP method was issued that has no (more) recorded
+    interaction in the cassette.
+    """
+    pass
+
+
+def load_cassette(filename):
+    """
+    Load a cassette file and return its records as a list of dict.
+    """
+    records = []
+    with open(filename, 'r') as fp:
+        for line in fp:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+class ReplaySession(FakedSession):
+    """
+    A faked session that serves the HTTP methods recorded in a cassette, with
+    the recorded latency scaled by a factor.
+
+    The recorded interactions for the same HTTP method and URI are served in
+    the order they were recorded. When they are exhausted, the last one is
+    served again, unless 'strict' is set.
+
+    The total delay and the number of served HTTP methods are available in the
+    'total_delay' and 'op_count' attributes.
+    """
+
+    def __init__(self, cassette, latency_scale=1.0, strict=False,
+                 sleep=time.sleep, host='replay-host'):
+        """
+        Parameters:
+
+          cassette (string or list of dict): Path name of the cassette file,
+            or the records loaded from it.
+
+          latency_scale (float): Factor applied to the recorded duration of
+            each HTTP method. 0 disables the delay.
+
+          strict (bool): Raise CassetteMismatch when the recorded
+            interactions for an HTTP method and URI are exhausted.
+
+          sleep (callable): Function used for delaying, for testing.
+
+          host (string): HMC host of the session.
+        """
+        if not isinstance(cassette, list):
+            cassette = load_cassette(cassette)
+        hmc_name, hmc_version, api_version = 'replay-hmc', '2.14.0', '3.1'
+        for record in cassette:
+            if record['uri'] == '/api/version' and record['status'] == 200:
+                body = record['response_body']
+                hmc_name = body.get('hmc-name', hmc_name)
+                hmc_version = body.get('hmc-version', hmc_version)
+                api_version = '{0}.{1}'.format(
+                    body.get('api-major-version', 3),
+                    body.get('api-minor-version', 1))
+                break
+        super(ReplaySession, self).__init__(
+            host, hmc_name, hmc_version, api_version)
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        self._last = {}
+        for record in cassette:
+            if SESSION_URI_PATTERN.match(record['uri']):
+                continue
+            self._queues[(record['method'], record['uri'])].append(record)
+        self.total_delay = 0.0
+        self.op_count = 0
+
+    def _next_record(self, method, uri):
+        key = (method, uri)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                record = queue.popleft()
+                self._last[key] = record
+            elif key in self._last and not self.strict:
+                record = self._last[key]
+            else:
+                raise CassetteMismatch(
+                    "No recorded interaction for {0} {1}".format(method, uri))
+            delay = record.get('duration', 0.0) * self.latency_scale
+            self.total_delay += delay
+            self.op_count += 1
+        return record, delay
+
+    def _replay(self, method, uri):
+        record, delay = self._next_record(method, uri)
+        if delay > 0:
+            self._sleep(delay)
+        status = record['status']
+        body = record['response_body']
+        if record.get('error'):
+            raise zhmcclient.ConnectionError(body.get('message'), None)
+        if status != 200:
+            error_body = dict(body)
+            error_body['http-status'] = status
+            error_body['request-method'] = method
+            error_body['request-uri'] = uri
+            raise zhmcclient.HTTPError(error_body)
+        if record.get('job_uri'):
+            return zhmcclient.Job(self, record['job_uri'], method, uri)
+        return body
+
+    # pylint: disable=arguments-differ,unused-argument
+
+    def get(self, uri, logon_required=True, renew_session=True):
+        return self._replay('GET', uri)
+
+    def post(self, uri, body=None, logon_required=True,
+             wait_for_completion=True, operation_timeout=None,
+             renew_session=True):
+        return self._replay('POST', uri)
+
+    def delete(self, uri, logon_required=True, renew_session=True):
+        return self._replay('DELETE', uri)
@@ -0,0 +1,315 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Wrappers around zhmcclient_mock.FakedSession for testing.
+
+The wrappers in this module are derived from FakedSession, so they can be
+passed to the modules via their '_faked_session' parameter. They delegate the
+HTTP methods to the wrapped faked session and share its faked HMC, so they can
+be stacked on top of each other.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import random
+import re
+import threading
+import time
+
+from zhmcclient_mock import FakedSession
+
+# Pattern for the URI of an asynchronous operation that is modelled as a job.
+# The group is the operation name (e.g. 'start').
+JOB_OPERATION_PATTERN = re.compile(r'^/api/[a-z\-]+/[^/]+/operations/([a-z\-]+)$')
+
+# Operations that are performed as jobs on a real HMC and take a noticeable
+# amount of time.
+JOB_OPERATIONS = ('start', 'stop', 'activate', 'deactivate', 'load',
+                  'scsi-load', 'scsi-dump', 'psw-restart', 'reset-clear',
+                  'reset-normal')
+
+
+class FixedLatency(object):
+    """
+    A latency distribution that always returns the same value.
+    """
+
+    def __init__(self, seconds):
+        """
+        Parameters:
+          seconds (float): The latency in seconds.
+        """
+        self.seconds = seconds
+
+    def sample(self):
+        """Return a latency in seconds."""
+        return self.seconds
+
+
+class NormalLatency(object):
+    """
+    A latency distribution that returns normally distributed values, clipped
+    at a minimum value.
+    """
+
+    def __init__(self, mean, stddev, minimum=0.0, seed=None):
+        """
+        Parameters:
+          mean (float): Mean of the latency in seconds.
+          stddev (float): Standard deviation of the latency in seconds.
+          minimum (float): Minimum latency in seconds.
+          seed: Seed for the random number generator, for repeatable results.
+        """
+        self.mean = mean
+        self.stddev = stddev
+        self.minimum = minimum
+        self._random = random.Random(seed)
+
+    def sample(self):
+        """Return a latency in seconds."""
+        return max(self.minimum, self._random.gauss(self.mean, self.stddev))
+
+
+class RecordedLatency(object):
+    """
+    A latency distribution that returns values picked randomly from a list of
+    latencies that were recorded against a real HMC.
+    """
+
+    def __init__(self, samples, seed=None):
+        """
+        Parameters:
+          samples (iterable of float): The recorded latencies in seconds.
+          seed: Seed for the random number generator, for repeatable results.
+        """
+        self.samples = list(samples)
+        if not self.samples:
+            raise ValueError("RecordedLatency requires at least one sample")
+        self._random = random.Random(seed)
+
+    def sample(self):
+        """Return a latency in seconds."""
+        return self._random.choice(self.samples)
+
+
+class FakedSessionWrapper(FakedSession):
+    """
+    Base class for wrappers around a FakedSession object.
+
+    The HTTP methods are delegated to the wrapped session, and the faked HMC
+    of the wrapped session is shared.
+    """
+
+    def __init__(self, session):
+        """
+        Parameters:
+          session (zhmcclient_mock.FakedSession): The faked session to be
+            wrapped.
+        """
+        hmc = session.hmc
+        super(FakedSessionWrapper, self).__init__(
+            session.host, hmc.hmc_name, hmc.hmc_version, hmc.api_version)
+        self._hmc = hmc
+        self.wrapped_session = session
+
+    def get(self, uri, logon_required=True, renew_session=True):
+        # pylint: disable=arguments-differ
+        return self.wrapped_session.get(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+    def post(self, uri, body=None, logon_required=True,
+             wait_for_completion=True, operation_timeout=None,
+             renew_session=True):
+        # pylint: disable=arguments-differ
+        return self.wrapped_session.post(
+            uri, body=body, logon_required=logon_required,
+            wait_for_completion=wait_for_completion,
+            operation_timeout=operation_timeout, renew_session=renew_session)
+
+    def delete(self, uri, logon_required=True, renew_session=True):
+        # pylint: disable=arguments-differ
+        return self.wrapped_session.delete(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+
+class LatencySession(FakedSessionWrapper):
+    """
+    A faked session that models the round-trip cost of a real HMC, by
+    delaying each HTTP method by a latency picked from a distribution, and
+    by delaying asynchronous operations such as 'start' or 'activate' by a
+    simulated job duration when waiting for their completion.
+
+    The accumulated delay and the number of delayed HTTP methods are
+    available in the `total_delay` and `op_count` attributes. The number of
+    HTTP methods that were delayed at the time each HTTP method started
+    (including itself) is available in the `concurrency` attribute, as a list
+    in the order the HTTP methods started, and its maximum is available in
+    the `peak_concurrency` attribute.
+    """
+
+    def __init__(self, session, latency=None, job_durations=None,
+                 sleep=time.sleep):
+        """
+        Parameters:
+
+          session (zhmcclient_mock.FakedSession): The faked session to be
+            wrapped.
+
+          latency: Latency distribution (an object with a `sample()` method
+            such as FixedLatency) to be used for all HTTP methods, or a dict
+            with such distributions by HTTP method ('GET', 'POST', 'DELETE').
+            HTTP methods missing in the dict are not delayed.
+            `None` means no latency.
+
+          job_durations (dict): Latency distributions for the simulated job
+            duration, by operation name (e.g. 'start'). The operation name
+            is the last segment of the URI of the operation, and must be one
+            of JOB_OPERATIONS. `None` means no job durations.
+
+          sleep (callable): Function for sleeping a number of seconds. Tests
+            that only want to check the accounting can pass a function that
+            does not actually sleep.
+        """
+        super(LatencySession, self).__init__(session)
+        if latency is None:
+            latency = {}
+        elif not isinstance(latency, dict):
+            latency = dict(GET=latency, POST=latency, DELETE=latency)
+        self.latency = latency
+        self.job_durations = job_durations or {}
+        for op_name in self.job_durations:
+            if op_name not in JOB_OPERATIONS:
+                raise ValueError(
+                    "Invalid job operation name: {0!r}".format(op_name))
+        self.sleep = sleep
+        self.total_delay = 0.0
+        self.op_count = 0
+        self.concurrency = []
+        self.peak_concurrency = 0
+        self._active_count = 0
+        self._lock = threading.Lock()
+
+    def _delay(self, seconds):
+        if seconds > 0:
+            self.sleep(seconds)
+        with self._lock:
+            self.total_delay += seconds
+
+    def _delay_request(self, method):
+        dist = self.latency.get(method)
+        with self._lock:
+            self.op_count += 1
+            self._active_count += 1
+            self.concurrency.append(self._active_count)
+            self.peak_concurrency = max(
+                self.peak_concurrency, self._active_count)
+        try:
+            if dist is not None:
+                self._delay(dist.sample())
+        finally:
+            with self._lock:
+                self._active_count -= 1
+
+    def _delay_job(self, uri):
+        m = JOB_OPERATION_PATTERN.match(uri)
+        if m:
+            dist = self.job_durations.get(m.group(1))
+            if dist is not None:
+                self._delay(dist.sample())
+
+    def get(self, uri, logon_required=True, renew_session=True):
+        self._delay_request('GET')
+        return super(LatencySession, self).get(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+    def post(self, uri, body=None, logon_required=True,
+             wait_for_completion=True, operation_timeout=None,
+             renew_session=True):
+        self._delay_request('POST')
+        result = super(LatencySession, self).post(
+            uri, body=body, logon_required=logon_required,
+            wait_for_completion=wait_for_completion,
+            operation_timeout=operation_timeout, renew_session=renew_session)
+        if wait_for_completion:
+            self._delay_job(uri)
+        return result
+
+    def delete(self, uri, logon_required=True, renew_session=True):
+        self._delay_request('DELETE')
+        return super(LatencySession, self).delete(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+
+class FailureInjectingSession(FakedSessionWrapper):
+    """
+    A faked session that injects failures into HTTP methods, e.g. to test
+    the retrying of transient HMC errors.
+
+    A failure is specified as a tuple (method, uri_pattern, exc, count): The
+    first `count` HTTP methods with the HTTP method `method` ('GET', 'POST',
+    'DELETE') and a URI that matches the regular expression `uri_pattern`
+    raise the exception `exc` without being performed. If `exc` is an
+    exception class or a function without arguments that returns an
+    exception, a new exception is raised each time.
+
+    The injected failures are available in the `injected` attribute, as a
+    list of tuples (method, uri, exc).
+    """
+
+    def __init__(self, session, failures):
+        """
+        Parameters:
+          session (zhmcclient_mock.FakedSession): The faked session to be
+            wrapped.
+          failures (iterable of tuple): The failures to be injected, as
+            tuples (method, uri_pattern, exc, count).
+        """
+        super(FailureInjectingSession, self).__init__(session)
+        self.failures = [
+            [method, re.compile(uri_pattern), exc, count]
+            for method, uri_pattern, exc, count in failures]
+        self.injected = []
+        self._lock = threading.Lock()
+
+    def _inject(self, method, uri):
+        with self._lock:
+            for failure in self.failures:
+                f_method, f_pattern, exc, count = failure
+                if f_method == method and count > 0 and f_pattern.search(uri):
+                    failure[3] = count - 1
+                    if callable(exc):
+                        exc = exc()
+                    self.injected.append((method, uri, exc))
+                    raise exc
+
+    def get(self, uri, logon_required=True, renew_session=True):
+        self._inject('GET', uri)
+        return super(FailureInjectingSession, self).get(
+            uri, logon_required=logon_required, renew_session=renew_session)
+
+    def post(self, uri, body=None, logon_required=True,
+             wait_for_completion=True, operation_timeout=None,
+             renew_session=True):
+        self._inject('POST', uri)
+        return super(FailureInjectingSession, self).post(
+            uri, body=body, logon_required=logon_required,
+            wait_for_completion=wait_for_completion,
+            operation_timeout=operation_timeout, renew_session=renew_session)
+
+    def delete(self, uri, logon_required=True, renew_session=True):
+        self._inject('DELETE', uri)
+        return super(FailureInjectingSession, self).delete(
+            uri, logon_required=logon_required, renew_session=renew_session)
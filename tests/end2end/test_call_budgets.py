@@ -0,0 +1,231 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End2end tests for the number of HMC operations issued by the main code paths
+of the modules (HMC call budgets).
+
+These tests run only against mocked HMCs. They exercise only code paths that
+do not change the mocked HMC, because the HMC session fixture is shared by all
+tests in this module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import importlib
+import pytest
+import requests.packages.urllib3
+# pylint: disable=line-too-long,unused-import
+from zhmcclient.testutils import hmc_definition, hmc_session  # noqa: F401, E501
+from tests.common.call_budget import hmc_counting_session  # noqa: F401, E501
+# pylint: enable=line-too-long,unused-import
+
+requests.packages.urllib3.disable_warnings()
+
+# Names of resources in the mocked HMC definition (mocked_hmc_z14.yaml)
+CLASSIC_CPC_NAME = 'CPC1'
+DPM_CPC_NAME = 'CPC2'
+
+# Testcases for test_call_budget(), as tuples of:
+# - module name
+# - module input parameters, without the common parameters hmc_host,
+#   hmc_auth, log_file, _faked_session
+# - budget for the total number of HMC operations
+# - dict of budgets for HMC operations on URIs matching a pattern (or None)
+TESTCASES_CALL_BUDGET = [
+    (
+        # Includes one rejected property-selective GET, because the mocked
+        # HMC does not support the 'properties' query parameter.
+        'zhmc_cpc_list',
+        dict(include_unmanaged_cpcs=True),
+        5,
+        None,
+    ),
+    (
+        'zhmc_cpc',
+        dict(name=DPM_CPC_NAME, state='facts', properties={},
+             activation_profile_name=None),
+        5,
+        None,
+    ),
+    (
+        'zhmc_cpc',
+        dict(name=DPM_CPC_NAME, state='facts', properties={},
+             activation_profile_name=None, expand_partitions=False,
+             expand_adapters=False, expand_storage_groups=False),
+        2,
+        None,
+    ),
+    (
+        'zhmc_lpar_list',
+        dict(cpc_name=None),
+        2,
+        None,
+    ),
+    (
+        'zhmc_lpar_list',
+        dict(cpc_name=CLASSIC_CPC_NAME),
+        2,
+        None,
+    ),
+    (
+        'zhmc_lpar',
+        dict(cpc_name=CLASSIC_CPC_NAME, name='LPAR1', state='facts',
+             properties={}, activation_profile_name=None, force=False,
+             os_ipl_token=None),
+        3,
+        None,
+    ),
+    (
+        'zhmc_partition_list',
+        dict(cpc_name=None),
+        2,
+        None,
+    ),
+    (
+        'zhmc_partition_list',
+        dict(cpc_name=DPM_CPC_NAME),
+        2,
+        None,
+    ),
+    (
+        'zhmc_partition',
+        dict(cpc_name=DPM_CPC_NAME, name='PART1', state='facts',
+             properties={}, expand_storage_groups=False,
+             expand_crypto_adapters=False),
+        6,
+        {'^/api/adapters/': 1, '^/api/virtual-switches/': 1},
+    ),
+    (
+        'zhmc_adapter_list',
+        dict(cpc_name=None, name=None, adapter_id=None, adapter_family=None,
+             type=None, status=None),
+        4,
+        None,
+    ),
+    (
+        'zhmc_adapter',
+        dict(cpc_name=DPM_CPC_NAME, name='OSA1', match={}, state='facts',
+             properties={}),
+        5,
+        None,
+    ),
+    (
+        'zhmc_nic',
+        dict(cpc_name=DPM_CPC_NAME, partition_name='PART1', name='OSA1-NIC1',
+             state='present', properties={}),
+        5,
+        None,
+    ),
+    (
+        'zhmc_hba',
+        dict(cpc_name=DPM_CPC_NAME, partition_name='PART1', name='HBA1',
+             state='absent', properties={}),
+        3,
+        None,
+    ),
+    (
+        'zhmc_virtual_function',
+        dict(cpc_name=DPM_CPC_NAME, partition_name='PART1', name='VF1',
+             state='absent', properties={}),
+        3,
+        None,
+    ),
+    (
+        'zhmc_crypto_attachment',
+        dict(cpc_name=DPM_CPC_NAME, partition_name='PART1', state='facts',
+             adapter_count=-1, adapter_names=[], domain_range=[0, -1],
+             access_mode='usage', crypto_type='ep11'),
+        4,
+        None,
+    ),
+    (
+        'zhmc_storage_volume',
+        dict(cpc_name=DPM_CPC_NAME, storage_group_name='Storage group 1',
+             name='Storage volume 1', state='facts', properties={}),
+        5,
+        None,
+    ),
+    (
+        'zhmc_user_list',
+        dict(),
+        1,
+        None,
+    ),
+    (
+        'zhmc_user',
+        dict(name='USER1', state='facts', properties={}, expand=False),
+        4,
+        None,
+    ),
+    (
+        'zhmc_user_role_list',
+        dict(),
+        1,
+        None,
+    ),
+    (
+        'zhmc_user_role',
+        dict(name='hmc-operator-tasks', state='facts', properties={}),
+        2,
+        None,
+    ),
+    (
+        'zhmc_password_rule_list',
+        dict(),
+        1,
+        None,
+    ),
+    (
+        'zhmc_password_rule',
+        dict(name='Standard', state='facts', properties={}),
+        2,
+        None,
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "module_name, module_params, budget, pattern_budgets",
+    TESTCASES_CALL_BUDGET)
+def test_call_budget(
+        module_name, module_params, budget, pattern_budgets,
+        hmc_counting_session):  # noqa: F811, E501
+    """
+    Test that the main code path of a module stays within its budget of HMC
+    operations.
+    """
+    module = importlib.import_module('plugins.modules.' + module_name)
+
+    params = {
+        'hmc_host': 'fake-host',
+        'hmc_auth': dict(userid='fake-userid', password='fake-password',
+                         ca_certs=None, verify=True),
+        'log_file': None,
+        '_faked_session': hmc_counting_session,
+    }
+    params.update(module_params)
+
+    # Exercise the code to be tested
+    if hasattr(module, 'perform_task'):
+        module.perform_task(params, False)
+    else:
+        module.perform_list(params)
+
+    hmc_counting_session.assert_budget(budget)
+    if pattern_budgets:
+        for uri_pattern, pattern_budget in pattern_budgets.items():
+            hmc_counting_session.assert_budget(
+                pattern_budget, uri_pattern=uri_pattern)
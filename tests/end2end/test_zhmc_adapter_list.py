@@ -215,7 +215,9 @@ def test_zhmc_adapter_list(
             'adapter_family': filter_args_module.get('adapter_family', None),
             'type': filter_args_module.get('type', None),
             'status': filter_args_module.get('status', None),
+            'output_file': None,
             'log_file': LOG_FILE,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
 
@@ -255,7 +255,7 @@ def get_module_output(mod_obj):
     If the module failed, return None.
     """
 
-    def func(changed, partition):
+    def func(changed, partition, update_plan=None):
         return changed, partition
 
     if not mod_obj.exit_json.called:
@@ -385,6 +385,7 @@ def test_zhmc_partition_facts(
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
 
@@ -590,6 +591,7 @@ def test_zhmc_partition_state(
                 'expand_storage_groups': False,
                 'expand_crypto_adapters': False,
                 'log_file': LOG_FILE,
+                'log_level': 'debug',
                 '_faked_session': faked_session,
             }
             if input_props2 is not None:
@@ -979,6 +981,7 @@ def test_zhmc_partition_properties(
                     'expand_storage_groups': False,
                     'expand_crypto_adapters': False,
                     'log_file': LOG_FILE,
+                    'log_level': 'debug',
                     '_faked_session': faked_session,
                 }
 
@@ -191,7 +191,9 @@ def test_zhmc_partition_list(
         params = {
             'hmc_host': hmc_host,
             'hmc_auth': hmc_auth,
+            'output_file': None,
             'log_file': LOG_FILE,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
         if with_cpc:
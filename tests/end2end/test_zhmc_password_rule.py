@@ -162,6 +162,7 @@ def test_zhmc_password_rule_facts(
         'state': 'facts',
         'properties': {},
         'log_file': LOG_FILE,
+        'log_level': 'debug',
         '_faked_session': faked_session,
     }
 
@@ -302,6 +303,7 @@ def test_zhmc_password_rule_absent_present(
             'name': pwrule_name,
             'state': input_state,
             'log_file': LOG_FILE,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
         if input_props is not None:
@@ -283,6 +283,7 @@ def test_zhmc_user_facts(
         'properties': {},
         'expand': expand,
         'log_file': LOG_FILE,
+        'log_level': 'debug',
         '_faked_session': faked_session,
     }
 
@@ -450,6 +451,7 @@ def test_zhmc_user_absent_present(
             'state': input_state,
             'expand': expand,
             'log_file': LOG_FILE,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
         if input_props is not None:
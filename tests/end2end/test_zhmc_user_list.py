@@ -116,7 +116,9 @@ def test_zhmc_user_list(
     params = {
         'hmc_host': hmc_host,
         'hmc_auth': hmc_auth,
+        'output_file': None,
         'log_file': LOG_FILE,
+        'log_level': 'debug',
         '_faked_session': faked_session,
     }
 
@@ -164,6 +164,7 @@ def test_zhmc_user_role_facts(
         'name': urole.name,
         'state': 'facts',
         'log_file': LOG_FILE,
+        'log_level': 'debug',
         '_faked_session': faked_session,
     }
 
@@ -322,6 +323,7 @@ def test_zhmc_user_role_absent_present(
             'name': urole_name,
             'state': input_state,
             'log_file': LOG_FILE,
+            'log_level': 'debug',
             '_faked_session': faked_session,
         }
         if input_props2 is not None:
@@ -20,6 +20,16 @@ Utility functions for function testing.
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import os
+import pytest
+import mock
+
+# Mocked HMC definition file of the end2end tests, with CPC1 (classic mode)
+# and CPC2 (DPM mode) and their child resources, and HMC users.
+MOCKED_HMC_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'end2end',
+    'mocked_hmc_z14.yaml')
+
 
 def mock_ansible_module(ansible_mod_cls, params, check_mode):
     """
@@ -31,3 +41,30 @@ def mock_ansible_module(ansible_mod_cls, params, check_mode):
     mod_obj.fail_json.configure_mock(side_effect=SystemExit(1))
     mod_obj.exit_json.configure_mock(side_effect=SystemExit(0))
     return mod_obj
+
+
+def run_module(module, params, session=None, check_mode=False):
+    """
+    Run the main function of an Ansible module with the specified module
+    parameters and a mocked AnsibleModule class, and return the mocked
+    AnsibleModule object.
+
+    The HMC host and credentials, the logging parameters and the faked
+    session are added to the module parameters, if not specified.
+    """
+    module_params = {
+        'hmc_host': 'fake-host',
+        'hmc_auth': dict(userid='fake-userid',
+                         password='fake-password'),
+        'log_file': None,
+        'log_level': 'debug',
+        '_faked_session': session,
+    }
+    module_params.update(params)
+    with mock.patch.object(module, 'AnsibleModule', autospec=True) \
+            as ansible_mod_cls:
+        mod_obj = mock_ansible_module(ansible_mod_cls, module_params,
+                                      check_mode)
+        with pytest.raises(SystemExit):
+            module.main()
+    return mod_obj
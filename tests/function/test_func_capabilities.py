@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the use of the HMC capability cache by the list modules.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import importlib
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils import common
+from tests.common.call_budget import CallCountingSession
+from tests.common.session_wrappers import FailureInjectingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# List modules that use the HMC capabilities, with the name of their return
+# value for the list of items, their module specific parameters, and the URI
+# pattern of the "List Permitted ..." operation
+LIST_MODULES = [
+    ('zhmc_adapter_list', 'adapters',
+     dict(cpc_name=None, name=None, adapter_id=None, adapter_family=None,
+          type=None, status=None),
+     r'/list-permitted-adapters'),
+    ('zhmc_lpar_list', 'lpars', dict(cpc_name=None),
+     r'/list-permitted-logical-partitions'),
+    ('zhmc_partition_list', 'partitions', dict(cpc_name=None),
+     r'/list-permitted-partitions'),
+]
+
+
+@pytest.fixture(autouse=True)
+def capabilities():
+    """
+    Forget the capability objects of this process that were used in a test.
+    """
+    yield
+    common._CAPABILITIES.clear()
+
+
+def run_list(module_name, session, cache_dir, **params):
+    """
+    Run a list module with the capability cache enabled, and return the
+    mocked AnsibleModule object.
+    """
+    module = importlib.import_module('plugins.modules.' + module_name)
+    module_params = {
+        'output_file': None,
+    }
+    module_params.update(params)
+    env = {common.CAPABILITY_CACHE_DIR_ENV_VAR: cache_dir}
+    with mock.patch.dict(os.environ, env):
+        return run_module(module, module_params, session)
+
+
+@pytest.mark.parametrize(
+    "module_name, items_key, params, list_pattern", LIST_MODULES)
+def test_repeat_run(module_name, items_key, params, list_pattern, tmpdir):
+    """
+    Test that a repeated run of a list module does not query the HMC
+    version again, and returns the same result.
+    """
+    session = CallCountingSession(
+        FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    mod_obj = run_list(module_name, session, str(tmpdir), **params)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    items1 = mod_obj.exit_json.call_args[1][items_key]
+    assert session.count('GET', r'^/api/version$') == 1
+
+    session.reset()
+    mod_obj = run_list(module_name, session, str(tmpdir), **params)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    items2 = mod_obj.exit_json.call_args[1][items_key]
+    assert session.count('GET', r'^/api/version$') == 0
+    assert items2 == items1
+
+
+# The "List Permitted Adapters" operation is not yet supported by zhmcclient,
+# so zhmc_adapter_list always lists the adapters in the traditional way.
+@pytest.mark.parametrize(
+    "module_name, items_key, params, list_pattern", LIST_MODULES[1:])
+def test_refresh_on_error(module_name, items_key, params, list_pattern,
+                          tmpdir):
+    """
+    Test that a list module retrieves the HMC capabilities again and lists
+    the items in the traditional way, when the cached capabilities claim a
+    "List Permitted ..." operation that the HMC no longer supports.
+    """
+    faked_session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    mod_obj = run_list(module_name, faked_session, str(tmpdir), **params)
+    exp_items = mod_obj.exit_json.call_args[1][items_key]
+
+    # The HMC has been downgraded to a version without the operation
+    cache_file = os.path.join(
+        str(tmpdir), faked_session.host + '.capabilities.json')
+    with open(cache_file) as fp:
+        record = json.load(fp)
+    assert record['list-permitted'] == dict(
+        adapters=True, lpars=True, partitions=True)
+    faked_session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    faked_session.hmc.hmc_version = '2.13.1'
+    common._CAPABILITIES.clear()
+
+    def not_found():
+        return zhmcclient.HTTPError({
+            'http-status': 404, 'reason': 1, 'message': 'Not found'})
+
+    session = FailureInjectingSession(
+        faked_session, [('GET', list_pattern, not_found, 1)])
+    mod_obj = run_list(module_name, session, str(tmpdir), **params)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    assert mod_obj.exit_json.call_args[1][items_key] == exp_items
+    assert len(session.injected) == 1
+    with open(cache_file) as fp:
+        record = json.load(fp)
+    assert record['hmc-version'] == '2.13.1'
+    assert record['list-permitted'] == dict(
+        adapters=False, lpars=False, partitions=False)
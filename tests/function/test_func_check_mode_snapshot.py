@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for check mode with a snapshot file ('check_mode_snapshot'
+module parameter).
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_snapshot, zhmc_partition, zhmc_user, \
+    zhmc_user_role, zhmc_password_rule
+from plugins.module_utils.common import snapshot_session, load_snapshot, \
+    ParameterError
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+
+def run_check_mode(module, params):
+    """
+    Run a module in check mode and return tuple(exit_code, exit_json or
+    fail_json keyword arguments).
+    """
+    module_params = {
+        'properties': {},
+    }
+    module_params.update(params)
+    mod_obj = run_module(module, module_params, check_mode=True)
+
+    if mod_obj.fail_json.called:
+        return 1, mod_obj.fail_json.call_args[1]
+    return 0, mod_obj.exit_json.call_args[1]
+
+
+@pytest.fixture(params=['json', 'jsonl'])
+def snapshot_file(request, tmpdir):
+    """
+    Fixture for a snapshot file of the mocked HMC, written by the
+    zhmc_snapshot module.
+    """
+    filename = str(tmpdir.join('snapshot.' + request.param))
+    params = {
+        'hmc_host': 'fake-host',
+        'hmc_auth': dict(userid='fake-userid',
+                         password='fake-password'),
+        'snapshot_file': filename,
+        'format': request.param,
+        'cpc_names': [],
+        'include': ['partitions', 'lpars', 'adapters', 'storage_groups',
+                    'users', 'user_roles', 'password_rules'],
+        'max_workers': 1,
+        '_faked_session': FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE),
+    }
+    zhmc_snapshot.perform_task(params, False)
+    return filename
+
+
+def test_snapshot_session(snapshot_file):
+    """
+    Test that a faked session loaded from a snapshot has the resources of the
+    snapshot.
+    """
+    session = snapshot_session(snapshot_file, 'fake-host', 'fake-userid')
+    client = zhmcclient.Client(session)
+
+    cpc = client.cpcs.find(name='CPC2')
+    partition = cpc.partitions.find(name='PART1')
+    nics = partition.nics.list()
+    assert [nic.name for nic in nics] == ['OSA1-NIC1']
+    assert partition.get_property('nic-uris') == [nics[0].uri]
+    adapter = cpc.adapters.find(name='OSA1')
+    assert len(adapter.get_property('network-port-uris')) == 2
+    assert sorted(lpar.name for lpar in
+                  client.cpcs.find(name='CPC1').lpars.list()) == \
+        ['LPAR1', 'LPAR2']
+    console = client.consoles.console
+    assert sorted(user.name for user in console.users.list()) == \
+        ['PEDEBUG', 'USER1']
+    storage_group = console.storage_groups.find(name='Storage group 1')
+    assert [sv.name for sv in storage_group.storage_volumes.list()] == \
+        ['Storage volume 1']
+
+
+@pytest.mark.parametrize(
+    "fmt, dumps_kwargs", [
+        ('json', dict()),
+        ('json', dict(indent=4)),
+        ('jsonl', dict()),
+        ('jsonl', dict(indent=None, separators=(' , ', ' : '))),
+        ('json-hmc-line', dict()),
+    ]
+)
+def test_load_snapshot_reformatted(tmpdir, fmt, dumps_kwargs):
+    """
+    Test loading snapshot files that were reformatted, e.g. by editing them,
+    with the format detected from their content.
+    """
+    hmc_info = {'hmc-version': '2.15.0'}
+    resources = [('cpc', {'object-uri': '/api/cpcs/1', 'name': 'CPC1'}),
+                 ('cpc', {'object-uri': '/api/cpcs/2', 'name': 'CPC2'})]
+    filename = str(tmpdir.join('snapshot.txt'))
+    with open(filename, 'w') as fp:
+        if fmt == 'jsonl':
+            fp.write(' ' + json.dumps({'hmc': hmc_info}, **dumps_kwargs) +
+                     '\n\n')
+            for class_name, properties in resources:
+                fp.write(json.dumps({'properties': properties,
+                                     'class': class_name},
+                                    **dumps_kwargs) + '\n')
+        elif fmt == 'json-hmc-line':
+            # A JSON object whose first line starts like the JSON Lines format
+            fp.write('{"hmc": ' + json.dumps(hmc_info) + ',\n')
+            fp.write(' "resources": ' + json.dumps(
+                {'cpc': [p for _, p in resources]}) + '}\n')
+        else:
+            fp.write(json.dumps(
+                {'resources': {'cpc': [p for _, p in resources]},
+                 'hmc': hmc_info}, **dumps_kwargs))
+
+    assert load_snapshot(filename) == (hmc_info, resources)
+
+
+def test_snapshot_session_error(tmpdir):
+    """
+    Test loading an invalid snapshot file.
+    """
+    filename = str(tmpdir.join('snapshot.json'))
+    with open(filename, 'w') as fp:
+        fp.write('{"resources": {}}\n')
+
+    with pytest.raises(ParameterError):
+        snapshot_session(filename, 'fake-host', 'fake-userid')
+    with pytest.raises(ParameterError):
+        snapshot_session(filename + '.missing', 'fake-host', 'fake-userid')
+
+
+def test_partition_check_mode(snapshot_file):
+    """
+    Test zhmc_partition in check mode with a snapshot: Creating a partition
+    runs the real code path against the faked HMC, without accessing the HMC
+    (which would fail for 'fake-host').
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'name': 'PART3',
+        'state': 'stopped',
+        'properties': {
+            'description': "Partition in snapshot",
+            'ifl_processors': 2,
+            'initial_memory': 1024,
+            'maximum_memory': 1024,
+        },
+        'expand_storage_groups': False,
+        'expand_crypto_adapters': False,
+        'check_mode_snapshot': snapshot_file,
+    }
+    exit_code, result = run_check_mode(zhmc_partition, params)
+
+    assert exit_code == 0, result
+    assert result['changed'] is True
+    partition = result['partition']
+    assert partition['name'] == 'PART3'
+    assert partition['description'] == "Partition in snapshot"
+    assert partition['status'] == 'stopped'
+    # Set by the faked HMC, not by the check mode code of the module
+    assert partition['object-uri'].startswith('/api/partitions/')
+
+    # The snapshot file is not changed
+    session = snapshot_session(snapshot_file, 'fake-host', 'fake-userid')
+    cpc = zhmcclient.Client(session).cpcs.find(name='CPC2')
+    assert sorted(p.name for p in cpc.partitions.list()) == ['PART1', 'PART2']
+
+
+def test_user_check_mode(snapshot_file):
+    """
+    Test zhmc_user in check mode with a snapshot, for an existing user.
+    """
+    params = {
+        'name': 'USER1',
+        'state': 'present',
+        'properties': {
+            'description': "Updated in snapshot",
+        },
+        'expand': False,
+        'check_mode_snapshot': snapshot_file,
+    }
+    exit_code, result = run_check_mode(zhmc_user, params)
+
+    assert exit_code == 0, result
+    assert result['changed'] is True
+    assert result['user']['description'] == "Updated in snapshot"
+
+
+def test_user_role_check_mode(snapshot_file):
+    """
+    Test zhmc_user_role in check mode with a snapshot, for facts.
+    """
+    params = {
+        'name': 'hmc-operator-tasks',
+        'state': 'facts',
+        'check_mode_snapshot': snapshot_file,
+    }
+    exit_code, result = run_check_mode(zhmc_user_role, params)
+
+    assert exit_code == 0, result
+    assert result['changed'] is False
+    assert result['user_role']['name'] == 'hmc-operator-tasks'
+
+
+def test_password_rule_check_mode(snapshot_file):
+    """
+    Test zhmc_password_rule in check mode with a snapshot, for deleting a
+    password rule.
+    """
+    params = {
+        'name': 'Nonexisting rule',
+        'state': 'absent',
+        'check_mode_snapshot': snapshot_file,
+    }
+    exit_code, result = run_check_mode(zhmc_password_rule, params)
+
+    assert exit_code == 0, result
+    assert result['changed'] is False
+
+    params['name'] = 'Standard'
+    exit_code, result = run_check_mode(zhmc_password_rule, params)
+
+    assert exit_code == 0, result
+    assert result['changed'] is True
+
+
+def test_snapshot_error(tmpdir):
+    """
+    Test that an invalid snapshot file causes a module failure.
+    """
+    params = {
+        'name': 'USER1',
+        'state': 'facts',
+        'expand': False,
+        'check_mode_snapshot': os.path.join(str(tmpdir), 'missing.json'),
+    }
+    exit_code, result = run_check_mode(zhmc_user, params)
+
+    assert exit_code == 1
+    assert result['msg'].startswith("ParameterError: Cannot load snapshot")
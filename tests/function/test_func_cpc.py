@@ -397,6 +397,7 @@ class TestCpc(object):
             'state': input_state,
             'properties': input_properties,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
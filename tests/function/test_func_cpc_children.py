@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the child resources in the result of the 'zhmc_cpc'
+Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_cpc
+from tests.common.call_budget import CallCountingSession
+from tests.common.session_wrappers import LatencySession, FixedLatency
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has partitions PART1 and PART2, adapters
+# OSA1 and FCP1, and storage group 'Storage group 1'.
+
+# URI patterns of the list operations for the child resources
+CHILD_LIST_URIS = {
+    'partitions': '^/api/cpcs/[^/]+/partitions',
+    'adapters': '^/api/cpcs/[^/]+/adapters',
+    'storage-groups': '^/api/storage-groups',
+}
+
+
+def run_cpc_facts(session, check_mode=False, **params):
+    """
+    Run the zhmc_cpc module for state=facts and return the 'cpc' result.
+    """
+    _params = {
+        'name': 'CPC2',
+        'state': 'facts',
+        'activation_profile_name': None,
+        'properties': {},
+        'expand_partitions': True,
+        'expand_adapters': True,
+        'expand_storage_groups': True,
+        'partition_properties': None,
+        'adapter_properties': None,
+        'storage_group_properties': None,
+        'max_workers': 8,
+    }
+    _params.update(params)
+    mod_obj = run_module(zhmc_cpc, _params, session, check_mode)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    return mod_obj.exit_json.call_args[1]['cpc']
+
+
+class TestCpcChildren(object):
+    """
+    All tests for the child resources in the result of the zhmc_cpc module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    @pytest.mark.parametrize("max_workers", [1, 8])
+    def test_children_default(self, max_workers):
+        """
+        Test that all child resources are included by default, with the
+        subset of properties returned by the list operations.
+        """
+        cpc = run_cpc_facts(self.session, max_workers=max_workers)
+
+        assert cpc['name'] == 'CPC2'
+        assert sorted(p['name'] for p in cpc['partitions']) == \
+            ['PART1', 'PART2']
+        assert sorted(a['name'] for a in cpc['adapters']) == ['FCP1', 'OSA1']
+        assert [sg['name'] for sg in cpc['storage-groups']] == \
+            ['Storage group 1']
+        assert cpc['partitions'][0] == {
+            'name': 'PART1',
+            'object-uri': '/api/partitions/part1',
+            'status': 'stopped',
+            'type': 'linux',
+        }
+        for uri_pattern in CHILD_LIST_URIS.values():
+            assert self.session.count('GET', uri_pattern) == 1
+        assert self.session.count('GET', '^/api/partitions/') == 0
+
+    @pytest.mark.parametrize(
+        "expand", [
+            dict(expand_partitions=False, expand_adapters=False,
+                 expand_storage_groups=False),
+            dict(expand_adapters=False),
+            dict(expand_partitions=False, expand_storage_groups=False),
+        ]
+    )
+    def test_children_excluded(self, expand):
+        """
+        Test that excluded child resources are neither listed nor returned.
+        """
+        cpc = run_cpc_facts(self.session, **expand)
+
+        for prop_name, expand_parm, _ in zhmc_cpc.CPC_CHILDREN:
+            included = expand.get(expand_parm, True)
+            assert (prop_name in cpc) == included
+            assert self.session.count(
+                'GET', CHILD_LIST_URIS[prop_name]) == int(included)
+
+    def test_children_properties(self):
+        """
+        Test retrieving additional properties of the child resources.
+        """
+        cpc = run_cpc_facts(
+            self.session, expand_adapters=False,
+            partition_properties=['initial_memory', 'description'],
+            storage_group_properties=['shared'])
+
+        assert 'adapters' not in cpc
+        part1 = [p for p in cpc['partitions'] if p['name'] == 'PART1'][0]
+        assert sorted(part1) == ['description', 'initial-memory', 'name',
+                                 'object-uri', 'status', 'type']
+        assert part1['initial-memory'] == 4096
+        assert 'shared' in cpc['storage-groups'][0]
+        assert self.session.count('GET', '^/api/partitions/part1') >= 1
+        assert self.session.count('GET', '^/api/adapters/') == 0
+
+    def test_children_properties_max_workers(self):
+        """
+        Test that the additional properties of the child resources of all
+        types are retrieved with at most max_workers concurrent HMC
+        operations.
+        """
+        session = LatencySession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE),
+            latency=FixedLatency(0.05))
+
+        cpc = run_cpc_facts(
+            session, max_workers=2,
+            partition_properties=['description'],
+            adapter_properties=['description'],
+            storage_group_properties=['shared'])
+
+        assert all('description' in p for p in cpc['partitions'])
+        assert all('description' in a for a in cpc['adapters'])
+        assert 'shared' in cpc['storage-groups'][0]
+        assert 1 < session.peak_concurrency <= 2
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests and benchmark for the 'zhmc_cpc_list' Ansible module with
+many CPCs, using a faked session with HMC latency.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_cpc_list
+from tests.common.call_budget import CallCountingSession
+from tests.common.session_wrappers import LatencySession, FixedLatency
+
+# Number of managed CPCs in the faked HMC
+NUM_CPCS = 12
+
+# Latency of each HMC operation in the benchmark, in seconds
+BENCHMARK_LATENCY = 0.05
+
+
+def faked_hmc_session():
+    """
+    Return a FakedSession for an HMC with NUM_CPCS managed CPCs (alternating
+    DPM and classic mode) and two unmanaged CPCs.
+    """
+    session = FakedSession('fake-host', 'fake-hmc', '2.15.0', '4.1')
+    console = session.hmc.consoles.add({
+        'object-id': None,
+        'name': 'fake-hmc',
+    })
+    for i in range(NUM_CPCS):
+        dpm = i % 2 == 0
+        session.hmc.cpcs.add({
+            'object-id': 'cpc{0}'.format(i),
+            'name': 'CPC{0:02d}'.format(i),
+            'status': 'active' if dpm else 'operating',
+            'has-unacceptable-status': False,
+            'dpm-enabled': dpm,
+            'se-version': '2.15.0' if dpm else '2.14.1',
+        })
+    for i in range(2):
+        console.unmanaged_cpcs.add({
+            'object-id': 'ucpc{0}'.format(i),
+            'name': 'NEWCPC{0}'.format(i),
+        })
+    return session
+
+
+def expected_cpcs():
+    """
+    Return the expected result items of zhmc_cpc_list.
+    """
+    cpcs = []
+    for i in range(NUM_CPCS):
+        dpm = i % 2 == 0
+        cpcs.append({
+            'name': 'CPC{0:02d}'.format(i),
+            'is_managed': True,
+            'status': 'active' if dpm else 'operating',
+            'has_unacceptable_status': False,
+            'dpm_enabled': dpm,
+            'se_version': '2.15.0' if dpm else '2.14.1',
+        })
+    for i in range(2):
+        cpcs.append({'name': 'NEWCPC{0}'.format(i), 'is_managed': False})
+    return cpcs
+
+
+def list_cpcs(session, max_workers, include_unmanaged_cpcs=True):
+    """
+    Run perform_list() of the zhmc_cpc_list module and return the result
+    items.
+    """
+    params = {
+        'hmc_host': 'fake-host',
+        'hmc_auth': dict(userid='fake-userid', password='fake-password',
+                         ca_certs=None, verify=True),
+        'include_unmanaged_cpcs': include_unmanaged_cpcs,
+        'output_file': None,
+        'max_workers': max_workers,
+        'log_file': None,
+        '_faked_session': session,
+    }
+    return zhmc_cpc_list.perform_list(params).result()
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_cpc_list_many(max_workers):
+    """
+    Test that the result items are complete and in order, and that each CPC
+    is retrieved only once, with a single rejected property-selective GET
+    because the faked HMC does not support the 'properties' query parameter.
+    """
+    session = CallCountingSession(faked_hmc_session())
+
+    cpcs = list_cpcs(session, max_workers)
+
+    assert cpcs == expected_cpcs()
+    assert session.count('GET', r'^/api/cpcs/[^/?]+\?properties=') == 1
+    assert session.count('GET', r'^/api/cpcs/[^/?]+$') == NUM_CPCS
+    assert session.count() == NUM_CPCS + 3
+
+
+def test_cpc_list_managed_only():
+    """
+    Test that the unmanaged CPCs are not listed if not requested.
+    """
+    session = CallCountingSession(faked_hmc_session())
+
+    cpcs = list_cpcs(session, 8, include_unmanaged_cpcs=False)
+
+    assert cpcs == expected_cpcs()[0:NUM_CPCS]
+    assert session.count('GET', 'list-unmanaged-cpcs') == 0
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_benchmark_cpc_list(max_workers):
+    """
+    Benchmark for listing NUM_CPCS managed CPCs and the unmanaged CPCs with
+    HMC latency, checking that the first HMC operation (which logs on) is
+    done alone, and that the subsequent HMC operations overlap in parallel
+    mode but never exceed max_workers.
+    """
+    session = LatencySession(
+        faked_hmc_session(), latency=FixedLatency(BENCHMARK_LATENCY))
+
+    cpcs = list_cpcs(session, max_workers)
+
+    assert cpcs == expected_cpcs()
+    assert session.op_count == NUM_CPCS + 3
+    assert session.concurrency[0:2] == [1, 1]
+    if max_workers == 1:
+        assert session.peak_concurrency == 1
+    else:
+        assert 1 < session.peak_concurrency <= max_workers
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the batch mode of the 'zhmc_hba' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import pytest
+import mock
+import zhmcclient
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_hba
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has PART1 and PART2 without HBAs, and
+# adapter FCP1 with port 0.
+
+
+def run_hba_batch(session, hbas, state='present', check_mode=False):
+    """
+    Run the zhmc_hba module in batch mode and return the mocked
+    AnsibleModule object.
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'partition_name': None,
+        'name': None,
+        'state': state,
+        'properties': {},
+        'hbas': hbas,
+        'max_workers': 8,
+    }
+    return run_module(zhmc_hba, params, session, check_mode)
+
+
+def hba_item(partition_name, name, properties=None):
+    """
+    Return an item of the 'hbas' module parameter.
+    """
+    return dict(partition_name=partition_name, name=name,
+                properties=properties)
+
+
+FCP1_PORT0 = {'adapter_name': 'FCP1', 'adapter_port': 0}
+
+
+class TestHbaBatch(object):
+    """
+    All tests for the batch mode of the zhmc_hba module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+        self.cpc = zhmcclient.Client(self.session).cpcs.find(name='CPC2')
+
+    def hba_names(self, partition_name):
+        """
+        Return the sorted names of the HBAs of a partition in the mocked HMC.
+        """
+        partition = self.cpc.partitions.find(name=partition_name)
+        return sorted(hba.name for hba in partition.hbas.list())
+
+    @pytest.mark.parametrize("check_mode", [False, True])
+    def test_batch_present(self, check_mode):
+        """
+        Test creating HBAs in multiple partitions, and that the adapter port
+        is looked up only once.
+        """
+        hbas = [
+            hba_item('PART2', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+            hba_item('PART1', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+            hba_item('PART1', 'HBA2', dict(FCP1_PORT0, device_number='1201')),
+        ]
+        self.session.reset()
+
+        mod_obj = run_hba_batch(self.session, hbas,
+                                check_mode=check_mode)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert 'hba' not in result
+        results = result['hbas']
+        assert [(r['partition_name'], r['name'], r['changed'])
+                for r in results] == \
+            [('PART2', 'HBA1', True), ('PART1', 'HBA1', True),
+             ('PART1', 'HBA2', True)]
+        assert self.session.count('GET', '^/api/cpcs/[^/]+/adapters') == 1
+        assert self.session.count(
+            'GET', '^/api/adapters/[^/]+/storage-ports/[^/]+$') == 1
+
+        if check_mode:
+            assert all(r['properties'] == {} for r in results)
+            assert self.hba_names('PART1') == []
+        else:
+            assert results[2]['properties']['device-number'] == '1201'
+            assert results[2]['properties']['wwpn']
+            assert self.hba_names('PART1') == ['HBA1', 'HBA2']
+            assert self.hba_names('PART2') == ['HBA1']
+
+    def test_batch_update_absent(self):
+        """
+        Test updating and deleting HBAs in batch mode, and idempotency.
+        """
+        hbas = [
+            hba_item('PART1', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+            hba_item('PART2', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+        ]
+        run_hba_batch(self.session, hbas)
+
+        hbas[1]['properties']['device_number'] = '1300'
+        mod_obj = run_hba_batch(self.session, hbas)
+        results = mod_obj.exit_json.call_args[1]['hbas']
+        assert [r['changed'] for r in results] == [False, True]
+        assert results[1]['properties']['device-number'] == '1300'
+
+        mod_obj = run_hba_batch(self.session,
+                                [hba_item('PART1', 'HBA1'),
+                                 hba_item('PART1', 'HBA9')],
+                                state='absent')
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert [r['changed'] for r in result['hbas']] == [True, False]
+        assert self.hba_names('PART1') == []
+        assert self.hba_names('PART2') == ['HBA1']
+
+    @pytest.mark.parametrize(
+        "hbas, error_msg_pattern", [
+            ([hba_item('PART1', 'HBA1'), hba_item('PART1', 'HBA1')],
+             "ParameterError: Item 1 in module parameter 'hbas' specifies "
+             "HBA 'HBA1' in partition 'PART1' again."),
+            ([hba_item('PART9', 'HBA1', FCP1_PORT0)],
+             "ParameterError: Partitions specified in module parameter "
+             "'hbas' do not exist in CPC 'CPC2': PART9"),
+            ([hba_item('PART1', 'HBA1',
+                       {'adapter_name': 'FCP9', 'adapter_port': 0})],
+             "ParameterError: Artificial property 'adapter_name' does not "
+             "specify the name of an existing adapter: 'FCP9'"),
+            ([hba_item('PART1', 'HBA1',
+                       {'adapter_name': 'FCP1', 'adapter_port': 3})],
+             "ParameterError: Artificial property 'adapter_port' does not "
+             "specify the index of an existing port on adapter 'FCP1': 3"),
+            ([hba_item('PART1', 'HBA1', FCP1_PORT0),
+              hba_item('PART2', 'HBA1', {'foo': 'bar'})],
+             "ParameterError: Property 'foo' is not defined in the data "
+             "model for HBAs."),
+            ([hba_item('PART1', 'HBA1', FCP1_PORT0),
+              hba_item('PART2', 'HBA1', {'wwpn': 'C05076FFEB800004'})],
+             "ParameterError: Property 'wwpn' is not allowed in the "
+             "'properties' module parameter."),
+            ([hba_item('PART1', 'HBA1', FCP1_PORT0),
+              hba_item('PART2', 'HBA1', {'adapter_name': 'FCP1'})],
+             "ParameterError: Artificial properties 'adapter_name' and "
+             "'adapter_port' must either both be specified or both be "
+             "omitted."),
+            ([hba_item('PART1', 'HBA1', FCP1_PORT0),
+              hba_item('PART2', 'HBA1',
+                       {'adapter_name': 'FCP1', 'adapter_port': 'x'})],
+             "ParameterError: Item 1 in module parameter 'hbas' has an "
+             "invalid property value: invalid literal for int\\(\\) with "
+             "base 10: 'x'"),
+        ]
+    )
+    def test_batch_parm_errors(self, hbas,
+                               error_msg_pattern):
+        """
+        Test batch mode with parameter errors, which are detected before
+        anything is changed.
+        """
+        mod_obj = run_hba_batch(self.session, hbas)
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+        assert self.session.count('POST', '/hbas') == 0
+
+    def test_batch_partition_failure(self):
+        """
+        Test that an HMC error in one partition does not prevent the
+        processing of the other partitions, and that the module fails with
+        the items that have been processed.
+        """
+        hbas = [
+            hba_item('PART2', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+            hba_item('PART2', 'HBA2', dict(FCP1_PORT0, device_number='1201')),
+            hba_item('PART2', 'HBA3', dict(FCP1_PORT0, device_number='1202')),
+            hba_item('PART1', 'HBA1', dict(FCP1_PORT0, device_number='1200')),
+        ]
+        create = zhmcclient.HbaManager.create
+
+        def failing_create(hba_manager, properties):
+            if hba_manager.partition.name == 'PART2' and \
+                    properties['name'] == 'HBA2':
+                raise zhmcclient.ConnectionError("Connection lost", None)
+            return create(hba_manager, properties)
+
+        with mock.patch.object(zhmcclient.HbaManager, 'create',
+                               failing_create):
+            mod_obj = run_hba_batch(self.session, hbas)
+
+        assert not mod_obj.exit_json.called
+        result = mod_obj.fail_json.call_args[1]
+        assert result['msg'] == \
+            "Processing failed for 2 of 4 HBAs: ConnectionError: " \
+            "Connection lost"
+        assert result['changed'] is True
+        assert [(r['partition_name'], r['name'], r['changed'], r.get('msg'))
+                for r in result['hbas']] == [
+            ('PART2', 'HBA1', True, None),
+            ('PART2', 'HBA2', False, "ConnectionError: Connection lost"),
+            ('PART2', 'HBA3', False, "ConnectionError: Connection lost"),
+            ('PART1', 'HBA1', True, None),
+        ]
+        assert self.hba_names('PART1') == ['HBA1']
+        assert self.hba_names('PART2') == ['HBA1']
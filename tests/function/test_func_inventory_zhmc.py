@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc' inventory plugin.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import pytest
+import mock
+
+import zhmcclient
+from ansible.errors import AnsibleError
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import inventory_loader
+from zhmcclient_mock import FakedSession
+
+from plugins.inventory import zhmc as zhmc_inventory
+from plugins.module_utils import common
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE
+
+CONFIG_BASE = """
+plugin: ibm.ibm_zhmc.zhmc
+hmc_host: fake-host
+hmc_auth:
+  userid: fake-userid
+  password: fake-password
+"""
+
+
+def run_inventory(tmpdir, config, session, cache=True):
+    """
+    Run the inventory plugin with a configuration file and a session, and
+    return the resulting InventoryData object.
+    """
+    config_file = str(tmpdir.join('zhmc.yml'))
+    with open(config_file, 'w') as fp:
+        fp.write(CONFIG_BASE + config)
+
+    # Load the option definitions from the plugin documentation, as the
+    # plugin loader does for plugins in installed collections.
+    inventory_loader._load_config_defs(
+        'zhmc', zhmc_inventory, zhmc_inventory.__file__)
+    plugin = zhmc_inventory.InventoryModule()
+    plugin._load_name = 'zhmc'
+    plugin._get_session = lambda: session
+
+    assert plugin.verify_file(config_file)
+    inventory = InventoryData()
+    plugin.parse(inventory, DataLoader(), config_file, cache=cache)
+    # As done by the inventory manager after parsing
+    try:
+        plugin.update_cache_if_changed()
+    except AttributeError:
+        pass  # Caching is not enabled
+    return inventory
+
+
+def group_hosts(inventory):
+    """
+    Return the host names of the non-empty groups as a dict.
+    """
+    return dict((g.name, sorted(h.name for h in g.hosts))
+                for g in inventory.groups.values() if g.hosts)
+
+
+class TestInventoryZhmc(object):
+    """
+    All tests for the 'zhmc' inventory plugin.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    def test_inventory_all(self, tmpdir):
+        """
+        Test the inventory with default options and keyed groups.
+        """
+        config = """
+keyed_groups:
+  - key: zhmc_status
+    prefix: status
+"""
+        inventory = run_inventory(tmpdir, config, self.session)
+
+        assert group_hosts(inventory) == {
+            'zhmc_cpcs': ['CPC1', 'CPC2'],
+            'zhmc_partitions': ['CPC2.PART1', 'CPC2.PART2'],
+            'zhmc_lpars': ['CPC1.LPAR1', 'CPC1.LPAR2'],
+            'zhmc_cpc_CPC1': ['CPC1.LPAR1', 'CPC1.LPAR2'],
+            'zhmc_cpc_CPC2': ['CPC2.PART1', 'CPC2.PART2'],
+            'status_active': ['CPC1', 'CPC2'],
+            'status_stopped': ['CPC2.PART1', 'CPC2.PART2'],
+            'status_operating': ['CPC1.LPAR1'],
+            'status_not_activated': ['CPC1.LPAR2'],
+        }
+        host_vars = inventory.get_host('CPC2.PART1').vars
+        assert host_vars['zhmc_name'] == 'PART1'
+        assert host_vars['zhmc_cpc_name'] == 'CPC2'
+        assert host_vars['zhmc_class'] == 'partition'
+        assert host_vars['zhmc_type'] == 'linux'
+        assert host_vars['zhmc_object_uri'] == '/api/partitions/part1'
+
+        # Listing needs no HMC operations per host
+        assert self.session.count(uri_pattern='^/api/partitions/') == 0
+        assert self.session.count(uri_pattern='^/api/logical-partitions/') \
+            == 0
+
+    def test_inventory_properties(self, tmpdir):
+        """
+        Test the inventory with additional properties and CPC selection.
+        """
+        config = """
+cpc_names:
+  - CPC2
+include_cpcs: false
+properties:
+  - os_type
+  - maximum-memory
+keyed_groups:
+  - key: zhmc_type
+    prefix: type
+"""
+        inventory = run_inventory(tmpdir, config, self.session)
+
+        assert group_hosts(inventory) == {
+            'zhmc_partitions': ['CPC2.PART1', 'CPC2.PART2'],
+            'zhmc_cpc_CPC2': ['CPC2.PART1', 'CPC2.PART2'],
+            'type_linux': ['CPC2.PART1'],
+            'type_ssc': ['CPC2.PART2'],
+        }
+        host_vars = inventory.get_host('CPC2.PART1').vars
+        assert 'zhmc_os_type' in host_vars
+        assert 'zhmc_maximum_memory' in host_vars
+        assert 'zhmc_initial_memory' not in host_vars
+
+    def test_inventory_cache(self, tmpdir):
+        """
+        Test that a cached inventory is used without accessing the HMC.
+        """
+        config = """
+cache: true
+cache_plugin: jsonfile
+cache_connection: {0}
+cache_timeout: 600
+""".format(str(tmpdir.join('cache')))
+
+        # The first run does not read the cache and updates it
+        inventory1 = run_inventory(tmpdir, config, self.session, cache=False)
+        assert self.session.count() > 0
+
+        # The second run is served from the cache
+        self.session.reset()
+        inventory2 = run_inventory(tmpdir, config, self.session, cache=True)
+        assert self.session.count() == 0
+
+        assert group_hosts(inventory2) == group_hosts(inventory1)
+
+    @pytest.mark.parametrize("hmc_version", ['2.13.1', '2.14.0'])
+    def test_inventory_capabilities(self, tmpdir, hmc_version):
+        """
+        Test that the HMC capabilities are cached across inventory refreshes,
+        and that the partitions and LPARs are listed in the traditional way
+        on HMCs without the "List Permitted ..." operations.
+        """
+        self.session.hmc.hmc_version = hmc_version
+        env = {common.CAPABILITY_CACHE_DIR_ENV_VAR: str(tmpdir.join('caps'))}
+        try:
+            with mock.patch.dict(os.environ, env):
+                inventory1 = run_inventory(tmpdir, "", self.session)
+                assert self.session.count('GET', r'^/api/version$') == 1
+                permitted = self.session.count(
+                    'GET', '/list-permitted-')
+                assert permitted == (2 if hmc_version == '2.14.0' else 0)
+
+                common._CAPABILITIES.clear()
+                self.session.reset()
+                inventory2 = run_inventory(tmpdir, "", self.session)
+                assert self.session.count('GET', r'^/api/version$') == 0
+        finally:
+            common._CAPABILITIES.clear()
+
+        assert group_hosts(inventory2) == group_hosts(inventory1)
+        assert group_hosts(inventory1)['zhmc_partitions'] == \
+            ['CPC2.PART1', 'CPC2.PART2']
+        assert group_hosts(inventory1)['zhmc_lpars'] == \
+            ['CPC1.LPAR1', 'CPC1.LPAR2']
+
+    def test_inventory_error(self, tmpdir):
+        """
+        Test that HMC errors are surfaced as Ansible errors.
+        """
+        exc = zhmcclient.ConnectionError("Connection refused", None)
+        with mock.patch.object(self.session, 'get', side_effect=exc):
+            with pytest.raises(AnsibleError) as exc_info:
+                run_inventory(tmpdir, "", self.session)
+        assert "Connection refused" in str(exc_info.value)
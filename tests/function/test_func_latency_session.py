@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the latency-injecting faked session used for benchmarks.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import time
+import pytest
+
+from zhmcclient import Client
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_partition
+from tests.common.session_wrappers import LatencySession, FixedLatency, \
+    NormalLatency, RecordedLatency
+
+from .func_utils import run_module
+
+# FakedSession() init arguments
+FAKED_SESSION_KWARGS = dict(
+    host='fake-host',
+    hmc_name='faked-hmc-name',
+    hmc_version='2.13.1',
+    api_version='1.8'
+)
+
+FAKED_CONSOLE = {
+    'object-uri': '/api/console',
+    'class': 'console',
+    'name': 'hmc-1',
+    'description': 'Console HMC1',
+    'version': '2.13.0',
+}
+
+FAKED_CPC_1_URI = '/api/cpcs/fake-cpc-1'
+FAKED_CPC_1 = {
+    'object-id': 'fake-cpc-1',
+    'object-uri': FAKED_CPC_1_URI,
+    'class': 'cpc',
+    'name': 'cpc-name-1',
+    'description': 'CPC #1 in DPM mode',
+    'status': 'active',
+    'dpm-enabled': True,
+    'is-ensemble-member': False,
+    'iml-mode': 'dpm',
+}
+
+FAKED_PARTITION_1 = {
+    'object-id': 'fake-part-1',
+    'object-uri': '/api/partitions/fake-part-1',
+    'parent': FAKED_CPC_1_URI,
+    'class': 'partition',
+    'name': 'part-name-1',
+    'description': 'Partition #1',
+    'status': 'stopped',
+    'type': 'linux',
+    'ifl-processors': 1,
+    'initial-memory': 1024,
+    'maximum-memory': 2048,
+    'storage-group-uris': [],
+    'crypto-configuration': None,
+    'boot-storage-volume': None,
+}
+
+
+class SleepRecorder(object):
+    """
+    Replacement for time.sleep() that records the requested delays.
+    """
+
+    def __init__(self):
+        self.delays = []
+
+    def __call__(self, seconds):
+        self.delays.append(seconds)
+
+
+class TestLatencySession(object):
+    """
+    All tests for the LatencySession class.
+    """
+
+    def setup_method(self):
+        """
+        Using the zhmcclient mock support, set up a CPC in DPM mode with a
+        stopped partition.
+        """
+        self.session = FakedSession(**FAKED_SESSION_KWARGS)
+        self.session.hmc.consoles.add(FAKED_CONSOLE)
+        self.faked_cpc = self.session.hmc.cpcs.add(FAKED_CPC_1)
+        self.faked_cpc.partitions.add(FAKED_PARTITION_1)
+
+    def test_latency_fixed(self):
+        """
+        Test that a fixed latency is applied to each HTTP method.
+        """
+        sleep = SleepRecorder()
+        session = LatencySession(
+            self.session, latency=FixedLatency(0.25), sleep=sleep)
+        client = Client(session)
+
+        cpcs = client.cpcs.list()
+        cpcs[0].partitions.list()
+
+        assert session.op_count == 2
+        assert sleep.delays == [0.25, 0.25]
+        assert session.total_delay == pytest.approx(0.5)
+        assert session.concurrency == [1, 1]
+        assert session.peak_concurrency == 1
+
+    def test_latency_by_method(self):
+        """
+        Test that latencies can be specified per HTTP method.
+        """
+        sleep = SleepRecorder()
+        session = LatencySession(
+            self.session, latency=dict(POST=FixedLatency(1.0)), sleep=sleep)
+        client = Client(session)
+
+        cpc = client.cpcs.list()[0]
+        cpc.update_properties({'description': 'new'})
+
+        assert session.op_count == 2
+        assert sleep.delays == [1.0]
+        assert self.faked_cpc.properties['description'] == 'new'
+
+    def test_latency_normal(self):
+        """
+        Test that a normal distribution is clipped and repeatable.
+        """
+        dist1 = NormalLatency(0.1, 1.0, minimum=0.05, seed=42)
+        dist2 = NormalLatency(0.1, 1.0, minimum=0.05, seed=42)
+        samples1 = [dist1.sample() for _ in range(100)]
+        samples2 = [dist2.sample() for _ in range(100)]
+        assert samples1 == samples2
+        assert min(samples1) == 0.05
+
+    def test_latency_recorded(self):
+        """
+        Test that a recorded distribution returns only recorded values.
+        """
+        recorded = [0.1, 0.2, 0.7]
+        dist = RecordedLatency(recorded, seed=1)
+        for _ in range(20):
+            assert dist.sample() in recorded
+        with pytest.raises(ValueError):
+            RecordedLatency([])
+
+    def test_latency_invalid_job_operation(self):
+        """
+        Test that an invalid job operation name is rejected.
+        """
+        with pytest.raises(ValueError):
+            LatencySession(self.session,
+                           job_durations=dict(foo=FixedLatency(1)))
+
+    def test_latency_job_duration(self):
+        """
+        Test that starting a partition through the module path with
+        '_faked_session' is delayed by the simulated job duration.
+        """
+        sleep = SleepRecorder()
+        session = LatencySession(
+            self.session, latency=FixedLatency(0.01),
+            job_durations=dict(start=FixedLatency(60.0)), sleep=sleep)
+
+        params = {
+            'cpc_name': FAKED_CPC_1['name'],
+            'name': FAKED_PARTITION_1['name'],
+            'state': 'active',
+            'properties': None,
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+        }
+        mod_obj = run_module(zhmc_partition, params, session)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        assert sleep.delays.count(60.0) == 1
+        assert session.total_delay == pytest.approx(
+            60.0 + 0.01 * session.op_count)
+
+    def test_latency_real_sleep(self):
+        """
+        Test that the latency is actually observable in the elapsed time.
+        """
+        session = LatencySession(self.session, latency=FixedLatency(0.02))
+        client = Client(session)
+
+        start_time = time.time()
+        for _ in range(5):
+            client.cpcs.list()
+        elapsed = time.time() - start_time
+
+        assert session.op_count == 5
+        assert elapsed >= 0.1
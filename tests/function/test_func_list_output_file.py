@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'output_file' parameter of the list modules.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import hashlib
+import importlib
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# List modules, with the name of their return value for the list of items
+# and their module specific parameters
+LIST_MODULES = [
+    ('zhmc_adapter_list', 'adapters',
+     dict(cpc_name=None, name=None, adapter_id=None, adapter_family=None,
+          type=None, status=None)),
+    ('zhmc_cpc_list', 'cpcs', dict(include_unmanaged_cpcs=False)),
+    ('zhmc_lpar_list', 'lpars', dict(cpc_name=None)),
+    ('zhmc_partition_list', 'partitions', dict(cpc_name=None)),
+    ('zhmc_password_rule_list', 'password_rules', dict()),
+    ('zhmc_user_list', 'users', dict()),
+    ('zhmc_user_role_list', 'user_roles', dict()),
+]
+
+
+def run_list(module_name, session, output_file, check_mode=False,
+             **params):
+    """
+    Run a list module and return the mocked AnsibleModule object.
+    """
+    module = importlib.import_module('plugins.modules.' + module_name)
+    module_params = {
+        'output_file': output_file,
+    }
+    module_params.update(params)
+    return run_module(module, module_params, session, check_mode)
+
+
+def read_lines(path):
+    """
+    Return the JSON objects in a JSON Lines file.
+    """
+    with open(path) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def file_checksum(path):
+    """
+    Return the checksum of a file in the format of the 'output' return
+    value.
+    """
+    with open(path, 'rb') as fp:
+        return 'sha256:' + hashlib.sha256(fp.read()).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "module_name, items_key, params", LIST_MODULES)
+def test_list_output_file(module_name, items_key, params, tmpdir):
+    """
+    Test that the items of a list module are written to the output file,
+    and that the file is written only if its content changes.
+    """
+    session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    output_file = str(tmpdir.join('items.jsonl'))
+
+    # The items as returned without output file
+    mod_obj = run_list(module_name, session, None, **params)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result = mod_obj.exit_json.call_args[1]
+    assert result['changed'] is False
+    items = result[items_key]
+    assert items
+
+    # The items written to the output file
+    mod_obj = run_list(module_name, session, output_file, **params)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result = mod_obj.exit_json.call_args[1]
+    assert result['changed'] is True
+    assert items_key not in result
+    assert result['output'] == {
+        'path': output_file,
+        'count': len(items),
+        'checksum': file_checksum(output_file),
+    }
+    assert read_lines(output_file) == items
+
+    # A second run does not change the file
+    mtime = os.stat(output_file).st_mtime
+    mod_obj = run_list(module_name, session, output_file, **params)
+    result = mod_obj.exit_json.call_args[1]
+    assert result['changed'] is False
+    assert result['output']['count'] == len(items)
+    assert os.stat(output_file).st_mtime == mtime
+    assert os.listdir(str(tmpdir)) == ['items.jsonl']
+
+
+def test_list_output_file_check_mode(tmpdir):
+    """
+    Test that the output file is not written in check mode.
+    """
+    session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    output_file = str(tmpdir.join('users.jsonl'))
+
+    mod_obj = run_list('zhmc_user_list', session, output_file,
+                       check_mode=True)
+
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result = mod_obj.exit_json.call_args[1]
+    assert result['changed'] is True
+    assert result['output']['count'] > 0
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_list_output_file_error(tmpdir):
+    """
+    Test that the output file is left unchanged when listing fails.
+    """
+    session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    output_file = str(tmpdir.join('users.jsonl'))
+    with open(output_file, 'w') as fp:
+        fp.write('{"name": "old"}\n')
+
+    exc = zhmcclient.HTTPError(
+        dict(http_status=500, reason=1, message="Failed"))
+    with mock.patch('zhmcclient.UserManager.list', side_effect=exc):
+        mod_obj = run_list('zhmc_user_list', session, output_file)
+
+    assert mod_obj.fail_json.called
+    assert read_lines(output_file) == [{'name': 'old'}]
+    assert os.listdir(str(tmpdir)) == ['users.jsonl']
+
+
+@pytest.mark.parametrize(
+    "module_name, items_key, params", LIST_MODULES)
+def test_list_output_file_missing_dir(module_name, items_key, params, tmpdir):
+    """
+    Test that a missing directory of the output file fails the module with
+    a message that shows the output file.
+    """
+    session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+    output_file = str(tmpdir.join('missing', 'items.jsonl'))
+
+    mod_obj = run_list(module_name, session, output_file, **params)
+
+    assert mod_obj.fail_json.called
+    msg = mod_obj.fail_json.call_args[1]['msg']
+    assert msg.startswith('ParameterError: ')
+    assert output_file in msg
+    assert os.listdir(str(tmpdir)) == []
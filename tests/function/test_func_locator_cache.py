@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the use of the locator cache by the modules.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import pytest
+import mock
+
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils import common
+from plugins.modules import zhmc_partition, zhmc_lpar
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# Patterns for the URIs of the list operations for CPCs, partitions and LPARs
+LIST_URI_PATTERNS = (r'^/api/cpcs(\?|$)', r'/partitions(\?|$)',
+                     r'/logical-partitions(\?|$)')
+
+
+@pytest.fixture(autouse=True)
+def locator_caches():
+    """
+    Forget the locator caches of this process that were used in a test.
+    """
+    yield
+    common._LOCATOR_CACHES.clear()
+
+
+def run_cached_module(module, session, params, cache_dir):
+    """
+    Run a module with the locator cache enabled, as a separate process would
+    do it, and return the mocked AnsibleModule object.
+    """
+    env = {common.LOCATOR_CACHE_DIR_ENV_VAR: cache_dir}
+    with mock.patch.dict(os.environ, env):
+        mod_obj = run_module(module, params, session)
+        # The cache is written when the module process ends
+        for cache in common._LOCATOR_CACHES.values():
+            cache.flush()
+        common._LOCATOR_CACHES.clear()
+    return mod_obj
+
+
+def list_calls(session):
+    """
+    Return the number of list operations for CPCs, partitions and LPARs.
+    """
+    return sum(session.count('GET', pattern) for pattern in LIST_URI_PATTERNS)
+
+
+@pytest.mark.parametrize(
+    "module, params", [
+        (zhmc_partition,
+         dict(cpc_name='CPC2', name='PART1', state='facts', properties=None,
+              expand_storage_groups=False, expand_crypto_adapters=False)),
+        (zhmc_lpar,
+         dict(cpc_name='CPC1', name='LPAR1', state='facts',
+              activation_profile_name=None, force=False,
+              os_ipl_token=None, properties=None)),
+    ]
+)
+def test_repeat_run(module, params, tmpdir):
+    """
+    Test that a repeated run of a module finds the resources by their cached
+    URIs without listing their collections, and returns the same result.
+    """
+    session = CallCountingSession(
+        FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    mod_obj = run_cached_module(module, session, params, str(tmpdir))
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result1 = mod_obj.exit_json.call_args[1]
+    assert list_calls(session) > 0
+
+    session.reset()
+    mod_obj = run_cached_module(module, session, params, str(tmpdir))
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result2 = mod_obj.exit_json.call_args[1]
+    assert list_calls(session) == 0
+    assert result2 == result1
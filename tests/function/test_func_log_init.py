@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the logging setup of the modules (log_init()).
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import logging
+import time
+
+from plugins.module_utils.common import log_init, log_file_handler, \
+    HMC_LOGGER_NAME, HMC_LOG_MAX_LENGTH
+
+LOGGER_NAME = 'zhmc_test_log_init'
+
+
+def read_log_file(log_file, expected_lines, timeout=5):
+    """
+    Return the lines of a log file, waiting until it has the expected number
+    of lines, since the log records are written asynchronously.
+    """
+    end_time = time.time() + timeout
+    while True:
+        with open(log_file) as fp:
+            lines = fp.read().splitlines()
+        if len(lines) >= expected_lines or time.time() > end_time:
+            return lines
+        time.sleep(0.01)
+
+
+class TestLogInit(object):
+    """
+    All tests for log_init().
+    """
+
+    def teardown_method(self):
+        """
+        Remove the log handlers and levels set up by the test.
+        """
+        for name in (LOGGER_NAME, HMC_LOGGER_NAME):
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.NOTSET)
+            for handler in list(logger.handlers):
+                if hasattr(handler, 'baseFilename'):
+                    logger.removeHandler(handler)
+
+    def test_no_log_file(self):
+        """
+        Test that without log file, the loggers inherit the level of the root
+        logger, so that debug log records are not created.
+        """
+        root_logger = logging.getLogger()
+        saved_level = root_logger.level
+        root_logger.setLevel(logging.WARNING)
+        try:
+            log_init(LOGGER_NAME, None, 'debug')
+
+            for name in (LOGGER_NAME, HMC_LOGGER_NAME):
+                logger = logging.getLogger(name)
+                assert logger.level == logging.NOTSET
+                assert not [h for h in logger.handlers
+                            if hasattr(h, 'baseFilename')]
+                assert not logger.isEnabledFor(logging.DEBUG)
+        finally:
+            root_logger.setLevel(saved_level)
+
+    def test_log_level(self, tmpdir):
+        """
+        Test that the log level applies to the log file.
+        """
+        log_file = str(tmpdir.join('test.log'))
+        log_init(LOGGER_NAME, log_file, 'info')
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.debug("debug message")
+        logger.info("info message")
+        logging.getLogger(HMC_LOGGER_NAME).debug("hmc message")
+        logging.getLogger(HMC_LOGGER_NAME).warning("hmc warning")
+
+        lines = read_log_file(log_file, 2)
+        assert len(lines) == 2
+        assert " INFO {0} ".format(LOGGER_NAME) in lines[0]
+        assert lines[0].endswith("info message")
+        assert " WARNING {0} ".format(HMC_LOGGER_NAME) in lines[1]
+        assert lines[1].endswith("hmc warning")
+
+    def test_one_handler(self, tmpdir):
+        """
+        Test that initializing logging again for the same log file does not
+        add another handler.
+        """
+        log_file = str(tmpdir.join('test.log'))
+        log_init(LOGGER_NAME, log_file)
+        log_init(LOGGER_NAME, log_file)
+
+        handler = log_file_handler(log_file)
+        for name in (LOGGER_NAME, HMC_LOGGER_NAME):
+            handlers = [h for h in logging.getLogger(name).handlers
+                        if hasattr(h, 'baseFilename')]
+            assert handlers == [handler]
+
+        logging.getLogger(LOGGER_NAME).debug("message")
+        lines = read_log_file(log_file, 1)
+        assert len(lines) == 1
+
+    def test_hmc_truncation(self, tmpdir):
+        """
+        Test that long messages of the HMC logger are truncated, and that
+        messages of other loggers are not truncated.
+        """
+        log_file = str(tmpdir.join('test.log'))
+        log_init(LOGGER_NAME, log_file)
+        content = 'x' * (HMC_LOG_MAX_LENGTH * 3)
+
+        logging.getLogger(HMC_LOGGER_NAME).debug(
+            "Respons: GET /api/cpcs, content: %r", content)
+        logging.getLogger(LOGGER_NAME).debug("Result: %s", content)
+
+        lines = read_log_file(log_file, 2)
+        assert len(lines) == 2
+        assert "...(truncated, {0} of ".format(HMC_LOG_MAX_LENGTH) in lines[0]
+        assert len(lines[0]) < HMC_LOG_MAX_LENGTH + 200
+        assert lines[1].endswith(content)
@@ -404,6 +404,7 @@ class TestLpar(object):
             'activation_profile_name': None,  # TODO: Add to tests
             'properties': input_props,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -481,6 +482,7 @@ class TestLpar(object):
             'state': desired_state,
             'activation_profile_name': None,  # TODO: Add to tests
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the batch mode of the 'zhmc_lpar' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import pytest
+import zhmcclient
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_lpar
+from plugins.module_utils.common import ParameterError
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC1 (classic) has LPAR1 (operating) and LPAR2
+# (not-activated). LPAR3 (operating) is added by the tests, and the
+# processing weights are set for LPAR1 and LPAR3.
+
+WEIGHTS = {
+    'initial-processing-weight': 10,
+    'minimum-processing-weight': 0,
+    'maximum-processing-weight': 0,
+}
+
+
+def run_lpar_batch(session, lpars, state='set', check_mode=False):
+    """
+    Run the zhmc_lpar module in batch mode and return the mocked
+    AnsibleModule object.
+    """
+    params = {
+        'cpc_name': 'CPC1',
+        'name': None,
+        'state': state,
+        'activation_profile_name': None,
+        'force': False,
+        'os_ipl_token': None,
+        'properties': {},
+        'lpars': lpars,
+        'max_workers': 8,
+    }
+    return run_module(zhmc_lpar, params, session, check_mode)
+
+
+class TestLparBatch(object):
+    """
+    All tests for the batch mode of the zhmc_lpar module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        faked_session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+        faked_cpc = faked_session.hmc.cpcs.lookup_by_oid('cpc1')
+        faked_cpc.lpars.add({
+            'object-id': 'lpar3',
+            'name': 'LPAR3',
+            'status': 'operating',
+        })
+        for faked_lpar in faked_cpc.lpars.list():
+            if faked_lpar.properties['status'] == 'operating':
+                faked_lpar.properties.update(WEIGHTS)
+        self.session = CallCountingSession(faked_session)
+        self.cpc = zhmcclient.Client(self.session).cpcs.find(name='CPC1')
+
+    def lpar_properties(self, lpar_name):
+        """
+        Return the properties of an LPAR in the mocked HMC.
+        """
+        lpar = self.cpc.lpars.find(name=lpar_name)
+        lpar.pull_full_properties()
+        return lpar.properties
+
+    @pytest.mark.parametrize("check_mode", [False, True])
+    def test_batch_set(self, check_mode):
+        """
+        Test updating the processing weights of multiple LPARs, with the
+        LPARs listed only once and only the changed LPARs updated.
+        """
+        lpars = [
+            dict(name='LPAR3', properties={'initial_processing_weight': 10}),
+            dict(name='LPAR1', properties={
+                'initial_processing_weight': '30',
+                'initial_processing_weight_capped': True}),
+        ]
+        self.session.reset()
+
+        mod_obj = run_lpar_batch(self.session, lpars,
+                                 check_mode=check_mode)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert 'lpar' not in result
+        assert result['lpars'] == [
+            {
+                'name': 'LPAR3',
+                'changed': False,
+                'properties': dict(WEIGHTS, name='LPAR3',
+                                   status='operating'),
+            },
+            {
+                'name': 'LPAR1',
+                'changed': True,
+                'properties': dict(
+                    WEIGHTS, name='LPAR1', status='operating',
+                    **{'initial-processing-weight': 30,
+                       'initial-processing-weight-capped': True}),
+            },
+        ]
+        assert self.session.count(
+            'GET', '^/api/cpcs/[^/]+/logical-partitions') == 1
+
+        props = self.lpar_properties('LPAR1')
+        if check_mode:
+            assert self.session.count('POST') == 0
+            assert props['initial-processing-weight'] == 10
+        else:
+            assert self.session.count(
+                'POST', '^/api/logical-partitions/lpar1$') == 1
+            assert self.session.count('POST') == 1
+            assert props['initial-processing-weight'] == 30
+            assert props['initial-processing-weight-capped'] is True
+
+    def test_batch_set_full_properties(self, monkeypatch):
+        """
+        Test updating the processing weights of multiple LPARs with a
+        zhmcclient version that cannot retrieve selected properties (before
+        1.8), where the full properties of the LPARs are retrieved instead.
+        """
+        monkeypatch.delattr(zhmcclient.BaseResource, 'pull_properties')
+        lpars = [
+            dict(name='LPAR3', properties={'initial_processing_weight': 10}),
+            dict(name='LPAR1', properties={'initial_processing_weight': 30}),
+        ]
+        self.session.reset()
+
+        mod_obj = run_lpar_batch(self.session, lpars)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert [(item['name'], item['changed'])
+                for item in result['lpars']] == \
+            [('LPAR3', False), ('LPAR1', True)]
+        assert result['lpars'][1]['properties'][
+            'initial-processing-weight'] == 30
+        assert self.session.count('GET', r'\?properties=') == 0
+        assert self.session.count(
+            'GET', '^/api/logical-partitions/lpar[13]$') == 2
+        assert self.session.count(
+            'POST', '^/api/logical-partitions/lpar1$') == 1
+        assert self.lpar_properties('LPAR1')[
+            'initial-processing-weight'] == 30
+
+    @pytest.mark.parametrize(
+        "lpars, state, error_msg_pattern", [
+            ([dict(name='LPAR1'), dict(name='LPAR1')], 'set',
+             "ParameterError: Item 1 in module parameter 'lpars' specifies "
+             "LPAR 'LPAR1' again."),
+            ([dict(name='LPAR1')], 'active',
+             "ParameterError: Module parameter 'lpars' is supported only for "
+             "state=set, but state=active was specified."),
+            ([dict(name='LPAR1', properties={'foo': 1})], 'set',
+             "ParameterError: Property 'foo' in item 0 of module parameter "
+             "'lpars' is not defined in the data model for LPARs."),
+            ([dict(name='LPAR1', properties={'status': 'operating'})], 'set',
+             "ParameterError: Property 'status' in item 0 of module "
+             "parameter 'lpars' is not allowed."),
+            ([dict(name='LPAR1'), dict(name='LPAR9')], 'set',
+             "ParameterError: LPARs specified in module parameter 'lpars' "
+             "do not exist in CPC 'CPC1': LPAR9"),
+            ([dict(name='LPAR1',
+                   properties={'initial_processing_weight': 30}),
+              dict(name='LPAR3',
+                   properties={'initial_processing_weight': 1000})], 'set',
+             "ParameterError: Property 'initial-processing-weight' of LPAR "
+             "'LPAR3' must be in the range 1 to 999: 1000"),
+            ([dict(name='LPAR1',
+                   properties={'initial_processing_weight': 30}),
+              dict(name='LPAR3',
+                   properties={'minimum_processing_weight': 20})], 'set',
+             "ParameterError: Property 'minimum-processing-weight' of LPAR "
+             "'LPAR3' must not be greater than property "
+             "'initial-processing-weight': 20 > 10"),
+            ([dict(name='LPAR1',
+                   properties={'initial_processing_weight': 30}),
+              dict(name='LPAR2',
+                   properties={'initial_processing_weight': 30})], 'set',
+             "StatusError: LPARs specified in module parameter 'lpars' are "
+             "not active and cannot be updated: LPAR2 \\(not-activated\\)"),
+        ]
+    )
+    def test_batch_errors(self, lpars, state,
+                          error_msg_pattern):
+        """
+        Test batch mode with errors, which are detected before any LPAR is
+        updated.
+        """
+        mod_obj = run_lpar_batch(self.session, lpars,
+                                 state=state)
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+        assert self.session.count('POST') == 0
+
+
+@pytest.mark.parametrize(
+    "properties, error_msg", [
+        ({}, None),
+        ({'initial-processing-weight': 1}, None),
+        ({'initial-processing-weight': 999,
+          'minimum-processing-weight': 0,
+          'maximum-processing-weight': 0}, None),
+        ({'initial-processing-weight': 0},
+         "Property 'initial-processing-weight' of LPAR 'LPAR1' must be in "
+         "the range 1 to 999: 0"),
+        ({'maximum-processing-weight': -1},
+         "Property 'maximum-processing-weight' of LPAR 'LPAR1' must be in "
+         "the range 0 to 999: -1"),
+        ({'initial-processing-weight': 50,
+          'minimum-processing-weight': 10,
+          'maximum-processing-weight': 40},
+         "Property 'initial-processing-weight' of LPAR 'LPAR1' must not be "
+         "greater than property 'maximum-processing-weight': 50 > 40"),
+        ({'minimum-processing-weight': 50,
+          'maximum-processing-weight': 40},
+         "Property 'minimum-processing-weight' of LPAR 'LPAR1' must not be "
+         "greater than property 'maximum-processing-weight': 50 > 40"),
+        ({'initial-ifl-processing-weight': 50,
+          'maximum-ifl-processing-weight': 40}, None),
+    ]
+)
+def test_check_processing_weights(properties, error_msg):
+    """
+    Test check_processing_weights() for general purpose processors.
+    """
+    if error_msg is None:
+        zhmc_lpar.check_processing_weights('LPAR1', properties, [''])
+    else:
+        with pytest.raises(ParameterError) as exc_info:
+            zhmc_lpar.check_processing_weights('LPAR1', properties, [''])
+        assert str(exc_info.value) == error_msg
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc_metrics' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import re
+import csv
+import json
+import stat
+from datetime import datetime
+import pytest
+import mock
+import pytz
+
+from zhmcclient_mock import FakedSession, FakedMetricObjectValues
+
+from plugins.modules import zhmc_metrics
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC1 (classic) has LPAR1 and LPAR2, and CPC2 (DPM) has
+# PART1 and PART2 and adapters OSA1 and FCP1.
+
+# URI pattern of the metrics contexts
+CONTEXT_URI = '^/api/services/metrics/context'
+
+# Resources with metric values in the mocked HMC, by metric group, as tuples
+# (resource URI, resource name, CPC name)
+METRIC_RESOURCES = {
+    'cpc-usage-overview': [
+        ('/api/cpcs/cpc1', 'CPC1', 'CPC1'),
+        ('/api/cpcs/cpc2', 'CPC2', 'CPC2'),
+    ],
+    'logical-partition-usage': [
+        ('/api/logical-partitions/lpar1', 'LPAR1', 'CPC1'),
+        ('/api/logical-partitions/lpar2', 'LPAR2', 'CPC1'),
+    ],
+    'partition-usage': [
+        ('/api/partitions/part1', 'PART1', 'CPC2'),
+        ('/api/partitions/part2', 'PART2', 'CPC2'),
+    ],
+    'adapter-usage': [
+        ('/api/adapters/osa1', 'OSA1', 'CPC2'),
+    ],
+    'partition-attached-network-interface': [
+        ('/api/partitions/part1/nics/nic1', None, 'CPC2'),
+    ],
+}
+
+TIMESTAMP = datetime(2023, 5, 11, 14, 2, 30, tzinfo=pytz.utc)
+
+# Values of the metrics in the mocked HMC, by metric type
+METRIC_VALUES = {
+    'boolean-metric': True,
+    'byte-metric': 7,
+    'short-metric': 7,
+    'integer-metric': 7,
+    'long-metric': 7,
+    'double-metric': 7.5,
+    'string-metric': 'abc',
+}
+
+
+def add_metric_values(faked_session):
+    """
+    Add metric values for METRIC_RESOURCES to the mocked HMC, and return the
+    expected metric values by metric group.
+    """
+    hmc = faked_session.hmc
+    expected = {}
+    for group_name, resources in METRIC_RESOURCES.items():
+        values = [(name, METRIC_VALUES[type_])
+                  for name, type_ in hmc.metric_groups[group_name].types]
+        expected[group_name] = dict(values)
+        for uri, _, _ in resources:
+            hmc.add_metric_values(FakedMetricObjectValues(
+                group_name=group_name, resource_uri=uri,
+                timestamp=TIMESTAMP, values=values))
+    return expected
+
+
+def run_metrics(session, metric_groups, cpc_names=None, samples=1,
+                interval=15, context_cache_dir=None, output_file=None,
+                output_format='jsonl'):
+    """
+    Run the zhmc_metrics module and return the mocked AnsibleModule object.
+    """
+    params = {
+        'cpc_names': cpc_names,
+        'metric_groups': metric_groups,
+        'samples': samples,
+        'interval': interval,
+        'context_cache_dir': context_cache_dir,
+        'output_file': output_file,
+        'output_format': output_format,
+        'max_workers': 8,
+    }
+    return run_module(zhmc_metrics, params, session)
+
+
+def expected_items(metric_groups, values, cpc_names=None, sample=0):
+    """
+    Return the expected result items for a sample.
+    """
+    items = []
+    for group_name in metric_groups:
+        resource_class = group_name.split('-usage')[0]
+        if resource_class == 'partition-attached-network-interface':
+            resource_class = 'nic'
+        elif resource_class == 'cpc-usage-overview':
+            resource_class = 'cpc'
+        for uri, name, cpc_name in METRIC_RESOURCES[group_name]:
+            if cpc_names is not None and cpc_name not in cpc_names:
+                continue
+            items.append({
+                'sample': sample,
+                'metric_group': group_name,
+                'resource_class': resource_class,
+                'resource_uri': uri,
+                'resource_name': name,
+                'cpc_name': cpc_name,
+                'timestamp': '2023-05-11T14:02:30+00:00',
+                'metrics': values[group_name],
+            })
+    return items
+
+
+class TestMetrics(object):
+    """
+    All tests for the zhmc_metrics module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC with metric values.
+        """
+        faked_session = FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE)
+        self.values = add_metric_values(faked_session)
+        self.session = CallCountingSession(faked_session)
+
+    def assert_one_context(self, get_count):
+        """
+        Assert that a single metrics context was created, used for get_count
+        retrievals, and deleted.
+        """
+        assert self.session.count('POST', CONTEXT_URI + '$') == 1
+        assert self.session.count('GET', CONTEXT_URI + '/') == get_count
+        assert self.session.count('DELETE', CONTEXT_URI + '/') == 1
+
+    def test_metrics_all(self):
+        """
+        Test retrieving multiple metric groups for all CPCs with a single
+        metrics context and a single retrieval.
+        """
+        metric_groups = list(METRIC_RESOURCES)
+
+        mod_obj = run_metrics(self.session, metric_groups)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is False
+        assert result['metrics'] == expected_items(metric_groups, self.values)
+        cpc_metrics = result['metrics'][0]['metrics']
+        assert cpc_metrics['cpc-processor-usage'] == 7
+        assert cpc_metrics['temperature-celsius'] == 7.5
+        nic_metrics = result['metrics'][-1]['metrics']
+        assert nic_metrics['partition-id'] == 'abc'
+        self.assert_one_context(1)
+        for list_uri in ('/partitions', '/logical-partitions', '/adapters'):
+            assert self.session.count('GET', '^/api/cpcs/[^/]+' + list_uri) \
+                == 1
+
+    def test_metrics_cpc_names(self):
+        """
+        Test retrieving metrics for selected CPCs, which lists only the
+        resources needed for the metric groups.
+        """
+        metric_groups = ['logical-partition-usage', 'partition-usage']
+
+        mod_obj = run_metrics(self.session, metric_groups,
+                              cpc_names=['CPC2'])
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        assert mod_obj.exit_json.call_args[1]['metrics'] == \
+            expected_items(metric_groups, self.values, cpc_names=['CPC2'])
+        self.assert_one_context(1)
+        assert self.session.count('GET', '/partitions') == 1
+        assert self.session.count('GET', '/logical-partitions') == 0
+        assert self.session.count('GET', '/adapters') == 0
+
+    def test_metrics_samples(self):
+        """
+        Test retrieving multiple samples at the interval, with a single
+        metrics context.
+        """
+        metric_groups = ['adapter-usage']
+
+        with mock.patch.object(zhmc_metrics.time, 'sleep') as sleep:
+            mod_obj = run_metrics(self.session, metric_groups, samples=3,
+                                  interval=60)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        expected = []
+        for sample in range(3):
+            expected.extend(expected_items(metric_groups, self.values,
+                                           sample=sample))
+        assert mod_obj.exit_json.call_args[1]['metrics'] == expected
+        # The samples are retrieved at a fixed rate, and time.sleep() does
+        # not actually sleep in this test
+        assert [round(call[0][0]) for call in sleep.call_args_list] == \
+            [60, 120]
+        self.assert_one_context(3)
+
+    def test_metrics_context_reuse(self, tmpdir):
+        """
+        Test that a persisted metrics context is reused by later module runs
+        and is recreated when it has been deleted on the HMC.
+        """
+        cache_dir = str(tmpdir)
+        metric_groups = ['partition-usage', 'adapter-usage']
+        expected = expected_items(metric_groups, self.values)
+
+        mod_obj = run_metrics(self.session, metric_groups,
+                              context_cache_dir=cache_dir)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        assert mod_obj.exit_json.call_args[1]['metrics'] == expected
+        assert self.session.count('POST', CONTEXT_URI + '$') == 1
+        assert self.session.count('DELETE', CONTEXT_URI + '/') == 0
+        cache_file = tmpdir.join('fake-host.fake-userid.metrics.json')
+        assert stat.S_IMODE(os.stat(str(cache_file)).st_mode) == 0o600
+        contexts = json.loads(cache_file.read())['contexts']
+        assert len(contexts) == 1
+        context_uri = list(contexts.values())[0]['metrics-context-uri']
+
+        # The metrics context is reused for the same metric groups
+        self.session.reset()
+        mod_obj = run_metrics(self.session, list(reversed(metric_groups)),
+                              context_cache_dir=cache_dir)
+        assert mod_obj.exit_json.call_args[1]['metrics'] == expected
+        assert self.session.count('POST', CONTEXT_URI + '$') == 0
+        assert self.session.count('GET', '^' + context_uri + '$') == 1
+
+        # The metrics context is recreated after it has been deleted
+        self.session.delete(context_uri)
+        self.session.reset()
+        mod_obj = run_metrics(self.session, metric_groups,
+                              context_cache_dir=cache_dir)
+        assert mod_obj.exit_json.call_args[1]['metrics'] == expected
+        assert self.session.count('POST', CONTEXT_URI + '$') == 1
+        assert self.session.count('GET', CONTEXT_URI + '/') == 2
+        contexts = json.loads(cache_file.read())['contexts']
+        assert list(contexts.values())[0]['metrics-context-uri'] != \
+            context_uri
+
+        # Another metrics context is created for other metric groups
+        self.session.reset()
+        run_metrics(self.session, ['partition-usage'],
+                    context_cache_dir=cache_dir)
+        assert self.session.count('POST', CONTEXT_URI + '$') == 1
+        assert len(json.loads(cache_file.read())['contexts']) == 2
+
+    @pytest.mark.parametrize("output_format", ['csv', 'jsonl'])
+    def test_metrics_output_file(self, output_format, tmpdir):
+        """
+        Test writing the samples to a CSV or JSON Lines file.
+        """
+        metric_groups = ['partition-usage', 'adapter-usage']
+        output_file = str(tmpdir.join('metrics.' + output_format))
+
+        with mock.patch.object(zhmc_metrics.time, 'sleep'):
+            mod_obj = run_metrics(self.session, metric_groups, samples=2,
+                                  output_file=output_file,
+                                  output_format=output_format)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert 'metrics' not in result
+        assert result['output']['path'] == output_file
+        assert result['output']['count'] == 6
+        with open(output_file) as fp:
+            if output_format == 'csv':
+                rows = list(csv.DictReader(fp))
+                assert list(rows[0]) == list(zhmc_metrics.METRICS_FIELDS) + \
+                    ['processor-usage', 'network-usage', 'storage-usage',
+                     'accelerator-usage', 'crypto-usage', 'adapter-usage']
+                assert [r['resource_name'] for r in rows] == \
+                    ['PART1', 'PART2', 'OSA1'] * 2
+                assert [r['sample'] for r in rows] == ['0'] * 3 + ['1'] * 3
+                assert rows[0]['processor-usage'] == '7'
+                assert rows[0]['adapter-usage'] == ''
+                assert rows[2]['adapter-usage'] == '7'
+            else:
+                items = [json.loads(line) for line in fp]
+                assert items == \
+                    expected_items(metric_groups, self.values) + \
+                    expected_items(metric_groups, self.values, sample=1)
+        self.assert_one_context(2)
+
+    @pytest.mark.parametrize(
+        "params, error_msg, context_count", [
+            (dict(metric_groups=['partition-usage'], cpc_names=['CPC9']),
+             "ParameterError: CPCs specified in module parameter "
+             "'cpc_names' do not exist: CPC9", 0),
+            (dict(metric_groups=['partition-usage', 'foo-usage']),
+             "ParameterError: Metric groups specified in module parameter "
+             "'metric_groups' are not supported by the HMC: foo-usage", 1),
+            (dict(metric_groups=['partition-usage'], samples=0),
+             "ParameterError: Module parameter 'samples' must be at least "
+             "1: 0", 0),
+        ]
+    )
+    def test_metrics_errors(self, params, error_msg, context_count):
+        """
+        Test parameter errors, with any metrics context deleted.
+        """
+        mod_obj = run_metrics(self.session, **params)
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(re.escape(error_msg)), msg), msg
+        assert self.session.count('POST', CONTEXT_URI + '$') == \
+            context_count
+        assert self.session.count('DELETE', CONTEXT_URI + '/') == \
+            context_count
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc_nic_rollout' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import pytest
+import mock
+import zhmcclient
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_nic_rollout
+from tests.common.call_budget import CallCountingSession
+from tests.common.session_wrappers import FailureInjectingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has PART1 and PART2, each with NIC
+# OSA1-NIC1 (device number 0010) backed by port 0 of adapter OSA1.
+
+
+def run_rollout(session, nics, check_mode=False, max_workers=8):
+    """
+    Run the zhmc_nic_rollout module and return the mocked AnsibleModule
+    object.
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'nics': nics,
+        'max_workers': max_workers,
+    }
+    return run_module(zhmc_nic_rollout, params, session, check_mode)
+
+
+def nic_item(partition_name, name, adapter_name=None, adapter_port=0,
+             properties=None):
+    """
+    Return an item of the 'nics' module parameter, with the defaults set by
+    Ansible.
+    """
+    return dict(partition_name=partition_name, name=name,
+                adapter_name=adapter_name, adapter_port=adapter_port,
+                properties=properties)
+
+
+class TestNicRollout(object):
+    """
+    All tests for the zhmc_nic_rollout module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+        self.client = zhmcclient.Client(self.session)
+        self.cpc = self.client.cpcs.find(name='CPC2')
+
+    def nic_properties(self, partition_name, nic_name):
+        """
+        Return the properties of a NIC in the mocked HMC, or None if it does
+        not exist.
+        """
+        partition = self.cpc.partitions.find(name=partition_name)
+        nics = partition.nics.findall(name=nic_name)
+        if not nics:
+            return None
+        nics[0].pull_full_properties()
+        return nics[0].properties
+
+    @pytest.mark.parametrize("check_mode", [False, True])
+    def test_rollout_create_update(self, check_mode):
+        """
+        Test creating a NIC in all partitions, updating an existing NIC and
+        leaving a conforming NIC unchanged.
+        """
+        vswitch_uri = '/api/virtual-switches/vs-osa1'
+        nics = [
+            nic_item('PART1', 'NIC2', 'OSA1', 0,
+                     {'device_number': '0020'}),
+            nic_item('PART2', 'NIC2', 'OSA1', 0,
+                     {'device_number': '0020'}),
+            nic_item('PART1', 'OSA1-NIC1', 'OSA1', 0,
+                     {'device_number': '10'}),
+            nic_item('PART2', 'OSA1-NIC1', None, 0,
+                     {'description': 'Updated NIC'}),
+        ]
+        self.session.reset()
+
+        mod_obj = run_rollout(self.session, nics,
+                              check_mode)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        created = {
+            'action': 'created',
+            'properties': {
+                'name': 'NIC2',
+                'device-number': '0020',
+                'virtual-switch-uri': vswitch_uri,
+            },
+        }
+        assert result['rollout'] == {
+            'cpc_name': 'CPC2',
+            'created': 2,
+            'updated': 1,
+            'unchanged': 1,
+            'failed': 0,
+            'partitions': {
+                'PART1': {
+                    'nics': {
+                        'NIC2': created,
+                        'OSA1-NIC1': {'action': 'unchanged',
+                                      'properties': {}},
+                    },
+                },
+                'PART2': {
+                    'nics': {
+                        'NIC2': created,
+                        'OSA1-NIC1': {
+                            'action': 'updated',
+                            'properties': {'description': 'Updated NIC'},
+                        },
+                    },
+                },
+            },
+        }
+
+        # The backing adapter, its port and the virtual switches are
+        # retrieved only once for both partitions.
+        assert self.session.count('GET', '^/api/cpcs/[^/]+/adapters') == 1
+        assert self.session.count(
+            'GET', '^/api/cpcs/[^/]+/virtual-switches') == 1
+        assert self.session.count('GET', '^/api/cpcs/[^/]+/partitions') == 1
+
+        if check_mode:
+            assert self.session.count('POST') == 0
+            assert self.nic_properties('PART1', 'NIC2') is None
+        else:
+            for partition_name in ('PART1', 'PART2'):
+                props = self.nic_properties(partition_name, 'NIC2')
+                assert props['device-number'] == '0020'
+                assert props['virtual-switch-uri'] == vswitch_uri
+            props = self.nic_properties('PART2', 'OSA1-NIC1')
+            assert props['description'] == 'Updated NIC'
+
+    def test_rollout_unchanged(self):
+        """
+        Test that a repeated rollout does not change anything.
+        """
+        nics = [
+            nic_item('PART1', 'NIC2', 'OSA1', 0, {'device_number': '0020'}),
+            nic_item('PART2', 'NIC2', 'OSA1', 0, {'device_number': '0020'}),
+        ]
+        run_rollout(self.session, nics)
+        self.session.reset()
+
+        mod_obj = run_rollout(self.session, nics)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is False
+        assert result['rollout']['unchanged'] == 2
+        assert self.session.count('POST') == 0
+
+    def test_rollout_update_wait_once(self):
+        """
+        Test that the updates of multiple NICs of a partition wait for a
+        partition status transition only once, based on a status-only
+        retrieval of the partition.
+        """
+        run_rollout(self.session,
+                    [nic_item('PART2', 'NIC2', 'OSA1', 0)])
+        nics = [
+            nic_item('PART2', 'NIC2', None, 0, {'description': 'New 2'}),
+            nic_item('PART2', 'OSA1-NIC1', None, 0, {'description': 'New 1'}),
+        ]
+        self.session.reset()
+
+        with mock.patch.object(
+                zhmc_nic_rollout, 'wait_for_transition_completion',
+                wraps=zhmc_nic_rollout.wait_for_transition_completion) \
+                as wait_mock:
+            mod_obj = run_rollout(self.session, nics)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['rollout']['updated'] == 2
+        assert wait_mock.call_count == 1
+        assert wait_mock.call_args[1] == {'pull_properties': False}
+        # The partition is retrieved once for listing its NICs, and once for
+        # its status, because the faked HMC does not support the 'properties'
+        # query parameter.
+        assert self.session.count(
+            'GET', r'^/api/partitions/part2\?properties=status$') == 1
+        assert self.session.count('GET', r'^/api/partitions/part2$') == 2
+        for nic_name, description in (('NIC2', 'New 2'),
+                                      ('OSA1-NIC1', 'New 1')):
+            props = self.nic_properties('PART2', nic_name)
+            assert props['description'] == description
+
+    def test_rollout_partition_failure(self):
+        """
+        Test that an HMC error for one partition is reported for that
+        partition, and that the other partitions are still processed.
+        """
+        session = FailureInjectingSession(self.session, [
+            ('POST', '^/api/partitions/part1/nics$',
+             zhmcclient.HTTPError({'http-status': 409, 'reason': 1,
+                                   'message': 'Injected failure'}),
+             1),
+        ])
+        nics = [
+            nic_item('PART1', 'NIC2', 'OSA1', 0),
+            nic_item('PART2', 'NIC2', 'OSA1', 0),
+        ]
+
+        mod_obj = run_rollout(session, nics)
+
+        assert mod_obj.fail_json.called
+        result = mod_obj.fail_json.call_args[1]
+        assert result['msg'] == "NIC rollout failed for 1 of 2 partitions"
+        assert result['changed'] is True
+        rollout = result['rollout']
+        assert rollout['created'] == 1
+        assert rollout['failed'] == 1
+        assert rollout['partitions']['PART1']['nics'] == {}
+        assert re.match('^HTTPError: 409,1: Injected failure',
+                        rollout['partitions']['PART1']['msg'])
+        assert rollout['partitions']['PART2']['nics']['NIC2']['action'] == \
+            'created'
+
+    @pytest.mark.parametrize(
+        "nics, error_msg_pattern", [
+            ([nic_item('PART1', 'NIC2'), nic_item('PART1', 'NIC2')],
+             "ParameterError: Item 1 in module parameter 'nics' specifies "
+             "NIC 'NIC2' in partition 'PART1' again."),
+            ([nic_item('PART1', 'NIC2', properties={'adapter_name': 'OSA1'})],
+             "ParameterError: Artificial property 'adapter_name' must be "
+             "specified as a suboption in item 0 of module parameter "
+             "'nics'."),
+            ([nic_item('PART1', 'NIC2', properties={'type': 'osd'})],
+             "ParameterError: Property 'type' in item 0 of module parameter "
+             "'nics' is not allowed or not defined in the data model for "
+             "NICs."),
+            ([nic_item('PART9', 'NIC2', 'OSA1')],
+             "ParameterError: Partitions specified in module parameter "
+             "'nics' do not exist in CPC 'CPC2': PART9"),
+            ([nic_item('PART1', 'NIC2', 'OSA9')],
+             "ParameterError: Suboption 'adapter_name' does not specify the "
+             "name of an existing adapter: 'OSA9'"),
+            ([nic_item('PART1', 'NIC2', 'OSA1', 5)],
+             "ParameterError: Suboption 'adapter_port' does not specify the "
+             "index of an existing port on adapter 'OSA1': 5"),
+            ([nic_item('PART1', 'NIC2', 'FCP1')],
+             "ParameterError: Suboption 'adapter_name' specifies the name of "
+             "a non-network adapter of family 'ficon': 'FCP1'"),
+        ]
+    )
+    def test_rollout_parm_errors(self, nics,
+                                 error_msg_pattern):
+        """
+        Test the zhmc_nic_rollout module with parameter errors, which are
+        detected before anything is changed.
+        """
+        mod_obj = run_rollout(self.session, nics)
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+        assert self.session.count('POST', '/nics') == 0
@@ -26,6 +26,7 @@ import pytest
 import mock
 import re
 
+import zhmcclient
 from zhmcclient import Client
 from zhmcclient_mock import FakedSession
 
@@ -290,6 +291,29 @@ FAKED_CRYPTO_ADAPTER_2 = {
     'physical-channel-status': 'operating',
 }
 
+# Faked FCP adapter and port used for the HBAs in the 'hbas' module parameter
+FAKED_FCP_ADAPTER_1_NAME = 'fcp adapter #1'
+FAKED_FCP_ADAPTER_1_URI = '/api/adapters/fake-fcp-adapter-1'
+FAKED_FCP_ADAPTER_1 = {
+    'object-id': 'fake-fcp-adapter-1',
+    'object-uri': FAKED_FCP_ADAPTER_1_URI,
+    'parent': FAKED_CPC_1_URI,
+    'class': 'adapter',
+    'name': FAKED_FCP_ADAPTER_1_NAME,
+    'description': 'FCP adapter #1',
+    'type': 'fcp',
+    'adapter-family': 'ficon',
+    'port-count': 1,
+    'adapter-id': '120',
+}
+FAKED_FCP_PORT_1 = {
+    'element-id': 'fake-fcp-port-1',
+    'parent': FAKED_FCP_ADAPTER_1_URI,
+    'class': 'storage-port',
+    'name': 'Port #1',
+    'index': 0,
+}
+
 # Translation table from 'state' module input parameter to corresponding
 # desired partition 'status' property value. 'None' means the partition
 # does not exist.
@@ -326,7 +350,7 @@ def get_module_output(mod_obj):
     If the module failed, return None.
     """
 
-    def func(changed, partition):
+    def func(changed, partition, update_plan=None):
         return changed, partition
 
     if not mod_obj.exit_json.called:
@@ -892,6 +916,7 @@ class TestPartition(object):
             'expand_storage_groups': expand_storage_groups,
             'expand_crypto_adapters': expand_crypto_adapters,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1045,6 +1070,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1115,6 +1141,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1194,6 +1221,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1260,6 +1288,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1337,6 +1366,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1415,6 +1445,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1602,6 +1633,7 @@ class TestPartition(object):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
             '_faked_session': self.session,
         }
 
@@ -1623,3 +1655,362 @@ class TestPartition(object):
         msg = get_failure_msg(mod_obj)
         pattern = r'^{0}$'.format(error_msg_pattern)
         assert re.match(pattern, msg)
+
+    def setup_children(self):
+        """
+        Prepare the faked partition with a NIC and an HBA, and the faked
+        adapters used for the 'nics' and 'hbas' module parameters.
+        """
+        self.setup_nic()
+        # The port is added with a URI generated by the faked HMC
+        port_props = dict(FAKED_PORT_1)
+        del port_props['element-id']
+        del port_props['element-uri']
+        self.faked_adapter.properties['network-port-uris'] = []
+        self.faked_adapter.ports.add(port_props)
+        faked_fcp_adapter = self.faked_cpc.adapters.add(FAKED_FCP_ADAPTER_1)
+        faked_fcp_adapter.ports.add(FAKED_FCP_PORT_1)
+        self.setup_hba()
+
+    @pytest.mark.parametrize(
+        "check_mode", [False, True])
+    @pytest.mark.parametrize(
+        "initial_state", ['absent', 'stopped'])
+    @pytest.mark.parametrize(
+        "desired_state", ['stopped', 'active'])
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_children_success(
+            self, ansible_mod_cls, desired_state, initial_state, check_mode):
+        """
+        Tests for reconciling the partition with the 'nics' and 'hbas' module
+        parameters.
+        """
+        # Prepare the initial partition, NIC and HBA before the test is run
+        self.setup_partition(initial_state)
+        self.setup_children()
+
+        if initial_state == 'absent':
+            properties = {
+                'ifl_processors': 1,
+                'initial_memory': 512,
+                'maximum_memory': 512,
+            }
+        else:
+            properties = {}
+        nics = [
+            {
+                'name': FAKED_NIC_1_NAME,
+                'adapter_name': FAKED_ADAPTER_1_NAME,
+                'adapter_port': FAKED_PORT_1_INDEX,
+                'properties': {'description': 'Updated NIC #1'},
+            },
+            {
+                'name': 'nic-2',
+                'adapter_name': FAKED_ADAPTER_1_NAME,
+                'adapter_port': FAKED_PORT_1_INDEX,
+                'properties': {'device_number': '0230'},
+            },
+        ]
+        hbas = [
+            {
+                'name': 'hba-2',
+                'adapter_name': FAKED_FCP_ADAPTER_1_NAME,
+                'adapter_port': 0,
+                'properties': {},
+            },
+        ]
+
+        # Prepare module input parameters
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': desired_state,
+            'properties': properties,
+            'nics': nics,
+            'hbas': hbas,
+            'virtual_functions': None,
+            'storage_groups': None,
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+
+        # Prepare mocks for AnsibleModule object
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, check_mode)
+
+        # Exercise the code to be tested
+        with pytest.raises(SystemExit) as exc_info:
+            zhmc_partition.main()
+        exit_code = exc_info.value.args[0]
+
+        # Assert module exit code
+        assert exit_code == 0, \
+            "Module unexpectedly failed with this message:\n{0}". \
+            format(get_failure_msg(mod_obj))
+
+        changed, part_props = get_module_output(mod_obj)
+        assert changed
+        if check_mode:
+            return
+
+        # Assert the partition resource and its children
+        assert part_props['status'] == \
+            PARTITION_STATUS_FROM_STATE[desired_state]
+        part = self.cpc.partitions.find(name=FAKED_PARTITION_1_NAME)
+        nics = dict((nic.name, nic)
+                    for nic in part.nics.list(full_properties=True))
+        assert sorted(nics) == [FAKED_NIC_1_NAME, 'nic-2']
+        assert nics[FAKED_NIC_1_NAME].properties['description'] == \
+            'Updated NIC #1'
+        assert nics['nic-2'].properties['virtual-switch-uri'] == \
+            FAKED_VSWITCH_1_URI
+        assert nics['nic-2'].properties['device-number'] == '0230'
+        hbas = part.hbas.list(full_properties=True)
+        assert [hba.name for hba in hbas] == ['hba-2']
+        assert sorted(part_props['nic-uris']) == \
+            sorted(nic.uri for nic in nics.values())
+
+        # A second run with the same parameters does not change anything
+        with pytest.raises(SystemExit) as exc_info:
+            zhmc_partition.main()
+        assert exc_info.value.args[0] == 0
+        changed, _ = get_module_output(mod_obj)
+        assert not changed
+
+    @pytest.mark.parametrize(
+        "nics, error_msg_pattern", [
+            ([{'name': 'nic-2', 'adapter_name': 'foo', 'adapter_port': 0}],
+             "ParameterError: Item 'adapter_name' in module parameter 'nics' "
+             "does not specify the name of an existing adapter: 'foo'"),
+            ([{'name': 'nic-2', 'adapter_name': FAKED_ADAPTER_1_NAME,
+               'adapter_port': 5}],
+             "ParameterError: Item 'adapter_port' in module parameter 'nics' "
+             "does not specify the index of an existing port on adapter .*"),
+            ([{'name': 'nic-2', 'adapter_name': FAKED_ADAPTER_1_NAME,
+               'properties': {'foo': 1}}],
+             "ParameterError: Property 'foo' is not allowed in the "
+             "'properties' item of module parameter 'nics'."),
+        ]
+    )
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_children_parm_errors(
+            self, ansible_mod_cls, nics, error_msg_pattern):
+        """
+        Tests for the 'nics' module parameter with parameter errors.
+        """
+        self.setup_partition('stopped')
+        self.setup_children()
+
+        # Prepare module input parameters
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': 'active',
+            'properties': {},
+            'nics': nics,
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+
+        # Prepare mocks for AnsibleModule object
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, False)
+
+        # Exercise the code to be tested
+        with pytest.raises(SystemExit) as exc_info:
+            zhmc_partition.main()
+        exit_code = exc_info.value.args[0]
+
+        assert exit_code == 1
+        msg = get_failure_msg(mod_obj)
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_children_storage_groups(self, ansible_mod_cls):
+        """
+        Test reconciling the storage group attachments of the partition.
+        The faked HMC does not support attaching storage groups, so the
+        attach and detach methods are mocked.
+        """
+        sg_props = {
+            'name': 'sg-1',
+            'cpc-uri': FAKED_CPC_1_URI,
+            'type': 'fcp',
+        }
+        faked_sg1 = self.console.storage_groups.add(sg_props)
+        faked_sg2 = self.console.storage_groups.add(
+            dict(sg_props, name='sg-2'))
+        self.setup_partition(
+            'stopped', {'storage-group-uris': [faked_sg2.uri]})
+
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': 'active',
+            'properties': {},
+            'storage_groups': ['sg-1'],
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, False)
+
+        with mock.patch("zhmcclient.Partition.attach_storage_group") \
+                as attach, \
+                mock.patch("zhmcclient.Partition.detach_storage_group") \
+                as detach:
+            with pytest.raises(SystemExit) as exc_info:
+                zhmc_partition.main()
+
+        assert exc_info.value.args[0] == 0, get_failure_msg(mod_obj)
+        changed, _ = get_module_output(mod_obj)
+        assert changed
+        assert [c[0][0].uri for c in attach.call_args_list] == [faked_sg1.uri]
+        assert [c[0][0].uri for c in detach.call_args_list] == [faked_sg2.uri]
+
+    @pytest.mark.parametrize(
+        "check_mode", [False, True])
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_update_plan_single_stop(self, ansible_mod_cls, check_mode):
+        """
+        Test that an active partition with a property update that requires
+        the partition to be stopped and with a NIC change is stopped only
+        once, and that the update plan is returned.
+        """
+        self.setup_partition('active')
+        self.setup_children()
+
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': 'active',
+            'properties': {'maximum_memory': 4096},
+            'nics': [
+                {
+                    'name': FAKED_NIC_1_NAME,
+                    'adapter_name': FAKED_ADAPTER_1_NAME,
+                    'adapter_port': FAKED_PORT_1_INDEX,
+                    'properties': {'description': 'Updated NIC #1'},
+                },
+            ],
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, check_mode)
+
+        with mock.patch("zhmcclient.Partition.stop", autospec=True,
+                        side_effect=zhmcclient.Partition.stop) as stop:
+            with pytest.raises(SystemExit) as exc_info:
+                zhmc_partition.main()
+
+        assert exc_info.value.args[0] == 0, get_failure_msg(mod_obj)
+        call_kwargs = mod_obj.exit_json.call_args[1]
+        assert call_kwargs['changed']
+        assert call_kwargs['update_plan'] == {
+            'offline_properties': ['maximum-memory'],
+            'change_groups': ['properties', 'nics'],
+            'stopped': True,
+        }
+        assert stop.call_count == (0 if check_mode else 1)
+        if not check_mode:
+            assert call_kwargs['partition']['status'] == 'active'
+            assert call_kwargs['partition']['maximum-memory'] == 4096
+
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_stopped_partition_not_stopped(self, ansible_mod_cls):
+        """
+        Test that a partition that is already stopped is not stopped again
+        when the 'stopped' state is desired.
+        """
+        self.setup_partition('stopped')
+
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': 'stopped',
+            'properties': {'maximum_memory': 4096},
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, False)
+
+        with mock.patch("zhmcclient.Partition.stop", autospec=True) as stop:
+            with pytest.raises(SystemExit) as exc_info:
+                zhmc_partition.main()
+
+        assert exc_info.value.args[0] == 0, get_failure_msg(mod_obj)
+        call_kwargs = mod_obj.exit_json.call_args[1]
+        assert call_kwargs['changed']
+        assert call_kwargs['update_plan']['stopped'] is False
+        assert call_kwargs['partition']['maximum-memory'] == 4096
+        assert stop.call_count == 0
+
+    @pytest.mark.parametrize("initial_status", ['paused', 'terminated'])
+    @mock.patch("plugins.modules.zhmc_partition.AnsibleModule",
+                autospec=True)
+    def test_inactive_partition_stopped(self, ansible_mod_cls,
+                                        initial_status):
+        """
+        Test that a paused or terminated partition is stopped when the
+        'stopped' state is desired.
+        """
+        self.setup_partition('stopped', {'status': initial_status})
+
+        params = {
+            'hmc_host': 'fake-host',
+            'hmc_auth': dict(userid='fake-userid',
+                             password='fake-password'),
+            'cpc_name': self.cpc.name,
+            'name': FAKED_PARTITION_1_NAME,
+            'state': 'stopped',
+            'properties': {},
+            'expand_storage_groups': False,
+            'expand_crypto_adapters': False,
+            'log_file': None,
+            'log_level': 'debug',
+            '_faked_session': self.session,
+        }
+        mod_obj = mock_ansible_module(ansible_mod_cls, params, False)
+
+        with mock.patch("zhmcclient.Partition.stop", autospec=True,
+                        side_effect=zhmcclient.Partition.stop) as stop:
+            with pytest.raises(SystemExit) as exc_info:
+                zhmc_partition.main()
+
+        assert exc_info.value.args[0] == 0, get_failure_msg(mod_obj)
+        call_kwargs = mod_obj.exit_json.call_args[1]
+        assert call_kwargs['changed']
+        assert call_kwargs['partition']['status'] == 'stopped'
+        assert stop.call_count == 1
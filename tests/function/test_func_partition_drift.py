@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc_partition_drift' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import pytest
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_partition_drift
+from plugins.module_utils import common
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has PART1 and PART2, each with NIC
+# OSA1-NIC1 backed by port 0 of adapter OSA1.
+
+
+def run_drift(session, specs, check_mode=False):
+    """
+    Run the zhmc_partition_drift module and return the mocked AnsibleModule
+    object.
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'specs': specs,
+        'max_workers': 8,
+    }
+    return run_module(zhmc_partition_drift, params, session, check_mode)
+
+
+def nic_spec(name, adapter_name=None, adapter_port=0, properties=None):
+    """
+    Return an item of the 'nics' suboption, with the defaults set by
+    Ansible.
+    """
+    return dict(name=name, adapter_name=adapter_name,
+                adapter_port=adapter_port, properties=properties)
+
+
+class TestPartitionDrift(object):
+    """
+    All tests for the zhmc_partition_drift module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    @pytest.mark.parametrize("device_number", ['10', '0010', 10])
+    @pytest.mark.parametrize("check_mode", [False, True])
+    def test_drift_clean(self, check_mode, device_number):
+        """
+        Test partitions that conform to their specification, with values in
+        different notations and types.
+        """
+        specs = [
+            {
+                'name': 'PART1',
+                'name_pattern': None,
+                'properties': {
+                    'maximum_memory': 4096,
+                    'cp_processors': '1',
+                    'boot_device': 'test-operating-system',
+                },
+                'nics': [
+                    nic_spec('OSA1-NIC1', 'OSA1', 0,
+                             {'device_number': device_number}),
+                ],
+            },
+        ]
+
+        mod_obj = run_drift(self.session, specs, check_mode)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is False
+        assert result['drift'] == {
+            'cpc_name': 'CPC2',
+            'checked': 1,
+            'drifted': 0,
+            'partitions': {},
+        }
+
+        # PART2 is not matched by the specification and is not retrieved
+        assert self.session.count(uri_pattern='^/api/partitions/part2') == 0
+
+    def test_drift_report(self):
+        """
+        Test partitions that deviate from their specification, with a pattern
+        item that is overridden by a name item.
+        """
+        specs = [
+            {
+                'name': None,
+                'name_pattern': 'PART[0-9]',
+                'properties': {
+                    'maximum_memory': 8192,
+                    'cp_processors': 1,
+                },
+                'nics': [
+                    nic_spec('OSA1-NIC1', 'OSA1', 1),
+                ],
+            },
+            {
+                'name': 'PART1',
+                'name_pattern': None,
+                'properties': {'maximum_memory': 4096},
+                'nics': [
+                    nic_spec('OSA1-NIC1', None, 0,
+                             {'description': 'NIC1 backed by OSA1'}),
+                    nic_spec('NIC2'),
+                ],
+            },
+            {
+                'name': 'PART9',
+                'name_pattern': None,
+                'properties': None,
+                'nics': None,
+            },
+        ]
+
+        mod_obj = run_drift(self.session, specs)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is False
+        assert result['drift'] == {
+            'cpc_name': 'CPC2',
+            'checked': 3,
+            'drifted': 3,
+            'partitions': {
+                'PART1': {
+                    'nics': {
+                        'NIC2': {
+                            'exists': {'expected': True, 'actual': False},
+                        },
+                    },
+                },
+                'PART2': {
+                    'properties': {
+                        'maximum_memory': {'expected': 8192, 'actual': 4096},
+                    },
+                    'nics': {
+                        'OSA1-NIC1': {
+                            'adapter_port': {'expected': 1, 'actual': 0},
+                        },
+                    },
+                },
+                'PART9': {
+                    'exists': {'expected': True, 'actual': False},
+                },
+            },
+        }
+
+    def test_drift_property_selection(self):
+        """
+        Test that the full properties are retrieved for all partitions after
+        the HMC has rejected the selection of properties once.
+        """
+        specs = [
+            {
+                'name': None,
+                'name_pattern': '.*',
+                'properties': {'maximum_memory': 4096},
+                'nics': None,
+            },
+        ]
+
+        mod_obj = run_drift(self.session, specs)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        assert mod_obj.exit_json.call_args[1]['drift']['drifted'] == 0
+        # The faked HMC does not support the 'properties' query parameter
+        assert self.session.count(
+            'GET', r'^/api/partitions/[^/]+\?properties=') == 1
+        assert self.session.count('GET', r'^/api/partitions/[^/?]+$') == 2
+
+    @pytest.mark.parametrize(
+        "spec, error_msg_pattern", [
+            ({'name': 'PART1', 'name_pattern': 'PART.*'},
+             "ParameterError: Item 0 in module parameter 'specs' must "
+             "specify exactly one of 'name' and 'name_pattern'."),
+            ({'name': None, 'name_pattern': None},
+             "ParameterError: Item 0 in module parameter 'specs' must "
+             "specify exactly one of 'name' and 'name_pattern'."),
+            ({'name': None, 'name_pattern': 'PART('},
+             "ParameterError: Item 0 in module parameter 'specs' has an "
+             "invalid 'name_pattern' 'PART\\(': .*"),
+            ({'name': 'PART1', 'name_pattern': None,
+              'properties': {'boot_storage_hba_name': 'hba1'}},
+             "ParameterError: Artificial property 'boot_storage_hba_name' "
+             "cannot be checked in item 0 of module parameter 'specs'."),
+            ({'name': 'PART1', 'name_pattern': None,
+              'properties': {'maximum_memroy': 4096}},
+             "ParameterError: Property 'maximum_memroy' in item 0 of module "
+             "parameter 'specs' is not defined in the data model for "
+             "partitions."),
+            ({'name': 'PART1', 'name_pattern': None,
+              'nics': [{'name': 'OSA1-NIC1',
+                        'properties': {'device-number': '1000'}}]},
+             "ParameterError: Property 'device-number' of NIC 'OSA1-NIC1' in "
+             "item 0 of module parameter 'specs' is not defined in the data "
+             "model for NICs."),
+        ]
+    )
+    def test_drift_parm_errors(self, spec,
+                               error_msg_pattern):
+        """
+        Test the zhmc_partition_drift module with parameter errors.
+        """
+        spec = dict(dict(properties=None, nics=None), **spec)
+
+        mod_obj = run_drift(self.session, [spec])
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+        assert self.session.count() == 0
+
+
+def test_drift_properties():
+    """
+    Test that the properties that can be checked are those in the property
+    definitions of partitions and NICs, without their artificial properties.
+    """
+    drift_properties = zhmc_partition_drift.DRIFT_PROPERTIES
+    assert set(drift_properties['partition']) == \
+        set(common.ZHMC_PARTITION_PROPERTIES) - \
+        set(common.PARTITION_ARTIFICIAL_PROPERTIES)
+    assert set(drift_properties['nic']) == \
+        set(common.ZHMC_NIC_PROPERTIES) - \
+        set(common.NIC_ARTIFICIAL_PROPERTIES)
+
+
+@pytest.mark.parametrize(
+    "kind, prop_name, actual, expected, exp_result", [
+        ('partition', 'maximum_memory', 4096, 4096, (True, 4096)),
+        ('partition', 'maximum_memory', 4096, '4096', (True, 4096)),
+        ('partition', 'maximum_memory', 4096, '4k', (False, '4k')),
+        ('partition', 'description', 'abc', 'abc', (True, 'abc')),
+        ('nic', 'device_number', '1000', '1000', (True, '1000')),
+        ('nic', 'device_number', '1000', 1000, (True, '1000')),
+        ('nic', 'device_number', '1000', 100, (False, '100')),
+        ('nic', 'mac_address', '02:00:00:00:0a:01', '2:0:0:0:A:1',
+         (True, '2:0:0:0:A:1')),
+        ('nic', 'device_number', None, None, (True, None)),
+    ]
+)
+def test_drift_values_equal(kind, prop_name, actual, expected, exp_result):
+    """
+    Test values_equal() with values in different notations and types.
+    """
+    result = zhmc_partition_drift.values_equal(
+        kind, prop_name, actual, expected)
+    assert result == exp_result
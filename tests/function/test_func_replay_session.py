@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for recording HMC cassettes and replaying them with a faked
+session.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient import Client
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_partition
+from plugins.module_utils.common import CassetteRecorder, get_session, \
+    CASSETTE_ENV_VAR, CASSETTE_SECRET_VALUE
+from tests.common.replay import ReplaySession, CassetteMismatch, \
+    load_cassette
+
+from .func_utils import run_module
+from .test_func_latency_session import FAKED_SESSION_KWARGS, \
+    FAKED_CONSOLE, FAKED_CPC_1, FAKED_PARTITION_1, SleepRecorder
+
+
+def run_partition_facts(session):
+    """
+    Run zhmc_partition with state=facts using a session and return the
+    partition properties returned by the module.
+    """
+    params = {
+        'cpc_name': FAKED_CPC_1['name'],
+        'name': FAKED_PARTITION_1['name'],
+        'state': 'facts',
+        'properties': None,
+        'expand_storage_groups': False,
+        'expand_crypto_adapters': False,
+    }
+    mod_obj = run_module(zhmc_partition, params, session)
+
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    return mod_obj.exit_json.call_args[1]['partition']
+
+
+class TestRecordReplay(object):
+    """
+    All tests for CassetteRecorder and ReplaySession.
+    """
+
+    def setup_method(self):
+        """
+        Using the zhmcclient mock support, set up a CPC in DPM mode with a
+        stopped partition.
+        """
+        self.session = FakedSession(**FAKED_SESSION_KWARGS)
+        self.session.hmc.consoles.add(FAKED_CONSOLE)
+        self.faked_cpc = self.session.hmc.cpcs.add(FAKED_CPC_1)
+        self.faked_cpc.partitions.add(FAKED_PARTITION_1)
+
+    def test_record_replay_module(self, tmpdir):
+        """
+        Test that a module run that was recorded returns the same result
+        when replayed, with the same HMC operations.
+        """
+        cassette_file = str(tmpdir.join('cassette.jsonl'))
+        CassetteRecorder(cassette_file).attach(self.session)
+
+        recorded_partition = run_partition_facts(self.session)
+
+        records = load_cassette(cassette_file)
+        assert len(records) > 0
+        assert all(r['status'] == 200 for r in records)
+
+        replay_session = ReplaySession(
+            cassette_file, latency_scale=0, strict=True)
+        replayed_partition = run_partition_facts(replay_session)
+
+        assert replayed_partition == recorded_partition
+        assert replay_session.op_count == len(records)
+        assert replay_session.total_delay == 0
+
+    def test_record_scrubs_secrets(self, tmpdir):
+        """
+        Test that secrets in request bodies are scrubbed in the cassette.
+        """
+        cassette_file = str(tmpdir.join('cassette.jsonl'))
+        CassetteRecorder(cassette_file).attach(self.session)
+        client = Client(self.session)
+
+        console = client.consoles.console
+        console.users.create({
+            'name': 'user-1',
+            'type': 'standard',
+            'authentication-type': 'local',
+            'password': 'secret-password',
+            'password-rule-uri': '/api/console/password-rules/1',
+        })
+
+        records = load_cassette(cassette_file)
+        post_records = [r for r in records if r['method'] == 'POST']
+        assert len(post_records) == 1
+        request_body = post_records[0]['request_body']
+        assert request_body['password'] == CASSETTE_SECRET_VALUE
+        assert request_body['password-rule-uri'] == \
+            '/api/console/password-rules/1'
+        assert request_body['name'] == 'user-1'
+        with open(cassette_file) as fp:
+            assert 'secret-password' not in fp.read()
+
+    def test_record_http_error(self, tmpdir):
+        """
+        Test that HTTP errors are recorded and raised again when replayed.
+        """
+        cassette_file = str(tmpdir.join('cassette.jsonl'))
+        CassetteRecorder(cassette_file).attach(self.session)
+        uri = '/api/partitions/invalid'
+
+        with pytest.raises(zhmcclient.HTTPError) as exc_info:
+            self.session.get(uri)
+        recorded_exc = exc_info.value
+
+        replay_session = ReplaySession(cassette_file, latency_scale=0)
+        with pytest.raises(zhmcclient.HTTPError) as exc_info:
+            replay_session.get(uri)
+        replayed_exc = exc_info.value
+
+        assert replayed_exc.http_status == recorded_exc.http_status
+        assert replayed_exc.reason == recorded_exc.reason
+
+    def test_replay_latency_scale(self):
+        """
+        Test that the recorded latency is scaled.
+        """
+        cassette = [
+            dict(method='POST', uri='/api/sessions', request_body=None,
+                 status=200, response_body={}, duration=2.0),
+            dict(method='GET', uri='/api/cpcs', request_body=None,
+                 status=200, response_body={'cpcs': []}, duration=0.5),
+            dict(method='GET', uri='/api/console', request_body=None,
+                 status=200, response_body={'name': 'hmc-1'}, duration=0.25),
+        ]
+        sleep = SleepRecorder()
+        session = ReplaySession(cassette, latency_scale=2.0, sleep=sleep)
+        client = Client(session)
+
+        assert client.cpcs.list() == []
+
+        assert sleep.delays == [1.0]
+        assert session.op_count == 1
+        assert session.total_delay == pytest.approx(1.0)
+
+    def test_replay_mismatch(self):
+        """
+        Test the handling of HTTP methods without recorded interaction.
+        """
+        cassette = [
+            dict(method='GET', uri='/api/cpcs', request_body=None,
+                 status=200, response_body={'cpcs': []}, duration=0.1),
+        ]
+        session = ReplaySession(cassette, latency_scale=0)
+        session.get('/api/cpcs')
+        session.get('/api/cpcs')  # last interaction is served again
+        with pytest.raises(CassetteMismatch):
+            session.get('/api/console')
+
+        session = ReplaySession(cassette, latency_scale=0, strict=True)
+        session.get('/api/cpcs')
+        with pytest.raises(CassetteMismatch):
+            session.get('/api/cpcs')
+
+    def test_get_session_recording(self, tmpdir):
+        """
+        Test that get_session() attaches a recorder to new sessions when the
+        environment variable is set, and not to faked sessions.
+        """
+        cassette_file = str(tmpdir.join('cassette.jsonl'))
+        with mock.patch.dict(os.environ, {CASSETTE_ENV_VAR: cassette_file}):
+            session = get_session(
+                None, 'fake-host', 'fake-userid', 'fake-password', None,
+                False)
+            faked_session = get_session(
+                self.session, 'fake-host', None, None, None, False)
+
+        assert session.get.__name__ == 'get'
+        assert not hasattr(session.get, '__self__')
+        assert faked_session is self.session
+        assert hasattr(faked_session.get, '__self__')
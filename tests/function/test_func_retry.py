@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the retrying of transient HMC errors by the modules.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils import common
+from plugins.modules import zhmc_user_list, zhmc_partition
+from tests.common.session_wrappers import FailureInjectingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# Retry policy for the tests, with short delays
+RETRY_POLICY = dict(max_attempts=3, initial_delay=0.01, max_delay=0.01)
+
+
+def http_503():
+    """
+    Return a new zhmcclient.HTTPError for a temporarily unavailable HMC.
+    """
+    return zhmcclient.HTTPError({
+        'http-status': 503,
+        'reason': 0,
+        'message': 'Injected error',
+    })
+
+
+@pytest.fixture(autouse=True)
+def retry_policies():
+    """
+    Forget the retry policies of the sessions created in a test.
+    """
+    yield
+    del common.RETRY_POLICIES[:]
+
+
+def run_retried_module(module, session, params, check_mode=False):
+    """
+    Run a module with a new session that is the faked session, so that the
+    retry policy is attached to it, and return the mocked AnsibleModule
+    object.
+    """
+    env = {common.RETRY_ENV_VAR: json.dumps(RETRY_POLICY)}
+    with mock.patch.dict(os.environ, env):
+        with mock.patch.object(common, 'Session', return_value=session):
+            return run_module(module, params, check_mode=check_mode)
+
+
+@pytest.mark.parametrize(
+    "failures, exp_retries", [
+        (0, None),
+        (1, 1),
+        (2, 2),
+    ]
+)
+def test_retry_list(failures, exp_retries):
+    """
+    Test that listing users succeeds when the HMC fails transiently, and
+    that the retries are reported in the result.
+    """
+    session = FailureInjectingSession(
+        FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE),
+        [('GET', r'^/api/console/users', http_503, failures)])
+
+    mod_obj = run_retried_module(zhmc_user_list, session,
+                                 dict(output_file=None))
+
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result = mod_obj.exit_json.call_args[1]
+    assert result['users']
+    assert result.get('retries') == exp_retries
+    assert len(session.injected) == failures
+
+
+def test_retry_exhausted():
+    """
+    Test that the module fails when the HMC fails more often than the
+    retry policy allows.
+    """
+    session = FailureInjectingSession(
+        FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE),
+        [('GET', r'^/api/console/users', http_503, 5)])
+
+    mod_obj = run_retried_module(zhmc_user_list, session,
+                                 dict(output_file=None))
+
+    assert mod_obj.fail_json.called
+    assert 'HTTPError: 503' in mod_obj.fail_json.call_args[1]['msg']
+    assert len(session.injected) == RETRY_POLICY['max_attempts']
+
+
+def test_retry_update():
+    """
+    Test that an update of a partition succeeds when the update operation
+    fails transiently.
+    """
+    session = FailureInjectingSession(
+        FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE),
+        [('POST', r'^/api/partitions/[^/]+$', http_503, 1)])
+
+    mod_obj = run_retried_module(zhmc_partition, session, dict(
+        cpc_name='CPC2', name='PART1', state='stopped',
+        properties=dict(description='retried'), expand_storage_groups=False,
+        expand_crypto_adapters=False))
+
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    result = mod_obj.exit_json.call_args[1]
+    assert result['changed'] is True
+    assert result['partition']['description'] == 'retried'
+    assert result['retries'] == 1
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc_snapshot' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_snapshot
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# The mocked HMC has CPC1 (classic, LPAR1, LPAR2) and CPC2 (DPM, PART1,
+# PART2, adapters OSA1, FCP1), a storage group with a volume, users, user
+# roles and password rules.
+
+
+def run_snapshot(session, snapshot_file, check_mode=False, **params):
+    """
+    Run the zhmc_snapshot module and return the exit_json() keyword
+    arguments.
+    """
+    module_params = {
+        'snapshot_file': snapshot_file,
+        'format': 'json',
+        'cpc_names': [],
+        'include': ['partitions', 'lpars', 'adapters', 'storage_groups',
+                    'users', 'user_roles', 'password_rules'],
+        'max_workers': 8,
+    }
+    module_params.update(params)
+    mod_obj = run_module(zhmc_snapshot, module_params, session, check_mode)
+    assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+    return mod_obj.exit_json.call_args[1]
+
+
+class TestSnapshot(object):
+    """
+    All tests for the zhmc_snapshot module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+
+    @pytest.mark.parametrize("max_workers", [1, 8])
+    def test_snapshot_json(self, max_workers, tmpdir):
+        """
+        Test a snapshot of the entire mocked HMC in JSON format.
+        """
+        snapshot_file = str(tmpdir.join('snapshot.json'))
+
+        result = run_snapshot(self.session, snapshot_file,
+                              max_workers=max_workers)
+
+        assert result['changed'] is True
+        summary = result['snapshot']
+        assert summary['snapshot_file'] == snapshot_file
+        assert summary['format'] == 'json'
+
+        with open(snapshot_file) as fp:
+            snapshot = json.load(fp)
+        resources = snapshot['resources']
+        counts = dict((c, len(r)) for c, r in resources.items())
+        assert summary['resource_counts'] == counts
+        assert summary['resource_count'] == sum(counts.values())
+        assert sorted(p['name'] for p in resources['cpc']) == ['CPC1', 'CPC2']
+        assert sorted(p['name'] for p in resources['partition']) == \
+            ['PART1', 'PART2']
+        assert sorted(p['name'] for p in resources['logical-partition']) == \
+            ['LPAR1', 'LPAR2']
+        for class_name in ('nic', 'adapter', 'storage-group',
+                           'storage-volume', 'user', 'user-role',
+                           'password-rule'):
+            assert counts.get(class_name), class_name
+
+        # Secrets are scrubbed, but not the URIs of password rules
+        for user in resources['user']:
+            assert user['password'] == '********'
+            assert user['password-rule-uri'].startswith(
+                '/api/console/password-rules/')
+
+        # The file has the same content as the formatted JSON object
+        with open(snapshot_file) as fp:
+            assert fp.read() == \
+                json.dumps(snapshot, indent=2, sort_keys=True,
+                           separators=(',', ': ')) + '\n'
+
+        # Each resource is retrieved only once
+        uris = [uri for method, uri in self.session.calls if method == 'get']
+        assert len(uris) == len(set(uris))
+
+    def test_snapshot_auto_discovered_volumes(self, tmpdir):
+        """
+        Test that the storage volumes are included even if listing them
+        returns an empty list, as it does for auto-discovered volumes.
+        """
+        snapshot_file = str(tmpdir.join('snapshot.json'))
+
+        with mock.patch.object(zhmcclient.StorageVolumeManager, 'list',
+                               return_value=[]):
+            run_snapshot(self.session, snapshot_file,
+                         include=['storage_groups'])
+
+        with open(snapshot_file) as fp:
+            resources = json.load(fp)['resources']
+        sg_volume_uris = set(
+            uri for sg in resources['storage-group']
+            for uri in sg['storage-volume-uris'])
+        assert sg_volume_uris
+        assert set(v['element-uri'] for v in resources['storage-volume']) == \
+            sg_volume_uris
+
+    def test_snapshot_jsonl(self, tmpdir):
+        """
+        Test a snapshot of the partitions of a CPC in JSON Lines format.
+        """
+        snapshot_file = str(tmpdir.join('snapshot.jsonl'))
+
+        result = run_snapshot(self.session, snapshot_file,
+                              format='jsonl', cpc_names=['CPC2'],
+                              include=['partitions'])
+
+        with open(snapshot_file) as fp:
+            lines = [json.loads(line) for line in fp]
+        assert 'hmc' in lines[0]
+        classes = [line['class'] for line in lines[1:]]
+        assert classes == sorted(classes)
+        assert set(classes) == set(['cpc', 'partition', 'nic'])
+        assert result['snapshot']['resource_count'] == len(lines) - 1
+
+    def test_snapshot_idempotent(self, tmpdir):
+        """
+        Test that an unchanged snapshot does not rewrite the file, and that
+        check mode does not write the file.
+        """
+        snapshot_file = str(tmpdir.join('snapshot.json'))
+
+        result = run_snapshot(self.session, snapshot_file,
+                              check_mode=True)
+        assert result['changed'] is True
+        assert not os.path.exists(snapshot_file)
+
+        run_snapshot(self.session, snapshot_file)
+        mtime = os.stat(snapshot_file).st_mtime
+
+        result = run_snapshot(self.session, snapshot_file)
+        assert result['changed'] is False
+        assert os.stat(snapshot_file).st_mtime == mtime
+        assert [fn for fn in os.listdir(str(tmpdir))] == ['snapshot.json']
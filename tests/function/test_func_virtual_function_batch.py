@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the batch mode of the 'zhmc_virtual_function' Ansible
+module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import re
+import pytest
+import mock
+import zhmcclient
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_virtual_function
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has PART1 and PART2 without virtual
+# functions. The faked HMC does not check the family of the adapter backing
+# a virtual function, so adapter OSA1 is used for that.
+
+
+def run_vf_batch(session, vfunctions, state='present', check_mode=False):
+    """
+    Run the zhmc_virtual_function module in batch mode and return the mocked
+    AnsibleModule object.
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'partition_name': None,
+        'name': None,
+        'state': state,
+        'properties': {},
+        'virtual_functions': vfunctions,
+        'max_workers': 8,
+    }
+    return run_module(zhmc_virtual_function, params, session, check_mode)
+
+
+def vf_item(partition_name, name, properties=None):
+    """
+    Return an item of the 'virtual_functions' module parameter.
+    """
+    return dict(partition_name=partition_name, name=name,
+                properties=properties)
+
+
+class TestVirtualFunctionBatch(object):
+    """
+    All tests for the batch mode of the zhmc_virtual_function module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+        self.cpc = zhmcclient.Client(self.session).cpcs.find(name='CPC2')
+
+    def vf_properties(self, partition_name):
+        """
+        Return the properties of the virtual functions of a partition in the
+        mocked HMC, by name.
+        """
+        partition = self.cpc.partitions.find(name=partition_name)
+        return dict(
+            (vf.name, vf.properties)
+            for vf in partition.virtual_functions.list(full_properties=True))
+
+    @pytest.mark.parametrize("check_mode", [False, True])
+    def test_batch_present(self, check_mode):
+        """
+        Test creating virtual functions in multiple partitions, with the
+        backing adapter looked up only once.
+        """
+        vfunctions = [
+            vf_item('PART2', 'VF1',
+                    {'adapter_name': 'OSA1', 'device_number': '0400'}),
+            vf_item('PART1', 'VF1',
+                    {'adapter_name': 'OSA1', 'device_number': '0400'}),
+            vf_item('PART1', 'VF2',
+                    {'adapter_name': 'OSA1', 'device_number': '0401'}),
+        ]
+        self.session.reset()
+
+        mod_obj = run_vf_batch(self.session, vfunctions,
+                               check_mode=check_mode)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert 'virtual_function' not in result
+        results = result['virtual_functions']
+        assert [(r['partition_name'], r['name'], r['changed'])
+                for r in results] == \
+            [('PART2', 'VF1', True), ('PART1', 'VF1', True),
+             ('PART1', 'VF2', True)]
+        assert self.session.count('GET', '^/api/cpcs/[^/]+/adapters') == 1
+
+        if check_mode:
+            assert all(r['properties'] == {} for r in results)
+            assert self.vf_properties('PART1') == {}
+        else:
+            assert results[2]['properties']['device-number'] == '0401'
+            assert results[2]['properties']['adapter-uri'] == \
+                '/api/adapters/osa1'
+            assert sorted(self.vf_properties('PART1')) == ['VF1', 'VF2']
+            assert sorted(self.vf_properties('PART2')) == ['VF1']
+
+    def test_batch_update_once(self):
+        """
+        Test that the updates of the virtual functions of a partition
+        retrieve the partition status only once.
+        """
+        vfunctions = [
+            vf_item('PART1', 'VF1', {'device_number': '0400'}),
+            vf_item('PART1', 'VF2', {'device_number': '0401'}),
+            vf_item('PART1', 'VF3', {'device_number': '0402'}),
+        ]
+        run_vf_batch(self.session, vfunctions)
+        for item in vfunctions:
+            item['properties']['description'] = 'zEDC'
+        self.session.reset()
+
+        mod_obj = run_vf_batch(self.session, vfunctions)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        results = mod_obj.exit_json.call_args[1]['virtual_functions']
+        assert [r['changed'] for r in results] == [True, True, True]
+        assert all(r['properties']['description'] == 'zEDC'
+                   for r in results)
+        # The partition is retrieved once for listing its virtual functions,
+        # and once for its status, because the faked HMC does not support the
+        # 'properties' query parameter.
+        assert self.session.count(
+            'GET', r'^/api/partitions/[^/?]+\?properties=status$') == 1
+        assert self.session.count('GET', r'^/api/partitions/[^/?]+$') == 2
+        assert self.session.count(
+            'POST', '^/api/partitions/[^/]+/virtual-functions/') == 3
+        assert all(p['description'] == 'zEDC'
+                   for p in self.vf_properties('PART1').values())
+
+        # Repeated run does not change anything
+        mod_obj = run_vf_batch(self.session, vfunctions)
+        assert mod_obj.exit_json.call_args[1]['changed'] is False
+
+    def test_batch_absent(self):
+        """
+        Test deleting virtual functions in batch mode.
+        """
+        run_vf_batch(self.session,
+                     [vf_item('PART1', 'VF1'), vf_item('PART2', 'VF1')])
+
+        mod_obj = run_vf_batch(self.session,
+                               [vf_item('PART1', 'VF1'),
+                                vf_item('PART1', 'VF9')],
+                               state='absent')
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert [r['changed'] for r in result['virtual_functions']] == \
+            [True, False]
+        assert self.vf_properties('PART1') == {}
+        assert sorted(self.vf_properties('PART2')) == ['VF1']
+
+    @pytest.mark.parametrize(
+        "vfunctions, error_msg_pattern", [
+            ([vf_item('PART1', 'VF1'), vf_item('PART1', 'VF1')],
+             "ParameterError: Item 1 in module parameter 'virtual_functions' "
+             "specifies virtual function 'VF1' in partition 'PART1' "
+             "again."),
+            ([vf_item('PART9', 'VF1')],
+             "ParameterError: Partitions specified in module parameter "
+             "'virtual_functions' do not exist in CPC 'CPC2': PART9"),
+            ([vf_item('PART1', 'VF1', {'adapter_name': 'ZEDC9'})],
+             "ParameterError: Artificial property 'adapter_name' does not "
+             "specify the name of an existing adapter: 'ZEDC9'"),
+            ([vf_item('PART1', 'VF1', {'adapter_name': 'OSA1'}),
+              vf_item('PART2', 'VF1', {'foo': 'bar'})],
+             "ParameterError: Property 'foo' is not defined in the data "
+             "model for virtual functions."),
+            ([vf_item('PART1', 'VF1', {'adapter_name': 'OSA1'}),
+              vf_item('PART2', 'VF1', {'class': 'virtual-function'})],
+             "ParameterError: Property 'class' is not allowed in the "
+             "'properties' module parameter."),
+            ([vf_item('PART1', 'VF1', {'adapter_name': 'OSA1'}),
+              vf_item('PART2', 'VF1', {'description': 42})],
+             "ParameterError: Item 1 in module parameter 'virtual_functions' "
+             "has an invalid property value: Value of <(type|class) 'int'> "
+             "cannot be converted to unicode: 42"),
+        ]
+    )
+    def test_batch_parm_errors(self, vfunctions,
+                               error_msg_pattern):
+        """
+        Test batch mode with parameter errors, which are detected before
+        anything is changed.
+        """
+        mod_obj = run_vf_batch(self.session, vfunctions)
+
+        assert mod_obj.fail_json.called
+        msg = mod_obj.fail_json.call_args[1]['msg']
+        assert re.match(r'^{0}$'.format(error_msg_pattern), msg), msg
+        assert self.session.count('POST', '/virtual-functions') == 0
+
+    def test_batch_partition_failure(self):
+        """
+        Test that an HMC error in one partition does not prevent the
+        processing of the other partitions, and that the module fails with
+        the items that have been processed.
+        """
+        vfunctions = [
+            vf_item('PART2', 'VF1', {'device_number': '0400'}),
+            vf_item('PART2', 'VF2', {'device_number': '0401'}),
+            vf_item('PART2', 'VF3', {'device_number': '0402'}),
+            vf_item('PART1', 'VF1', {'device_number': '0400'}),
+        ]
+        create = zhmcclient.VirtualFunctionManager.create
+
+        def failing_create(vf_manager, properties):
+            if vf_manager.partition.name == 'PART2' and \
+                    properties['name'] == 'VF2':
+                raise zhmcclient.ConnectionError("Connection lost", None)
+            return create(vf_manager, properties)
+
+        with mock.patch.object(zhmcclient.VirtualFunctionManager, 'create',
+                               failing_create):
+            mod_obj = run_vf_batch(self.session, vfunctions)
+
+        assert not mod_obj.exit_json.called
+        result = mod_obj.fail_json.call_args[1]
+        assert result['msg'] == \
+            "Processing failed for 2 of 4 virtual functions: " \
+            "ConnectionError: Connection lost"
+        assert result['changed'] is True
+        assert [(r['partition_name'], r['name'], r['changed'], r.get('msg'))
+                for r in result['virtual_functions']] == [
+            ('PART2', 'VF1', True, None),
+            ('PART2', 'VF2', False, "ConnectionError: Connection lost"),
+            ('PART2', 'VF3', False, "ConnectionError: Connection lost"),
+            ('PART1', 'VF1', True, None),
+        ]
+        assert sorted(self.vf_properties('PART1')) == ['VF1']
+        assert sorted(self.vf_properties('PART2')) == ['VF1']
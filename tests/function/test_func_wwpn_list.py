@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Function tests for the 'zhmc_wwpn_list' Ansible module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import csv
+import json
+import pytest
+import zhmcclient
+
+from zhmcclient_mock import FakedSession
+
+from plugins.modules import zhmc_wwpn_list
+from tests.common.call_budget import CallCountingSession
+
+from .func_utils import MOCKED_HMC_FILE, run_module
+
+# In the mocked HMC, CPC2 (DPM) has PART1 and PART2 without HBAs, and
+# adapter FCP1 (adapter ID 118) with port 0.
+
+
+def run_wwpn_list(session, partition_names=None, output_file=None,
+                  output_format='jsonl', check_mode=False):
+    """
+    Run the zhmc_wwpn_list module and return the mocked AnsibleModule
+    object.
+    """
+    params = {
+        'cpc_name': 'CPC2',
+        'partition_names': partition_names,
+        'output_file': output_file,
+        'output_format': output_format,
+    }
+    return run_module(zhmc_wwpn_list, params, session, check_mode)
+
+
+class TestWwpnList(object):
+    """
+    All tests for the zhmc_wwpn_list module.
+    """
+
+    def setup_method(self):
+        """
+        Set up the mocked HMC with HBAs in PART1 and PART2.
+        """
+        self.session = CallCountingSession(
+            FakedSession.from_hmc_yaml_file(MOCKED_HMC_FILE))
+        cpc = zhmcclient.Client(self.session).cpcs.find(name='CPC2')
+        port = cpc.adapters.find(name='FCP1').ports.find(index=0)
+        self.expected = []
+        for partition_name, devno in (('PART1', '1200'), ('PART2', '1300')):
+            partition = cpc.partitions.find(name=partition_name)
+            hba = partition.hbas.create({
+                'name': 'HBA1',
+                'adapter-port-uri': port.uri,
+                'device-number': devno,
+            })
+            self.expected.append({
+                'partition_name': partition_name,
+                'adapter_id': '118',
+                'device_number': devno,
+                'wwpn': hba.get_property('wwpn'),
+            })
+        self.session.reset()
+
+    def test_wwpn_list_all(self):
+        """
+        Test listing the WWPNs of all partitions with a single Export WWPN
+        List operation.
+        """
+        mod_obj = run_wwpn_list(self.session)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is False
+        assert result['wwpns'] == self.expected
+        assert self.session.count(
+            'POST', '/operations/export-port-names-list$') == 1
+        assert self.session.count('GET', '/hbas') == 0
+
+    def test_wwpn_list_selected(self):
+        """
+        Test listing the WWPNs of selected partitions.
+        """
+        mod_obj = run_wwpn_list(self.session, partition_names=['PART2'])
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        assert mod_obj.exit_json.call_args[1]['wwpns'] == self.expected[1:]
+
+    def test_wwpn_list_missing_partition(self):
+        """
+        Test listing the WWPNs of a partition that does not exist.
+        """
+        mod_obj = run_wwpn_list(self.session,
+                                partition_names=['PART1', 'PART9'])
+
+        assert mod_obj.fail_json.called
+        assert mod_obj.fail_json.call_args[1]['msg'] == \
+            "ParameterError: Partitions specified in module parameter " \
+            "'partition_names' do not exist in CPC 'CPC2': PART9"
+        assert self.session.count('POST') == 0
+
+    @pytest.mark.parametrize("output_format", ['csv', 'jsonl'])
+    def test_wwpn_list_output_file(self, output_format, tmpdir):
+        """
+        Test writing the WWPNs to a CSV or JSON Lines file.
+        """
+        output_file = str(tmpdir.join('wwpns.' + output_format))
+
+        mod_obj = run_wwpn_list(self.session, output_file=output_file,
+                                output_format=output_format)
+
+        assert not mod_obj.fail_json.called, mod_obj.fail_json.call_args
+        result = mod_obj.exit_json.call_args[1]
+        assert result['changed'] is True
+        assert 'wwpns' not in result
+        assert result['output']['path'] == output_file
+        assert result['output']['count'] == 2
+        with open(output_file) as fp:
+            if output_format == 'csv':
+                lines = fp.read().splitlines()
+                assert lines[0] == 'partition_name,adapter_id,' \
+                    'device_number,wwpn'
+                items = list(csv.DictReader(lines))
+            else:
+                items = [json.loads(line) for line in fp]
+        assert items == self.expected
+
+        # The file is not written again if its content does not change
+        mod_obj = run_wwpn_list(self.session, output_file=output_file,
+                                output_format=output_format)
+        assert mod_obj.exit_json.call_args[1]['changed'] is False
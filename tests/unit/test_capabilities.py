@@ -0,0 +1,218 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the HMC capabilities in the 'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils import common
+from plugins.module_utils.common import HmcCapabilities, \
+    CAPABILITY_CACHE_DIR_ENV_VAR
+from tests.common.call_budget import CallCountingSession
+
+HMC_HOST = '10.11.12.13'
+
+
+@pytest.fixture(autouse=True)
+def capabilities():
+    """
+    Forget the capability objects of this process that were used in a test.
+    """
+    yield
+    common._CAPABILITIES.clear()
+
+
+def new_client(hmc_version='2.14.1'):
+    """
+    Return a client for a call counting faked session for an HMC with a
+    CPC.
+    """
+    faked_session = FakedSession(HMC_HOST, 'HMC1', hmc_version, '2.20')
+    faked_session.hmc.cpcs.add({
+        'object-id': 'cpc1', 'name': 'CPC1', 'dpm-enabled': True,
+        'se-version': '2.14.1'})
+    return zhmcclient.Client(CallCountingSession(faked_session))
+
+
+def http_error(http_status, reason=1):
+    """
+    Return a zhmcclient.HTTPError with the HTTP status and reason codes.
+    """
+    return zhmcclient.HTTPError({
+        'http-status': http_status,
+        'reason': reason,
+        'message': 'Injected error',
+    })
+
+
+@pytest.mark.parametrize(
+    "hmc_version, exp_list_permitted", [
+        ('2.13.1', False),
+        ('2.14.0', True),
+        ('2.15.0', True),
+    ]
+)
+def test_versions(hmc_version, exp_list_permitted):
+    """
+    Test the versions and list operations, without a cache directory.
+    """
+    client = new_client(hmc_version)
+    caps = HmcCapabilities(client)
+
+    assert caps.hmc_version == hmc_version
+    assert caps.hmc_version_info == \
+        [int(x) for x in hmc_version.split('.')]
+    assert caps.api_version == '2.20'
+    for kind in ('partitions', 'lpars', 'adapters'):
+        assert caps.has_list_permitted(kind) is exp_list_permitted
+    assert caps.cached is False
+    assert client.session.count('GET', '^/api/version$') == 1
+
+
+def test_cpc_facts():
+    """
+    Test that the SE version and DPM mode of a CPC are retrieved once.
+    """
+    client = new_client()
+    caps = HmcCapabilities(client)
+    cpc = client.cpcs.find(name='CPC1')
+    client.session.reset()
+
+    assert caps.cpc_se_version(cpc) == '2.14.1'
+    assert caps.cpc_dpm_enabled(cpc) is True
+    assert client.session.count('GET', '^/api/cpcs/cpc1$') == 1
+
+    # A new CPC object, e.g. from another list operation
+    cpc = client.cpcs.resource_object(cpc.uri)
+    client.session.reset()
+    assert caps.cpc_se_version(cpc) == '2.14.1'
+    assert caps.cpc_dpm_enabled(cpc) is True
+    assert client.session.calls == []
+
+
+def test_cache(tmpdir):
+    """
+    Test that the capabilities are shared through the cache file.
+    """
+    client = new_client()
+    caps = HmcCapabilities(client, str(tmpdir))
+    cpc = client.cpcs.find(name='CPC1')
+    assert caps.has_list_permitted('partitions') is True
+    assert caps.cpc_se_version(cpc) == '2.14.1'
+    assert os.path.exists(os.path.join(
+        str(tmpdir), HMC_HOST + '.capabilities.json'))
+
+    client = new_client()
+    cpc = client.cpcs.find(name='CPC1')
+    client.session.reset()
+    caps = HmcCapabilities(client, str(tmpdir))
+    assert caps.hmc_version == '2.14.1'
+    assert caps.has_list_permitted('partitions') is True
+    assert caps.cpc_se_version(cpc) == '2.14.1'
+    assert caps.cached is True
+    assert client.session.calls == []
+
+
+@pytest.mark.parametrize(
+    "content", [
+        '{invalid',
+        '[]',
+        '{"time": 0}',
+    ]
+)
+def test_cache_invalid(content, tmpdir):
+    """
+    Test that an invalid cache file is ignored.
+    """
+    client = new_client()
+    with open(os.path.join(str(tmpdir), HMC_HOST + '.capabilities.json'),
+              'w') as fp:
+        fp.write(content)
+    caps = HmcCapabilities(client, str(tmpdir))
+    assert caps.hmc_version == '2.14.1'
+    assert caps.cached is False
+
+
+def test_cache_expired(tmpdir):
+    """
+    Test that an expired capability record is retrieved again.
+    """
+    client = new_client('2.13.1')
+    HmcCapabilities(client, str(tmpdir), ttl=100).has_list_permitted('lpars')
+
+    # The HMC has been upgraded
+    client = new_client('2.15.0')
+    with mock.patch.object(common.time, 'time',
+                           return_value=common.time.time() + 50):
+        caps = HmcCapabilities(client, str(tmpdir), ttl=100)
+        assert caps.has_list_permitted('lpars') is False
+    with mock.patch.object(common.time, 'time',
+                           return_value=common.time.time() + 150):
+        caps = HmcCapabilities(client, str(tmpdir), ttl=100)
+        assert caps.has_list_permitted('lpars') is True
+    with open(caps.filename) as fp:
+        assert json.load(fp)['hmc-version'] == '2.15.0'
+
+
+@pytest.mark.parametrize(
+    "error, cached, exp_refreshed", [
+        (http_error(404), True, True),
+        (http_error(400), True, True),
+        (http_error(404), False, False),
+        (http_error(500), True, False),
+        (zhmcclient.ConnectionError('reset', None), True, False),
+    ]
+)
+def test_refresh_on_error(error, cached, exp_refreshed, tmpdir):
+    """
+    Test that the capabilities are refreshed on errors that may be caused
+    by a change of the HMC, if they were cached.
+    """
+    if cached:
+        _ = HmcCapabilities(new_client('2.15.0'), str(tmpdir)).hmc_version
+
+    # The HMC has been downgraded
+    client = new_client('2.13.1')
+    caps = HmcCapabilities(client, str(tmpdir))
+    assert caps.cached is cached
+
+    assert caps.refresh_on_error(error) is exp_refreshed
+    assert caps.cached is (cached and not exp_refreshed)
+    exp_version = '2.13.1' if exp_refreshed or not cached else '2.15.0'
+    assert caps.hmc_version == exp_version
+
+
+def test_for_client(tmpdir):
+    """
+    Test that the capability object is shared for a client, and that it
+    uses the cache directory from the environment variable.
+    """
+    client = new_client()
+    with mock.patch.dict(os.environ,
+                         {CAPABILITY_CACHE_DIR_ENV_VAR: str(tmpdir)}):
+        caps = HmcCapabilities.for_client(client)
+        assert HmcCapabilities.for_client(client) is caps
+        assert caps.cache_dir == str(tmpdir)
+        assert HmcCapabilities.for_client(new_client()) is not caps
@@ -25,6 +25,7 @@ import mock
 
 from plugins.modules import zhmc_hba
 from plugins.module_utils import common as module_utils
+from plugins.module_utils.common import ParameterError
 
 
 class TestZhmcHbaMain(object):
@@ -54,6 +55,7 @@ class TestZhmcHbaMain(object):
             'name': 'fake-hba-name',
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Return values of perform_task()
@@ -91,12 +93,24 @@ class TestZhmcHbaMain(object):
                 ),
             ),
             cpc_name=dict(required=True, type='str'),
-            partition_name=dict(required=True, type='str'),
-            name=dict(required=True, type='str'),
+            partition_name=dict(required=False, type='str', default=None),
+            name=dict(required=False, type='str', default=None),
             state=dict(required=True, type='str',
                        choices=['absent', 'present']),
             properties=dict(required=False, type='dict', default={}),
+            hbas=dict(
+                required=False, type='list', elements='dict', default=None,
+                options=dict(
+                    partition_name=dict(required=True, type='str'),
+                    name=dict(required=True, type='str'),
+                    properties=dict(required=False, type='dict',
+                                    default=None),
+                ),
+            ),
+            max_workers=dict(required=False, type='int', default=8),
             log_file=dict(required=False, type='str', default=None),
+            log_level=dict(required=False, type='str', default='debug',
+                           choices=['debug', 'info', 'warning', 'error']),
             _faked_session=dict(required=False, type='raw'),
         )
         assert ansible_mod_cls.call_args == \
@@ -135,6 +149,7 @@ class TestZhmcHbaMain(object):
             'name': 'fake-hba-name',
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Exception raised by perform_task()
@@ -186,8 +201,11 @@ class TestZhmcHbaPerformTask(object):
 
         # Prepare input arguments
         params = {
+            'partition_name': 'fake-partition-name',
+            'name': 'fake-hba-name',
             'state': 'present',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Prepare return values
@@ -227,8 +245,11 @@ class TestZhmcHbaPerformTask(object):
 
         # Prepare input arguments
         params = {
+            'partition_name': 'fake-partition-name',
+            'name': 'fake-hba-name',
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Prepare return values
@@ -254,5 +275,59 @@ class TestZhmcHbaPerformTask(object):
         # Assert no call to the other action functions
         assert ensure_present_func.called is False
 
+    @pytest.mark.parametrize(
+        "params, error_msg", [
+            (dict(partition_name=None, name='fake-hba-name', hbas=None),
+             "Module parameter 'partition_name' is required unless module "
+             "parameter 'hbas' is specified."),
+            (dict(partition_name='fake-partition-name', name=None,
+                  hbas=None),
+             "Module parameter 'name' is required unless module parameter "
+             "'hbas' is specified."),
+            (dict(partition_name='fake-partition-name', name=None,
+                  hbas=[]),
+             "Module parameter 'partition_name' must not be specified "
+             "together with module parameter 'hbas'."),
+        ]
+    )
+    @mock.patch("plugins.modules.zhmc_hba.ensure_batch",
+                autospec=True)
+    @mock.patch("plugins.modules.zhmc_hba.ensure_present",
+                autospec=True)
+    def test_pt_param_error(
+            self, ensure_present_func, ensure_batch_func, params, error_msg):
+        """
+        Test perform_task() with inconsistent parameters for batch mode.
+        """
+        params = dict(params, state='present')
+
+        with pytest.raises(ParameterError) as exc_info:
+            zhmc_hba.perform_task(params, False)
+
+        assert str(exc_info.value) == error_msg
+        assert ensure_present_func.called is False
+        assert ensure_batch_func.called is False
+
+    @mock.patch("plugins.modules.zhmc_hba.ensure_batch",
+                autospec=True)
+    @mock.patch("plugins.modules.zhmc_hba.ensure_present",
+                autospec=True)
+    def test_pt_batch(self, ensure_present_func, ensure_batch_func):
+        """
+        Test perform_task() in batch mode.
+        """
+        params = {
+            'partition_name': None,
+            'name': None,
+            'state': 'present',
+            'hbas': [],
+        }
+        ensure_batch_func.return_value = (False, [])
+
+        assert zhmc_hba.perform_task(params, True) == (False, [])
+
+        assert ensure_batch_func.call_args == mock.call(params, True)
+        assert ensure_present_func.called is False
+
 
 # The other functions of the module are tested with function tests.
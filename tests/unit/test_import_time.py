@@ -0,0 +1,104 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Import-time benchmark for the modules, based on 'python -X importtime'.
+
+Each module is imported in a new Python process, as in an AnsiballZ module
+run. The tests verify that test-only dependencies are not imported, and that
+the time spent in the module code itself (excluding its imports) stays within
+a budget.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import re
+import sys
+import subprocess
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+MODULES_DIR = os.path.join(REPO_DIR, 'plugins', 'modules')
+
+MODULE_NAMES = sorted(
+    fn[:-3] for fn in os.listdir(MODULES_DIR)
+    if fn.startswith('zhmc_') and fn.endswith('.py'))
+
+# Packages that must not be imported when a module is imported, because they
+# are needed only for tests.
+TEST_ONLY_PACKAGES = ('zhmcclient_mock', 'jsonschema', 'pytest', 'mock')
+
+# Budget in microseconds for the self time (excluding imports) of each of the
+# Python modules of this collection. It is generous, in order to detect only
+# regressions such as expensive computations at import time.
+SELF_TIME_BUDGET_US = 100000
+
+# Line format of 'python -X importtime' output:
+#   import time: self [us] | cumulative | imported package
+IMPORTTIME_PATTERN = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 7),
+    reason="'python -X importtime' requires Python 3.7")
+
+
+def import_times(module_name):
+    """
+    Import a module in a new Python process and return its import times as a
+    dict with key: imported package name, value: tuple(self_us, cumulative_us).
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_DIR
+    proc = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import plugins.modules.{0}'.format(module_name)],
+        cwd=REPO_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    err = err.decode('utf-8')
+    assert proc.returncode == 0, err
+    times = {}
+    for line in err.splitlines():
+        m = IMPORTTIME_PATTERN.match(line)
+        if m:
+            times[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return times
+
+
+@pytest.mark.parametrize("module_name", MODULE_NAMES)
+def test_import_time(module_name):
+    """
+    Test the imports and the import time of a module.
+    """
+    times = import_times(module_name)
+
+    module_pkg = 'plugins.modules.{0}'.format(module_name)
+    assert module_pkg in times
+
+    for imported in times:
+        top_pkg = imported.split('.')[0]
+        assert top_pkg not in TEST_ONLY_PACKAGES, \
+            "Module {0} imports test-only package {1}". \
+            format(module_name, imported)
+
+    for imported, (self_us, _) in times.items():
+        if imported.startswith('plugins.'):
+            assert self_us <= SELF_TIME_BUDGET_US, \
+                "Self import time of {0} is {1} us, budget is {2} us". \
+                format(imported, self_us, SELF_TIME_BUDGET_US)
@@ -0,0 +1,239 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the locator cache in the 'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+import mock
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils import common
+from plugins.module_utils.common import LocatorCache, find_by_name, \
+    LOCATOR_CACHE_DIR_ENV_VAR
+from tests.common.call_budget import CallCountingSession
+
+HMC_HOST = '10.11.12.13'
+
+
+@pytest.fixture(autouse=True)
+def locator_caches():
+    """
+    Forget the locator caches of this process that were used in a test.
+    """
+    yield
+    common._LOCATOR_CACHES.clear()
+
+
+@pytest.fixture
+def session(tmpdir):
+    """
+    A call counting faked session for an HMC with a CPC and two partitions,
+    with the locator cache enabled in a temporary directory.
+    """
+    faked_session = FakedSession(HMC_HOST, 'HMC1', '2.14.1', '2.20')
+    faked_session.hmc.cpcs.add({
+        'object-id': 'cpc1', 'name': 'CPC1', 'dpm-enabled': True})
+    cpc = faked_session.hmc.cpcs.lookup_by_oid('cpc1')
+    for oid in ('part1', 'part2'):
+        cpc.partitions.add({'object-id': oid, 'name': oid.upper()})
+    with mock.patch.dict(os.environ, {LOCATOR_CACHE_DIR_ENV_VAR: str(tmpdir)}):
+        yield CallCountingSession(faked_session)
+
+
+def list_calls(session):
+    """
+    Return the number of list operations issued through a session.
+    """
+    return session.count('GET', r'^/api/cpcs(\?|$)') + \
+        session.count('GET', r'/partitions(\?|$)')
+
+
+def test_put_get(tmpdir):
+    """
+    Test that cached URIs are returned, and are shared with other processes
+    through the cache file.
+    """
+    cache = LocatorCache(str(tmpdir), HMC_HOST)
+    assert cache.get('k1') is None
+    cache.put('k1', '/api/partitions/1')
+    cache.put('k2', '/api/partitions/2')
+    cache.remove('k2')
+    assert cache.get('k1') == '/api/partitions/1'
+    assert cache.get('k2') is None
+
+    # Not yet visible for other processes
+    assert LocatorCache(str(tmpdir), HMC_HOST).get('k1') is None
+    cache.flush()
+    assert os.path.exists(os.path.join(str(tmpdir), HMC_HOST + '.json'))
+    other_cache = LocatorCache(str(tmpdir), HMC_HOST)
+    assert other_cache.get('k1') == '/api/partitions/1'
+    assert other_cache.get('k2') is None
+
+
+def test_merge(tmpdir):
+    """
+    Test that the changes of different processes are merged in the cache
+    file.
+    """
+    cache1 = LocatorCache(str(tmpdir), HMC_HOST)
+    cache2 = LocatorCache(str(tmpdir), HMC_HOST)
+    cache1.put('k1', '/api/partitions/1')
+    cache1.put('k3', '/api/partitions/3')
+    cache1.flush()
+    cache2.put('k2', '/api/partitions/2')
+    cache2.remove('k3')
+    cache2.flush()
+
+    cache = LocatorCache(str(tmpdir), HMC_HOST)
+    assert cache.get('k1') == '/api/partitions/1'
+    assert cache.get('k2') == '/api/partitions/2'
+    assert cache.get('k3') is None
+
+
+def test_evict_age(tmpdir):
+    """
+    Test that entries that are older than the maximum age are not used and
+    are evicted.
+    """
+    cache = LocatorCache(str(tmpdir), HMC_HOST, max_age=100)
+    with mock.patch.object(common.time, 'time', return_value=1000.0):
+        cache.put('k1', '/api/partitions/1')
+    with mock.patch.object(common.time, 'time', return_value=1050.0):
+        cache.put('k2', '/api/partitions/2')
+    with mock.patch.object(common.time, 'time', return_value=1120.0):
+        assert cache.get('k1') is None
+        assert cache.get('k2') == '/api/partitions/2'
+        cache.flush()
+
+    with open(cache.filename) as fp:
+        assert list(json.load(fp)) == ['k2']
+
+
+def test_evict_lru(tmpdir):
+    """
+    Test that the least recently used entries are evicted when there are
+    too many entries.
+    """
+    cache = LocatorCache(str(tmpdir), HMC_HOST, max_entries=2)
+    for index, key in enumerate(('k1', 'k2', 'k3')):
+        with mock.patch.object(common.time, 'time',
+                               return_value=1000.0 + index):
+            cache.put(key, '/api/partitions/' + key)
+    with mock.patch.object(common.time, 'time', return_value=1010.0):
+        cache.get('k1')
+        cache.flush()
+
+    with open(cache.filename) as fp:
+        assert sorted(json.load(fp)) == ['k1', 'k3']
+
+
+def test_invalid_file(tmpdir):
+    """
+    Test that an invalid cache file is treated as an empty cache.
+    """
+    cache = LocatorCache(str(tmpdir), HMC_HOST)
+    with open(cache.filename, 'w') as fp:
+        fp.write('[invalid')
+    assert cache.get('k1') is None
+    cache.put('k1', '/api/partitions/1')
+    cache.flush()
+    assert LocatorCache(str(tmpdir), HMC_HOST).get('k1') == \
+        '/api/partitions/1'
+
+
+def test_find_by_name(session):
+    """
+    Test that find_by_name() lists the collection only when the URI is not
+    cached.
+    """
+    client = zhmcclient.Client(session)
+    cpc = find_by_name(client.cpcs, 'CPC1')
+    partition = find_by_name(cpc.partitions, 'PART1')
+    assert partition.uri == '/api/partitions/part1'
+    assert list_calls(session) == 2
+    LocatorCache.for_session(session).flush()
+    common._LOCATOR_CACHES.clear()
+
+    # A new process with a new client finds the resources by their URIs
+    session.reset()
+    client = zhmcclient.Client(session)
+    cpc = find_by_name(client.cpcs, 'CPC1')
+    partition = find_by_name(cpc.partitions, 'PART1')
+    assert partition.uri == '/api/partitions/part1'
+    assert partition.name == 'PART1'
+    assert partition.manager is cpc.partitions
+    assert list_calls(session) == 0
+    assert session.count('GET') == 2
+
+
+@pytest.mark.parametrize(
+    "change", ['deleted', 'renamed']
+)
+def test_find_by_name_stale(session, change):
+    """
+    Test that find_by_name() falls back to listing the collection when the
+    cached resource no longer exists or has been renamed.
+    """
+    client = zhmcclient.Client(session)
+    cpc = find_by_name(client.cpcs, 'CPC1')
+    find_by_name(cpc.partitions, 'PART1')
+    faked_cpc = session.hmc.cpcs.lookup_by_oid('cpc1')
+    if change == 'deleted':
+        faked_cpc.partitions.remove('part1')
+        faked_cpc.partitions.add({'object-id': 'part3', 'name': 'PART1'})
+        exp_uri = '/api/partitions/part3'
+    else:
+        faked_cpc.partitions.lookup_by_oid('part1').update(
+            {'name': 'PART3'})
+        faked_cpc.partitions.lookup_by_oid('part2').update(
+            {'name': 'PART1'})
+        exp_uri = '/api/partitions/part2'
+
+    client = zhmcclient.Client(session)
+    cpc = find_by_name(client.cpcs, 'CPC1')
+    partition = find_by_name(cpc.partitions, 'PART1')
+    assert partition.uri == exp_uri
+    assert LocatorCache.for_session(session).get(
+        LocatorCache.key(cpc.partitions, 'PART1')) == exp_uri
+
+
+def test_find_by_name_not_found(session):
+    """
+    Test that find_by_name() raises NotFound for a resource that does not
+    exist.
+    """
+    client = zhmcclient.Client(session)
+    cpc = find_by_name(client.cpcs, 'CPC1')
+    with pytest.raises(zhmcclient.NotFound):
+        find_by_name(cpc.partitions, 'PART9')
+
+
+def test_find_by_name_disabled():
+    """
+    Test that find_by_name() uses the manager when the locator cache is not
+    enabled.
+    """
+    manager = mock.Mock()
+    with mock.patch.dict(os.environ, {LOCATOR_CACHE_DIR_ENV_VAR: ''}):
+        assert find_by_name(manager, 'PART1') is manager.find.return_value
+    manager.find.assert_called_once_with(name='PART1')
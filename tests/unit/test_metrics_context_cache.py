@@ -0,0 +1,96 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the metrics context cache in the 'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import stat
+
+from plugins.module_utils.common import MetricsContextCache
+
+HMC_HOST = '10.11.12.13'
+
+
+def context(uri):
+    """
+    Return the properties of a metrics context.
+    """
+    return {'metrics-context-uri': uri, 'metric-group-infos': []}
+
+
+def test_key():
+    """
+    Test that the key does not depend on the order of the metric groups.
+    """
+    key1 = MetricsContextCache.key(['a', 'b'], 15)
+    assert MetricsContextCache.key(['b', 'a', 'b'], 15) == key1
+    assert MetricsContextCache.key(['a', 'b'], 30) != key1
+    assert MetricsContextCache.key(['a'], 15) != key1
+
+
+def test_write_read(tmpdir):
+    """
+    Test that the metrics contexts and the session ID are shared with other
+    processes through the cache file, which is readable only by its owner.
+    """
+    cache = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    assert cache.session_id is None
+    assert cache.get('k1') is None
+    cache.put('k1', context('/api/services/metrics/context/1'))
+    cache.put('k2', context('/api/services/metrics/context/2'))
+    cache.remove('k2')
+    cache.write('sess1')
+
+    filename = str(tmpdir.join('10.11.12.13.user1.metrics.json'))
+    assert cache.filename == filename
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o600
+
+    cache2 = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    assert cache2.session_id == 'sess1'
+    assert cache2.get('k1') == context('/api/services/metrics/context/1')
+    assert cache2.get('k2') is None
+
+    other_user = MetricsContextCache(str(tmpdir), HMC_HOST, 'user2')
+    assert other_user.session_id is None
+    assert other_user.get('k1') is None
+
+
+def test_write_merge(tmpdir):
+    """
+    Test that the changes of concurrent processes are merged for the same
+    HMC session, and that the metrics contexts of an ended HMC session are
+    dropped.
+    """
+    cache1 = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    cache2 = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    cache1.put('k1', context('/api/services/metrics/context/1'))
+    cache1.write('sess1')
+    cache2.put('k2', context('/api/services/metrics/context/2'))
+    cache2.write('sess1')
+    assert cache2.get('k1') == context('/api/services/metrics/context/1')
+
+    # The HMC session has ended and a new one has been created
+    cache3 = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    cache3.put('k2', context('/api/services/metrics/context/3'))
+    cache3.write('sess2')
+
+    cache4 = MetricsContextCache(str(tmpdir), HMC_HOST, 'user1')
+    assert cache4.session_id == 'sess2'
+    assert cache4.get('k1') is None
+    assert cache4.get('k2') == context('/api/services/metrics/context/3')
@@ -54,6 +54,7 @@ class TestZhmcNicMain(object):
             'name': 'fake-nic-name',
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Return values of perform_task()
@@ -97,6 +98,8 @@ class TestZhmcNicMain(object):
                        choices=['absent', 'present']),
             properties=dict(required=False, type='dict', default={}),
             log_file=dict(required=False, type='str', default=None),
+            log_level=dict(required=False, type='str', default='debug',
+                           choices=['debug', 'info', 'warning', 'error']),
             _faked_session=dict(required=False, type='raw'),
         )
         assert ansible_mod_cls.call_args == \
@@ -135,6 +138,7 @@ class TestZhmcNicMain(object):
             'name': 'fake-nic-name',
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Exception raised by perform_task()
@@ -188,6 +192,7 @@ class TestZhmcNicPerformTask(object):
         params = {
             'state': 'present',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Prepare return values
@@ -229,6 +234,7 @@ class TestZhmcNicPerformTask(object):
         params = {
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
 
         # Prepare return values
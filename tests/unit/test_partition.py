@@ -30,6 +30,7 @@ import zhmcclient_mock
 
 from plugins.modules import zhmc_partition
 from plugins.module_utils import common as module_utils
+from tests.common.call_budget import CallCountingSession
 
 
 class TestZhmcPartitionMain(unittest.TestCase):
@@ -57,12 +58,14 @@ class TestZhmcPartitionMain(unittest.TestCase):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
         }
         check_mode = False
 
         # Return values of perform_task()
         perform_task_changed = True
         perform_task_result = {}
+        perform_task_update_plan = {}
 
         # Prepare mocks
         mod_obj = ansible_mod_cls.return_value
@@ -71,7 +74,8 @@ class TestZhmcPartitionMain(unittest.TestCase):
         mod_obj.fail_json.configure_mock(side_effect=SystemExit(1))
         mod_obj.exit_json.configure_mock(side_effect=SystemExit(0))
         perform_task_func.return_value = (perform_task_changed,
-                                          perform_task_result)
+                                          perform_task_result,
+                                          perform_task_update_plan)
 
         # Exercise code
         with self.assertRaises(SystemExit) as cm:
@@ -99,11 +103,43 @@ class TestZhmcPartitionMain(unittest.TestCase):
             state=dict(required=True, type='str',
                        choices=['absent', 'stopped', 'active', 'facts']),
             properties=dict(required=False, type='dict', default={}),
+            nics=dict(
+                required=False, type='list', elements='dict', default=None,
+                options=dict(
+                    name=dict(required=True, type='str'),
+                    adapter_name=dict(required=True, type='str'),
+                    adapter_port=dict(required=False, type='int', default=0),
+                    properties=dict(required=False, type='dict', default={}),
+                ),
+            ),
+            hbas=dict(
+                required=False, type='list', elements='dict', default=None,
+                options=dict(
+                    name=dict(required=True, type='str'),
+                    adapter_name=dict(required=True, type='str'),
+                    adapter_port=dict(required=False, type='int', default=0),
+                    properties=dict(required=False, type='dict', default={}),
+                ),
+            ),
+            virtual_functions=dict(
+                required=False, type='list', elements='dict', default=None,
+                options=dict(
+                    name=dict(required=True, type='str'),
+                    adapter_name=dict(required=True, type='str'),
+                    properties=dict(required=False, type='dict', default={}),
+                ),
+            ),
+            storage_groups=dict(required=False, type='list', elements='str',
+                                default=None),
             expand_storage_groups=dict(required=False, type='bool',
                                        default=False),
             expand_crypto_adapters=dict(required=False, type='bool',
                                         default=False),
+            check_mode_snapshot=dict(required=False, type='str',
+                                     default=None),
             log_file=dict(required=False, type='str', default=None),
+            log_level=dict(required=False, type='str', default='debug',
+                           choices=['debug', 'info', 'warning', 'error']),
             _faked_session=dict(required=False, type='raw'),
         )
         assert ansible_mod_cls.call_args == \
@@ -116,7 +152,8 @@ class TestZhmcPartitionMain(unittest.TestCase):
         # Assert call to exit_json()
         assert mod_obj.exit_json.call_args == \
             mock.call(changed=perform_task_changed,
-                      partition=perform_task_result)
+                      partition=perform_task_result,
+                      update_plan=perform_task_update_plan)
 
         # Assert no call to fail_json()
         assert mod_obj.fail_json.called is False
@@ -141,6 +178,7 @@ class TestZhmcPartitionMain(unittest.TestCase):
             'expand_storage_groups': False,
             'expand_crypto_adapters': False,
             'log_file': None,
+            'log_level': 'debug',
         }
         check_mode = False
 
@@ -195,6 +233,7 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         params = {
             'state': 'active',
             'log_file': None,
+            'log_level': 'debug',
         }
         check_mode = True
 
@@ -203,17 +242,19 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         result = {
             'fake-prop': 'fake-value',
         }
+        update_plan = {}
 
         # Prepare mocks
-        ensure_active_func.return_value = (changed, result)
+        ensure_active_func.return_value = (changed, result, update_plan)
 
         # Exercise code
-        actual_changed, actual_result = zhmc_partition.perform_task(
-            params, check_mode)
+        actual_changed, actual_result, actual_update_plan = \
+            zhmc_partition.perform_task(params, check_mode)
 
         # Assert return values
         assert actual_changed == changed
         assert actual_result == result
+        assert actual_update_plan == update_plan
 
         # Assert call to the desired action function
         assert ensure_active_func.call_args == mock.call(params, check_mode)
@@ -238,6 +279,7 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         params = {
             'state': 'stopped',
             'log_file': None,
+            'log_level': 'debug',
         }
         check_mode = True
 
@@ -246,17 +288,19 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         result = {
             'fake-prop': 'fake-value',
         }
+        update_plan = {}
 
         # Prepare mocks
-        ensure_stopped_func.return_value = (changed, result)
+        ensure_stopped_func.return_value = (changed, result, update_plan)
 
         # Exercise code
-        actual_changed, actual_result = zhmc_partition.perform_task(
-            params, check_mode)
+        actual_changed, actual_result, actual_update_plan = \
+            zhmc_partition.perform_task(params, check_mode)
 
         # Assert return values
         assert actual_changed == changed
         assert actual_result == result
+        assert actual_update_plan == update_plan
 
         # Assert call to the desired action function
         assert ensure_stopped_func.call_args == mock.call(params, check_mode)
@@ -281,6 +325,7 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         params = {
             'state': 'absent',
             'log_file': None,
+            'log_level': 'debug',
         }
         check_mode = False
 
@@ -289,17 +334,19 @@ class TestZhmcPartitionPerformTask(unittest.TestCase):
         result = {
             'fake-prop': 'fake-value',
         }
+        update_plan = {}
 
         # Prepare mocks
-        ensure_absent_func.return_value = (changed, result)
+        ensure_absent_func.return_value = (changed, result, update_plan)
 
         # Exercise code
-        actual_changed, actual_result = zhmc_partition.perform_task(
-            params, check_mode)
+        actual_changed, actual_result, actual_update_plan = \
+            zhmc_partition.perform_task(params, check_mode)
 
         # Assert return values
         assert actual_changed == changed
         assert actual_result == result
+        assert actual_update_plan == update_plan
 
         # Assert call to the desired action function
         assert ensure_absent_func.call_args == mock.call(params, check_mode)
@@ -688,4 +735,72 @@ def test_partition_create_check_mode_partition(
                     format(prop_hmc_name, exp_prop_value)
 
 
+def mocked_partition_with_nics(nic_count):
+    """
+    Create a mocked partition that has the specified number of NICs, all
+    backed by the same OSA adapter via the same virtual switch.
+
+    Returns a tuple(CallCountingSession, Partition object).
+    """
+    session = zhmcclient_mock.FakedSession(**FAKED_SESSION_KWARGS)
+    faked_cpc = session.hmc.cpcs.add(FAKED_CPC_1)
+    faked_adapter = faked_cpc.adapters.add({
+        'object-id': 'fake-osa-1',
+        'name': 'osa-1',
+        'adapter-id': '120',
+        'type': 'osd',
+        'adapter-family': 'osa',
+    })
+    faked_vswitch = faked_cpc.virtual_switches.add({
+        'object-id': 'fake-vswitch-1',
+        'name': 'vswitch-1',
+        'backing-adapter-uri': faked_adapter.uri,
+        'port': 0,
+    })
+    faked_partition = faked_cpc.partitions.add({
+        'object-id': 'fake-part-1',
+        'name': 'part-1',
+        'status': 'stopped',
+    })
+    for i in range(nic_count):
+        faked_partition.nics.add({
+            'name': 'nic-{0}'.format(i),
+            'virtual-switch-uri': faked_vswitch.uri,
+        })
+    counting_session = CallCountingSession(session)
+    client = zhmcclient.Client(counting_session)
+    cpc = client.cpcs.find(name=FAKED_CPC_1['name'])
+    partition = cpc.partitions.find(name='part-1')
+    partition.pull_full_properties()
+    return counting_session, partition
+
+
+@pytest.mark.parametrize(
+    "nic_count", [1, 4, 16])
+def test_partition_add_artificial_properties_budget(nic_count):
+    """
+    Test that the number of HMC operations of add_artificial_properties()
+    grows only by the retrieval of each NIC, and that the backing virtual
+    switch and adapter shared by the NICs are retrieved only once.
+    """
+    session, partition = mocked_partition_with_nics(nic_count)
+    session.reset()
+
+    # The function to be tested
+    partition_properties = dict(partition.properties)
+    zhmc_partition.add_artificial_properties(
+        partition_properties, partition, False, False)
+
+    assert len(partition_properties['nics']) == nic_count
+    for nic_props in partition_properties['nics']:
+        assert nic_props['adapter-name'] == 'osa-1'
+        assert nic_props['adapter-port'] == 0
+        assert nic_props['adapter-id'] == '120'
+
+    session.assert_budget(nic_count, uri_pattern='/nics/')
+    session.assert_budget(1, uri_pattern='^/api/virtual-switches/')
+    session.assert_budget(1, uri_pattern='^/api/adapters/')
+    session.assert_budget(nic_count + 2)
+
+
 # The other functions of the module are tested with function tests.
@@ -0,0 +1,120 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the SelectedPropertiesPuller class in the 'common'
+module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+import zhmcclient
+from zhmcclient_mock import FakedSession
+
+from plugins.module_utils.common import SelectedPropertiesPuller
+from tests.common.call_budget import CallCountingSession
+
+# URI patterns of the property-selective and the full "Get Properties"
+# operations for partitions
+SELECTIVE_GET = r'^/api/partitions/[^/?]+\?properties='
+FULL_GET = r'^/api/partitions/[^/?]+$'
+
+
+@pytest.fixture
+def partitions():
+    """
+    Fixture for the call counting session of a faked HMC with a CPC with
+    three partitions, and the zhmcclient objects of the partitions.
+    """
+    faked_session = FakedSession('fake-host', 'HMC1', '2.14.1', '2.20')
+    faked_session.hmc.cpcs.add({
+        'object-id': 'cpc1', 'name': 'CPC1', 'dpm-enabled': True})
+    faked_cpc = faked_session.hmc.cpcs.lookup_by_oid('cpc1')
+    for oid in ('part1', 'part2', 'part3'):
+        faked_cpc.partitions.add({
+            'object-id': oid, 'name': oid.upper(), 'description': oid})
+    session = CallCountingSession(faked_session)
+    cpc = zhmcclient.Client(session).cpcs.find(name='CPC1')
+    resources = cpc.partitions.list()
+    session.reset()
+    return session, resources
+
+
+def test_pull_rejected_selection(partitions):
+    """
+    Test that the full properties are retrieved after the HMC rejected a
+    property selection once. The faked HMC rejects the 'properties' query
+    parameter.
+    """
+    session, resources = partitions
+    puller = SelectedPropertiesPuller()
+
+    for resource in resources:
+        puller.pull(resource, ['description'])
+
+    assert puller.selection_supported is False
+    assert [r.properties['description'] for r in resources] == \
+        ['part1', 'part2', 'part3']
+    assert session.count('GET', SELECTIVE_GET) == 1
+    assert session.count('GET', FULL_GET) == 3
+
+
+def test_pull_without_pull_properties(partitions, monkeypatch):
+    """
+    Test that the full properties are retrieved without attempting a
+    property selection with zhmcclient versions that do not have
+    pull_properties() (before 1.8).
+    """
+    monkeypatch.delattr(zhmcclient.BaseResource, 'pull_properties')
+    session, resources = partitions
+    puller = SelectedPropertiesPuller()
+
+    for resource in resources:
+        puller.pull(resource, ['description'])
+
+    assert puller.selection_supported is False
+    assert [r.properties['description'] for r in resources] == \
+        ['part1', 'part2', 'part3']
+    assert session.count('GET', SELECTIVE_GET) == 0
+    assert session.count('GET', FULL_GET) == 3
+
+
+def test_pull_present_properties(partitions):
+    """
+    Test that properties that are already present are not retrieved again.
+    """
+    session, resources = partitions
+    puller = SelectedPropertiesPuller()
+
+    puller.pull(resources[0], ['name'])
+
+    assert session.count() == 0
+
+
+def test_pull_refresh(partitions):
+    """
+    Test that properties that are already present are retrieved again when
+    a refresh is requested.
+    """
+    session, resources = partitions
+    puller = SelectedPropertiesPuller()
+    resources[0].update_properties_local({'name': 'OLD'})
+
+    puller.pull(resources[0], ['name'], refresh=True)
+
+    assert resources[0].properties['name'] == 'PART1'
+    assert session.count('GET') == 2
@@ -0,0 +1,249 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests and micro-benchmarks for the compiled property schemas in the
+'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import timeit
+import pytest
+
+from plugins.module_utils.common import PropertySchema, \
+    PropertyDefinition, property_schema, process_normal_property
+from plugins.modules import zhmc_partition
+
+# Number of repetitions of the micro-benchmarks. The minimum time of the
+# repetitions is used, to reduce the effect of other load on the system.
+BENCHMARK_REPEAT = 5
+BENCHMARK_NUMBER = 200
+
+# Factor by which the diff with a compiled schema may be slower than the
+# diff based on the tuples, to tolerate measurement noise.
+BENCHMARK_TOLERANCE = 1.2
+
+
+class FakedResource(object):
+    """
+    Resource object with the 'properties' attribute, as used by
+    process_normal_property().
+    """
+
+    def __init__(self, properties):
+        self.properties = properties
+
+
+def tuple_normal_property(
+        prop_name, resource_properties, input_props, resource):
+    """
+    Reference implementation of process_normal_property() that works on the
+    tuples of the property definition dictionary, for the benchmarks.
+    """
+    create_props = {}
+    update_props = {}
+    deactivate = False
+    allowed, create, update, update_while_active, eq_func, type_cast = \
+        resource_properties[prop_name][0:6]
+    if not allowed:
+        raise AssertionError()
+    hmc_prop_name = prop_name.replace('_', '-')
+    input_prop_value = input_props[prop_name]
+    if type_cast:
+        input_prop_value = type_cast(input_prop_value)
+    current_prop_value = resource.properties.get(hmc_prop_name)
+    if eq_func:
+        equal = eq_func(current_prop_value, input_prop_value, prop_name)
+    else:
+        equal = (current_prop_value == input_prop_value)
+    if not equal and update:
+        update_props[hmc_prop_name] = input_prop_value
+        if not update_while_active:
+            deactivate = True
+    return create_props, update_props, deactivate
+
+
+def partition_input_props():
+    """
+    Return input properties for all updatable normal partition properties,
+    and a faked partition whose properties all differ from them.
+    """
+    input_props = {}
+    current_props = {}
+    for name, prop_def in zhmc_partition.ZHMC_PARTITION_PROPERTIES.items():
+        allowed, create, update, _, eq_func, type_cast = prop_def[0:6]
+        if not (allowed and update) or eq_func or \
+                name.endswith('_name') or name == 'crypto_configuration':
+            continue
+        input_props[name] = '1' if type_cast else 'new'
+        current_props[name.replace('_', '-')] = 'old'
+    return input_props, FakedResource(current_props)
+
+
+def test_property_definition():
+    """
+    Test the attributes of a compiled property definition.
+    """
+    eq_func = object()
+    prop_def = PropertyDefinition(
+        'max_memory', (True, True, False, None, eq_func, int))
+    assert prop_def.name == 'max_memory'
+    assert prop_def.hmc_name == 'max-memory'
+    assert prop_def.allowed is True
+    assert prop_def.create is True
+    assert prop_def.update is False
+    assert prop_def.update_while_active is None
+    assert prop_def.eq_func is eq_func
+    assert prop_def.type_cast is int
+    assert prop_def.required is False
+    assert prop_def.default is None
+    with pytest.raises(AttributeError):
+        prop_def.foo = 1
+
+
+def test_property_schema():
+    """
+    Test the precomputed requiredness and defaults of a compiled schema.
+    """
+
+    def required_func(input_props):
+        return True
+
+    properties = {
+        'p_req': (True, True, True, True, None, None, True, None),
+        'p_func': (True, True, True, True, None, None, required_func, 42),
+        'p_special': (True, True, True, True, None, None, False, 'special'),
+        'p_short': (True, True, True, True, None, None),
+    }
+    schema = PropertySchema(properties, special_default='special')
+
+    assert len(schema) == 4
+    assert 'p_req' in schema
+    assert 'p_foo' not in schema
+    assert schema['p_func'].hmc_name == 'p-func'
+    assert schema.required_names == ('p_req',)
+    assert schema.required_funcs == ((schema['p_func'], required_func),)
+    assert schema.defaults == (
+        ('p-req', None), ('p-func', 42), ('p-short', None))
+
+
+def test_property_schema_cached():
+    """
+    Test that a property definition dictionary is compiled only once.
+    """
+    properties = {'p1': (True, True, True, True, None, None)}
+    schema = property_schema(properties)
+    assert isinstance(schema, PropertySchema)
+    assert property_schema(properties) is schema
+    assert property_schema(schema) is schema
+
+
+def test_process_normal_property_schema():
+    """
+    Test that process_normal_property() returns the same result for a
+    compiled schema and for the property definition dictionary.
+    """
+    input_props, partition = partition_input_props()
+    for prop_name in input_props:
+        result_dict = process_normal_property(
+            prop_name, zhmc_partition.ZHMC_PARTITION_PROPERTIES, input_props,
+            partition)
+        result_schema = process_normal_property(
+            prop_name, zhmc_partition.ZHMC_PARTITION_SCHEMA, input_props,
+            partition)
+        assert result_schema == result_dict
+        assert result_schema == tuple_normal_property(
+            prop_name, zhmc_partition.ZHMC_PARTITION_PROPERTIES, input_props,
+            partition)
+
+
+def test_benchmark_partition_diff():
+    """
+    Micro-benchmark for the diff of all updatable partition properties
+    against an existing partition, with the compiled schema and with the
+    tuples of the property definition dictionary.
+    """
+    input_props, partition = partition_input_props()
+    props = zhmc_partition.ZHMC_PARTITION_PROPERTIES
+    schema = zhmc_partition.ZHMC_PARTITION_SCHEMA
+
+    def diff_tuples():
+        for prop_name in input_props:
+            tuple_normal_property(prop_name, props, input_props, partition)
+
+    def diff_schema():
+        for prop_name in input_props:
+            process_normal_property(prop_name, schema, input_props, partition)
+
+    time_tuples = min(timeit.repeat(
+        diff_tuples, repeat=BENCHMARK_REPEAT, number=BENCHMARK_NUMBER))
+    time_schema = min(timeit.repeat(
+        diff_schema, repeat=BENCHMARK_REPEAT, number=BENCHMARK_NUMBER))
+
+    per_diff_us = 1e6 / BENCHMARK_NUMBER
+    print("\nDiff of {0} partition properties: tuples: {1:.1f} us, "
+          "compiled schema: {2:.1f} us".
+          format(len(input_props), time_tuples * per_diff_us,
+                 time_schema * per_diff_us))
+    assert time_schema <= time_tuples * BENCHMARK_TOLERANCE
+
+
+def test_benchmark_check_mode_defaults():
+    """
+    Micro-benchmark for applying the create requiredness and defaults of
+    the partition properties, with the compiled schema and with the tuples
+    of the property definition dictionary.
+    """
+    props = zhmc_partition.ZHMC_PARTITION_PROPERTIES
+    schema = zhmc_partition.ZHMC_PARTITION_SCHEMA
+    special_default = zhmc_partition.SPECIAL_DEFAULT
+
+    def defaults_tuples():
+        input_props = {}
+        missing = []
+        for prop_name in props:
+            hmc_name = prop_name.replace('_', '-')
+            required, default = props[prop_name][6:8]
+            if not callable(required) and required and \
+                    hmc_name not in input_props:
+                missing.append(prop_name)
+            if default != special_default:
+                input_props.setdefault(hmc_name, default)
+        return missing, input_props
+
+    def defaults_schema():
+        input_props = {}
+        missing = []
+        for prop_name in schema.required_names:
+            if schema[prop_name].hmc_name not in input_props:
+                missing.append(prop_name)
+        for hmc_name, default in schema.defaults:
+            input_props.setdefault(hmc_name, default)
+        return missing, input_props
+
+    assert defaults_schema() == defaults_tuples()
+
+    time_tuples = min(timeit.repeat(
+        defaults_tuples, repeat=BENCHMARK_REPEAT, number=BENCHMARK_NUMBER))
+    time_schema = min(timeit.repeat(
+        defaults_schema, repeat=BENCHMARK_REPEAT, number=BENCHMARK_NUMBER))
+
+    per_run_us = 1e6 / BENCHMARK_NUMBER
+    print("\nDefaults of {0} partition properties: tuples: {1:.1f} us, "
+          "compiled schema: {2:.1f} us".
+          format(len(props), time_tuples * per_run_us,
+                 time_schema * per_run_us))
+    assert time_schema <= time_tuples * BENCHMARK_TOLERANCE
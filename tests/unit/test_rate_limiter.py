@@ -0,0 +1,192 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the HMC rate limiter in the 'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import time
+import multiprocessing
+import pytest
+import mock
+
+from plugins.module_utils import common
+from plugins.module_utils.common import HmcRateLimiter, ParameterError, \
+    get_session, RATE_LIMITS_ENV_VAR, RATE_LIMIT_DIR_ENV_VAR
+
+pytestmark = pytest.mark.skipif(
+    common.fcntl is None, reason="File locks are not available")
+
+HMC_HOST = '10.11.12.13'
+
+
+def issue_methods(lock_dir, limits, count, duration, queue):
+    """
+    Issue HTTP methods that take a duration through a rate limiter, in a
+    separate process, and put the start times of the methods into the queue.
+    """
+    limiter = HmcRateLimiter(HMC_HOST, lock_dir=lock_dir, **limits)
+    for _ in range(count):
+        slot = limiter.acquire()
+        try:
+            queue.put(time.time())
+            time.sleep(duration)
+        finally:
+            limiter.release(slot)
+
+
+def run_processes(lock_dir, limits, processes, count, duration=0.0):
+    """
+    Run processes that issue HTTP methods through rate limiters, and return
+    the sorted start times of the methods.
+    """
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(
+            target=issue_methods,
+            args=(lock_dir, limits, count, duration, queue))
+        for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    start_times = [queue.get(timeout=30) for _ in range(processes * count)]
+    for proc in procs:
+        proc.join()
+        assert proc.exitcode == 0
+    return sorted(start_times)
+
+
+def test_rate_limit_across_processes(tmpdir):
+    """
+    Test that the rate of HTTP methods is limited across processes.
+    """
+    rate = 20.0
+    start_times = run_processes(
+        str(tmpdir), dict(rate=rate, burst=1), processes=4, count=5)
+
+    # The first method uses the initial token, the others wait for new tokens
+    elapsed = start_times[-1] - start_times[0]
+    assert elapsed >= (len(start_times) - 1) / rate * 0.9
+
+
+def test_burst(tmpdir):
+    """
+    Test that a burst of HTTP methods is not delayed.
+    """
+    limiter = HmcRateLimiter(HMC_HOST, rate=1, burst=5, lock_dir=str(tmpdir))
+    start_time = time.time()
+    for _ in range(5):
+        limiter.release(limiter.acquire())
+    assert time.time() - start_time < 0.5
+
+
+def test_concurrency_limit_across_processes(tmpdir):
+    """
+    Test that the number of concurrent HTTP methods is limited across
+    processes.
+    """
+    duration = 0.2
+    start_time = time.time()
+    start_times = run_processes(
+        str(tmpdir), dict(max_concurrency=2), processes=4, count=1,
+        duration=duration)
+    elapsed = time.time() - start_time
+
+    # 4 methods with 2 at a time need at least 2 durations
+    assert elapsed >= 2 * duration
+    assert start_times[2] - start_times[0] >= duration * 0.9
+
+
+def test_attach(tmpdir):
+    """
+    Test that the HTTP methods of an attached session are limited, and that
+    recursive calls are limited only once.
+    """
+    limiter = HmcRateLimiter(HMC_HOST, max_concurrency=1,
+                             lock_dir=str(tmpdir))
+    session = mock.Mock()
+    session.get.return_value = {'name': 'x'}
+
+    limiter.attach(session)
+    with mock.patch.object(limiter, 'acquire', wraps=limiter.acquire) \
+            as acquire:
+        assert session.get('/api/console') == {'name': 'x'}
+        session.post('/api/console/operations/x', body={'a': 1})
+        session.delete('/api/users/1')
+    assert acquire.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "limits, exp_limits", [
+        (None, None),
+        ({}, None),
+        ({'other-host': {'rate': 1}}, None),
+        ({HMC_HOST: {'rate': 2.5, 'burst': 5}}, (2.5, 5, None)),
+        ({'*': {'max_concurrency': 4}}, (None, 1, 4)),
+        ({'*': {'rate': 10}, HMC_HOST: {'rate': 1}}, (1, 1, None)),
+    ]
+)
+def test_from_environment(limits, exp_limits, tmpdir):
+    """
+    Test the limits defined in the environment variable.
+    """
+    env = {RATE_LIMIT_DIR_ENV_VAR: str(tmpdir)}
+    if limits is not None:
+        env[RATE_LIMITS_ENV_VAR] = json.dumps(limits)
+    with mock.patch.dict(os.environ, env):
+        limiter = HmcRateLimiter.from_environment(HMC_HOST)
+
+    if exp_limits is None:
+        assert limiter is None
+    else:
+        assert (limiter.rate, limiter.burst, limiter.max_concurrency) == \
+            exp_limits
+        assert limiter.lock_dir == str(tmpdir)
+
+
+@pytest.mark.parametrize(
+    "limits_str", [
+        'foo',
+        '["rate"]',
+        '{"*": {"rates": 1}}',
+        '{"*": {"rate": -1}}',
+        '{"*": {"max_concurrency": "4"}}',
+    ]
+)
+def test_from_environment_error(limits_str):
+    """
+    Test invalid limits in the environment variable.
+    """
+    with mock.patch.dict(os.environ, {RATE_LIMITS_ENV_VAR: limits_str}):
+        with pytest.raises(ParameterError):
+            HmcRateLimiter.from_environment(HMC_HOST)
+
+
+def test_get_session(tmpdir):
+    """
+    Test that get_session() attaches a rate limiter to a new session.
+    """
+    env = {
+        RATE_LIMITS_ENV_VAR: json.dumps({HMC_HOST: {'max_concurrency': 2}}),
+        RATE_LIMIT_DIR_ENV_VAR: str(tmpdir),
+    }
+    with mock.patch.dict(os.environ, env):
+        with mock.patch.object(HmcRateLimiter, 'attach') as attach:
+            get_session(None, HMC_HOST, 'fake-userid', 'fake-password',
+                        None, True)
+    assert attach.call_count == 1
@@ -0,0 +1,274 @@
+# Copyright 2023 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the retry policy in the 'common' module_utils module.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import json
+import pytest
+import mock
+
+import zhmcclient
+
+from plugins.module_utils import common
+from plugins.module_utils.common import RetryPolicy, ParameterError, \
+    get_session, retry_result, RETRY_ENV_VAR
+
+
+def http_error(http_status, reason=0):
+    """
+    Return a zhmcclient.HTTPError with the HTTP status and reason codes.
+    """
+    return zhmcclient.HTTPError({
+        'http-status': http_status,
+        'reason': reason,
+        'message': 'Injected error',
+    })
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    """
+    Do not actually sleep between the retries, and forget the retry policies
+    of the sessions created in a test.
+    """
+    with mock.patch.object(common.time, 'sleep') as sleep:
+        yield sleep
+    del common.RETRY_POLICIES[:]
+
+
+def failing_func(errors, result='ok'):
+    """
+    Return a mocked function that raises the errors in turn, and then
+    returns the result.
+    """
+    return mock.Mock(side_effect=list(errors) + [result])
+
+
+@pytest.mark.parametrize(
+    "method, error, exp_retried", [
+        ('get', http_error(503), True),
+        ('get', http_error(409, 2), True),
+        ('get', http_error(409, 1), False),
+        ('get', http_error(404, 1), False),
+        ('get', zhmcclient.ConnectionError('reset', None), True),
+        ('get', zhmcclient.ReadTimeout('t', None, 0, 0), True),
+        ('post', http_error(503), True),
+        ('post', http_error(409, 2), True),
+        ('post', http_error(500), False),
+        ('post', zhmcclient.ConnectTimeout('t', None, 0, 0), True),
+        ('post', zhmcclient.ReadTimeout('t', None, 0, 0), False),
+        ('post', zhmcclient.ConnectionError('reset', None), False),
+        ('delete', http_error(503), True),
+        ('delete', zhmcclient.ConnectionError('reset', None), False),
+    ]
+)
+def test_transient_errors(method, error, exp_retried):
+    """
+    Test which errors are retried for which HTTP methods.
+    """
+    policy = RetryPolicy(max_attempts=3)
+    func = failing_func([error])
+
+    if exp_retried:
+        assert policy.call(method, func, ('/api/x',), {}) == 'ok'
+        assert func.call_count == 2
+        assert policy.retries == 1
+    else:
+        with pytest.raises(type(error)):
+            policy.call(method, func, ('/api/x',), {})
+        assert func.call_count == 1
+        assert policy.retries == 0
+
+
+def test_max_attempts():
+    """
+    Test that an HTTP method is attempted at most max_attempts times, and
+    that the last error is raised.
+    """
+    policy = RetryPolicy(max_attempts=3)
+    errors = [http_error(503, reason) for reason in (1, 2, 3)]
+    func = failing_func(errors)
+
+    with pytest.raises(zhmcclient.HTTPError) as exc_info:
+        policy.call('get', func, ('/api/x',), {})
+    assert exc_info.value is errors[-1]
+    assert func.call_count == 3
+    assert policy.retries == 2
+
+
+def test_backoff(no_sleep):
+    """
+    Test the exponential backoff with full jitter and the maximum delay.
+    """
+    policy = RetryPolicy(max_attempts=6, initial_delay=1.0, max_delay=5.0)
+    func = failing_func([http_error(503)] * 5)
+
+    with mock.patch.object(common.random, 'uniform',
+                           side_effect=lambda low, high: high) as uniform:
+        policy.call('get', func, ('/api/x',), {})
+
+    assert [c[0] for c in uniform.call_args_list] == \
+        [(0, 1.0), (0, 2.0), (0, 4.0), (0, 5.0), (0, 5.0)]
+    assert [c[0][0] for c in no_sleep.call_args_list] == \
+        [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_deadline(no_sleep):
+    """
+    Test that an HTTP method is not retried if the delay would exceed the
+    deadline.
+    """
+    policy = RetryPolicy(max_attempts=10, initial_delay=4.0, max_delay=4.0,
+                         deadline=10.0)
+    func = failing_func([http_error(503)] * 9)
+
+    # A clock that advances only by sleeping
+    clock = [1000.0]
+    no_sleep.side_effect = lambda seconds: clock.append(clock[-1] + seconds)
+
+    with mock.patch.object(common.random, 'uniform', return_value=4.0):
+        with mock.patch.object(common.time, 'time',
+                               side_effect=lambda: clock[-1]):
+            with pytest.raises(zhmcclient.HTTPError):
+                policy.call('get', func, ('/api/x',), {})
+
+    # Retries at 4 and 8 seconds, the next one would be at 12 seconds
+    assert func.call_count == 3
+    assert no_sleep.call_count == 2
+
+
+def test_post_with_nested_calls():
+    """
+    Test that a POST method that issued other HTTP methods before it failed
+    is not retried, because the operation may have been performed.
+    """
+    policy = RetryPolicy(max_attempts=3)
+    session = mock.Mock()
+    polls = []
+
+    def post(uri, body=None, **kwargs):
+        # Poll the job of an asynchronous operation, and then fail
+        session.get('/api/jobs/1')
+        polls.append(uri)
+        raise http_error(503)
+
+    session.post.side_effect = post
+    session.get.return_value = {'status': 'running'}
+    policy.attach(session)
+
+    with pytest.raises(zhmcclient.HTTPError):
+        session.post('/api/partitions/1/operations/start')
+    assert len(polls) == 1
+    assert policy.retries == 0
+
+
+def test_attach():
+    """
+    Test that the HTTP methods of an attached session are retried, with
+    their arguments.
+    """
+    policy = RetryPolicy(max_attempts=2)
+    session = mock.Mock()
+    session.get.side_effect = [http_error(503), {'name': 'x'}]
+    session.post.side_effect = [http_error(503), None]
+    session.delete.side_effect = [http_error(503), None]
+    orig_post = session.post
+
+    policy.attach(session)
+    assert session.get('/api/console') == {'name': 'x'}
+    session.post('/api/console/operations/x', body={'a': 1},
+                 wait_for_completion=False)
+    session.delete('/api/users/1')
+
+    assert policy.retries == 3
+    assert orig_post.call_args_list == 2 * [
+        mock.call('/api/console/operations/x', body={'a': 1},
+                  wait_for_completion=False)]
+
+
+@pytest.mark.parametrize(
+    "policy, exp_policy", [
+        (None, (3, 1.0, 30.0, 300.0)),
+        ({}, (3, 1.0, 30.0, 300.0)),
+        ({'max_attempts': 1}, (1, 1.0, 30.0, 300.0)),
+        ({'max_attempts': 5, 'initial_delay': 0.5, 'max_delay': 10,
+          'deadline': 60}, (5, 0.5, 10, 60)),
+    ]
+)
+def test_from_environment(policy, exp_policy):
+    """
+    Test the retry policy defined in the environment variable.
+    """
+    env = {}
+    if policy is not None:
+        env[RETRY_ENV_VAR] = json.dumps(policy)
+    with mock.patch.dict(os.environ, env):
+        if policy is None:
+            os.environ.pop(RETRY_ENV_VAR, None)
+        retry_policy = RetryPolicy.from_environment()
+
+    assert (retry_policy.max_attempts, retry_policy.initial_delay,
+            retry_policy.max_delay, retry_policy.deadline) == exp_policy
+
+
+@pytest.mark.parametrize(
+    "policy_str", [
+        'foo',
+        '["max_attempts"]',
+        '{"attempts": 3}',
+        '{"max_attempts": 0}',
+        '{"max_attempts": 2.5}',
+        '{"max_attempts": true}',
+        '{"initial_delay": -1}',
+        '{"deadline": "60"}',
+    ]
+)
+def test_from_environment_error(policy_str):
+    """
+    Test invalid retry policies in the environment variable.
+    """
+    with mock.patch.dict(os.environ, {RETRY_ENV_VAR: policy_str}):
+        with pytest.raises(ParameterError):
+            RetryPolicy.from_environment()
+
+
+@pytest.mark.parametrize(
+    "policy, exp_attached", [
+        ({}, True),
+        ({'max_attempts': 1}, False),
+    ]
+)
+def test_get_session(policy, exp_attached):
+    """
+    Test that get_session() attaches a retry policy to a new session, and
+    that retry_result() reports its retries.
+    """
+    env = {RETRY_ENV_VAR: json.dumps(policy)}
+    with mock.patch.dict(os.environ, env):
+        with mock.patch.object(RetryPolicy, 'attach') as attach:
+            get_session(None, 'fake-host', 'fake-userid', 'fake-password',
+                        None, True)
+    assert attach.call_count == int(exp_attached)
+    assert len(common.RETRY_POLICIES) == int(exp_attached)
+    assert retry_result() == {}
+
+    if exp_attached:
+        common.RETRY_POLICIES[0].retries = 2
+        assert retry_result() == {'retries': 2}